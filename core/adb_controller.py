@@ -1,43 +1,356 @@
 import subprocess
 import shlex
-import time
 import os
-from typing import Optional
+import random
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator, Optional, Protocol, Union
 
-def _run(cmd: str) -> str:
-    # Use shell=False for safety; allow spaces via shlex.split
-    proc = subprocess.run(shlex.split(cmd), capture_output=True, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(f"Command failed: {cmd}\nSTDERR: {proc.stderr.strip()}")
-    return proc.stdout.strip()
+import numpy as np
+
+from core import clock, metrics, recorder, tracing
+from core.circuit_breaker import DeviceUnavailable, get_breaker
+from core.logger import get_logger
+from core.raw_frame import RawFrame
+
+if TYPE_CHECKING:
+    from core.touch_backend import TouchBackend
+
+_logger = get_logger("adb")
+
+Frame = Union[np.ndarray, RawFrame]
+
+
+class FrameSource(Protocol):
+    """可直接提供畫面影格的擷取來源（例如 screenrecord 串流）。"""
+
+    def grab(self, timeout: float = 5.0) -> Frame:
+        ...
+
+
+class Controller(Protocol):
+    """可取代 adb 的裝置控制器（例如重播錄製畫面的假裝置）。"""
+
+    def capture_screen(self, save_path: str, device_id: Optional[str] = None) -> None:
+        ...
+
+    def grab_frame(self, device_id: Optional[str] = None) -> Frame:
+        ...
+
+    def tap(self, x: int, y: int, device_id: Optional[str] = None) -> None:
+        ...
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300, device_id: Optional[str] = None) -> None:
+        ...
+
+    def devices(self) -> list[str]:
+        ...
+
+
+# 設定後所有裝置操作都改由此控制器處理，不再呼叫 adb
+_controller: Optional[Controller] = None
+
+
+def set_controller(controller: Optional[Controller]) -> Optional[Controller]:
+    """替換裝置控制器（None 表示恢復使用 adb），回傳原本的控制器。"""
+    global _controller
+    previous, _controller = _controller, controller
+    return previous
+
+
+# device_id -> 已註冊的影格來源；未註冊的裝置沿用 screencap
+_frame_sources: dict[Optional[str], FrameSource] = {}
+
+
+def register_frame_source(device_id: Optional[str], source: FrameSource) -> None:
+    _frame_sources[device_id] = source
+
+
+def unregister_frame_source(device_id: Optional[str]) -> None:
+    _frame_sources.pop(device_id, None)
+
+
+def has_frame_source(device_id: Optional[str]) -> bool:
+    return device_id in _frame_sources
+
+
+# device_id -> 持久連線的觸控後端（例如 minitouch）；未註冊的裝置沿用 `input tap`
+_touch_backends: dict[Optional[str], "TouchBackend"] = {}
+
+
+def register_touch_backend(device_id: Optional[str], backend: "TouchBackend") -> None:
+    _touch_backends[device_id] = backend
+
+
+def unregister_touch_backend(device_id: Optional[str]) -> None:
+    backend = _touch_backends.pop(device_id, None)
+    if backend is not None:
+        backend.close()
+
+
+def get_touch_backend(device_id: Optional[str]) -> Optional["TouchBackend"]:
+    return _touch_backends.get(device_id)
+
+
+def _touch(device_id: Optional[str], action: str, *args) -> bool:
+    """以觸控後端送出；未註冊或連線失敗（改回 `input`）時回傳 False。"""
+    backend = _touch_backends.get(device_id)
+    if backend is None:
+        return False
+    try:
+        getattr(backend, action)(*args)
+        return True
+    except OSError as e:
+        _logger.warning(f"[TOUCH] 觸控後端失敗，改用 input {action}: {e}")
+        unregister_touch_backend(device_id)
+        return False
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """adb 指令的期限與重試：每次最多 `timeout` 秒，連線類錯誤最多重試 `retries` 次。"""
+
+    timeout: float = 10.0
+    retries: int = 2
+    backoff: float = 0.5
+    max_backoff: float = 5.0
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次重試前的等待：指數退避加上 ±50% 抖動，避免多台裝置同時重試。"""
+        base = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return base * random.uniform(0.5, 1.5)
+
+
+def retry_policy_from_env() -> RetryPolicy:
+    return RetryPolicy(
+        timeout=float(os.getenv("ADB_TIMEOUT", "10")),
+        retries=int(os.getenv("ADB_RETRIES", "2")),
+        backoff=float(os.getenv("ADB_BACKOFF", "0.5")),
+    )
+
+
+_retry_policy = retry_policy_from_env()
+
+
+def set_retry_policy(policy: RetryPolicy) -> RetryPolicy:
+    global _retry_policy
+    previous, _retry_policy = _retry_policy, policy
+    return previous
+
+
+class AdbTimeout(RuntimeError):
+    """adb 指令超過期限（例如 Wi-Fi 連線時 pull 卡住）。"""
+
+
+# stderr 含這些字串時視為連線問題：指令沒有到達裝置，可以安全重試
+_CONNECTION_ERRORS = (
+    "device offline",
+    "not found",
+    "no devices",
+    "connection reset",
+    "connection refused",
+    "protocol fault",
+    "closed",
+    "cannot connect",
+)
+# host:port 形式的序號以 `adb connect` 連線，斷線後可自動重連
+_NETWORK_SERIAL = re.compile(r"^[\w.\-]+:\d+$")
+
+
+def _serial_of(args: list[str]) -> Optional[str]:
+    return args[2] if len(args) > 2 and args[1] == "-s" else None
+
+
+def _command_label(args: list[str]) -> str:
+    rest = args[3:] if _serial_of(args) else args[1:]
+    return rest[0] if rest else ""
+
+
+def _reconnect(serial: str, timeout: float) -> None:
+    try:
+        proc = subprocess.run(["adb", "connect", serial], capture_output=True, text=True, timeout=timeout or None)
+        ok = proc.returncode == 0 and "connected" in proc.stdout and "failed" not in proc.stdout
+    except (OSError, subprocess.TimeoutExpired):
+        ok = False
+    metrics.inc("adb_reconnects_total", result="ok" if ok else "error")
+    _logger.info(f"[ADB] 重新連線 {serial}：{'成功' if ok else '失敗'}")
+
+
+def _call(cmd: str, *, text: bool, timeout: Optional[float], retries: Optional[int], idempotent: bool):
+    """執行 adb 指令：期限、連線錯誤重試（含 `adb connect` 重連）與每台裝置的斷路器。
+
+    `idempotent=False`（點擊、滑動）時逾時不重試：指令可能已送達裝置，重送會變成連點。
+    """
+    args = shlex.split(cmd)
+    serial = _serial_of(args)
+    label = _command_label(args)
+    policy = _retry_policy
+    timeout = policy.timeout if timeout is None else timeout
+    retries = policy.retries if retries is None else retries
+    breaker = get_breaker(serial)
+    breaker.allow()
+    attempt = 0
+    while True:
+        try:
+            # Use shell=False for safety; allow spaces via shlex.split
+            proc = subprocess.run(args, capture_output=True, text=text, timeout=timeout or None)
+        except subprocess.TimeoutExpired:
+            metrics.inc("adb_timeouts_total", command=label)
+            error: RuntimeError = AdbTimeout(f"Command timed out after {timeout:g}s: {cmd}")
+            connection, retryable = True, idempotent
+        except OSError as e:
+            # adb 無法啟動（找不到執行檔、資源不足）：記為失敗，半開試探才不會卡在進行中
+            error = RuntimeError(f"Command could not start: {cmd}: {e}")
+            connection, retryable = True, False
+        else:
+            if proc.returncode == 0:
+                breaker.success()
+                metrics.inc("adb_commands_total", command=label, result="ok")
+                return proc.stdout
+            stderr = proc.stderr if text else proc.stderr.decode("utf-8", errors="replace")
+            error = RuntimeError(f"Command failed: {cmd}\nSTDERR: {stderr.strip()}")
+            connection = any(s in stderr.lower() for s in _CONNECTION_ERRORS)
+            retryable = connection
+        if not retryable or attempt >= retries:
+            break
+        metrics.inc("adb_retries_total", command=label)
+        if serial and _NETWORK_SERIAL.match(serial):
+            _reconnect(serial, timeout)
+        clock.sleep(policy.delay(attempt))
+        attempt += 1
+    # 只有連線類錯誤與逾時計入斷路器；指令本身的錯誤代表裝置仍有回應
+    if connection:
+        breaker.failure(str(error))
+    else:
+        breaker.success()
+    metrics.inc("adb_commands_total", command=label, result="timeout" if isinstance(error, AdbTimeout) else "error")
+    raise error
+
+
+def _run(cmd: str, *, timeout: Optional[float] = None, retries: Optional[int] = None, idempotent: bool = True) -> str:
+    return _call(cmd, text=True, timeout=timeout, retries=retries, idempotent=idempotent).strip()
+
+def _run_bytes(cmd: str, *, timeout: Optional[float] = None, retries: Optional[int] = None) -> bytes:
+    """同 `_run`，但回傳原始位元組（用於 exec-out 傳回的影像資料）。"""
+    return _call(cmd, text=False, timeout=timeout, retries=retries, idempotent=True)
+
+# 同時進行的 adb 截圖上限；裝置很多時避免塞爆 adb server 與網路（None 表示不限制）
+_capture_slots: Optional[threading.BoundedSemaphore] = None
+
+
+def set_capture_limit(limit: int) -> None:
+    """限制同時進行的 adb 截圖數（0 表示不限制）。"""
+    global _capture_slots
+    _capture_slots = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+
+@contextmanager
+def _capture_slot() -> Iterator[None]:
+    slots = _capture_slots
+    if slots is None:
+        yield
+        return
+    with metrics.timer("capture_wait_seconds"):
+        slots.acquire()
+    try:
+        yield
+    finally:
+        slots.release()
 
 def _prefix(device_id: Optional[str]) -> str:
     return f"-s {device_id} " if device_id else ""
 
+@tracing.traced("capture_screen", cat="capture")
 def capture_screen(save_path: str, device_id: Optional[str] = None):
     """
     透過 adb 擷取模擬器畫面到本機。
+    若該裝置已註冊影格來源（如串流），直接寫出最新影格。
     """
-    prefix = _prefix(device_id)
-    _run(f"adb {prefix}shell screencap -p /sdcard/__ld_screen.png")
-    _run(f"adb {prefix}pull /sdcard/__ld_screen.png {save_path}")
+    source = _frame_sources.get(device_id)
+    if _controller is not None:
+        with metrics.timer("capture_seconds", mode="controller"):
+            _controller.capture_screen(save_path, device_id)
+    elif source is not None:
+        import cv2
+        from core.image_utils import load_screen
 
-def tap(x: int, y: int, device_id: Optional[str] = None):
-    prefix = _prefix(device_id)
-    _run(f"adb {prefix}shell input tap {int(x)} {int(y)}")
-    # Optional small delay between taps to avoid missing UI transitions
+        with metrics.timer("capture_seconds", mode="source"):
+            frame = source.grab()
+        if not cv2.imwrite(save_path, load_screen(frame)):
+            raise RuntimeError(f"寫入截圖失敗: {save_path}")
+    else:
+        prefix = _prefix(device_id)
+        with _capture_slot(), metrics.timer("capture_seconds", mode="screencap"):
+            _run(f"adb {prefix}shell screencap -p /sdcard/__ld_screen.png")
+            _run(f"adb {prefix}pull /sdcard/__ld_screen.png {save_path}")
+    recorder.record_frame(save_path)
+
+@tracing.traced("grab_frame", cat="capture")
+def grab_frame(device_id: Optional[str] = None) -> Frame:
+    """擷取一張記憶體內的畫面（不落地存檔）。
+
+    已註冊影格來源時由來源提供；否則以 `exec-out screencap` 取得 RawFrame，
+    只有實際讀取的區域才會被解碼。
+    """
+    source = _frame_sources.get(device_id)
+    if _controller is not None:
+        with metrics.timer("capture_seconds", mode="controller"):
+            frame = _controller.grab_frame(device_id)
+    elif source is not None:
+        with metrics.timer("capture_seconds", mode="source"):
+            frame = source.grab()
+    else:
+        with _capture_slot(), metrics.timer("capture_seconds", mode="exec_out"):
+            data = _run_bytes(f"adb {_prefix(device_id)}exec-out screencap")
+        frame = RawFrame.from_bytes(data)
+    recorder.record_frame(frame)
+    return frame
+
+def _tap_delay_from_env() -> float:
     try:
-        delay = float(os.getenv("TAP_DELAY_SECONDS", "1.0"))
+        return float(os.getenv("TAP_DELAY_SECONDS", "1.0"))
     except Exception:
-        delay = 1.0
+        return 1.0
+
+
+# 點擊後的預設延遲：啟動時讀取一次，可由設定檔熱重載以 set_tap_delay 覆寫
+_tap_delay = _tap_delay_from_env()
+
+
+def set_tap_delay(seconds: float) -> None:
+    global _tap_delay
+    _tap_delay = max(0.0, float(seconds))
+
+@tracing.traced("tap", cat="input")
+def tap(x: int, y: int, device_id: Optional[str] = None, delay: Optional[float] = None):
+    with metrics.timer("tap_seconds"):
+        if _controller is not None:
+            _controller.tap(int(x), int(y), device_id)
+        elif not _touch(device_id, "tap", int(x), int(y)):
+            _run(f"adb {_prefix(device_id)}shell input tap {int(x)} {int(y)}", idempotent=False)
+    metrics.inc("taps_total")
+    recorder.note("tap", x=int(x), y=int(y))
+    # Optional small delay between taps to avoid missing UI transitions
+    if delay is None:
+        delay = _tap_delay
     if delay > 0:
-        time.sleep(delay)
+        clock.sleep(delay)
 
 def swipe(x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300, device_id: Optional[str] = None):
+    recorder.note("swipe", x1=int(x1), y1=int(y1), x2=int(x2), y2=int(y2), duration_ms=int(duration_ms))
+    if _controller is not None:
+        _controller.swipe(x1, y1, x2, y2, duration_ms, device_id)
+        return
+    if _touch(device_id, "swipe", int(x1), int(y1), int(x2), int(y2), int(duration_ms)):
+        return
     prefix = _prefix(device_id)
-    _run(f"adb {prefix}shell input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration_ms)}")
+    _run(f"adb {prefix}shell input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration_ms)}", idempotent=False)
 
 def devices() -> list[str]:
+    if _controller is not None:
+        return _controller.devices()
     out = _run("adb devices")
     lines = [ln.strip() for ln in out.splitlines()[1:] if ln.strip()]
     devs = []
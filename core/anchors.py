@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+from core.image_utils import Screen, load_screen
+from core.raw_frame import RawFrame
+
+
+@dataclass
+class Anchor:
+    """模板上一次命中時的畫面位置與該處的取樣像素。"""
+
+    box: tuple[int, int, int, int]  # x, y, w, h（整張畫面座標）
+    ys: np.ndarray
+    xs: np.ndarray
+    expected: np.ndarray  # int16, (len(ys), len(xs), 3)
+    score: float
+    source: Any  # 學習時的模板（路徑或影像）；模板更換後錨點失效
+
+    @property
+    def center(self) -> tuple[int, int]:
+        x, y, w, h = self.box
+        return (x + w // 2, y + h // 2)
+
+
+def _sample(screen: Screen, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+    if isinstance(screen, RawFrame):
+        return screen.sample(ys, xs)
+    return load_screen(screen)[np.ix_(ys, xs)]
+
+
+def _same_source(a: Any, b: Any) -> bool:
+    return a == b if isinstance(a, str) and isinstance(b, str) else a is b
+
+
+class AnchorCache:
+    """固定位置 UI（暫停、離開、確認鍵）的定點驗證。
+
+    模板比對命中後記下命中框，之後先在同一位置以每 `step` 像素取樣的 SAD 比對；
+    平均每通道差距不超過 `tolerance` 即視為命中，只讀取數百個像素、為微秒等級。
+    逐 `block_rows` 列累加差距，超出總預算立即中止；未命中才回到完整的模板比對。
+    """
+
+    def __init__(self, *, step: int = 4, tolerance: float = 12.0, block_rows: int = 4) -> None:
+        self.step = max(1, int(step))
+        self.tolerance = float(tolerance)
+        self.block_rows = max(1, int(block_rows))
+        self._anchors: dict[Hashable, Anchor] = {}
+        self._lock = threading.Lock()
+
+    def learn(self, key: Hashable, screen: Screen, box: tuple[int, int, int, int], score: float, source: Any) -> None:
+        x, y, w, h = (int(v) for v in box)
+        if w <= 0 or h <= 0:
+            return
+        # 取樣點置於各格中央，避開邊框的抗鋸齒像素
+        ys = np.arange(y + min(self.step, h) // 2, y + h, self.step, dtype=np.intp)
+        xs = np.arange(x + min(self.step, w) // 2, x + w, self.step, dtype=np.intp)
+        expected = _sample(screen, ys, xs).astype(np.int16)
+        with self._lock:
+            self._anchors[key] = Anchor((x, y, w, h), ys, xs, expected, float(score), source)
+
+    def verify(self, key: Hashable, screen: Screen, source: Any) -> Optional[Anchor]:
+        """在錨點位置比對；命中回傳錨點，未命中或尚未學習回傳 None。"""
+        anchor = self._anchors.get(key)
+        if anchor is None or not _same_source(anchor.source, source):
+            return None
+        if not isinstance(screen, RawFrame):
+            screen = load_screen(screen)  # 路徑只解碼一次（呼叫端應傳入該 tick 已解碼的畫面）
+        budget = self.tolerance * anchor.expected.size
+        total = 0
+        for r0 in range(0, len(anchor.ys), self.block_rows):
+            rows = anchor.ys[r0:r0 + self.block_rows]
+            try:
+                got = _sample(screen, rows, anchor.xs).astype(np.int16)
+            except (IndexError, ValueError):
+                return None  # 畫面尺寸改變
+            total += int(np.abs(got - anchor.expected[r0:r0 + self.block_rows]).sum())
+            if total > budget:
+                return None
+        return anchor
+
+    def forget(self, key: Hashable) -> None:
+        with self._lock:
+            self._anchors.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._anchors.clear()
+
+    def __len__(self) -> int:
+        return len(self._anchors)
+
+
+def _cache_from_env() -> Optional[AnchorCache]:
+    """ANCHOR_CHECK=0 關閉；ANCHOR_STEP 為取樣間距，ANCHOR_TOLERANCE 為平均每通道容許差。"""
+    if os.getenv("ANCHOR_CHECK", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    try:
+        return AnchorCache(
+            step=int(os.getenv("ANCHOR_STEP", "4")),
+            tolerance=float(os.getenv("ANCHOR_TOLERANCE", "12")),
+        )
+    except ValueError:
+        return AnchorCache()
+
+
+_cache: Optional[AnchorCache] = _cache_from_env()
+
+
+def get_cache() -> Optional[AnchorCache]:
+    return _cache
+
+
+def set_cache(cache: Optional[AnchorCache]) -> Optional[AnchorCache]:
+    """替換全域錨點快取（None 停用定點驗證），回傳原本的快取。"""
+    global _cache
+    previous, _cache = _cache, cache
+    return previous
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass, replace
+from types import MappingProxyType
+from typing import Mapping, Optional, Union
+
+import cv2
+import numpy as np
+
+from core.config import AppConfig, ConfigStore, ConfigView, Point, Region, TaskConfig, TemplateSpec
+from core.logger import get_logger
+from core.probes import PixelProbe, ProbeSet
+
+_logger = get_logger("calibration")
+
+# 設定檔中的區域、座標與模板皆以此解析度量測
+DEFAULT_BASE_SIZE = (1920, 1080)
+# 錨點比對：先在預期倍率附近粗掃，再於最佳值附近細掃
+COARSE_SCALES = np.linspace(0.8, 1.25, 19)
+FINE_STEPS = 11
+
+
+def _parse_size(text: str) -> Optional[tuple[int, int]]:
+    m = re.search(r"(\d+)\s*[xX]\s*(\d+)", text or "")
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+@dataclass(frozen=True)
+class Calibration:
+    """裝置解析度相對於設定基準解析度的換算。
+
+    區域與座標依 sx / sy 線性換算；模板影像依錨點比對量得的 `ui_scale` 預先縮放一次。
+    `anchored` 為 True 時倍率已由實際畫面確認，模板比對只需在單一倍率進行；
+    否則以幾何比例（sy）預縮放，仍保留原本的多尺度掃描。
+    """
+
+    device_size: tuple[int, int]
+    base_size: tuple[int, int] = DEFAULT_BASE_SIZE
+    density: Optional[int] = None
+    ui_scale: float = 1.0
+    anchored: bool = False
+    anchor_score: float = 0.0
+
+    @classmethod
+    def identity(cls, base_size: tuple[int, int] = DEFAULT_BASE_SIZE) -> "Calibration":
+        return cls(device_size=tuple(base_size), base_size=tuple(base_size))
+
+    @property
+    def sx(self) -> float:
+        return self.device_size[0] / self.base_size[0]
+
+    @property
+    def sy(self) -> float:
+        return self.device_size[1] / self.base_size[1]
+
+    @property
+    def is_identity(self) -> bool:
+        return self.sx == 1.0 and self.sy == 1.0 and self.ui_scale == 1.0 and not self.anchored
+
+    def point(self, p: Optional[Point]) -> Optional[Point]:
+        if p is None:
+            return None
+        return (int(round(p[0] * self.sx)), int(round(p[1] * self.sy)))
+
+    def region(self, r: Optional[Region]) -> Optional[Region]:
+        if r is None:
+            return None
+        x, y, w, h = r
+        x2, y2 = int(round((x + w) * self.sx)), int(round((y + h) * self.sy))
+        nx, ny = int(round(x * self.sx)), int(round(y * self.sy))
+        return (nx, ny, max(1, x2 - nx), max(1, y2 - ny))
+
+    def template_image(self, image: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if image is None or self.ui_scale == 1.0:
+            return image
+        interp = cv2.INTER_AREA if self.ui_scale < 1.0 else cv2.INTER_LINEAR
+        out = cv2.resize(image, None, fx=self.ui_scale, fy=self.ui_scale, interpolation=interp)
+        out.setflags(write=False)
+        return out
+
+    def template(self, spec: TemplateSpec) -> TemplateSpec:
+        # 特徵點比對本身估計縮放，不需預先縮放
+        if spec.method != "template" or self.is_identity:
+            return spec
+        scales = spec.scales
+        if self.anchored and scales is None:
+            scales = (1.0,)
+        return replace(spec, image=self.template_image(spec.image), scales=scales)
+
+    def task(self, cfg: TaskConfig) -> TaskConfig:
+        return replace(
+            cfg,
+            regions=MappingProxyType({k: self.region(v) for k, v in cfg.regions.items()}),
+            points=MappingProxyType({k: self.point(v) for k, v in cfg.points.items()}),
+            templates=MappingProxyType({k: self.template(v) for k, v in cfg.templates.items()}),
+        )
+
+    def apply(self, cfg: AppConfig) -> AppConfig:
+        """回傳換算到裝置座標的設定（用於 ConfigStore.set_transform，熱重載後自動重新套用）。"""
+        if self.is_identity:
+            return cfg
+        return replace(cfg, tasks=MappingProxyType({k: self.task(v) for k, v in cfg.tasks.items()}))
+
+    def probe_sets(self, sets: Mapping[str, ProbeSet]) -> dict[str, ProbeSet]:
+        """探針座標換算到裝置座標；顏色與容許差不變。"""
+        if self.sx == 1.0 and self.sy == 1.0:
+            return dict(sets)
+        out = {}
+        for name, ps in sets.items():
+            probes = [PixelProbe(*self.point((p.x, p.y)), p.bgr, p.tol) for p in ps.probes]
+            out[name] = ProbeSet(name, probes, min_ratio=ps.min_ratio)
+        return out
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: Mapping) -> "Calibration":
+        return cls(
+            device_size=tuple(int(v) for v in d["device_size"]),
+            base_size=tuple(int(v) for v in d.get("base_size", DEFAULT_BASE_SIZE)),
+            density=int(d["density"]) if d.get("density") is not None else None,
+            ui_scale=float(d.get("ui_scale", 1.0)),
+            anchored=bool(d.get("anchored", False)),
+            anchor_score=float(d.get("anchor_score", 0.0)),
+        )
+
+
+# ----------------------------------------------------------------------
+# 偵測
+# ----------------------------------------------------------------------
+def _grab_screen(device_id: Optional[str]) -> Optional[np.ndarray]:
+    from core import adb_controller
+    from core.image_utils import load_screen
+
+    try:
+        return load_screen(adb_controller.grab_frame(device_id))
+    except Exception as e:
+        _logger.debug(f"[CALIBRATE] 擷取畫面失敗: {e}")
+        return None
+
+
+def detect_resolution(
+    device_id: Optional[str] = None, *, screen: Optional[np.ndarray] = None
+) -> tuple[Optional[tuple[int, int]], Optional[int]]:
+    """回傳 ((寬, 高), dpi)。尺寸以實際畫面為準（方向與截圖一致；已有 `screen` 時不再擷取），無法擷取時才用 `wm size`。"""
+    from core import adb_controller
+
+    if screen is None:
+        screen = _grab_screen(device_id)
+    size = None
+    if screen is not None:
+        h, w = screen.shape[:2]
+        size = (w, h)
+    density = None
+    prefix = adb_controller._prefix(device_id)
+    try:
+        out = adb_controller._run(f"adb {prefix}shell wm density")
+        found = re.findall(r"(\d+)", out.splitlines()[-1]) if out else []
+        density = int(found[-1]) if found else None
+        if size is None:
+            lines = adb_controller._run(f"adb {prefix}shell wm size").splitlines()
+            # 有 Override size 時以最後一行為準；模擬器橫向執行，長邊為寬
+            parsed = _parse_size(lines[-1]) if lines else None
+            if parsed:
+                size = (max(parsed), min(parsed))
+    except Exception as e:
+        _logger.debug(f"[CALIBRATE] wm size/density 失敗: {e}")
+    return size, density
+
+
+def find_ui_scale(
+    screen: np.ndarray,
+    anchor: np.ndarray,
+    expected: float = 1.0,
+    region: Optional[Region] = None,
+) -> tuple[float, float]:
+    """以錨點模板量測畫面 UI 相對於模板的縮放；回傳 (倍率, 分數)。"""
+    from core.image_recognizer import _find_best_match
+
+    search = screen
+    if region is not None:
+        x, y, w, h = region
+        search = screen[y:y + h, x:x + w]
+    _, score, scale, *_ = _find_best_match(search, anchor, False, scales=tuple(expected * COARSE_SCALES))
+    step = expected * float(COARSE_SCALES[1] - COARSE_SCALES[0])
+    fine = np.linspace(scale - step, scale + step, FINE_STEPS)
+    _, fine_score, fine_scale, *_ = _find_best_match(search, anchor, False, scales=tuple(fine))
+    if fine_score >= score:
+        score, scale = fine_score, fine_scale
+    return float(scale), float(score)
+
+
+def calibrate(
+    cfg: AppConfig,
+    device_size: tuple[int, int],
+    *,
+    screen: Optional[np.ndarray] = None,
+    density: Optional[int] = None,
+    base_size: tuple[int, int] = DEFAULT_BASE_SIZE,
+    anchor: tuple[str, str] = ("cow_level", "pause"),
+) -> Calibration:
+    """依裝置尺寸與（可選的）目前畫面建立校正；錨點模板低於其門檻時不視為已確認倍率。"""
+    cal = Calibration(device_size=tuple(device_size), base_size=tuple(base_size), density=density)
+    cal = replace(cal, ui_scale=cal.sy)
+    task_name, tag = anchor
+    task = cfg.tasks.get(task_name)
+    spec = task.templates.get(tag) if task is not None else None
+    if screen is None or spec is None or spec.image is None:
+        return cal
+    scale, score = find_ui_scale(screen, spec.image, expected=cal.sy)
+    if score >= spec.threshold:
+        _logger.info(f"[CALIBRATE] 錨點 {tag} 倍率={scale:.3f} 分數={score:.3f}")
+        return replace(cal, ui_scale=scale, anchored=True, anchor_score=score)
+    _logger.info(f"[CALIBRATE] 未找到錨點 {tag}（分數={score:.3f}），以幾何比例 {cal.sy:.3f} 預縮放並保留多尺度掃描")
+    return replace(cal, anchor_score=score)
+
+
+# ----------------------------------------------------------------------
+# 快取（每台裝置只量測一次）
+# ----------------------------------------------------------------------
+def _cache_key(device_id: Optional[str]) -> str:
+    # 只以裝置為鍵，啟動時不需先向裝置查詢尺寸與 dpi 即可讀取；尺寸與 dpi 記錄在項目內容中
+    return device_id or "default"
+
+
+def load_cached(path: str, key: str) -> Optional[Calibration]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f).get(key)
+        return Calibration.from_dict(entry) if entry else None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_cached(path: str, key: str, cal: Calibration) -> None:
+    data: dict = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        pass
+    data[key] = cal.to_dict()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+# ----------------------------------------------------------------------
+# 目前生效的校正
+# ----------------------------------------------------------------------
+# 依裝置序號記錄；多裝置時各裝置解析度不同，不能共用一份（None 為單機模式與未指定裝置時的預設）
+_active: dict[Optional[str], Calibration] = {}
+_active_lock = threading.Lock()
+_IDENTITY = Calibration.identity()
+
+
+def active(device_id: Optional[str] = None) -> Calibration:
+    with _active_lock:
+        return _active.get(device_id) or _active.get(None) or _IDENTITY
+
+
+def set_active(cal: Optional[Calibration], device_id: Optional[str] = None) -> Calibration:
+    with _active_lock:
+        if cal is None:
+            _active.pop(device_id, None)
+        else:
+            _active[device_id] = cal
+    return cal or _IDENTITY
+
+
+def calibrate_from_env(store: Union[ConfigStore, ConfigView], device_id: Optional[str] = None) -> Calibration:
+    """CALIBRATE=1 時偵測解析度、以錨點量測 UI 倍率，並把換算掛到設定上（預設關閉，設定即以裝置座標為準）。
+
+    結果依裝置快取在 CALIBRATION_FILE（預設 config/calibration.json），有快取時不經過 adb 直接套用；
+    否則擷取一張畫面，尺寸等於基準解析度時不做錨點量測。只有錨點確認過的倍率與基準尺寸才寫入快取，
+    失敗時沿用未換算的設定。多裝置時 `store` 應為該裝置的 ConfigView，換算只套用到該裝置的 Runner。
+    """
+    if os.getenv("CALIBRATE", "0").strip().lower() not in ("1", "true", "yes", "on"):
+        return active(device_id)
+    base = _parse_size(os.getenv("CALIBRATION_BASE_SIZE", "")) or DEFAULT_BASE_SIZE
+    path = os.getenv("CALIBRATION_FILE", "config/calibration.json").strip()
+    anchor_tag = os.getenv("CALIBRATION_ANCHOR", "pause").strip() or "pause"
+    key = _cache_key(device_id)
+    cal = load_cached(path, key) if path else None
+    if cal is not None and tuple(cal.base_size) == tuple(base):
+        _logger.info(f"[CALIBRATE] 使用快取的校正: {key} {cal.device_size[0]}x{cal.device_size[1]} 倍率={cal.ui_scale:.3f}")
+    else:
+        try:
+            # 同一張畫面同時用於尺寸與錨點量測
+            screen = _grab_screen(device_id)
+            if screen is not None and (screen.shape[1], screen.shape[0]) == tuple(base):
+                cal = Calibration.identity(base)
+            else:
+                size, density = detect_resolution(device_id, screen=screen)
+                if size is None:
+                    _logger.warning("[CALIBRATE] 無法取得裝置解析度，不進行換算")
+                    return active(device_id)
+                cal = calibrate(
+                    store.current, size, screen=screen, density=density, base_size=base, anchor=("cow_level", anchor_tag)
+                )
+            if (cal.anchored or cal.is_identity) and path:
+                save_cached(path, key, cal)
+        except Exception as e:
+            _logger.warning(f"[CALIBRATE] 校正失敗，沿用未換算的設定: {e}")
+            return active(device_id)
+    set_active(cal, device_id)
+    if not cal.is_identity:
+        _logger.info(
+            f"[CALIBRATE] 裝置 {cal.device_size[0]}x{cal.device_size[1]} (基準 {cal.base_size[0]}x{cal.base_size[1]})，"
+            f"sx={cal.sx:.3f} sy={cal.sy:.3f} ui={cal.ui_scale:.3f}"
+        )
+    store.set_transform(cal.apply)
+    return cal
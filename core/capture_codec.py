@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import os
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Union
+
+import cv2
+import numpy as np
+
+from core import metrics
+from core.adb_controller import _capture_slot, _prefix, _run, _run_bytes
+from core.logger import get_logger
+from core.raw_frame import RawFrame
+
+CAPTURE_MODES = ("raw", "png", "scaled")
+
+
+@dataclass
+class ModeProbe:
+    """單一擷取模式的量測結果（秒 / 位元組）。"""
+
+    mode: str
+    wall_seconds: float  # 從下指令到取得 BGR 影像的總時間
+    transfer_bytes: int
+    decode_seconds: float  # 主機端解碼時間
+    encode_seconds: float = 0.0  # 推估的裝置端編碼時間
+
+    @property
+    def per_frame_ms(self) -> float:
+        return self.wall_seconds * 1000.0
+
+
+@dataclass
+class CaptureStats:
+    """目前採用的擷取模式與各模式量測，供日誌與 metrics 使用。"""
+
+    mode: str = ""
+    link_mbps: float = 0.0
+    round_trip_ms: float = 0.0
+    probes: dict[str, ModeProbe] = field(default_factory=dict)
+    frames: int = 0
+    last_frame_ms: float = 0.0
+    avg_frame_ms: float = 0.0
+    probed_at: float = 0.0
+
+    def summary(self) -> str:
+        parts = [
+            f"mode={self.mode}",
+            f"link={self.link_mbps:.1f}Mbps",
+            f"rtt={self.round_trip_ms:.0f}ms",
+            f"avg={self.avg_frame_ms:.0f}ms",
+        ]
+        for name, p in self.probes.items():
+            parts.append(
+                f"{name}={p.per_frame_ms:.0f}ms/{p.transfer_bytes // 1024}KB"
+                f"(enc={p.encode_seconds * 1000:.0f}ms,dec={p.decode_seconds * 1000:.0f}ms)"
+            )
+        return " ".join(parts)
+
+
+def decode_raw_screencap(data: bytes) -> np.ndarray:
+    """解析 `screencap`（無 -p）輸出並完整解碼為 BGR。"""
+    return RawFrame.from_bytes(data).to_bgr()
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    with metrics.timer("decode_seconds", format="png"):
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("PNG 解碼失敗")
+    return img
+
+
+class AdaptiveCapture:
+    """依連線頻寬與裝置編碼時間，自動在 raw / png / scaled 之間挑選最便宜的擷取方式。
+
+    - raw：`exec-out screencap`，裝置端不需編碼，但傳輸量約 w*h*4 位元組
+    - png：`exec-out screencap -p`，傳輸量小，但裝置端壓縮與主機端解碼較慢
+    - scaled：裝置端以 screenrecord 縮小解析度串流，主機端再放大回原尺寸（有損，需允許）
+
+    啟動時與每 `reprobe_seconds` 秒重新量測；實際單張成本明顯劣化時也會提前重測。
+    """
+
+    def __init__(
+        self,
+        device_id: Optional[str] = None,
+        *,
+        modes: tuple[str, ...] = ("raw", "png"),
+        reprobe_seconds: float = 300.0,
+        probe_samples: int = 2,
+        scaled_size: tuple[int, int] = (960, 540),
+        degrade_ratio: float = 1.5,
+        report: Optional[Callable[[CaptureStats], None]] = None,
+    ) -> None:
+        unknown = [m for m in modes if m not in CAPTURE_MODES]
+        if unknown or not modes:
+            raise ValueError(f"未知的擷取模式: {unknown or modes}")
+        self.device_id = device_id
+        self.modes = tuple(modes)
+        self.reprobe_seconds = float(reprobe_seconds)
+        self.probe_samples = max(1, int(probe_samples))
+        self.scaled_size = scaled_size
+        self.degrade_ratio = float(degrade_ratio)
+        self.report = report
+        self.stats = CaptureStats()
+        self.logger = get_logger("capture")
+        self._lock = threading.Lock()
+        self._stream = None  # scaled 模式的 ScreenRecordStream（延遲建立）
+        self._full_size: Optional[tuple[int, int]] = None  # (w, h)
+
+    # ------------------------------------------------------------------
+    # 對外 API（FrameSource）
+    # ------------------------------------------------------------------
+    def grab(self, timeout: float = 5.0) -> Union[np.ndarray, RawFrame]:
+        """擷取一張畫面；raw 模式回傳延遲解碼的 RawFrame。"""
+        with self._lock:
+            now = time.monotonic()
+            if not self.stats.mode or now - self.stats.probed_at >= self.reprobe_seconds:
+                self._probe()
+            t0 = time.perf_counter()
+            frame, _, _ = self._capture(self.stats.mode)
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            self._record(elapsed_ms)
+            return frame
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream = None
+
+    # ------------------------------------------------------------------
+    # 量測
+    # ------------------------------------------------------------------
+    def _probe(self) -> None:
+        stats = self.stats
+        stats.round_trip_ms = self._measure_round_trip() * 1000.0
+        rtt = stats.round_trip_ms / 1000.0
+
+        probes: dict[str, ModeProbe] = {}
+        # raw / png 先量測：取得裝置原始尺寸，scaled 影格才能放大回相同座標系
+        for mode in sorted(self.modes, key=CAPTURE_MODES.index):
+            samples: list[ModeProbe] = []
+            for _ in range(self.probe_samples):
+                try:
+                    t0 = time.perf_counter()
+                    _, nbytes, decode_s = self._capture(mode, fresh=True)
+                    samples.append(ModeProbe(mode, time.perf_counter() - t0, nbytes, decode_s))
+                except Exception as e:
+                    self.logger.warning(f"[CAPTURE] 量測 {mode} 失敗: {e}")
+                    break
+            if samples:
+                probes[mode] = ModeProbe(
+                    mode,
+                    statistics.median(s.wall_seconds for s in samples),
+                    samples[-1].transfer_bytes,
+                    statistics.median(s.decode_seconds for s in samples),
+                )
+        if not probes:
+            raise RuntimeError("所有擷取模式皆失敗")
+
+        # raw 不需裝置端編碼：以其傳輸時間推算連線頻寬，再反推其他模式的編碼時間
+        raw = probes.get("raw")
+        if raw is not None:
+            transfer_s = max(1e-3, raw.wall_seconds - rtt - raw.decode_seconds)
+            bytes_per_s = raw.transfer_bytes / transfer_s
+            stats.link_mbps = bytes_per_s * 8 / 1e6
+            for p in probes.values():
+                if p.mode == "png":
+                    p.encode_seconds = max(
+                        0.0, p.wall_seconds - rtt - p.decode_seconds - p.transfer_bytes / bytes_per_s
+                    )
+
+        best = min(probes.values(), key=lambda p: p.wall_seconds)
+        previous = stats.mode
+        stats.mode = best.mode
+        stats.probes = probes
+        stats.probed_at = time.monotonic()
+        stats.avg_frame_ms = best.per_frame_ms
+        if best.mode != "scaled":
+            self.close()
+        if previous != best.mode:
+            self.logger.info(f"[CAPTURE] 切換擷取模式 {previous or '∅'} → {best.mode}: {stats.summary()}")
+        if self.report:
+            self.report(stats)
+
+    def _measure_round_trip(self) -> float:
+        t0 = time.perf_counter()
+        _run(f"adb {_prefix(self.device_id)}exec-out echo")
+        return time.perf_counter() - t0
+
+    def _record(self, elapsed_ms: float) -> None:
+        stats = self.stats
+        stats.frames += 1
+        stats.last_frame_ms = elapsed_ms
+        # 指數移動平均，平滑單次抖動
+        stats.avg_frame_ms = elapsed_ms if stats.frames == 1 else stats.avg_frame_ms * 0.9 + elapsed_ms * 0.1
+        expected = stats.probes[stats.mode].per_frame_ms if stats.mode in stats.probes else 0.0
+        if expected and stats.avg_frame_ms > expected * self.degrade_ratio:
+            # 頻寬或裝置負載改變，下一張擷取前重新量測
+            stats.probed_at = 0.0
+        if self.report:
+            self.report(stats)
+
+    # ------------------------------------------------------------------
+    # 各模式實作：回傳 (frame, 傳輸位元組, 主機解碼秒數)
+    # ------------------------------------------------------------------
+    def _capture(self, mode: str, *, fresh: bool = False) -> tuple[Union[np.ndarray, RawFrame], int, float]:
+        prefix = _prefix(self.device_id)
+        if mode == "raw":
+            with _capture_slot():
+                data = _run_bytes(f"adb {prefix}exec-out screencap")
+            t0 = time.perf_counter()
+            # 不在此解碼整張畫面，由使用端依區域取用
+            frame = RawFrame.from_bytes(data)
+        elif mode == "png":
+            with _capture_slot():
+                data = _run_bytes(f"adb {prefix}exec-out screencap -p")
+            t0 = time.perf_counter()
+            frame = decode_png(data)
+        else:
+            return self._capture_scaled(fresh)
+        self._full_size = (frame.shape[1], frame.shape[0])
+        return frame, len(data), time.perf_counter() - t0
+
+    def _capture_scaled(self, fresh: bool = False) -> tuple[np.ndarray, int, float]:
+        """fresh=True（量測時）等待串流的下一張影格，而非直接取用快取的最新影格，避免低估成本。"""
+        if self._full_size is None:
+            # 只設定 scaled 模式時，先以一次 raw 擷取得知裝置原始尺寸
+            self._capture("raw")
+        if self._stream is None:
+            from core.screen_stream import ScreenRecordStream
+
+            self._stream = ScreenRecordStream(self.device_id, size=self.scaled_size).start()
+        if fresh:
+            small, _ = self._stream.wait_frame(timeout=5.0, after_seq=self._stream.frame_count)
+        else:
+            small = self._stream.grab(timeout=5.0)
+        t0 = time.perf_counter()
+        # 放大回原始解析度，讓既有區域座標維持有效
+        if self._full_size and (small.shape[1], small.shape[0]) != self._full_size:
+            frame = cv2.resize(small, self._full_size, interpolation=cv2.INTER_LINEAR)
+        else:
+            frame = small
+        return frame, small.nbytes, time.perf_counter() - t0
+
+
+def _parse_modes(s: str) -> tuple[str, ...]:
+    return tuple(m.strip().lower() for m in s.split(",") if m.strip())
+
+
+def build_capture_from_env(device_id: Optional[str], backend: str) -> AdaptiveCapture:
+    """`CAPTURE_BACKEND=adaptive` 依 CAPTURE_MODES 自動挑選；`raw`/`png` 則固定單一模式。"""
+    if backend in ("raw", "png"):
+        modes: tuple[str, ...] = (backend,)
+    else:
+        modes = _parse_modes(os.getenv("CAPTURE_MODES", "raw,png"))
+    w, h = os.getenv("CAPTURE_SCALED_SIZE", "960x540").lower().split("x")
+    logger = get_logger("capture")
+
+    def _log(stats: CaptureStats) -> None:
+        if stats.frames == 0 or stats.frames % 100 == 0:
+            logger.info(f"[CAPTURE] {stats.summary()}")
+
+    return AdaptiveCapture(
+        device_id,
+        modes=modes,
+        reprobe_seconds=float(os.getenv("CAPTURE_REPROBE_SECONDS", "300")),
+        scaled_size=(int(w), int(h)),
+        report=_log,
+    )
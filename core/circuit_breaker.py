@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional
+
+from core import clock, metrics
+from core.logger import get_logger
+
+_logger = get_logger("breaker")
+
+
+class DeviceUnavailable(RuntimeError):
+    """裝置的斷路器開啟中：在 `retry_in` 秒內不再對它送出 adb 指令。"""
+
+    def __init__(self, device_id: Optional[str], retry_in: float, reason: str = "") -> None:
+        self.device_id = device_id
+        self.retry_in = max(0.0, retry_in)
+        self.reason = reason
+        super().__init__(f"裝置 {device_id or 'default'} 暫停使用，{self.retry_in:.1f}s 後再試（{reason or '連續失敗'}）")
+
+
+class CircuitBreaker:
+    """單一裝置的斷路器（時間來自 core.clock）。
+
+    - closed：正常放行；連續失敗 `threshold` 次後轉為 open
+    - open：`cooldown` 秒內直接拋出 DeviceUnavailable，不再讓 adb 空轉
+    - half_open：冷卻結束後只放行一次試探；成功回到 closed，失敗再次 open 且冷卻加倍（上限 `max_cooldown`）
+    """
+
+    def __init__(
+        self,
+        device_id: Optional[str] = None,
+        *,
+        threshold: int = 5,
+        cooldown: float = 30.0,
+        max_cooldown: float = 300.0,
+    ) -> None:
+        self.device_id = device_id
+        self.threshold = max(1, int(threshold))
+        self.cooldown = float(cooldown)
+        self.max_cooldown = max(float(max_cooldown), self.cooldown)
+        self.failures = 0
+        self.trips = 0
+        self.last_error = ""
+        self._opened_at: Optional[float] = None
+        self._current_cooldown = self.cooldown
+        self._trial = False  # half_open 試探進行中
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if clock.monotonic() - self._opened_at < self._current_cooldown:
+            return "open"
+        return "half_open"
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self._current_cooldown - clock.monotonic())
+
+    def allow(self) -> None:
+        """送出指令前呼叫；斷路器開啟（或已有試探進行中）時拋出 DeviceUnavailable。"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return
+            retry_in = max(0.0, self._opened_at + self._current_cooldown - clock.monotonic())
+        raise DeviceUnavailable(self.device_id, retry_in, self.last_error)
+
+    def success(self) -> None:
+        with self._lock:
+            was_open = self._opened_at is not None
+            self.failures = 0
+            self._opened_at = None
+            self._current_cooldown = self.cooldown
+            self._trial = False
+        if was_open:
+            _logger.info(f"[BREAKER] {self.device_id or 'default'} 恢復")
+            metrics.set_gauge("adb_breaker_open", 0, device=self.device_id or "")
+
+    def failure(self, reason: str = "") -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = reason.splitlines()[0] if reason else ""
+            if self._trial:
+                # 試探失敗：重新開啟並加倍冷卻
+                self._trial = False
+                self._current_cooldown = min(self.max_cooldown, self._current_cooldown * 2)
+            elif self._opened_at is not None or self.failures < self.threshold:
+                return
+            self._opened_at = clock.monotonic()
+            self.trips += 1
+            cooldown = self._current_cooldown
+        _logger.warning(f"[BREAKER] {self.device_id or 'default'} 連續失敗 {self.failures} 次，暫停 {cooldown:.0f}s：{self.last_error}")
+        metrics.inc("adb_breaker_trips_total", device=self.device_id or "")
+        metrics.set_gauge("adb_breaker_open", 1, device=self.device_id or "")
+
+
+# device_id -> 斷路器
+_breakers: dict[Optional[str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(device_id: Optional[str]) -> CircuitBreaker:
+    """取得（必要時依 ADB_BREAKER_THRESHOLD、ADB_BREAKER_COOLDOWN 建立）裝置的斷路器。"""
+    with _breakers_lock:
+        breaker = _breakers.get(device_id)
+        if breaker is None:
+            breaker = _breakers[device_id] = CircuitBreaker(
+                device_id,
+                threshold=int(os.getenv("ADB_BREAKER_THRESHOLD", "5")),
+                cooldown=float(os.getenv("ADB_BREAKER_COOLDOWN", "30")),
+                max_cooldown=float(os.getenv("ADB_BREAKER_MAX_COOLDOWN", "300")),
+            )
+        return breaker
+
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Protocol
+
+
+class Clock(Protocol):
+    def monotonic(self) -> float:
+        ...
+
+    def sleep(self, seconds: float) -> None:
+        ...
+
+
+class SystemClock:
+    """真實時間。"""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """虛擬時間：sleep 立即返回並把時間往前推，用於在數秒內模擬數小時的流程。"""
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = float(start)
+        self.slept = 0.0  # 累計被跳過的等待秒數
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.now += seconds
+            self.slept += seconds
+
+    def advance(self, seconds: float) -> None:
+        self.sleep(seconds)
+
+
+_clock: Clock = SystemClock()
+
+
+def get_clock() -> Clock:
+    return _clock
+
+
+def set_clock(clock: Clock) -> Clock:
+    """替換全域時鐘，回傳原本的時鐘（方便測試結束後還原）。"""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def monotonic() -> float:
+    return _clock.monotonic()
+
+
+def sleep(seconds: float) -> None:
+    _clock.sleep(seconds)
+
+
+def wait(event: threading.Event, seconds: float) -> bool:
+    """最多睡眠 `seconds` 秒，`event` 被設定時提早返回；回傳 event 是否已設定。
+
+    真實時間下以 `event.wait` 等待；虛擬時鐘下直接推進時間（event 已設定則不推進）。
+    """
+    if isinstance(_clock, SystemClock):
+        return event.wait(max(0.0, seconds))
+    if not event.is_set():
+        _clock.sleep(seconds)
+    return event.is_set()
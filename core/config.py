@@ -0,0 +1,586 @@
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional
+
+import cv2
+import numpy as np
+import yaml
+
+from core.logger import get_logger
+from core.text_recognizer import OcrProfile
+
+Region = tuple[int, int, int, int]
+Point = tuple[int, int]
+
+OCR_ENGINES = ("auto", "easy", "easyocr", "tesseract", "tess")
+MATCH_METHODS = ("template", "orb", "akaze", "sift")
+# 特徵比對（RANSAC 內點比例）未指定門檻時的預設值
+FEATURE_THRESHOLD = 0.5
+
+
+class ConfigError(ValueError):
+    """設定檔格式或數值不合法。"""
+
+
+# ----------------------------------------------------------------------
+# 編譯後的設定（不可變）
+# ----------------------------------------------------------------------
+@dataclass(frozen=True)
+class TemplateSpec:
+    path: str
+    threshold: float
+    value_check: bool = True
+    value_mean_min: float = 40.0
+    value_mean_max: float = 240.0
+    # template：多尺度模板比對；orb / akaze / sift：特徵點比對（threshold 為 RANSAC 內點比例）
+    method: str = "template"
+    # 模板比對的縮放倍率；None 為預設的 0.8~1.2 九段掃描（校正後為單一倍率）
+    scales: Optional[tuple[float, ...]] = None
+    # 啟動時預先載入的模板影像（唯讀）；檔案不存在時為 None
+    image: Optional[np.ndarray] = field(default=None, compare=False, repr=False)
+
+    @property
+    def source(self):
+        """傳給比對函式的模板：已預載則用影像，否則用路徑。"""
+        return self.image if self.image is not None else self.path
+
+    @property
+    def available(self) -> bool:
+        return self.image is not None
+
+
+@dataclass(frozen=True)
+class TaskConfig:
+    name: str
+    regions: Mapping[str, Optional[Region]]
+    points: Mapping[str, Optional[Point]]
+    templates: Mapping[str, TemplateSpec]
+    timings: Mapping[str, float]
+    flags: Mapping[str, bool]
+    values: Mapping[str, str]
+
+
+@dataclass(frozen=True)
+class RunnerConfig:
+    screenshot_path: str = "screen.png"
+    match_threshold: float = 0.8
+    check_interval: float = 1.0
+    click_cooldown: float = 2.0
+    tick_budget: float = 0.0
+
+
+@dataclass(frozen=True)
+class OcrConfig:
+    engine: str = "auto"
+    lang: str = "chi_tra"
+    profiles: Mapping[str, OcrProfile] = field(default_factory=lambda: MappingProxyType({"default": OcrProfile()}))
+
+    @property
+    def default_profile(self) -> OcrProfile:
+        return self.profiles.get("default") or OcrProfile()
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    runner: RunnerConfig
+    tap_delay: float
+    ocr: OcrConfig
+    tasks: Mapping[str, TaskConfig]
+    source: str = "env"
+
+    def task(self, name: str) -> TaskConfig:
+        try:
+            return self.tasks[name]
+        except KeyError:
+            raise ConfigError(f"設定中沒有任務 '{name}'") from None
+
+
+# ----------------------------------------------------------------------
+# 由環境變數建立原始設定（維持既有環境變數的預設與回退規則）
+# ----------------------------------------------------------------------
+def _env(name: str, default: str) -> str:
+    return os.getenv(name, default)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, "1" if default else "0").strip() not in ("0", "false", "False", "no", "NO")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_list(name: str, default: str) -> Optional[list[int]]:
+    """'x,y,w,h' → [x, y, w, h]；空字串或格式錯誤視為未設定。"""
+    s = os.getenv(name, default).strip()
+    if not s:
+        return None
+    try:
+        return [int(p) for p in s.split(",")]
+    except ValueError:
+        return None
+
+
+def _cow_level_from_env() -> dict:
+    g_thr = _env_float("MATCH_THRESHOLD", 0.8)
+    g_check = _env_bool("BRIGHTNESS_CHECK", True)
+    vmin = _env_float("VALUE_MEAN_MIN", 40.0)
+    vmax = _env_float("VALUE_MEAN_MAX", 240.0)
+    pause_region = _env("PAUSE_REGION", "0,0,65,75")
+    pause_image = _env("PAUSE_IMAGE", "templates/pause.png")
+    confirm_image = _env("CONFIRM_IMAGE", "templates/confirm.png")
+
+    def tpl(prefix: str, path: str, *, threshold_env: Optional[str] = None) -> dict:
+        spec = {
+            "path": path,
+            "threshold": _env_float(threshold_env or f"{prefix}_THRESHOLD", g_thr),
+            "value_check": _env_bool(f"{prefix}_BRIGHTNESS_CHECK", g_check),
+            "value_mean_min": _env_float(f"{prefix}_VALUE_MEAN_MIN", vmin),
+            "value_mean_max": _env_float(f"{prefix}_VALUE_MEAN_MAX", vmax),
+        }
+        method = _env(f"{prefix}_MATCH_METHOD", "template").strip().lower()
+        if method != "template":
+            spec["method"] = method
+            if os.getenv(threshold_env or f"{prefix}_THRESHOLD") is None:
+                del spec["threshold"]
+        return spec
+
+    return {
+        "regions": {
+            "left": _env_list("COW_REGION_LEFT", "560,260,370,60"),
+            "right": _env_list("COW_REGION_RIGHT", "985,260,375,60"),
+            "any_level": _env_list("ANY_LEVEL_REGION", ""),
+            "in_progress": _env_list("IN_PROGRESS_REGION", pause_region),
+            "pause": _env_list("PAUSE_REGION", "0,0,65,75"),
+            "exit": _env_list("EXIT_REGION", "875,610,170,45"),
+            "confirm": _env_list("CONFIRM_REGION", "790,700,85,40"),
+            "fail_confirm": _env_list("FAIL_CONFIRM_REGION", "1690,1000,110,50"),
+            "final_stage": _env_list("FINAL_STAGE_REGION", "780,400,370,270"),
+            "random_text": _env_list("RANDOM_TEXT_REGION", "1750,90,160,50"),
+        },
+        "points": {
+            "final_stage": _env_list("FINAL_STAGE_POINT", "950,500"),
+            # 回到關卡清單的點擊位置、清單確認鍵、賜福關的能力選擇
+            "list_open": _env_list("LIST_OPEN_POINT", "1570,850"),
+            "list_confirm": _env_list("LIST_CONFIRM_POINT", "1670,1015"),
+            "blessing": _env_list("BLESSING_POINT", "950,500"),
+        },
+        "templates": {
+            "cow_target": tpl(
+                "COW_TARGET",
+                _env("COW_TARGET_IMAGE", _env("TARGET_IMAGE", "templates/cow_level.png")),
+            ),
+            "any_level": tpl("ANY_LEVEL", _env("ANY_LEVEL_IMAGE", "").strip()),
+            "in_progress": tpl("IN_PROGRESS", _env("IN_PROGRESS_IMAGE", pause_image)),
+            "pause": tpl("PAUSE", pause_image),
+            "exit": tpl("EXIT", _env("EXIT_IMAGE", "templates/exit.png")),
+            "confirm": tpl("CONFIRM", confirm_image),
+            "fail_confirm": tpl("FAIL_CONFIRM", _env("FAIL_CONFIRM_IMAGE", confirm_image)),
+        },
+        "timings": {
+            "enter_wait": _env_float("ENTER_WAIT_SECONDS", 1.0),
+        },
+        "flags": {
+            "enter_before_exit": _env_bool("ENTER_BEFORE_EXIT", True),
+            "auto_exit_if_in_progress": _env_bool("AUTO_EXIT_IF_IN_PROGRESS", False),
+            "exit_match_strict": _env_bool("EXIT_MATCH_STRICT", False),
+            "region_preview_in_memory": _env_bool("REGION_PREVIEW_IN_MEMORY", False),
+            "prefer_random": _env_bool("COW_PREFER_RANDOM", True),
+            "image_fallback": _env_bool("COW_IMAGE_FALLBACK", False),
+            "match_debug": _env_bool("MATCH_DEBUG", False),
+        },
+        "values": {
+            "target_text": _env("COW_TARGET_TEXT", "奶牛關"),
+            "star_cutoff": _env("COW_STAR_CUTOFF", "10"),
+            "min_cow_hits": _env("COW_MIN_HITS", "2"),
+            # 開始新一輪前要求的場景（逗號分隔，需 SCENES_FILE）；空字串表示不限制
+            "scenes": _env("COW_SCENES", ""),
+        },
+    }
+
+
+def raw_config_from_env() -> dict:
+    """將目前所有相關環境變數整理成與 YAML 相同結構的原始設定。"""
+    profile = OcrProfile.from_env()
+    return {
+        "runner": {
+            "screenshot_path": _env("SCREENSHOT_PATH", "screen.png"),
+            "match_threshold": _env_float("MATCH_THRESHOLD", 0.8),
+            "check_interval": _env_float("CHECK_INTERVAL", 1.0),
+            "click_cooldown": _env_float("CLICK_COOLDOWN", 2.0),
+            "tick_budget": _env_float("TICK_BUDGET_SECONDS", 0.0),
+        },
+        "input": {"tap_delay": _env_float("TAP_DELAY_SECONDS", 1.0)},
+        "ocr": {
+            "engine": _env("OCR_ENGINE", "auto").strip().lower(),
+            "lang": "chi_tra",
+            "profiles": {
+                "default": {
+                    "scale": profile.scale,
+                    "psm": profile.psm,
+                    "method": profile.method,
+                    "debug": profile.debug,
+                    "dilate": profile.dilate,
+                    "adaptive_block": profile.adaptive_block,
+                    "adaptive_c": profile.adaptive_c,
+                }
+            },
+        },
+        "tasks": {"cow_level": _cow_level_from_env()},
+    }
+
+
+# ----------------------------------------------------------------------
+# 驗證與編譯
+# ----------------------------------------------------------------------
+def _merge(base: dict, override: Mapping) -> dict:
+    out = dict(base)
+    for k, v in override.items():
+        if isinstance(v, Mapping) and isinstance(out.get(k), dict):
+            out[k] = _merge(out[k], v)
+        else:
+            out[k] = v
+    return out
+
+
+def _num(value: Any, where: str, *, lo: Optional[float] = None, hi: Optional[float] = None) -> float:
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        raise ConfigError(f"{where} 必須是數字，收到 {value!r}") from None
+    if lo is not None and f < lo or hi is not None and f > hi:
+        raise ConfigError(f"{where}={f} 超出範圍 [{lo}, {hi}]")
+    return f
+
+
+def _region(value: Any, where: str) -> Optional[Region]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    try:
+        parts = [int(v) for v in value]
+    except (TypeError, ValueError):
+        raise ConfigError(f"{where} 必須是 [x, y, w, h]，收到 {value!r}") from None
+    if len(parts) != 4:
+        raise ConfigError(f"{where} 必須是 [x, y, w, h]，收到 {value!r}")
+    x, y, w, h = parts
+    if w <= 0 or h <= 0:
+        # 與既有行為一致：寬高非正數視為未設定
+        return None
+    if x < 0 or y < 0:
+        raise ConfigError(f"{where} 座標不可為負數: {parts}")
+    return x, y, w, h
+
+
+def _point(value: Any, where: str) -> Optional[Point]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    try:
+        parts = [int(v) for v in value]
+    except (TypeError, ValueError):
+        raise ConfigError(f"{where} 必須是 [x, y]，收到 {value!r}") from None
+    if len(parts) != 2:
+        raise ConfigError(f"{where} 必須是 [x, y]，收到 {value!r}")
+    return parts[0], parts[1]
+
+
+def _load_template(path: str) -> Optional[np.ndarray]:
+    if not path or not os.path.exists(path):
+        return None
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ConfigError(f"無法讀取模板圖片: {path}")
+    img.setflags(write=False)
+    return img
+
+
+def _compile_template(name: str, raw: Any, where: str, default_threshold: float) -> TemplateSpec:
+    if isinstance(raw, str):
+        raw = {"path": raw}
+    if not isinstance(raw, Mapping):
+        raise ConfigError(f"{where} 必須是路徑或物件")
+    path = str(raw.get("path") or "").strip()
+    vmin = _num(raw.get("value_mean_min", 40.0), f"{where}.value_mean_min", lo=0, hi=255)
+    vmax = _num(raw.get("value_mean_max", 240.0), f"{where}.value_mean_max", lo=0, hi=255)
+    if vmin > vmax:
+        raise ConfigError(f"{where}: value_mean_min 不可大於 value_mean_max")
+    method = str(raw.get("method") or "template").strip().lower()
+    if method not in MATCH_METHODS:
+        raise ConfigError(f"{where}.method 必須是 {', '.join(MATCH_METHODS)}，收到 {method!r}")
+    if method != "template":
+        # 特徵比對的分數是內點比例，未指定門檻時不沿用模板比對的全域門檻
+        default_threshold = FEATURE_THRESHOLD
+    scales = raw.get("scales")
+    if scales is not None:
+        if isinstance(scales, (int, float)):
+            scales = [scales]
+        if not isinstance(scales, (list, tuple)) or not scales:
+            raise ConfigError(f"{where}.scales 必須是數字或非空的數字清單")
+        scales = tuple(_num(v, f"{where}.scales", lo=0.1, hi=10) for v in scales)
+    return TemplateSpec(
+        path=path,
+        threshold=_num(raw.get("threshold", default_threshold), f"{where}.threshold", lo=0, hi=1),
+        value_check=bool(raw.get("value_check", True)),
+        value_mean_min=vmin,
+        value_mean_max=vmax,
+        method=method,
+        scales=scales,
+        image=_load_template(path),
+    )
+
+
+def _compile_task(name: str, raw: Mapping, default_threshold: float, tap_delay: float) -> TaskConfig:
+    where = f"tasks.{name}"
+    if not isinstance(raw, Mapping):
+        raise ConfigError(f"{where} 必須是物件")
+    if "tap_delay" in (raw.get("timings") or {}):
+        raise ConfigError(f"{where}.timings.tap_delay 已移除，請改用 input.tap_delay")
+    regions = {k: _region(v, f"{where}.regions.{k}") for k, v in (raw.get("regions") or {}).items()}
+    points = {k: _point(v, f"{where}.points.{k}") for k, v in (raw.get("points") or {}).items()}
+    templates = {
+        k: _compile_template(k, v, f"{where}.templates.{k}", default_threshold)
+        for k, v in (raw.get("templates") or {}).items()
+    }
+    timings = {k: _num(v, f"{where}.timings.{k}", lo=0) for k, v in (raw.get("timings") or {}).items()}
+    # 點擊間隔只由 input.tap_delay 設定，任務端取得同一個值
+    timings["tap_delay"] = tap_delay
+    flags = {k: bool(v) for k, v in (raw.get("flags") or {}).items()}
+    values = {k: str(v) for k, v in (raw.get("values") or {}).items()}
+    return TaskConfig(
+        name=name,
+        regions=MappingProxyType(regions),
+        points=MappingProxyType(points),
+        templates=MappingProxyType(templates),
+        timings=MappingProxyType(timings),
+        flags=MappingProxyType(flags),
+        values=MappingProxyType(values),
+    )
+
+
+def _compile_profile(raw: Mapping, where: str) -> OcrProfile:
+    scale = raw.get("scale")
+    method = str(raw.get("method", "auto")).lower()
+    if method not in ("auto", "otsu", "adaptive"):
+        raise ConfigError(f"{where}.method 必須是 auto/otsu/adaptive，收到 {method!r}")
+    return OcrProfile(
+        scale=None if scale in (None, "") else _num(scale, f"{where}.scale", lo=0.1, hi=10),
+        psm=str(raw.get("psm", "7")),
+        method=method,
+        debug=bool(raw.get("debug", False)),
+        dilate=int(_num(raw.get("dilate", 1), f"{where}.dilate", lo=0)),
+        adaptive_block=int(_num(raw.get("adaptive_block", 31), f"{where}.adaptive_block", lo=3)),
+        adaptive_c=int(_num(raw.get("adaptive_c", 5), f"{where}.adaptive_c")),
+    )
+
+
+def compile_config(raw: Mapping, *, source: str = "env") -> AppConfig:
+    """驗證原始設定並編譯成不可變物件（模板影像於此預先載入）。"""
+    runner_raw = raw.get("runner") or {}
+    runner = RunnerConfig(
+        screenshot_path=str(runner_raw.get("screenshot_path", "screen.png")),
+        match_threshold=_num(runner_raw.get("match_threshold", 0.8), "runner.match_threshold", lo=0, hi=1),
+        check_interval=_num(runner_raw.get("check_interval", 1.0), "runner.check_interval", lo=0),
+        click_cooldown=_num(runner_raw.get("click_cooldown", 2.0), "runner.click_cooldown", lo=0),
+        tick_budget=_num(runner_raw.get("tick_budget", 0.0), "runner.tick_budget", lo=0),
+    )
+    ocr_raw = raw.get("ocr") or {}
+    engine = str(ocr_raw.get("engine", "auto")).strip().lower()
+    if engine not in OCR_ENGINES:
+        raise ConfigError(f"ocr.engine 必須是 {OCR_ENGINES} 之一，收到 {engine!r}")
+    profiles = {
+        k: _compile_profile(v or {}, f"ocr.profiles.{k}") for k, v in (ocr_raw.get("profiles") or {}).items()
+    }
+    profiles.setdefault("default", OcrProfile())
+    ocr = OcrConfig(engine=engine, lang=str(ocr_raw.get("lang", "chi_tra")), profiles=MappingProxyType(profiles))
+    tap_delay = _num((raw.get("input") or {}).get("tap_delay", 1.0), "input.tap_delay", lo=0)
+    tasks = {
+        name: _compile_task(name, task_raw or {}, runner.match_threshold, tap_delay)
+        for name, task_raw in (raw.get("tasks") or {}).items()
+    }
+    return AppConfig(
+        runner=runner,
+        tap_delay=tap_delay,
+        ocr=ocr,
+        tasks=MappingProxyType(tasks),
+        source=source,
+    )
+
+
+def load_config(path: Optional[str] = None) -> AppConfig:
+    """以環境變數為基底，若 YAML 設定檔存在則覆蓋其上，驗證後編譯。"""
+    raw = raw_config_from_env()
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        if not isinstance(data, Mapping):
+            raise ConfigError(f"設定檔最外層必須是物件: {path}")
+        raw = _merge(copy.deepcopy(raw), data)
+        return compile_config(raw, source=path)
+    return compile_config(raw)
+
+
+# ----------------------------------------------------------------------
+# 熱重載
+# ----------------------------------------------------------------------
+class ConfigStore:
+    """持有目前生效的設定；`maybe_reload()` 於 tick 之間呼叫，檔案變更時整份替換。
+
+    新設定驗證失敗時保留舊設定並記錄錯誤，執行中不會拿到半套設定。
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self.logger = get_logger("config")
+        self._lock = threading.Lock()
+        self._mtime = self._stat()
+        self._loaded = load_config(path)
+        self._current = self._loaded
+        self._listeners: list[Callable[[AppConfig], None]] = []
+        self._transform: Optional[Callable[[AppConfig], AppConfig]] = None
+
+    @property
+    def current(self) -> AppConfig:
+        return self._current
+
+    @property
+    def loaded(self) -> AppConfig:
+        """未經轉換的設定（ConfigView 以此套用各自的轉換）。"""
+        return self._loaded
+
+    def subscribe(self, listener: Callable[[AppConfig], None]) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[AppConfig], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def set_transform(self, transform: Optional[Callable[[AppConfig], AppConfig]]) -> None:
+        """設定每次載入後套用的轉換（如解析度校正），並立即以轉換後的設定通知訂閱者。"""
+        with self._lock:
+            self._transform = transform
+            self._current = transform(self._loaded) if transform else self._loaded
+        self._notify(self._current)
+
+    def _notify(self, cfg: AppConfig) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(cfg)
+            except Exception as e:
+                self.logger.error(f"[CONFIG] 套用設定失敗: {e}")
+
+    def _stat(self) -> Optional[float]:
+        if not self.path:
+            return None
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def maybe_reload(self) -> bool:
+        """設定檔有變更就重新編譯並替換；回傳是否已套用新設定。"""
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            try:
+                loaded = load_config(self.path)
+                cfg = self._transform(loaded) if self._transform else loaded
+            except Exception as e:
+                self.logger.error(f"[CONFIG] 重新載入失敗，沿用舊設定: {e}")
+                return False
+            self._loaded, self._current = loaded, cfg
+        self.logger.info(f"[CONFIG] 已重新載入設定: {cfg.source}")
+        self._notify(cfg)
+        return True
+
+
+class ConfigView:
+    """共用 ConfigStore 上的單一裝置視圖（多裝置時每個 Runner 一個）。
+
+    轉換（解析度校正）與訂閱者各自獨立；`maybe_reload()` 由該裝置的 Runner 在 tick 之間呼叫，
+    共用設定有新版本時才在同一執行緒套用轉換並通知，不會在其他裝置的回合中途替換設定。
+    """
+
+    def __init__(self, store: ConfigStore) -> None:
+        self.store = store
+        self.logger = store.logger
+        self._loaded = store.loaded
+        self._current = self._loaded
+        self._listeners: list[Callable[[AppConfig], None]] = []
+        self._transform: Optional[Callable[[AppConfig], AppConfig]] = None
+
+    @property
+    def current(self) -> AppConfig:
+        return self._current
+
+    @property
+    def loaded(self) -> AppConfig:
+        return self._loaded
+
+    def subscribe(self, listener: Callable[[AppConfig], None]) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[AppConfig], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def set_transform(self, transform: Optional[Callable[[AppConfig], AppConfig]]) -> None:
+        self._transform = transform
+        self._current = transform(self._loaded) if transform else self._loaded
+        self._notify(self._current)
+
+    def _notify(self, cfg: AppConfig) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(cfg)
+            except Exception as e:
+                self.logger.error(f"[CONFIG] 套用設定失敗: {e}")
+
+    def maybe_reload(self) -> bool:
+        self.store.maybe_reload()
+        loaded = self.store.loaded
+        if loaded is self._loaded:
+            return False
+        try:
+            cfg = self._transform(loaded) if self._transform else loaded
+        except Exception as e:
+            self.logger.error(f"[CONFIG] 套用轉換失敗，沿用舊設定: {e}")
+            self._loaded = loaded  # 同一版本不再重試
+            return False
+        self._loaded, self._current = loaded, cfg
+        self._notify(cfg)
+        return True
+
+
+_store: Optional[ConfigStore] = None
+
+
+def get_config_store() -> ConfigStore:
+    """全程式共用的設定（TASK_CONFIG，預設 config/tasks.yaml；不存在時僅使用環境變數）。"""
+    global _store
+    if _store is None:
+        _store = ConfigStore(os.getenv("TASK_CONFIG", "config/tasks.yaml").strip() or None)
+    return _store
+
+
+def apply_global_config(cfg: AppConfig) -> None:
+    """把與任務無關的熱路徑設定（點擊延遲、OCR 引擎與參數）推送到各模組。"""
+    from core import adb_controller, region_tools, text_recognizer
+
+    adb_controller.set_tap_delay(cfg.tap_delay)
+    region_tools.set_ocr_engine(cfg.ocr.engine)
+    text_recognizer.set_default_profile(cfg.ocr.default_profile)
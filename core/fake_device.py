@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+import cv2
+import numpy as np
+import yaml
+
+from core import adb_controller, clock, region_tools
+from core.clock import VirtualClock
+
+Region = tuple[int, int, int, int]
+
+
+@dataclass
+class TapTransition:
+    region: Region
+    to: str
+
+
+@dataclass
+class FakeState:
+    """腳本中的一個畫面狀態。"""
+
+    name: str
+    frame: np.ndarray  # BGR，唯讀
+    texts: list[tuple[Region, str]] = field(default_factory=list)  # OCR 回應
+    taps: list[TapTransition] = field(default_factory=list)
+    after: Optional[tuple[float, str]] = None  # 停留 N 秒後自動轉到另一狀態
+    _png: Optional[bytes] = None
+
+    def png(self) -> bytes:
+        if self._png is None:
+            ok, buf = cv2.imencode(".png", self.frame)
+            if not ok:
+                raise RuntimeError(f"無法編碼狀態 {self.name} 的畫面")
+            self._png = buf.tobytes()
+        return self._png
+
+
+@dataclass
+class InputEvent:
+    t: float  # clock.monotonic() 時間
+    kind: str  # tap / swipe
+    args: tuple[int, ...]
+    state: str  # 輸入當下的狀態
+    to: Optional[str] = None  # 觸發的狀態轉換
+
+
+def _contains(region: Region, x: int, y: int) -> bool:
+    rx, ry, rw, rh = region
+    return rx <= x < rx + rw and ry <= y < ry + rh
+
+
+def _overlap(a: Region, b: Region) -> int:
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return max(0, w) * max(0, h)
+
+
+class FakeDevice:
+    """重播錄製畫面的假裝置，可取代 `core.adb_controller` 的所有裝置操作。
+
+    - 擷取畫面時回傳目前狀態的影格（時間由 core.clock 提供，可為虛擬時間）
+    - 點擊落在腳本指定的區域時切換狀態；每個輸入都以時間戳記錄在 `inputs`
+    - 以 "fake" OCR 引擎回傳目前狀態對應區域的腳本文字，不需要 Tesseract
+    """
+
+    def __init__(self, states: dict[str, FakeState], start: str, *, device_id: str = "fake") -> None:
+        if start not in states:
+            raise ValueError(f"起始狀態不存在: {start}")
+        for st in states.values():
+            for tr in st.taps:
+                if tr.to not in states:
+                    raise ValueError(f"狀態 {st.name} 的點擊轉換指向不存在的狀態: {tr.to}")
+            if st.after and st.after[1] not in states:
+                raise ValueError(f"狀態 {st.name} 的 after 指向不存在的狀態: {st.after[1]}")
+        self.states = states
+        self.device_id = device_id
+        self.inputs: list[InputEvent] = []
+        self.visits: dict[str, int] = {name: 0 for name in states}
+        self.captures = 0
+        self._state = start
+        self._entered_at = clock.monotonic()
+        self._captured_state = start
+        self.visits[start] += 1
+
+    # ------------------------------------------------------------------
+    # 狀態
+    # ------------------------------------------------------------------
+    @property
+    def state(self) -> str:
+        self._advance_time()
+        return self._state
+
+    def _enter(self, name: str, at: Optional[float] = None) -> None:
+        self._state = name
+        self._entered_at = clock.monotonic() if at is None else at
+        self.visits[name] += 1
+
+    def _advance_time(self) -> None:
+        now = clock.monotonic()
+        after = self.states[self._state].after
+        while after is not None and now - self._entered_at >= after[0]:
+            self._enter(after[1], self._entered_at + after[0])
+            after = self.states[self._state].after
+
+    # ------------------------------------------------------------------
+    # adb_controller.Controller
+    # ------------------------------------------------------------------
+    def grab_frame(self, device_id: Optional[str] = None) -> np.ndarray:
+        self._captured_state = self.state
+        self.captures += 1
+        return self.states[self._captured_state].frame
+
+    def grab(self, timeout: float = 5.0) -> np.ndarray:
+        return self.grab_frame(self.device_id)
+
+    def capture_screen(self, save_path: str, device_id: Optional[str] = None) -> None:
+        self._captured_state = self.state
+        self.captures += 1
+        with open(save_path, "wb") as f:
+            f.write(self.states[self._captured_state].png())
+
+    def tap(self, x: int, y: int, device_id: Optional[str] = None) -> None:
+        state = self.state
+        to = next((tr.to for tr in self.states[state].taps if _contains(tr.region, x, y)), None)
+        self.inputs.append(InputEvent(clock.monotonic(), "tap", (x, y), state, to))
+        if to is not None:
+            self._enter(to)
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300, device_id: Optional[str] = None) -> None:
+        self.inputs.append(InputEvent(clock.monotonic(), "swipe", (x1, y1, x2, y2, duration_ms), self.state))
+
+    def devices(self) -> list[str]:
+        return [self.device_id]
+
+    def ocr(self, screen, region: Region, lang: str = "chi_tra") -> str:
+        """回傳最近一次擷取的狀態中，與 region 重疊最多的腳本文字。"""
+        best, best_area = "", 0
+        for r, text in self.states[self._captured_state].texts:
+            area = _overlap(tuple(r), tuple(region))
+            if area > best_area:
+                best, best_area = text, area
+        return best
+
+    # ------------------------------------------------------------------
+    # 安裝 / 還原
+    # ------------------------------------------------------------------
+    @contextmanager
+    def installed(self, *, virtual_time: bool = True) -> Iterator["FakeDevice"]:
+        """暫時以此裝置取代 adb 與 OCR；virtual_time=True 時 sleep 不再真的等待。"""
+        prev_clock = clock.set_clock(VirtualClock(clock.monotonic())) if virtual_time else None
+        prev_controller = adb_controller.set_controller(self)
+        prev_engine = region_tools._ocr_engine
+        region_tools.register_ocr_engine("fake", self.ocr)
+        region_tools.set_ocr_engine("fake")
+        self._entered_at = clock.monotonic()
+        try:
+            yield self
+        finally:
+            region_tools.set_ocr_engine(prev_engine)
+            region_tools.register_ocr_engine("fake", None)
+            adb_controller.set_controller(prev_controller)
+            if prev_clock is not None:
+                clock.set_clock(prev_clock)
+
+
+# ----------------------------------------------------------------------
+# 錄製工作階段（YAML）
+#   start: level_select
+#   size: [1920, 1080]
+#   states:
+#     level_select:
+#       frame: frames/level_select.png   # 相對於 YAML 檔；或用 color: [B, G, R] 產生純色畫面
+#       text:
+#         - {region: [560, 260, 370, 60], text: 普通副本}
+#       taps:
+#         - {region: [985, 260, 375, 60], to: in_battle}
+#       after: {seconds: 30, to: level_select}
+# ----------------------------------------------------------------------
+def _state_from_dict(name: str, data: dict, base_dir: str, size: tuple[int, int]) -> FakeState:
+    if data.get("frame"):
+        path = os.path.join(base_dir, data["frame"])
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is None:
+            raise FileNotFoundError(f"無法讀取狀態 {name} 的畫面: {path}")
+    else:
+        w, h = size
+        frame = np.empty((h, w, 3), dtype=np.uint8)
+        frame[:] = data.get("color", [0, 0, 0])
+    frame.setflags(write=False)
+    texts = [(tuple(int(v) for v in t["region"]), str(t.get("text", ""))) for t in data.get("text") or []]
+    taps = [TapTransition(tuple(int(v) for v in t["region"]), str(t["to"])) for t in data.get("taps") or []]
+    after = data.get("after")
+    return FakeState(
+        name=name,
+        frame=frame,
+        texts=texts,
+        taps=taps,
+        after=(float(after["seconds"]), str(after["to"])) if after else None,
+    )
+
+
+def load_session(path: str, *, device_id: str = "fake") -> FakeDevice:
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    size = tuple(int(v) for v in data.get("size", (1920, 1080)))
+    base_dir = os.path.dirname(os.path.abspath(path))
+    states = {name: _state_from_dict(name, spec or {}, base_dir, size) for name, spec in (data.get("states") or {}).items()}
+    if not states:
+        raise ValueError(f"工作階段沒有任何狀態: {path}")
+    return FakeDevice(states, str(data.get("start") or next(iter(states))), device_id=device_id)
+
+
+# ----------------------------------------------------------------------
+# 以虛擬時間驅動 TaskRunner
+# ----------------------------------------------------------------------
+@dataclass
+class SimulationReport:
+    ticks: int
+    completed: int  # 任務完成（回傳 TaskResult）的次數
+    virtual_seconds: float
+    cpu_seconds: float
+    wall_seconds: float
+    inputs: int
+
+    @property
+    def cpu_ms_per_tick(self) -> float:
+        return self.cpu_seconds * 1000.0 / self.ticks if self.ticks else 0.0
+
+    @property
+    def completed_per_hour(self) -> float:
+        return self.completed * 3600.0 / self.virtual_seconds if self.virtual_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"ticks={self.ticks} completed={self.completed} virtual={self.virtual_seconds:.0f}s "
+            f"({self.completed_per_hour:.1f}/h) cpu={self.cpu_seconds:.2f}s "
+            f"({self.cpu_ms_per_tick:.3f}ms/tick) wall={self.wall_seconds:.2f}s inputs={self.inputs}"
+        )
+
+
+def simulate(
+    runner,
+    device: FakeDevice,
+    *,
+    completed: Optional[int] = None,
+    virtual_seconds: Optional[float] = None,
+    max_ticks: int = 10_000_000,
+    quiet: bool = True,
+) -> SimulationReport:
+    """在假裝置與虛擬時間下反覆執行 runner.step()，直到完成指定次數或虛擬時間用完。"""
+    if completed is None and virtual_seconds is None:
+        raise ValueError("需指定 completed 或 virtual_seconds")
+    if quiet:
+        logging.disable(logging.INFO)
+    try:
+        with device.installed(virtual_time=True):
+            start_v = clock.monotonic()
+            start_done = runner.completed
+            start_inputs = len(device.inputs)
+            cpu0, wall0 = time.process_time(), time.perf_counter()
+            ticks = 0
+            while ticks < max_ticks:
+                if completed is not None and runner.completed - start_done >= completed:
+                    break
+                if virtual_seconds is not None and clock.monotonic() - start_v >= virtual_seconds:
+                    break
+                runner.step()
+                ticks += 1
+            return SimulationReport(
+                ticks=ticks,
+                completed=runner.completed - start_done,
+                virtual_seconds=clock.monotonic() - start_v,
+                cpu_seconds=time.process_time() - cpu0,
+                wall_seconds=time.perf_counter() - wall0,
+                inputs=len(device.inputs) - start_inputs,
+            )
+    finally:
+        if quiet:
+            logging.disable(logging.NOTSET)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from core import metrics, tracing
+from core.image_recognizer import _ensure_dir, _load_image, _match_tag, _note_match
+from core.image_utils import Screen, crop_screen
+from core.logger import get_logger
+
+METHODS = ("orb", "akaze", "sift")
+
+_logger = get_logger("feature_matcher")
+
+
+def _detector(method: str):
+    if method == "orb":
+        return cv2.ORB_create(nfeatures=int(os.getenv("FEATURE_ORB_FEATURES", "3000")))
+    if method == "akaze":
+        # OpenCV 5 將 AKAZE 移到 contrib（xfeatures2d）
+        create = getattr(cv2, "AKAZE_create", None) or getattr(getattr(cv2, "xfeatures2d", None), "AKAZE_create", None)
+        if create is None:
+            raise RuntimeError("此 OpenCV 版本沒有 AKAZE，請改用 orb 或 sift（或安裝 opencv-contrib-python）")
+        return create()
+    if method == "sift":
+        return cv2.SIFT_create()
+    raise ValueError(f"未知的特徵比對方法: {method}（可用: {', '.join(METHODS)}）")
+
+
+def _gray(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+@dataclass
+class Features:
+    points: np.ndarray  # (N, 2) float32 關鍵點座標
+    descriptors: Optional[np.ndarray]
+    size: tuple[int, int]  # (w, h)
+
+
+def compute_features(image: np.ndarray, method: str) -> Features:
+    gray = _gray(image)
+    keypoints, descriptors = _detector(method).detectAndCompute(gray, None)
+    points = np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2)
+    return Features(points, descriptors, (gray.shape[1], gray.shape[0]))
+
+
+class _FeatureCache:
+    """以來源物件為鍵的小型 LRU；保留來源參照，避免 id 被回收再利用而誤用舊結果。"""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._items: "OrderedDict[tuple, tuple[Any, Features]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: Any, key: tuple, compute) -> Features:
+        full_key = (id(source),) + key
+        with self._lock:
+            hit = self._items.get(full_key)
+            if hit is not None and hit[0] is source:
+                self._items.move_to_end(full_key)
+                return hit[1]
+        features = compute()
+        with self._lock:
+            self._items[full_key] = (source, features)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return features
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+# 模板特徵只需計算一次；畫面特徵在同一 tick 內對多個模板共用
+_templates = _FeatureCache(64)
+_frames = _FeatureCache(4)
+
+
+def clear_frame_cache() -> None:
+    """清除畫面特徵快取（基準測試量測單次完整成本時使用）。"""
+    _frames.clear()
+
+
+def template_features(target: Any, method: str) -> Features:
+    """取得（並快取）模板的關鍵點與描述子；target 為路徑或預載的影像。"""
+    key: tuple = (method,)
+    if isinstance(target, str):
+        key += (os.path.getmtime(target),) if os.path.exists(target) else ()
+    return _templates.get(target, key, lambda: compute_features(_load_image(target, "目標圖片"), method))
+
+
+@tracing.traced("find_image_features", cat="match")
+def find_image_by_features(
+    screen_path: Screen,
+    target_path: Any,
+    region: Optional[tuple[int, int, int, int]] = None,
+    *,
+    method: str = "orb",
+    threshold: float = 0.5,
+    ratio: float = 0.75,
+    min_inliers: int = 10,
+    scale_range: tuple[float, float] = (0.5, 2.0),
+    debug: bool = False,
+    debug_tag: Optional[str] = None,
+    debug_dir: str = "debug",
+) -> Tuple[Optional[tuple[int, int]], float]:
+    """以特徵點（ORB/AKAZE/SIFT）尋找模板，一次估計位置與縮放；回傳 (中心點, 分數)，與 find_image_* 相同。
+
+    分數為 RANSAC 內點占比對（ratio test 後）配對的比例；內點少於 `min_inliers`、
+    分數低於 `threshold` 或估計縮放超出 `scale_range` 時回傳 (None, 分數)。
+    適合較大、紋理豐富的模板（如 templates/cow_level.png）；小圖示特徵點太少，請用模板比對。
+    """
+    tag = _match_tag(target_path, debug_tag)
+    with metrics.timer("match_seconds", tag=tag):
+        tpl = template_features(target_path, method)
+        if region is None:
+            compute = lambda: compute_features(_load_image(screen_path, "螢幕截圖"), method)  # noqa: E731
+        else:
+            compute = lambda: compute_features(crop_screen(screen_path, region), method)  # noqa: E731
+        key = (method, tuple(region) if region else None)
+        if isinstance(screen_path, str):
+            # 截圖檔每個 tick 覆寫，以修改時間區分
+            key += (os.stat(screen_path).st_mtime_ns,)
+        frame = _frames.get(screen_path, key, compute)
+        center, score, scale, box = _estimate(tpl, frame, ratio=ratio, min_inliers=min_inliers)
+
+    ox, oy = (region[0], region[1]) if region is not None else (0, 0)
+    found = center is not None and score >= threshold and scale_range[0] <= scale <= scale_range[1]
+    if found:
+        center = (int(round(center[0] + ox)), int(round(center[1] + oy)))
+        _logger.info(f"[MATCH] features={method} scale={scale:.2f}, 分數={score:.3f} (門檻={threshold:.2f}), center={center}")
+    else:
+        _logger.info(f"[NO MATCH] features={method} 分數={score:.3f} (門檻={threshold:.2f}), scale={scale:.2f}")
+        center = None
+
+    if debug:
+        _ensure_dir(debug_dir)
+        canvas = _load_image(screen_path, "螢幕截圖").copy()
+        if found and box is not None:
+            cv2.polylines(canvas, [np.int32(box + (ox, oy))], True, (0, 255, 0), 2)
+        cv2.imwrite(os.path.join(debug_dir, f"{debug_tag or 'match'}_matched.png"), canvas)
+
+    _note_match(target_path, debug_tag, center, score, region)
+    return center, float(score)
+
+
+def _estimate(tpl: Features, frame: Features, *, ratio: float, min_inliers: int):
+    """回傳 (中心點, 分數, 縮放, 四角框)；配對不足時中心點為 None。"""
+    if tpl.descriptors is None or frame.descriptors is None or len(tpl.points) < 2 or len(frame.points) < 2:
+        return None, 0.0, 0.0, None
+    norm = cv2.NORM_HAMMING if tpl.descriptors.dtype == np.uint8 else cv2.NORM_L2
+    pairs = cv2.BFMatcher(norm).knnMatch(tpl.descriptors, frame.descriptors, k=2)
+    good = [p[0] for p in pairs if len(p) == 2 and p[0].distance < ratio * p[1].distance]
+    if len(good) < min_inliers:
+        return None, 0.0, 0.0, None
+
+    src = tpl.points[[m.queryIdx for m in good]]
+    dst = frame.points[[m.trainIdx for m in good]]
+    # 相似變換（平移 + 等比縮放 + 旋轉），比完整 homography 穩定
+    M, mask = cv2.estimateAffinePartial2D(src, dst, method=cv2.RANSAC, ransacReprojThreshold=4.0)
+    if M is None:
+        return None, 0.0, 0.0, None
+    inliers = int(mask.sum())
+    score = inliers / len(good)
+    scale = float(np.hypot(M[0, 0], M[1, 0]))
+    if inliers < min_inliers:
+        return None, score, scale, None
+
+    w, h = tpl.size
+    corners = np.array([[0, 0], [w, 0], [w, h], [0, h]], dtype=np.float32)
+    box = corners @ M[:, :2].T + M[:, 2]
+    cx, cy = (np.array([w / 2.0, h / 2.0]) @ M[:, :2].T + M[:, 2]).tolist()
+    return (cx, cy), score, scale, box
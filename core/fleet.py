@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Iterable, Optional
+
+from core import adb_controller, clock, metrics
+from core.circuit_breaker import DeviceUnavailable, get_breaker
+from core.config import ConfigView, get_config_store
+from core.logger import get_logger
+from core.runner import TaskRunner, build_runner_from_env
+
+_logger = get_logger("fleet")
+
+FLEET_STATUSES = ("online", "degraded", "parked", "offline")
+
+
+@dataclass
+class DeviceState:
+    serial: str
+    status: str = "offline"  # online / degraded / parked / offline
+    last_seen: float = 0.0  # core.clock 時間
+    last_check: float = 0.0
+    capture_seconds: Optional[float] = None  # 最近一次健康檢查的截圖耗時
+    failures: int = 0  # 連續健康檢查失敗次數
+    error: str = ""
+    worker: bool = False  # 工作執行緒是否執行中
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class FleetWorker:
+    """一台裝置的 TaskRunner 與其執行緒；執行緒結束時自行釋放影格來源、觸控連線與設定訂閱。"""
+
+    def __init__(self, serial: str, runner: TaskRunner) -> None:
+        self.serial = serial
+        self.runner = runner
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"fleet-{serial}", daemon=True)
+
+    def start(self) -> "FleetWorker":
+        self._thread.start()
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        try:
+            self.runner.loop(self._stop)
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self.runner.close()
+        source = self.runner.frame_source
+        if source is not None and hasattr(source, "stop"):
+            source.stop()
+        adb_controller.unregister_frame_source(self.serial)
+        adb_controller.unregister_touch_backend(self.serial)
+
+    def request_stop(self) -> None:
+        """要求在目前 tick 結束後停止；睡眠與停放中的 Runner 立即醒來。"""
+        self._stop.set()
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """要求停止並最多等 `timeout` 秒；回傳是否已結束。
+
+        逾時時執行緒仍在跑完目前的 tick，結束後自行釋放資源。
+        """
+        self.request_stop()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+class FleetManager:
+    """管理多台裝置：定期探索、`adb connect` 網路模擬器、以一次截圖做健康檢查，並隨裝置出現/消失啟停工作執行緒。
+
+    狀態：
+    - online：健康檢查成功
+    - degraded：健康檢查失敗，或截圖超過 `slow_capture` 秒
+    - parked：裝置的斷路器開啟中（見 core.circuit_breaker），冷卻前不再檢查
+    - offline：已不在 `adb devices` 清單中，工作執行緒已停止
+    """
+
+    def __init__(
+        self,
+        runner_factory: Callable[[str], TaskRunner],
+        *,
+        connect: Iterable[str] = (),
+        discover_interval: float = 10.0,
+        slow_capture: float = 2.0,
+    ) -> None:
+        self.runner_factory = runner_factory
+        self.connect = [s for s in connect if s]
+        self.discover_interval = float(discover_interval)
+        self.slow_capture = float(slow_capture)
+        self.devices: dict[str, DeviceState] = {}
+        self.workers: dict[str, FleetWorker] = {}
+        # 已要求停止但執行緒尚未結束的工作；結束前不為同一序號啟動新的 Runner
+        self._stopping: dict[str, FleetWorker] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 探索與健康檢查
+    # ------------------------------------------------------------------
+    def discover(self) -> Optional[list[str]]:
+        """回傳目前可用的序號；`adb devices` 本身失敗時回傳 None（不因此停止既有裝置）。"""
+        try:
+            present = set(adb_controller.devices())
+        except Exception as e:
+            _logger.warning(f"[FLEET] 無法列出裝置: {e}")
+            return None
+        for serial in self.connect:
+            if serial in present:
+                continue
+            try:
+                out = adb_controller._run(f"adb connect {serial}", retries=0)
+            except Exception as e:
+                _logger.info(f"[FLEET] adb connect {serial} 失敗: {e}")
+                continue
+            if "connected" in out and "failed" not in out and "cannot" not in out:
+                _logger.info(f"[FLEET] 已連線 {serial}")
+                present.add(serial)
+        return sorted(present)
+
+    def _probe(self, serial: str) -> None:
+        """一次不落地、不錄製的截圖，並遵守截圖並行上限。"""
+        controller = adb_controller._controller
+        if controller is not None:
+            controller.grab_frame(serial)
+            return
+        with adb_controller._capture_slot():
+            adb_controller._run_bytes(f"adb {adb_controller._prefix(serial)}exec-out screencap", retries=0)
+
+    def check(self, serial: str) -> DeviceState:
+        state = self.devices.setdefault(serial, DeviceState(serial))
+        state.last_check = clock.monotonic()
+        if get_breaker(serial).state == "open":
+            state.status = "parked"
+            return state
+        start = time.perf_counter()
+        try:
+            self._probe(serial)
+        except DeviceUnavailable as e:
+            state.status, state.error = "parked", str(e)
+        except Exception as e:
+            state.failures += 1
+            state.status, state.error = "degraded", str(e).splitlines()[0] if str(e) else type(e).__name__
+        else:
+            state.capture_seconds = time.perf_counter() - start
+            state.failures, state.error = 0, ""
+            state.status = "degraded" if state.capture_seconds > self.slow_capture else "online"
+        return state
+
+    # ------------------------------------------------------------------
+    # 工作執行緒
+    # ------------------------------------------------------------------
+    def _start_worker(self, serial: str) -> None:
+        try:
+            runner = self.runner_factory(serial)
+        except Exception as e:
+            _logger.error(f"[FLEET] 無法為 {serial} 建立 Runner: {e}")
+            return
+        self.workers[serial] = FleetWorker(serial, runner).start()
+        _logger.info(f"[FLEET] 啟動 {serial}")
+
+    def _stop_workers(self, workers: list[FleetWorker]) -> None:
+        """在 `_lock` 之外停止（join 可能要等目前的 tick 結束，不能卡住其他裝置的探索）。"""
+        for worker in workers:
+            worker.request_stop()
+        for worker in workers:
+            if worker.stop():
+                _logger.info(f"[FLEET] 停止 {worker.serial}")
+            else:
+                _logger.warning(f"[FLEET] {worker.serial} 的工作執行緒仍在結束目前的 tick，結束後釋放資源")
+
+    def _detach_worker(self, serial: str) -> Optional[FleetWorker]:
+        """從 workers 移出並記錄為停止中（呼叫端持有 `_lock`）。"""
+        worker = self.workers.pop(serial, None)
+        if worker is not None:
+            self._stopping[serial] = worker
+        return worker
+
+    def poll(self) -> dict[str, DeviceState]:
+        """探索一次、檢查每台裝置並調整工作執行緒；回傳各裝置狀態。"""
+        detached: list[FleetWorker] = []
+        with self._lock:
+            self._stopping = {s: w for s, w in self._stopping.items() if w.alive}
+            present = self.discover()
+            if present is not None:
+                now = clock.monotonic()
+                for serial in present:
+                    state = self.check(serial)
+                    state.last_seen = now
+                    worker = self.workers.get(serial)
+                    if worker is not None and not worker.alive:
+                        self.workers.pop(serial)
+                        worker = None
+                    if serial in self._stopping:
+                        continue  # 上一個工作執行緒還沒結束，下次再啟動
+                    # 只在第一次檢查成功後才啟動，避免一出現就卡在壞掉的裝置上
+                    if worker is None and state.failures == 0 and state.status != "parked":
+                        self._start_worker(serial)
+                for serial in [s for s in self.devices if s not in present]:
+                    worker = self._detach_worker(serial)
+                    if worker is not None:
+                        detached.append(worker)
+                    self.devices[serial].status = "offline"
+            for serial, state in self.devices.items():
+                state.worker = serial in self.workers
+            counts = {s: 0 for s in FLEET_STATUSES}
+            for state in self.devices.values():
+                counts[state.status] += 1
+            for status, n in counts.items():
+                metrics.set_gauge("fleet_devices", n, status=status, device="")
+            states = dict(self.devices)
+        self._stop_workers(detached)
+        return states
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {serial: state.to_dict() for serial, state in sorted(self.devices.items())}
+
+    def run(self, stop: Optional[threading.Event] = None) -> None:
+        _logger.info(f"[FLEET] 啟動裝置管理（探索間隔 {self.discover_interval:g}s，預先連線 {self.connect or '無'}）")
+        try:
+            while stop is None or not stop.is_set():
+                self.poll()
+                clock.sleep(self.discover_interval)
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for serial in list(self.workers):
+                self._detach_worker(serial)
+            stopping = list(self._stopping.values())
+            self._stopping = {}
+        self._stop_workers(stopping)
+
+
+# ----------------------------------------------------------------------
+# 由環境變數建立
+# ----------------------------------------------------------------------
+def fleet_enabled() -> bool:
+    return os.getenv("FLEET", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def build_fleet_from_env(task_factory: Callable[[], list]) -> FleetManager:
+    """FLEET_DEVICES 為需 `adb connect` 的網路序號（逗號分隔），FLEET_DISCOVER_INTERVAL、FLEET_SLOW_CAPTURE
+    設定探索間隔與 degraded 門檻，CAPTURE_CONCURRENCY 限制同時進行的截圖數（預設 2）。
+    每台裝置以 `task_factory()` 建立自己的任務實例與 `screen_<序號>.png`，並有各自的設定視圖（解析度校正互不影響）
+    與 minitouch 轉送埠（MINITOUCH_PORT 起依序分配，同一序號重新啟動時沿用）。"""
+    adb_controller.set_capture_limit(int(os.getenv("CAPTURE_CONCURRENCY", "2")))
+    base_port = int(os.getenv("MINITOUCH_PORT", "1111"))
+    ports: dict[str, int] = {}
+
+    def runner_factory(serial: str) -> TaskRunner:
+        safe = re.sub(r"[^\w.-]", "_", serial)
+        port = ports.setdefault(serial, base_port + len(ports))
+        return build_runner_from_env(
+            task_factory(),
+            device_id=serial,
+            screenshot_path=f"screen_{safe}.png",
+            config_store=ConfigView(get_config_store()),
+            touch_port=port,
+        )
+
+    return FleetManager(
+        runner_factory,
+        connect=[s.strip() for s in os.getenv("FLEET_DEVICES", "").split(",")],
+        discover_interval=float(os.getenv("FLEET_DISCOVER_INTERVAL", "10")),
+        slow_capture=float(os.getenv("FLEET_SLOW_CAPTURE", "2.0")),
+    )
@@ -1,22 +1,83 @@
 import cv2
 import numpy as np
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence, Tuple
 import os
+import threading
 
+from core import anchors, metrics, prefilter, recorder, tracing
+from core.image_utils import Screen, crop_screen
+from core.logger import get_logger
+from core.raw_frame import RawFrame
 
-def _load_image(path: str, description: str) -> np.ndarray:
+_logger = get_logger("image_recognizer")
+
+
+def _load_image(path: Screen, description: str) -> np.ndarray:
+    if isinstance(path, np.ndarray):
+        return path
+    if isinstance(path, RawFrame):
+        return path.to_bgr()
     image = cv2.imread(path, cv2.IMREAD_COLOR)
     if image is None:
         raise FileNotFoundError(f"讀取{description}失敗: {path}")
     return image
 
 
+def _workers_from_env() -> int:
+    try:
+        return max(0, int(os.getenv("MATCH_WORKERS", "0")))
+    except ValueError:
+        return 0
+
+
+# 多尺度比對的共用執行緒池：cv2.matchTemplate 執行期間會釋放 GIL，各 (尺度, 通道) 可同時計算
+_match_workers = _workers_from_env()
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def set_match_workers(workers: int) -> None:
+    """設定預設的平行比對執行緒數（0 為自動、1 為一律逐一計算）；會關閉既有的執行緒池。"""
+    global _match_workers, _pool
+    with _pool_lock:
+        _match_workers = max(0, int(workers))
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def _pool_workers() -> int:
+    """執行緒池大小：MATCH_WORKERS 為 0（自動）時為 CPU 核心數，否則採用該值（1 表示不建立執行緒池）。"""
+    return _match_workers if _match_workers > 0 else (os.cpu_count() or 1)
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    # 不調整 cv2.setNumThreads：那是整個行程的設定，會連帶拖慢逐一比對、ORB、校正與縮放
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=_pool_workers(), thread_name_prefix="match")
+        return _pool
+
+
+# 未校正時以 0.8~1.2 九段倍率掃描，吸收解析度差異
+DEFAULT_SCALES = tuple(float(s) for s in np.linspace(0.8, 1.2, 9))
+
+
 def _find_best_match(
     search_area_bgr: np.ndarray,
     target_bgr: np.ndarray,
     debug: bool,
+    parallel: Optional[bool] = None,
+    scales: Optional[Sequence[float]] = None,
 ) -> tuple[Optional[tuple[int, int]], float, float, Optional[np.ndarray], int, int, float]:
-    """在指定影像區塊內進行模板比對，回傳最佳匹配資訊。"""
+    """在指定影像區塊內進行模板比對，回傳最佳匹配資訊。
+
+    parallel=None 時依 MATCH_WORKERS 決定；平行模式把各 (尺度, 通道) 的 matchTemplate 交給共用執行緒池，
+    再依尺度順序合併，結果與逐一計算完全相同。
+    scales 為 None 時使用 DEFAULT_SCALES；模板已校正到裝置解析度時傳入 (1.0,) 只比對一次。
+    """
 
     search_hsv = cv2.cvtColor(search_area_bgr, cv2.COLOR_BGR2HSV)
     target_hsv = cv2.cvtColor(target_bgr, cv2.COLOR_BGR2HSV)
@@ -33,16 +94,38 @@ def _find_best_match(
     best_h, best_w = target_hsv.shape[:2]
     best_value_mean = 0.0
 
-    for scale in np.linspace(0.8, 1.2, 9):
-        resized = cv2.resize(target_hsv, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    jobs = []
+    for scale in DEFAULT_SCALES if scales is None else scales:
+        if scale == 1.0:
+            resized = target_hsv
+        else:
+            resized = cv2.resize(target_hsv, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
         h2, s2, _ = cv2.split(resized)
 
         if h1.shape[0] < h2.shape[0] or h1.shape[1] < h2.shape[1]:
             # 模板比搜尋區域還大時跳過
             continue
-
-        res_h = cv2.matchTemplate(h1, h2, cv2.TM_CCOEFF_NORMED)
-        res_s = cv2.matchTemplate(s1, s2, cv2.TM_CCOEFF_NORMED)
+        jobs.append((scale, resized.shape[:2], h2, s2))
+
+    if parallel is None:
+        parallel = _match_workers > 1
+    if parallel and len(jobs) > 1 and _pool_workers() > 1:
+        pool = _get_pool()
+        futures = [
+            (
+                pool.submit(cv2.matchTemplate, h1, h2, cv2.TM_CCOEFF_NORMED),
+                pool.submit(cv2.matchTemplate, s1, s2, cv2.TM_CCOEFF_NORMED),
+            )
+            for _, _, h2, s2 in jobs
+        ]
+        maps = [(fh.result(), fs.result()) for fh, fs in futures]
+    else:
+        maps = [
+            (cv2.matchTemplate(h1, h2, cv2.TM_CCOEFF_NORMED), cv2.matchTemplate(s1, s2, cv2.TM_CCOEFF_NORMED))
+            for _, _, h2, s2 in jobs
+        ]
+
+    for (scale, (rh, rw), _, _), (res_h, res_s) in zip(jobs, maps):
         res = res_h * 0.7 + res_s * 0.3
 
         _, max_val, _, max_loc = cv2.minMaxLoc(res)
@@ -52,7 +135,7 @@ def _find_best_match(
             best_loc = max_loc
             best_scale = scale
             best_result_map = res
-            best_h, best_w = resized.shape[:2]
+            best_h, best_w = rh, rw
 
             patch_v = v1[max_loc[1]:max_loc[1] + best_h, max_loc[0]:max_loc[0] + best_w]
             if patch_v.size > 0:
@@ -118,25 +201,25 @@ def _handle_match(
 
     if best_loc and best_score >= threshold:
         if value_check and (best_value_mean < value_mean_min or best_value_mean > value_mean_max):
-            print(f"[SKIP] 光度不符 (mean={best_value_mean:.1f})，忽略此結果")
+            _logger.info(f"[SKIP] 光度不符 (mean={best_value_mean:.1f})，忽略此結果")
             return None, best_score
 
         top_left = (best_loc[0] + x_offset, best_loc[1] + y_offset)
         bottom_right = (top_left[0] + best_w, top_left[1] + best_h)
         center = (top_left[0] + best_w // 2, top_left[1] + best_h // 2)
 
-        cv2.rectangle(screen_bgr, top_left, bottom_right, (0, 255, 0), 2)
-        cv2.putText(
-            screen_bgr,
-            f"{best_score:.2f}@{best_scale:.2f}",
-            (top_left[0], top_left[1] - 10),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.6,
-            (0, 255, 0),
-            2,
-        )
-
         if debug:
+            # 標註只在輸出 debug 影像時需要，避免一般呼叫額外繪製整張畫面
+            cv2.rectangle(screen_bgr, top_left, bottom_right, (0, 255, 0), 2)
+            cv2.putText(
+                screen_bgr,
+                f"{best_score:.2f}@{best_scale:.2f}",
+                (top_left[0], top_left[1] - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (0, 255, 0),
+                2,
+            )
             _ensure_dir(debug_dir)
             tag = debug_tag or "match"
             cv2.imwrite(os.path.join(debug_dir, f"{tag}_matched.png"), screen_bgr)
@@ -146,7 +229,7 @@ def _handle_match(
             tag = debug_tag or "match"
             _save_heatmap_images(best_result_map, debug_dir, tag, best_score)
 
-        print(
+        _logger.info(
             f"[MATCH] scale={best_scale:.2f}, 信心度={best_score:.3f} (門檻={threshold:.2f}), "
             f"loc={(top_left[0], top_left[1])}, meanV={best_value_mean:.1f}"
         )
@@ -158,15 +241,68 @@ def _handle_match(
         if best_result_map is not None:
             _save_heatmap_images(best_result_map, debug_dir, tag, best_score)
         cv2.imwrite(os.path.join(debug_dir, f"{tag}_matched.png"), screen_bgr)
-    print(
+    _logger.info(
         f"[NO MATCH] best scale={best_scale:.2f}, 信心度={best_score:.3f} (門檻={threshold:.2f}), "
         f"meanV={best_value_mean:.1f}"
     )
     return None, float(best_score)
 
 
+def _match_tag(target_path, debug_tag: Optional[str]) -> str:
+    if debug_tag:
+        return debug_tag
+    return os.path.splitext(os.path.basename(target_path))[0] if isinstance(target_path, str) else "array"
+
+
+def _note_match(target_path, debug_tag: Optional[str], loc, score: Optional[float], region=None) -> None:
+    """score 為 None 表示未做比對（閘門擋下），錄製檔中不留下假的 0 分。"""
+    recorder.note(
+        "match",
+        tag=_match_tag(target_path, debug_tag),
+        score=None if score is None else round(float(score), 4),
+        loc=[int(v) for v in loc] if loc else None,
+        region=[int(v) for v in region] if region else None,
+    )
+
+
+def _anchor_hit(screen: Screen, key, target_path, tag: str) -> Optional[tuple[tuple[int, int], float]]:
+    """定點驗證：模板上次命中的位置像素未變時直接回傳 (中心點, 當時分數)。"""
+    cache = anchors.get_cache()
+    if cache is None:
+        return None
+    with metrics.timer("match_seconds", tag=tag, mode="anchor"):
+        anchor = cache.verify(key, screen, target_path)
+    metrics.inc("anchor_checks_total", tag=tag, result="hit" if anchor else "miss")
+    if anchor is None:
+        return None
+    _logger.info(f"[MATCH] anchored 信心度={anchor.score:.3f}, loc={anchor.box[:2]}")
+    return anchor.center, anchor.score
+
+
+def _prefilter_rejects(
+    search_bgr: np.ndarray, target_bgr: np.ndarray, target_path, scales, tag: str, threshold: float
+) -> bool:
+    """色彩直方圖閘門：搜尋範圍不可能含有模板時回傳 True（直接視為未命中）。"""
+    gate = prefilter.get_gate()
+    if gate is None or not gate.applies(threshold):
+        return False
+    with metrics.timer("prefilter_seconds", tag=tag):
+        ok, sim = gate.passes(search_bgr, target_bgr, target_path, scales)
+    metrics.inc("prefilter_total", tag=tag, result="pass" if ok else "reject")
+    if not ok:
+        _logger.info(f"[NO MATCH] prefilter 直方圖交集={sim:.3f} (下限={gate.min_similarity:.2f})")
+    return not ok
+
+
+def _anchor_learn(screen: Screen, key, target_path, loc, top_left, size: tuple[int, int], score: float) -> None:
+    cache = anchors.get_cache()
+    if cache is not None and loc is not None:
+        cache.learn(key, screen, (top_left[0], top_left[1], size[0], size[1]), score, target_path)
+
+
+@tracing.traced("find_image", cat="match")
 def find_image_on_screen(
-    screen_path: str,
+    screen_path: Screen,
     target_path: str,
     threshold: float = 0.8,
     debug: bool = False,
@@ -176,18 +312,41 @@ def find_image_on_screen(
     value_check: bool = True,
     value_mean_min: float = 40.0,
     value_mean_max: float = 240.0,
+    parallel: Optional[bool] = None,
+    scales: Optional[Sequence[float]] = None,
+    anchor: Optional[str] = None,
 ) -> Tuple[Optional[tuple[int, int]], float]:
-    """在整張螢幕截圖中尋找目標圖片。"""
+    """在整張螢幕截圖中尋找目標圖片。
+
+    screen_path 可為截圖路徑、BGR 陣列或 RawFrame。
+    parallel: 是否以執行緒池平行計算各尺度（None 依 MATCH_WORKERS）。
+    scales: 模板縮放倍率（None 為 DEFAULT_SCALES 掃描）。
+    anchor: 固定位置 UI 的名稱；先在上次命中的位置定點驗證，未命中才做完整比對（不輸出 debug 影像）。
+    色彩直方圖閘門（MATCH_PREFILTER，門檻 ≥ PREFILTER_MIN_THRESHOLD 時）判定不可能命中時直接回傳 (None, 0.0)。
+    """
+
+    # 錨點依裝置分開：多裝置時不以其他裝置的命中位置驗證這台的畫面
+    key = (metrics.current_device(), anchor, None)
+    if anchor is not None:
+        hit = _anchor_hit(screen_path, key, target_path, _match_tag(target_path, debug_tag))
+        if hit is not None:
+            _note_match(target_path, debug_tag, hit[0], hit[1])
+            return hit
 
     screen = _load_image(screen_path, "螢幕截圖")
     target = _load_image(target_path, "目標圖片")
 
-    best_loc, best_score, best_scale, best_result_map, best_h, best_w, best_value_mean = _find_best_match(
-        screen, target, debug
-    )
+    if _prefilter_rejects(screen, target, target_path, scales, _match_tag(target_path, debug_tag), threshold):
+        _note_match(target_path, debug_tag, None, None)
+        return None, 0.0
 
-    return _handle_match(
-        screen,
+    with metrics.timer("match_seconds", tag=_match_tag(target_path, debug_tag)):
+        best_loc, best_score, best_scale, best_result_map, best_h, best_w, best_value_mean = _find_best_match(
+            screen, target, debug, parallel, scales
+        )
+
+    loc, score = _handle_match(
+        screen.copy() if debug else screen,
         best_loc,
         best_score,
         best_scale,
@@ -203,10 +362,15 @@ def find_image_on_screen(
         value_mean_min=value_mean_min,
         value_mean_max=value_mean_max,
     )
+    if anchor is not None:
+        _anchor_learn(screen, key, target_path, loc, best_loc, (best_w, best_h), score)
+    _note_match(target_path, debug_tag, loc, score)
+    return loc, score
 
 
+@tracing.traced("find_image", cat="match")
 def find_image_in_region(
-    screen_path: str,
+    screen_path: Screen,
     target_path: str,
     region: tuple[int, int, int, int],
     threshold: float = 0.8,
@@ -217,13 +381,28 @@ def find_image_in_region(
     value_check: bool = True,
     value_mean_min: float = 40.0,
     value_mean_max: float = 240.0,
+    parallel: Optional[bool] = None,
+    scales: Optional[Sequence[float]] = None,
+    anchor: Optional[str] = None,
 ) -> Tuple[Optional[tuple[int, int]], float]:
     """僅在指定區域內搜尋目標圖片。
 
     region: (x, y, w, h)
+    screen_path 可為截圖路徑、BGR 陣列或 RawFrame（只解碼該區域）。
+    parallel: 是否以執行緒池平行計算各尺度（None 依 MATCH_WORKERS）。
+    scales: 模板縮放倍率（None 為 DEFAULT_SCALES 掃描）。
+    anchor: 固定位置 UI 的名稱；先在上次命中的位置定點驗證，未命中才做完整比對（不輸出 debug 影像）。
+    色彩直方圖閘門（MATCH_PREFILTER，門檻 ≥ PREFILTER_MIN_THRESHOLD 時）判定不可能命中時直接回傳 (None, 0.0)。
     """
 
-    screen = _load_image(screen_path, "螢幕截圖")
+    key = (metrics.current_device(), anchor, tuple(region))
+    if anchor is not None:
+        hit = _anchor_hit(screen_path, key, target_path, _match_tag(target_path, debug_tag))
+        if hit is not None:
+            _note_match(target_path, debug_tag, hit[0], hit[1], region)
+            return hit
+
+    screen = screen_path if isinstance(screen_path, RawFrame) else _load_image(screen_path, "螢幕截圖")
     target = _load_image(target_path, "目標圖片")
 
     x, y, w, h = region
@@ -233,20 +412,26 @@ def find_image_in_region(
     if x < 0 or y < 0 or x + w > screen.shape[1] or y + h > screen.shape[0]:
         raise ValueError("區域超出螢幕截圖範圍")
 
-    search_area = screen[y : y + h, x : x + w].copy()
-
-    (
-        best_loc,
-        best_score,
-        best_scale,
-        best_result_map,
-        best_h,
-        best_w,
-        best_value_mean,
-    ) = _find_best_match(search_area, target, debug)
-
-    return _handle_match(
-        screen,
+    search_area = crop_screen(screen, region)
+
+    if _prefilter_rejects(search_area, target, target_path, scales, _match_tag(target_path, debug_tag), threshold):
+        _note_match(target_path, debug_tag, None, None, region)
+        return None, 0.0
+
+    with metrics.timer("match_seconds", tag=_match_tag(target_path, debug_tag)):
+        (
+            best_loc,
+            best_score,
+            best_scale,
+            best_result_map,
+            best_h,
+            best_w,
+            best_value_mean,
+        ) = _find_best_match(search_area, target, debug, parallel, scales)
+
+    # debug 標註需要整張畫面；一般呼叫只用到區域本身
+    loc, score = _handle_match(
+        _load_image(screen, "螢幕截圖").copy() if debug else search_area,
         best_loc,
         best_score,
         best_scale,
@@ -263,3 +448,7 @@ def find_image_in_region(
         value_mean_min=value_mean_min,
         value_mean_max=value_mean_max,
     )
+    if anchor is not None and best_loc is not None:
+        _anchor_learn(screen, key, target_path, loc, (best_loc[0] + x, best_loc[1] + y), (best_w, best_h), score)
+    _note_match(target_path, debug_tag, loc, score, region)
+    return loc, score
@@ -1,19 +1,71 @@
 import os
 import cv2
-from typing import Tuple
+import numpy as np
+from typing import Tuple, Union
 
+from core import metrics
+from core.raw_frame import RawFrame
 
-def get_pixel_color(image_path: str, x: int, y: int) -> Tuple[int, int, int]:
+# 畫面來源：截圖檔路徑、已解碼的 BGR 陣列，或延遲解碼的 RawFrame
+Screen = Union[str, np.ndarray, RawFrame]
+
+
+def get_pixel_color(image_path: Screen, x: int, y: int) -> Tuple[int, int, int]:
     """Return BGR color at (x, y) from image.
 
+    `image_path` may also be an in-memory BGR array or RawFrame (no disk read).
     Raises FileNotFoundError if image not readable or ValueError if out of bounds.
     """
-    img = cv2.imread(image_path, cv2.IMREAD_COLOR)
-    if img is None:
-        raise FileNotFoundError(f"無法讀取圖片: {image_path}")
+    if isinstance(image_path, RawFrame):
+        return image_path.pixel(x, y)
+    img = load_screen(image_path)
     h, w = img.shape[:2]
     if not (0 <= x < w and 0 <= y < h):
         raise ValueError(f"座標超出範圍: ({x},{y}) for image size ({w}x{h})")
     b, g, r = img[y, x]
     return int(b), int(g), int(r)
 
+
+def load_screen(screen: Screen) -> np.ndarray:
+    """取得整張 BGR 畫面；路徑會從磁碟讀取，RawFrame 會完整解碼。"""
+    if isinstance(screen, np.ndarray):
+        return screen
+    if isinstance(screen, RawFrame):
+        return screen.to_bgr()
+    with metrics.timer("decode_seconds", format="file"):
+        img = cv2.imread(screen, cv2.IMREAD_COLOR)
+    if img is None:
+        raise FileNotFoundError(f"無法讀取圖片: {screen}")
+    return img
+
+
+def crop_screen(screen: Screen, region: Tuple[int, int, int, int]) -> np.ndarray:
+    """只取出 region=(x, y, w, h) 的 BGR 影像（獨立副本）。
+
+    RawFrame 只會解碼該區域；陣列則直接切片複製。
+    """
+    if isinstance(screen, RawFrame):
+        return screen.crop(region)
+    img = load_screen(screen)
+    x, y, w, h = region
+    return img[y:y + h, x:x + w].copy()
+
+
+def thumbnail(screen: Screen, size: Tuple[int, int] = (16, 9)) -> np.ndarray:
+    """以等距取樣產生極小的灰階縮圖（uint8，形狀為 (h, w)）。
+
+    只讀取取樣點，RawFrame 不需解碼整張畫面；用於快速比對畫面是否相同或屬於哪個場景。
+    """
+    tw, th = size
+    if isinstance(screen, RawFrame):
+        sh, sw = screen.height, screen.width
+    else:
+        screen = load_screen(screen)
+        sh, sw = screen.shape[:2]
+    xs = ((np.arange(tw) + 0.5) * sw / tw).astype(np.intp)
+    ys = ((np.arange(th) + 0.5) * sh / th).astype(np.intp)
+    if isinstance(screen, RawFrame):
+        sampled = screen.sample(ys, xs)
+    else:
+        sampled = screen[np.ix_(ys, xs)]
+    return cv2.cvtColor(np.ascontiguousarray(sampled), cv2.COLOR_BGR2GRAY)
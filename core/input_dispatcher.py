@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from core import adb_controller, clock, metrics
+from core.logger import get_logger
+
+_logger = get_logger("input")
+
+
+@dataclass
+class _Input:
+    kind: str  # tap / swipe / macro / flush
+    args: tuple
+    future: Future = field(default_factory=Future)
+    enqueued: float = field(default_factory=clock.monotonic)
+
+
+class InputDispatcher:
+    """每台裝置一條輸入執行緒：任務把點擊放進佇列後立即取得 Future，不必等待 adb 往返。
+
+    - 同一裝置的輸入依送出順序執行；Future 在裝置回應（adb 指令結束）後完成，結果為完成時間；
+      失敗（包含 DeviceUnavailable）時 Future 帶有例外，呼叫端需以 `future.exception()` 確認
+    - 時間一律來自 core.clock（可替換為虛擬時鐘）
+    - `min_interval` > 0 時兩次輸入之間至少間隔該秒數（限速）
+    - `dedup_seconds` > 0 時，該時間內與上一個輸入完全相同的點擊會合併，回傳同一個 Future
+    - 指標：`input_queue_depth`（佇列長度）、`input_latency_seconds`（送出到完成）、`inputs_total`
+    """
+
+    def __init__(
+        self,
+        device_id: Optional[str] = None,
+        *,
+        min_interval: float = 0.0,
+        dedup_seconds: float = 0.0,
+        maxsize: int = 256,
+    ) -> None:
+        self.device_id = device_id
+        self.min_interval = max(0.0, float(min_interval))
+        self.dedup_seconds = max(0.0, float(dedup_seconds))
+        self._queue: "queue.Queue[Optional[_Input]]" = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._last: Optional[_Input] = None
+        self._last_done = 0.0
+        self._labels = {"device": device_id or ""}
+        self._thread = threading.Thread(target=self._worker, name=f"input-{device_id or 'default'}", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # 送出
+    # ------------------------------------------------------------------
+    def submit(self, kind: str, *args: Any) -> Future:
+        with self._lock:
+            last = self._last
+            if (
+                kind == "tap"
+                and self.dedup_seconds > 0
+                and last is not None
+                and last.kind == "tap"
+                and last.args == args
+                and clock.monotonic() - last.enqueued <= self.dedup_seconds
+            ):
+                metrics.inc("inputs_total", kind=kind, result="deduped", **self._labels)
+                return last.future
+            item = _Input(kind, args)
+            self._last = item
+        # 佇列滿時阻塞呼叫端（背壓），避免輸入無限累積
+        self._queue.put(item)
+        metrics.set_gauge("input_queue_depth", self._queue.qsize(), **self._labels)
+        return item.future
+
+    def tap(self, x: int, y: int) -> Future:
+        return self.submit("tap", int(x), int(y))
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> Future:
+        return self.submit("swipe", int(x1), int(y1), int(x2), int(y2), int(duration_ms))
+
+    def macro(self, macro) -> Future:
+        """把 InputMacro 排入同一佇列，與其他輸入保持順序；結果為 MacroResult。"""
+        return self.submit("macro", macro)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待目前已排入的輸入全部完成。"""
+        try:
+            self.submit("flush").result(timeout)
+            return True
+        except Exception:
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # 執行
+    # ------------------------------------------------------------------
+    def _execute(self, item: _Input) -> Any:
+        if item.kind == "tap":
+            adb_controller.tap(*item.args, device_id=self.device_id, delay=0)
+        elif item.kind == "swipe":
+            adb_controller.swipe(*item.args, device_id=self.device_id)
+        elif item.kind == "macro":
+            return item.args[0].run(self.device_id)
+        return clock.monotonic()
+
+    def in_worker(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if item.kind != "flush" and self.min_interval > 0:
+                wait = self._last_done + self.min_interval - clock.monotonic()
+                if wait > 0:
+                    clock.sleep(wait)
+            try:
+                result = self._execute(item)
+            except Exception as e:
+                _logger.warning(f"[INPUT] {item.kind}{item.args} 失敗: {e}")
+                metrics.inc("inputs_total", kind=item.kind, result="error", **self._labels)
+                item.future.set_exception(e)
+            else:
+                if item.kind != "flush":
+                    metrics.inc("inputs_total", kind=item.kind, result="ok", **self._labels)
+                item.future.set_result(result)
+            if item.kind != "flush":
+                self._last_done = clock.monotonic()
+                metrics.observe("input_latency_seconds", self._last_done - item.enqueued, kind=item.kind, **self._labels)
+            metrics.set_gauge("input_queue_depth", self._queue.qsize(), **self._labels)
+
+
+# ----------------------------------------------------------------------
+# 模組層級 API
+# ----------------------------------------------------------------------
+_dispatchers: dict[Optional[str], InputDispatcher] = {}
+_dispatchers_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    """INPUT_ASYNC=1 時 tap / swipe 改經由每台裝置的輸入執行緒送出。"""
+    return os.getenv("INPUT_ASYNC", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_dispatcher(device_id: Optional[str] = None) -> InputDispatcher:
+    """取得（必要時建立）裝置的輸入執行緒；INPUT_MIN_INTERVAL、INPUT_DEDUP_SECONDS、INPUT_QUEUE_SIZE 設定其行為。"""
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(device_id)
+        if dispatcher is None:
+            dispatcher = _dispatchers[device_id] = InputDispatcher(
+                device_id,
+                min_interval=float(os.getenv("INPUT_MIN_INTERVAL", "0")),
+                dedup_seconds=float(os.getenv("INPUT_DEDUP_SECONDS", "0")),
+                maxsize=int(os.getenv("INPUT_QUEUE_SIZE", "256")),
+            )
+        return dispatcher
+
+
+def existing_dispatcher(device_id: Optional[str] = None) -> Optional[InputDispatcher]:
+    return _dispatchers.get(device_id)
+
+
+def _completed() -> Future:
+    future: Future = Future()
+    future.set_result(clock.monotonic())
+    return future
+
+
+def tap(x: int, y: int, device_id: Optional[str] = None) -> Future:
+    """不等待點擊延遲的點擊；啟用 INPUT_ASYNC 時立即回傳（失敗記錄在 Future 上），
+    否則同步執行，失敗直接拋出例外，成功回傳已完成的 Future。"""
+    if enabled():
+        return get_dispatcher(device_id).tap(x, y)
+    adb_controller.tap(x, y, device_id=device_id, delay=0)
+    return _completed()
+
+
+def swipe(x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300, device_id: Optional[str] = None) -> Future:
+    if enabled():
+        return get_dispatcher(device_id).swipe(x1, y1, x2, y2, duration_ms)
+    adb_controller.swipe(x1, y1, x2, y2, duration_ms, device_id=device_id)
+    return _completed()
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    """等待所有裝置的佇列清空並結束輸入執行緒。"""
+    with _dispatchers_lock:
+        dispatchers = list(_dispatchers.values())
+        _dispatchers.clear()
+    for d in dispatchers:
+        d.flush(timeout)
+        d.close(timeout)
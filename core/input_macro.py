@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import shlex
+import subprocess
+from dataclasses import dataclass, field
+from typing import NoReturn, Optional
+
+from core import adb_controller, clock, input_dispatcher, metrics, recorder, tracing
+from core.circuit_breaker import get_breaker
+from core.touch_backend import MinitouchClient
+
+# 每個步驟前輸出的時間戳行：@<步驟序號> <epoch 秒>
+_STAMP = 'echo "@{i} $(date +%s.%N)"'
+
+
+@dataclass(frozen=True)
+class MacroStep:
+    kind: str  # tap / swipe / sleep
+    args: tuple
+
+    def command(self) -> str:
+        if self.kind == "tap":
+            return "input tap {} {}".format(*self.args)
+        if self.kind == "swipe":
+            return "input swipe {} {} {} {} {}".format(*self.args)
+        return f"sleep {self.args[0]:g}"
+
+    @property
+    def seconds(self) -> float:
+        if self.kind == "sleep":
+            return self.args[0]
+        if self.kind == "swipe":
+            return self.args[4] / 1000.0
+        return 0.0
+
+
+@dataclass
+class MacroResult:
+    steps: list[MacroStep]
+    started: float  # 主機端 clock.monotonic()
+    finished: float
+    # 各輸入步驟在裝置上開始的時間（epoch 秒；控制器模式為 core.clock 時間）；未要求時間戳時為空
+    device_times: list[Optional[float]] = field(default_factory=list)
+
+    @property
+    def offsets(self) -> list[Optional[float]]:
+        """相對於第一個步驟的秒數。"""
+        first = next((t for t in self.device_times if t is not None), None)
+        return [None if t is None or first is None else t - first for t in self.device_times]
+
+
+class InputMacro:
+    """點擊、滑動與裝置端等待組成的序列，一次 `adb shell` 送出，主機與裝置之間只往返一次。
+
+        macro = InputMacro().tap(1570, 850).sleep(1.1).tap(1570, 850).sleep(1.1).tap(1670, 1015)
+        handle = macro.start(device_id)      # 不阻塞；等待由裝置端的 sleep 完成
+        yield Wait(handle.remaining())       # 協程期間 Runner 可執行其他任務
+        result = handle.wait()
+    """
+
+    def __init__(self) -> None:
+        self.steps: list[MacroStep] = []
+
+    def tap(self, x: int, y: int) -> "InputMacro":
+        self.steps.append(MacroStep("tap", (int(x), int(y))))
+        return self
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> "InputMacro":
+        self.steps.append(MacroStep("swipe", (int(x1), int(y1), int(x2), int(y2), int(duration_ms))))
+        return self
+
+    def sleep(self, seconds: float) -> "InputMacro":
+        if seconds > 0:
+            self.steps.append(MacroStep("sleep", (round(float(seconds), 3),)))
+        return self
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    @property
+    def inputs(self) -> list[MacroStep]:
+        return [s for s in self.steps if s.kind != "sleep"]
+
+    @property
+    def duration(self) -> float:
+        """裝置端等待與滑動的總秒數（不含 adb 往返）。"""
+        return sum(s.seconds for s in self.steps)
+
+    def script(self, *, timestamps: bool = False) -> str:
+        """編譯成裝置端的 sh 指令。"""
+        parts = []
+        for i, step in enumerate(self.steps):
+            if timestamps and step.kind != "sleep":
+                parts.append(_STAMP.format(i=i))
+            parts.append(step.command())
+        return "; ".join(parts)
+
+    def start(self, device_id: Optional[str] = None, *, timestamps: bool = False) -> "MacroHandle":
+        # 先送完佇列中尚未執行的非同步輸入，避免巨集插隊
+        dispatcher = input_dispatcher.existing_dispatcher(device_id)
+        if dispatcher is not None and not dispatcher.in_worker():
+            dispatcher.flush()
+        taps = 0
+        for step in self.inputs:
+            if step.kind == "tap":
+                taps += 1
+                recorder.note("tap", x=step.args[0], y=step.args[1], macro=True)
+            else:
+                x1, y1, x2, y2, ms = step.args
+                recorder.note("swipe", x1=x1, y1=y1, x2=x2, y2=y2, duration_ms=ms, macro=True)
+        metrics.inc("taps_total", taps)
+        metrics.inc("macros_total")
+        return MacroHandle(self, device_id, timestamps=timestamps)
+
+    def run(self, device_id: Optional[str] = None, *, timestamps: bool = False) -> MacroResult:
+        return self.start(device_id, timestamps=timestamps).wait()
+
+
+class MacroHandle:
+    """執行中的巨集。
+
+    - 使用 adb 時在背景 `adb shell` 行程執行
+    - 裝置已註冊 minitouch 觸控後端時編譯成觸控指令（sleep 轉為 `w <ms>`），一次 socket 寫入
+    - 改用控制器（例如假裝置）時依序呼叫控制器並以 core.clock 等待
+    """
+
+    def __init__(self, macro: InputMacro, device_id: Optional[str], *, timestamps: bool = False) -> None:
+        self.macro = macro
+        self.started = clock.monotonic()
+        self._trace_start = tracing.now_us()
+        self._result: Optional[MacroResult] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._deadline: Optional[float] = None
+        controller = adb_controller._controller
+        if controller is not None:
+            times = []
+            for step in macro.steps:
+                if step.kind == "tap":
+                    controller.tap(*step.args, device_id)
+                elif step.kind == "swipe":
+                    controller.swipe(*step.args, device_id=device_id)
+                else:
+                    clock.sleep(step.seconds)
+                    continue
+                times.append(clock.monotonic())
+            self._result = MacroResult(macro.steps, self.started, clock.monotonic(), times if timestamps else [])
+            tracing.record("macro", self._trace_start, cat="input", steps=len(macro))
+            return
+        backend = adb_controller.get_touch_backend(device_id)
+        if isinstance(backend, MinitouchClient):
+            commands: list[str] = []
+            for step in macro.steps:
+                if step.kind == "tap":
+                    commands += backend.tap_commands(*step.args)
+                elif step.kind == "swipe":
+                    commands += backend.swipe_commands(*step.args)
+                else:
+                    commands.append(f"w {int(round(step.seconds * 1000))}")
+            try:
+                backend.send(commands)
+            except OSError:
+                adb_controller.unregister_touch_backend(device_id)
+            else:
+                # 等待由代理在裝置端執行；完成時間以預估長度計算，不提供逐步時間戳
+                self._deadline = self.started + macro.duration
+                self._result = MacroResult(macro.steps, self.started, self._deadline, [])
+                tracing.record("macro", self._trace_start, cat="input", steps=len(macro), backend="minitouch")
+                return
+        # 與 adb_controller._call 相同的斷路器與指標；巨集含點擊，逾時或失敗都不重送
+        self._device_id = device_id
+        self._breaker = get_breaker(device_id)
+        self._breaker.allow()
+        cmd = shlex.split(f"adb {adb_controller._prefix(device_id)}shell") + [macro.script(timestamps=timestamps)]
+        self._timestamps = timestamps
+        try:
+            self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            self._fail(RuntimeError(f"Macro could not start: {e}"), connection=True, result="error")
+
+    def done(self) -> bool:
+        if self._deadline is not None:
+            return clock.monotonic() >= self._deadline
+        return self._proc is None or self._proc.poll() is not None
+
+    def remaining(self) -> float:
+        """預計還需幾秒完成（供協程 yield Wait）。"""
+        if self.done():
+            return 0.0
+        return max(0.0, self.started + self.macro.duration - clock.monotonic())
+
+    def wait(self, timeout: Optional[float] = None) -> MacroResult:
+        if self._result is not None:
+            return self._result
+        assert self._proc is not None
+        try:
+            with metrics.timer("macro_seconds"):
+                out, err = self._proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # 卡住的 adb shell 不能留到下一回合：終止並回收
+            self._proc.kill()
+            self._proc.communicate()
+            metrics.inc("adb_timeouts_total", command="macro")
+            self._fail(adb_controller.AdbTimeout(f"Macro timed out after {timeout:g}s"), connection=True, result="timeout")
+        if self._proc.returncode != 0:
+            connection = any(s in err.lower() for s in adb_controller._CONNECTION_ERRORS)
+            self._fail(
+                RuntimeError(f"Macro failed: {self.macro.script()}\nSTDERR: {err.strip()}"), connection=connection, result="error"
+            )
+        self._breaker.success()
+        metrics.inc("adb_commands_total", command="macro", result="ok")
+        times = _parse_times(out) if self._timestamps else []
+        self._result = MacroResult(self.macro.steps, self.started, clock.monotonic(), times)
+        tracing.record("macro", self._trace_start, cat="input", steps=len(self.macro))
+        return self._result
+
+
+    def _fail(self, error: RuntimeError, *, connection: bool, result: str) -> NoReturn:
+        """同 adb_controller._call：只有連線類錯誤與逾時計入斷路器，網路序號順便 `adb connect` 重連。"""
+        if connection:
+            self._breaker.failure(str(error))
+            serial = self._device_id
+            if serial and adb_controller._NETWORK_SERIAL.match(serial):
+                adb_controller._reconnect(serial, adb_controller._retry_policy.timeout)
+        else:
+            self._breaker.success()
+        metrics.inc("adb_commands_total", command="macro", result=result)
+        raise error
+
+
+def _parse_times(output: str) -> list[Optional[float]]:
+    """解析 `@i <epoch>` 行；裝置的 date 不支援 %N 時只取整數秒。"""
+    by_step: dict[int, Optional[float]] = {}
+    for line in output.splitlines():
+        if not line.startswith("@"):
+            continue
+        idx, _, value = line[1:].partition(" ")
+        try:
+            by_step[int(idx)] = float(value)
+        except ValueError:
+            head = value.split(".")[0]
+            by_step[int(idx)] = float(head) if head.isdigit() else None
+    return [by_step.get(i) for i in sorted(by_step)] if by_step else []
@@ -1,11 +1,204 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 訊息開頭的 [TAG]，例如 [NO MATCH]、[ACTION]
+_TAG_RE = re.compile(r"^\[([A-Z][A-Z_ ]*)\]")
+
+# LogRecord 內建欄位；其餘（logger.info(..., extra={...})）在 JSON 輸出時一併寫出
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """每筆記錄輸出一行 JSON（JSON Lines）。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "time": time.strftime(DATE_FORMAT, time.localtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        tag = _TAG_RE.match(data["msg"])
+        if tag:
+            data["tag"] = tag.group(1)
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                data[key] = value if isinstance(value, (int, float, bool, str, type(None))) else str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class TagRateLimiter(logging.Filter):
+    """同一 [TAG] 在 `window` 秒內最多輸出 `limit` 筆，其餘略過；
+    下一個時間窗第一筆會附上略過的數量。`tags` 為空時套用到所有帶標籤的訊息。"""
+
+    def __init__(
+        self,
+        tags: Iterable[str] = (),
+        *,
+        limit: int = 5,
+        window: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.tags = {t.strip().upper() for t in tags if t.strip()}
+        self.limit = max(1, int(limit))
+        self.window = float(window)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state: dict[str, list] = {}  # tag -> [window_start, count, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        msg = record.getMessage()
+        m = _TAG_RE.match(msg)
+        if not m or (self.tags and m.group(1) not in self.tags):
+            return True
+        tag = m.group(1)
+        now = self.clock()
+        with self._lock:
+            state = self._state.setdefault(tag, [now, 0, 0])
+            if now - state[0] >= self.window:
+                if state[2]:
+                    record.msg, record.args = f"{msg}（前 {self.window:.0f}s 略過 {state[2]} 筆 [{tag}]）", None
+                state[:] = [now, 0, 0]
+            if state[1] >= self.limit:
+                state[2] += 1
+                return False
+            state[1] += 1
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """佇列滿時直接丟棄（計入 `dropped`），呼叫端永遠不會被磁碟或終端機拖慢。"""
+
+    def __init__(self, q: "queue.Queue") -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _build_handlers() -> list[logging.Handler]:
+    """LOG_FORMAT=json 輸出 JSON Lines；LOG_FILE 以 LOG_MAX_MB / LOG_BACKUPS 依大小輪替；
+    LOG_CONSOLE=0 可關閉終端機輸出。"""
+    if os.getenv("LOG_FORMAT", "text").strip().lower() == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+    handlers: list[logging.Handler] = []
+    if _env_bool("LOG_CONSOLE", True):
+        handlers.append(logging.StreamHandler(sys.__stderr__))
+    path = os.getenv("LOG_FILE", "").strip()
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handlers.append(
+            logging.handlers.RotatingFileHandler(
+                path,
+                maxBytes=int(float(os.getenv("LOG_MAX_MB", "10")) * 1024 * 1024),
+                backupCount=int(os.getenv("LOG_BACKUPS", "5")),
+                encoding="utf-8",
+            )
+        )
+    for h in handlers:
+        h.setFormatter(formatter)
+    return handlers
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_pipeline_lock = threading.Lock()
+
+
+def _pipeline() -> NonBlockingQueueHandler:
+    """所有 get_logger 取得的 logger 共用一個佇列；格式化與寫檔都在背景的 QueueListener 執行緒。"""
+    global _queue_handler, _listener
+    with _pipeline_lock:
+        if _queue_handler is None:
+            q: "queue.Queue" = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+            handler = NonBlockingQueueHandler(q)
+            tags = os.getenv("LOG_RATE_LIMIT_TAGS", "NO MATCH,SKIP")
+            handler.addFilter(
+                TagRateLimiter(
+                    tags.split(","),
+                    limit=int(os.getenv("LOG_RATE_LIMIT", "5")),
+                    window=float(os.getenv("LOG_RATE_WINDOW", "60")),
+                )
+            )
+            _listener = logging.handlers.QueueListener(q, *_build_handlers(), respect_handler_level=True)
+            _listener.start()
+            atexit.register(shutdown)
+            _queue_handler = handler
+        return _queue_handler
+
+
+def shutdown() -> None:
+    """寫完佇列中剩餘的記錄（程式結束時自動呼叫）。"""
+    global _listener
+    with _pipeline_lock:
+        if _listener is not None:
+            _listener.stop()
+            for h in _listener.handlers:
+                h.close()
+            _listener = None
+
 
 def get_logger(name: str = "ld-magic"):
     logger = logging.getLogger(name)
     if not logger.handlers:
-        handler = logging.StreamHandler()
-        fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
-        handler.setFormatter(fmt)
-        logger.addHandler(handler)
+        logger.addHandler(_pipeline())
         logger.setLevel(logging.INFO)
     return logger
+
+
+class _PrintToLogger:
+    """取代 sys.stdout：把 print 的每一行轉成 INFO 記錄，送進同一條非阻塞管線。"""
+
+    def __init__(self, logger: logging.Logger) -> None:
+        self.logger = logger
+        self._buf = ""
+
+    def write(self, text: str) -> int:
+        self._buf += text
+        while "\n" in self._buf:
+            line, self._buf = self._buf.split("\n", 1)
+            if line.strip():
+                self.logger.info(line.rstrip())
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buf.strip():
+            self.logger.info(self._buf.rstrip())
+        self._buf = ""
+
+    def isatty(self) -> bool:
+        return False
+
+
+def capture_prints(name: str = "stdout") -> None:
+    """LOG_CAPTURE_PRINTS=1（預設）時，將 print（含第三方套件）導入日誌管線。"""
+    if _env_bool("LOG_CAPTURE_PRINTS", True) and not isinstance(sys.stdout, _PrintToLogger):
+        sys.stdout = _PrintToLogger(get_logger(name))
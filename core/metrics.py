@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional
+
+from core.logger import get_logger
+
+# 延遲分布的預設桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 目前處理中的裝置；所有指標自動加上 device 標籤，不必層層傳遞 device_id
+_device: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_device", default="")
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+# 內建指標的說明文字（未列出的指標以名稱作為說明）
+HELP = {
+    "capture_seconds": "Screen capture latency",
+    "decode_seconds": "Full-frame image decode latency",
+    "match_seconds": "Template match latency per tag",
+    "ocr_seconds": "OCR latency per engine and region",
+    "tap_seconds": "adb tap round-trip latency",
+    "tick_seconds": "End-to-end runner tick latency",
+    "task_step_seconds": "Task step latency between scheduler yields",
+    "taps_total": "Taps sent",
+    "input_queue_depth": "Inputs waiting in the per-device dispatcher queue",
+    "input_latency_seconds": "Input latency from enqueue to device acknowledgement",
+    "inputs_total": "Inputs handled by the dispatcher",
+    "ticks_total": "Runner ticks",
+    "adb_commands_total": "adb commands by final result",
+    "adb_timeouts_total": "adb command attempts that hit their deadline",
+    "adb_retries_total": "adb command retries after connection errors or timeouts",
+    "adb_reconnects_total": "adb connect attempts for network serials",
+    "adb_breaker_trips_total": "Times a device circuit breaker opened",
+    "adb_breaker_open": "1 while the device circuit breaker is open",
+    "capture_wait_seconds": "Time spent waiting for a free adb capture slot",
+    "fleet_devices": "Fleet devices per status",
+    "capture_failures_total": "Screen re-captures that failed inside a task",
+    "task_results_total": "Finished task runs",
+    "cow_level_events_total": "cow_level statistics events",
+}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _key(labels: dict) -> LabelKey:
+    labels.setdefault("device", _device.get())
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str) -> None:
+        self.name, self.help = name, help
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, key: LabelKey, amount: float = 1.0) -> None:
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_fmt_labels(k)} {v:g}" for k, v in sorted(self._values.items())]
+        return lines
+
+    def to_dict(self) -> dict:
+        return {"type": "counter", "help": self.help, "series": [{"labels": dict(k), "value": v} for k, v in self._values.items()]}
+
+
+class Gauge:
+    def __init__(self, name: str, help: str) -> None:
+        self.name, self.help = name, help
+        self._values: dict[LabelKey, float] = {}
+
+    def set(self, key: LabelKey, value: float) -> None:
+        self._values[key] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_fmt_labels(k)} {v:g}" for k, v in sorted(self._values.items())]
+        return lines
+
+    def to_dict(self) -> dict:
+        return {"type": "gauge", "help": self.help, "series": [{"labels": dict(k), "value": v} for k, v in self._values.items()]}
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各桶計數..., +Inf 計數], 總和
+        self._counts: dict[LabelKey, list[int]] = {}
+        self._sums: dict[LabelKey, float] = {}
+
+    def observe(self, key: LabelKey, value: float) -> None:
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key in sorted(self._counts):
+            counts = self._counts[key]
+            cum = 0
+            for bound, c in zip(self.buckets, counts):
+                cum += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', f'{bound:g}'))} {cum}")
+            cum += counts[-1]
+            lines.append(f"{self.name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {cum}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {self._sums[key]:.6f}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {cum}")
+        return lines
+
+    def to_dict(self) -> dict:
+        series = []
+        for key, counts in self._counts.items():
+            total = sum(counts)
+            series.append(
+                {
+                    "labels": dict(key),
+                    "count": total,
+                    "sum": self._sums[key],
+                    "mean": self._sums[key] / total if total else 0.0,
+                    "buckets": dict(zip([f"{b:g}" for b in self.buckets] + ["+Inf"], counts)),
+                }
+            )
+        return {"type": "histogram", "help": self.help, "series": series}
+
+
+class Registry:
+    """行程內的指標集合（執行緒安全）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, object] = {}
+
+    def _get(self, cls, name: str, help: str):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help)
+        return metric
+
+    def inc(self, name: str, amount: float = 1.0, *, help: str = "", **labels) -> None:
+        with self._lock:
+            self._get(Counter, name, help or HELP.get(name, name)).inc(_key(labels), amount)
+
+    def set(self, name: str, value: float, *, help: str = "", **labels) -> None:
+        with self._lock:
+            self._get(Gauge, name, help or HELP.get(name, name)).set(_key(labels), value)
+
+    def observe(self, name: str, seconds: float, *, help: str = "", **labels) -> None:
+        with self._lock:
+            self._get(Histogram, name, help or HELP.get(name, name)).observe(_key(labels), seconds)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            lines: list[str] = []
+            for name in sorted(self._metrics):
+                lines += self._metrics[name].render()
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {name: m.to_dict() for name, m in sorted(self._metrics.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = Registry()
+
+
+def inc(name: str, amount: float = 1.0, **labels) -> None:
+    REGISTRY.inc(name, amount, **labels)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    REGISTRY.observe(name, seconds, **labels)
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    REGISTRY.set(name, value, **labels)
+
+
+@contextmanager
+def timer(name: str, **labels) -> Iterator[None]:
+    """量測區塊耗時並記入直方圖 `name`（即使區塊拋出例外也會記錄）。"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - start, **labels)
+
+
+def current_device() -> str:
+    """目前 device_scope 的裝置（未指定時為空字串）。"""
+    return _device.get()
+
+
+@contextmanager
+def device_scope(device_id: Optional[str]) -> Iterator[None]:
+    """在此區塊內記錄的指標都標上 device=<device_id>。"""
+    token = _device.set(device_id or "")
+    try:
+        yield
+    finally:
+        _device.reset(token)
+
+
+def dump_json(path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(REGISTRY.to_dict(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+# ----------------------------------------------------------------------
+# 本機 HTTP 端點：/metrics（Prometheus 文字格式）與 /metrics.json
+# ----------------------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?")[0] == "/metrics":
+            body = REGISTRY.render_prometheus().encode("utf-8")
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body = json.dumps(REGISTRY.to_dict(), ensure_ascii=False).encode("utf-8")
+            ctype = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        return
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    get_logger("metrics").info(f"[METRICS] http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_from_env() -> Optional[ThreadingHTTPServer]:
+    """METRICS_PORT 設定時啟動本機端點；METRICS_JSON 設定時於結束時寫出 JSON。"""
+    json_path = os.getenv("METRICS_JSON", "").strip()
+    if json_path:
+        import atexit
+
+        atexit.register(dump_json, json_path)
+    port = int(os.getenv("METRICS_PORT", "0") or 0)
+    if port <= 0:
+        return None
+    return start_http_server(port, os.getenv("METRICS_HOST", "127.0.0.1").strip() or "127.0.0.1")
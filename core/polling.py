@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+from typing import Callable, Optional
+
+import numpy as np
+
+from core import clock as _clock
+from core.image_utils import Screen, thumbnail
+from core.logger import get_logger
+
+# 變化偵測用的取樣縮圖大小（只讀取 64x36 個像素）
+DIFF_SIZE = (64, 36)
+
+
+class AdaptivePoller:
+    """依畫面變化率調整 Runner 的輪詢間隔。
+
+    - 畫面正在變化或剛執行過動作：以 `min_interval` 快速輪詢
+    - 畫面連續不變：間隔乘上 `backoff`，最多到 `max_interval`
+
+    變化量為相鄰兩張取樣縮圖的平均灰階差；超過 `change_threshold` 視為變化。
+    """
+
+    def __init__(
+        self,
+        *,
+        min_interval: float = 0.25,
+        max_interval: float = 4.0,
+        backoff: float = 2.0,
+        change_threshold: float = 2.0,
+        report_seconds: float = 30.0,
+        clock: Callable[[], float] = _clock.monotonic,
+    ) -> None:
+        self.min_interval = max(0.0, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.backoff = max(1.0, float(backoff))
+        self.change_threshold = float(change_threshold)
+        self.report_seconds = float(report_seconds)
+        self.clock = clock
+        self.logger = get_logger("poller")
+        self.interval = self.min_interval
+        self.last_diff = 0.0
+        self.changed = True
+        self.static_polls = 0  # 連續未變化的次數
+        self._prev: Optional[np.ndarray] = None
+        self._polls = 0
+        self._window_start = clock()
+        self._last_report = self._window_start
+        self.poll_rate = 0.0  # 最近一個回報區間的每秒輪詢次數
+
+    def observe(self, screen: Screen) -> bool:
+        """記錄一張新畫面，回傳是否與上一張不同。"""
+        thumb = thumbnail(screen, DIFF_SIZE).astype(np.int16)
+        if self._prev is None:
+            self.last_diff = float("inf")
+        else:
+            self.last_diff = float(np.mean(np.abs(thumb - self._prev)))
+        self._prev = thumb
+        self.changed = self.last_diff > self.change_threshold
+        self.static_polls = 0 if self.changed else self.static_polls + 1
+        self._polls += 1
+        return self.changed
+
+    def next_interval(self, acted: bool = False) -> float:
+        """根據最近一次 observe 與是否有動作決定下一次輪詢間隔。"""
+        if acted or self.changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, max(self.interval, self.min_interval or 0.01) * self.backoff)
+        self._maybe_report()
+        return self.interval
+
+    def _maybe_report(self) -> None:
+        now = self.clock()
+        elapsed = now - self._window_start
+        if elapsed <= 0:
+            return
+        self.poll_rate = self._polls / elapsed
+        if now - self._last_report < self.report_seconds:
+            return
+        self.logger.info(
+            f"[POLL] rate={self.poll_rate:.2f}/s interval={self.interval:.2f}s "
+            f"diff={self.last_diff:.1f} static={self.static_polls}"
+        )
+        self._last_report = now
+        self._window_start = now
+        self._polls = 0
+
+
+def build_poller_from_env() -> Optional[AdaptivePoller]:
+    """POLL_ADAPTIVE=1 時建立自適應輪詢；預設關閉（沿用 CHECK_INTERVAL / CLICK_COOLDOWN）。"""
+    if os.getenv("POLL_ADAPTIVE", "0").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    return AdaptivePoller(
+        min_interval=float(os.getenv("POLL_MIN_INTERVAL", "0.25")),
+        max_interval=float(os.getenv("POLL_MAX_INTERVAL", "4.0")),
+        backoff=float(os.getenv("POLL_BACKOFF", "2.0")),
+        change_threshold=float(os.getenv("POLL_CHANGE_THRESHOLD", "2.0")),
+        report_seconds=float(os.getenv("POLL_REPORT_SECONDS", "30")),
+    )
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+import cv2
+import numpy as np
+
+# 12 個色相區間（飽和度足夠時）+ 1 個灰階區間；與模板比對使用的 H、S 通道對應
+HUE_BINS = 12
+BINS = HUE_BINS + 1
+GREY_SATURATION = 40
+# 整張畫面超過此像素數時先等間距取樣，控制積分影像的大小
+MAX_SAMPLES = 200_000
+
+
+def bin_index(bgr: np.ndarray) -> np.ndarray:
+    """每個像素的色彩區間編號（uint8）；低飽和度歸入灰階區間。"""
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    idx = (hsv[..., 0].astype(np.uint16) * HUE_BINS // 180).astype(np.uint8)
+    idx[hsv[..., 1] < GREY_SATURATION] = HUE_BINS
+    return idx
+
+
+def histogram(bgr: np.ndarray) -> np.ndarray:
+    """正規化的色彩直方圖（總和為 1）。"""
+    counts = np.bincount(bin_index(bgr).ravel(), minlength=BINS).astype(np.float32)
+    return counts / max(1.0, float(counts.sum()))
+
+
+def best_window_similarity(
+    search_bgr: np.ndarray,
+    target_hist: np.ndarray,
+    window: tuple[int, int],
+    *,
+    stride_frac: float = 0.25,
+) -> float:
+    """以各區間的積分影像計算搜尋範圍內所有視窗的直方圖，回傳與模板直方圖的最大交集（0~1）。
+
+    window 為 (w, h)；視窗以其邊長的 `stride_frac` 為間距滑動。視窗比搜尋範圍大時回傳 1（交由模板比對處理）。
+    """
+    h, w = search_bgr.shape[:2]
+    ww, wh = window
+    if ww > w or wh > h or ww <= 0 or wh <= 0:
+        return 1.0
+    step = max(1, math.ceil(math.sqrt(h * w / MAX_SAMPLES)))
+    idx = bin_index(search_bgr[::step, ::step] if step > 1 else search_bgr)
+    sh, sw = idx.shape
+    ww, wh = max(1, ww // step), max(1, wh // step)
+    # (BINS, sh+1, sw+1) 的積分直方圖
+    integral = np.stack([cv2.integral((idx == b).view(np.uint8)) for b in range(BINS)])
+    ys = np.arange(0, sh - wh + 1, max(1, int(wh * stride_frac)))
+    xs = np.arange(0, sw - ww + 1, max(1, int(ww * stride_frac)))
+    y0, y1 = ys[:, None], ys[:, None] + wh
+    x0, x1 = xs[None, :], xs[None, :] + ww
+    counts = integral[:, y1, x1] - integral[:, y0, x1] - integral[:, y1, x0] + integral[:, y0, x0]
+    fractions = counts.astype(np.float32) / float(ww * wh)
+    similarity = np.minimum(fractions, target_hist[:, None, None]).sum(axis=0)
+    return float(similarity.max())
+
+
+class HistogramGate:
+    """多尺度模板比對前的色彩直方圖閘門。
+
+    搜尋範圍內沒有任何視窗的色彩分布與模板交集達到 `min_similarity`，
+    代表模板不可能出現，直接視為未命中，省下整組 matchTemplate。
+    呼叫端的比對門檻低於 `min_threshold` 時（例如只想取得最佳分數）不經過閘門。
+    """
+
+    def __init__(self, min_similarity: float = 0.35, *, min_threshold: float = 0.5, cache_size: int = 64) -> None:
+        self.min_similarity = float(min_similarity)
+        self.min_threshold = float(min_threshold)
+        self.cache_size = cache_size
+        self._hists: "OrderedDict[tuple, tuple[Any, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def template_histogram(self, source: Any, image: np.ndarray) -> np.ndarray:
+        """模板直方圖只計算一次；以來源物件快取（路徑另以修改時間區分）。"""
+        key: tuple = (id(source),)
+        if isinstance(source, str):
+            key = (source, os.path.getmtime(source) if os.path.exists(source) else 0.0)
+        with self._lock:
+            hit = self._hists.get(key)
+            if hit is not None and (isinstance(source, str) or hit[0] is source):
+                self._hists.move_to_end(key)
+                return hit[1]
+        hist = histogram(image)
+        with self._lock:
+            self._hists[key] = (source, hist)
+            while len(self._hists) > self.cache_size:
+                self._hists.popitem(last=False)
+        return hist
+
+    def similarity(
+        self, search_bgr: np.ndarray, target_bgr: np.ndarray, source: Any, scales: Optional[Sequence[float]] = None
+    ) -> float:
+        th, tw = target_bgr.shape[:2]
+        # 直方圖已正規化，對縮放不敏感；視窗取最小倍率，避免邊界背景稀釋
+        scale = min(scales) if scales else 0.8
+        window = (max(1, int(tw * scale)), max(1, int(th * scale)))
+        return best_window_similarity(search_bgr, self.template_histogram(source, target_bgr), window)
+
+    def applies(self, threshold: float) -> bool:
+        """門檻夠高、低相似度的視窗不可能達標時才使用閘門。"""
+        return threshold >= self.min_threshold
+
+    def passes(
+        self, search_bgr: np.ndarray, target_bgr: np.ndarray, source: Any, scales: Optional[Sequence[float]] = None
+    ) -> tuple[bool, float]:
+        sim = self.similarity(search_bgr, target_bgr, source, scales)
+        return sim >= self.min_similarity, sim
+
+
+def _gate_from_env() -> Optional[HistogramGate]:
+    """MATCH_PREFILTER=1 啟用（預設關閉）；PREFILTER_MIN_SIMILARITY 為直方圖交集下限，
+    PREFILTER_MIN_THRESHOLD 以下的比對門檻不經過閘門。"""
+    if os.getenv("MATCH_PREFILTER", "0").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    try:
+        return HistogramGate(
+            float(os.getenv("PREFILTER_MIN_SIMILARITY", "0.35")),
+            min_threshold=float(os.getenv("PREFILTER_MIN_THRESHOLD", "0.5")),
+        )
+    except ValueError:
+        return HistogramGate()
+
+
+_gate: Optional[HistogramGate] = _gate_from_env()
+
+
+def get_gate() -> Optional[HistogramGate]:
+    return _gate
+
+
+def set_gate(gate: Optional[HistogramGate]) -> Optional[HistogramGate]:
+    """替換全域閘門（None 停用），回傳原本的閘門。"""
+    global _gate
+    previous, _gate = _gate, gate
+    return previous
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+import yaml
+
+from core.image_utils import Screen, load_screen
+from core.raw_frame import RawFrame
+
+
+@dataclass
+class PixelProbe:
+    """單一像素探針：(x, y) 的 BGR 與預期值各通道差距都不超過 tol 視為通過。"""
+
+    x: int
+    y: int
+    bgr: tuple[int, int, int]
+    tol: int = 20
+
+    def to_dict(self) -> dict:
+        return {"x": int(self.x), "y": int(self.y), "bgr": [int(v) for v in self.bgr], "tol": int(self.tol)}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "PixelProbe":
+        return cls(int(d["x"]), int(d["y"]), tuple(int(v) for v in d["bgr"]), int(d.get("tol", 20)))
+
+
+@dataclass
+class ProbeResult:
+    passed: np.ndarray  # bool, 每個探針是否通過
+    diffs: np.ndarray  # int16, 每個探針各通道最大差距
+
+    @property
+    def ratio(self) -> float:
+        return float(self.passed.mean()) if self.passed.size else 0.0
+
+    @property
+    def all_passed(self) -> bool:
+        return bool(self.passed.all()) if self.passed.size else False
+
+
+class ProbeSet:
+    """一組具名的像素探針，以單次 NumPy gather 對記憶體中的畫面一次評估。
+
+    判斷「暫停鍵是否出現」這類固定位置的 UI，只需讀取少數像素，
+    成本為微秒等級，遠低於多尺度模板比對。
+    """
+
+    def __init__(self, name: str, probes: Iterable[PixelProbe], *, min_ratio: float = 1.0) -> None:
+        self.name = name
+        self.probes = list(probes)
+        self.min_ratio = float(min_ratio)
+        self.xs = np.array([p.x for p in self.probes], dtype=np.intp)
+        self.ys = np.array([p.y for p in self.probes], dtype=np.intp)
+        self.expected = np.array([p.bgr for p in self.probes], dtype=np.int16).reshape(-1, 3)
+        self.tol = np.array([p.tol for p in self.probes], dtype=np.int16)
+
+    def __len__(self) -> int:
+        return len(self.probes)
+
+    def gather(self, screen: Screen) -> np.ndarray:
+        """取出所有探針位置的 BGR 值，形狀 (N, 3)。"""
+        if isinstance(screen, RawFrame):
+            return screen.gather(self.ys, self.xs)
+        img = load_screen(screen)
+        h, w = img.shape[:2]
+        if self.probes and (self.xs.max() >= w or self.ys.max() >= h or self.xs.min() < 0 or self.ys.min() < 0):
+            raise ValueError(f"探針組 {self.name} 超出畫面範圍 ({w}x{h})")
+        return img[self.ys, self.xs]
+
+    def evaluate(self, screen: Screen) -> ProbeResult:
+        if not self.probes:
+            return ProbeResult(np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int16))
+        actual = self.gather(screen).astype(np.int16)
+        diffs = np.abs(actual - self.expected).max(axis=1)
+        return ProbeResult(diffs <= self.tol, diffs)
+
+    def check(self, screen: Screen) -> bool:
+        """通過比例達到 `min_ratio` 即視為命中。"""
+        return len(self) > 0 and self.evaluate(screen).ratio >= self.min_ratio
+
+
+# ----------------------------------------------------------------------
+# 探針組檔案（YAML）
+#   probe_sets:
+#     pause:
+#       min_ratio: 1.0
+#       probes:
+#         - {x: 30, y: 35, bgr: [255, 255, 255], tol: 20}
+# ----------------------------------------------------------------------
+def load_probe_sets(path: str) -> dict[str, ProbeSet]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    sets: dict[str, ProbeSet] = {}
+    for name, spec in (data.get("probe_sets") or {}).items():
+        spec = spec or {}
+        probes = [PixelProbe.from_dict(p) for p in spec.get("probes") or []]
+        sets[name] = ProbeSet(name, probes, min_ratio=float(spec.get("min_ratio", 1.0)))
+    return sets
+
+
+def append_probes(path: str, name: str, probes: Iterable[PixelProbe], *, min_ratio: Optional[float] = None) -> None:
+    """將探針附加到指定探針組（檔案或探針組不存在時自動建立）。"""
+    data: dict = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+    sets = data.setdefault("probe_sets", {})
+    entry = sets.get(name) or {}
+    sets[name] = entry
+    if min_ratio is not None:
+        entry["min_ratio"] = float(min_ratio)
+    entry.setdefault("probes", [])
+    entry["probes"].extend(p.to_dict() for p in probes)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False, default_flow_style=None)
+
+
+def load_probe_sets_from_env() -> dict[str, ProbeSet]:
+    """PROBES_FILE（預設 config/probes.yaml）存在時載入，否則回傳空字典。"""
+    path = os.getenv("PROBES_FILE", "config/probes.yaml").strip()
+    if not path or not os.path.exists(path):
+        return {}
+    return load_probe_sets(path)
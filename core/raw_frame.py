@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import mmap
+import struct
+from typing import Optional, Union
+
+import cv2
+import numpy as np
+
+from core import metrics
+
+# screencap 原始輸出的像素格式（android.graphics.PixelFormat）
+_BYTES_PER_PIXEL = {
+    1: 4,  # RGBA_8888
+    2: 4,  # RGBX_8888
+    3: 3,  # RGB_888
+}
+
+
+class RawFrame:
+    """以 `memoryview` 保存 `screencap` 原始畫面，只在需要時解碼指定區域。
+
+    建立時不複製像素；`crop()` 只會轉換該區域的行列並重排 RGB(A) → BGR，
+    因此每次 tick 的記憶體頻寬與配置量取決於實際檢查的區域大小，而非整張螢幕。
+    需要整張影像時（例如 debug 輸出）再呼叫 `to_bgr()`。
+    """
+
+    __slots__ = ("width", "height", "pixel_format", "_pixels", "_buffer", "_full")
+
+    def __init__(
+        self,
+        buffer: Union[bytes, bytearray, memoryview, mmap.mmap],
+        width: int,
+        height: int,
+        pixel_format: int,
+        offset: int,
+    ) -> None:
+        bpp = _BYTES_PER_PIXEL.get(pixel_format)
+        if bpp is None:
+            raise ValueError(f"不支援的像素格式: {pixel_format}")
+        self.width = int(width)
+        self.height = int(height)
+        self.pixel_format = pixel_format
+        self._buffer = buffer  # 保留參考，避免 mmap/bytes 被回收
+        view = memoryview(buffer)[offset : offset + self.width * self.height * bpp]
+        self._pixels = np.frombuffer(view, dtype=np.uint8).reshape(self.height, self.width, bpp)
+        self._full: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, bytearray, memoryview, mmap.mmap]) -> "RawFrame":
+        """解析 `screencap` 輸出：12 或 16 位元組標頭（w, h, format[, colorspace]）+ 像素。"""
+        if len(data) < 12:
+            raise ValueError("screencap 原始資料長度不足")
+        w, h, fmt = struct.unpack_from("<III", data, 0)
+        bpp = _BYTES_PER_PIXEL.get(fmt)
+        if bpp is None:
+            raise ValueError(f"不支援的像素格式: {fmt}")
+        header = len(data) - w * h * bpp
+        if header not in (12, 16):
+            raise ValueError(f"無法辨識的 screencap 標頭長度: {header} (w={w}, h={h})")
+        return cls(data, w, h, fmt, header)
+
+    @classmethod
+    def from_file(cls, path: str) -> "RawFrame":
+        """以 mmap 開啟存檔的 `screencap` 原始輸出，不將整個檔案讀入記憶體。"""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_bytes(mm)
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.height, self.width, 3
+
+    def _to_bgr(self, pixels: np.ndarray) -> np.ndarray:
+        code = cv2.COLOR_RGB2BGR if pixels.shape[2] == 3 else cv2.COLOR_RGBA2BGR
+        return cv2.cvtColor(pixels, code)
+
+    def crop(self, region: tuple[int, int, int, int]) -> np.ndarray:
+        """只解碼 region=(x, y, w, h) 範圍，回傳獨立的 BGR 陣列。"""
+        x, y, w, h = region
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.width, x + w), min(self.height, y + h)
+        if x1 <= x0 or y1 <= y0:
+            return np.zeros((0, 0, 3), dtype=np.uint8)
+        if self._full is not None:
+            return self._full[y0:y1, x0:x1].copy()
+        return self._to_bgr(self._pixels[y0:y1, x0:x1])
+
+    def pixel(self, x: int, y: int) -> tuple[int, int, int]:
+        """回傳 (x, y) 的 BGR 值。"""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError(f"座標超出範圍: ({x},{y}) for image size ({self.width}x{self.height})")
+        px = self._pixels[y, x]
+        return int(px[2]), int(px[1]), int(px[0])
+
+    def gather(self, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        """取出成對座標 (ys[i], xs[i]) 的 BGR 值，形狀 (N, 3)。"""
+        if len(xs) and (xs.min() < 0 or ys.min() < 0 or xs.max() >= self.width or ys.max() >= self.height):
+            raise ValueError(f"座標超出範圍 for image size ({self.width}x{self.height})")
+        return self._pixels[ys, xs][:, 2::-1]
+
+    def sample(self, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        """取出 ys × xs 網格上的像素（BGR），只讀取這些取樣點。"""
+        picked = self._pixels[np.ix_(ys, xs)]
+        return self._to_bgr(np.ascontiguousarray(picked))
+
+    def to_bgr(self) -> np.ndarray:
+        """解碼整張畫面（結果會快取）。"""
+        if self._full is None:
+            with metrics.timer("decode_seconds", format="raw"):
+                self._full = self._to_bgr(self._pixels)
+        return self._full
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.to_bgr()
+        return arr.astype(dtype) if dtype is not None else arr
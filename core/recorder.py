@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+import cv2
+import numpy as np
+
+from core import clock
+from core.image_utils import Screen
+from core.logger import get_logger
+from core.raw_frame import RawFrame
+
+# 感知雜湊：17x16 灰階縮圖的水平差分（dHash），共 256 位元
+HASH_SIZE = 16
+
+
+def signature(frame: np.ndarray) -> tuple[int, np.ndarray]:
+    """回傳 (dHash, 彩色縮圖)；縮圖用來避免純色或低對比畫面因 dHash 相同而被誤判為重複。"""
+    small = cv2.resize(frame, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big"), small.astype(np.int16)
+
+
+def phash(frame: np.ndarray) -> int:
+    return signature(frame)[0]
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class _Chunk:
+    """一個分段：`chunk-NNNNNN.zip`（畫面）＋ `chunk-NNNNNN.jsonl`（事件）。
+
+    每個分段自成一體：以新的關鍵影格開始，差分只參照同一分段內的影格，刪除舊分段不影響其他分段。
+    """
+
+    def __init__(self, directory: str, index: int) -> None:
+        base = os.path.join(directory, f"chunk-{index:06d}")
+        self.zip_path = base + ".zip"
+        self.events_path = base + ".jsonl"
+        # 內容本身已壓縮（PNG / zlib），ZIP 只負責封裝
+        self.zip = zipfile.ZipFile(self.zip_path, "w", compression=zipfile.ZIP_STORED)
+        self.events = open(self.events_path, "w", encoding="utf-8")
+        self.bytes = 0
+        self.frames = 0
+        self.entries: dict[str, str] = {}  # sha1 -> entry（內容定址）
+        self.key_entry: Optional[str] = None
+        self.key_frame: Optional[np.ndarray] = None
+        self.key_hash = 0
+        self.key_bytes = 0
+        self.last_entry: Optional[str] = None
+        self.last_hash = 0
+        self.last_small: Optional[np.ndarray] = None
+
+    def write_entry(self, name: str, data: bytes) -> None:
+        self.zip.writestr(name, data)
+        self.bytes += len(data)
+
+    def write_event(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        self.events.write(line)
+        self.bytes += len(line.encode("utf-8"))
+
+    def close(self) -> None:
+        self.zip.close()
+        self.events.close()
+
+
+class SessionRecorder:
+    """在背景執行緒錄製畫面與決策（OCR 文字、比對分數、點擊），供重播語料與誤判調查使用。
+
+    每張畫面依序處理：
+    1. 與本分段已存的畫面完全相同（sha1）→ 只記錄參照（內容定址）
+    2. 感知雜湊與上一張已存畫面相差 ≤ `dedup_bits` 位元（且縮圖平均差 ≤ `dedup_tolerance`）
+       → 視為相同畫面，只記錄參照（`exact=false`）；`dedup_bits=-1` 停用
+    3. 與目前關鍵影格相差 ≤ `delta_bits` 位元 → 存成對關鍵影格的 XOR 差分（zlib 壓縮）
+    4. 否則存成新的關鍵影格（PNG）
+
+    分段超過 `chunk_bytes` 或 `chunk_frames` 時輪替；所有分段總大小超過 `max_bytes` 時刪除最舊的分段。
+    佇列滿時丟棄新項目（計入 `dropped`），不會阻塞 Runner。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        max_bytes: int = 2 * 1024 * 1024 * 1024,
+        chunk_bytes: int = 64 * 1024 * 1024,
+        chunk_frames: int = 2000,
+        dedup_bits: int = 0,
+        dedup_tolerance: float = 2.0,
+        delta_bits: int = 48,
+        queue_size: int = 64,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.chunk_bytes = int(chunk_bytes)
+        self.chunk_frames = int(chunk_frames)
+        self.dedup_bits = int(dedup_bits)
+        self.dedup_tolerance = float(dedup_tolerance)
+        self.delta_bits = int(delta_bits)
+        self.logger = get_logger("recorder")
+        os.makedirs(directory, exist_ok=True)
+        existing = [int(n[6:12]) for n in os.listdir(directory) if n.startswith("chunk-") and n.endswith(".zip")]
+        self._next_chunk = max(existing, default=0) + 1
+        self._chunk: Optional[_Chunk] = None
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.stats = {"frames": 0, "keyframes": 0, "deltas": 0, "duplicates": 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, name="session-recorder", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # 呼叫端（主執行緒）：只做最少的工作後放入佇列
+    # ------------------------------------------------------------------
+    def _put(self, item: tuple) -> bool:
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    @property
+    def seq(self) -> int:
+        """最近一張畫面的序號；事件以此對應到畫面。"""
+        return self._seq
+
+    def record_frame(self, screen: Screen) -> int:
+        if isinstance(screen, str):
+            # 截圖檔每個 tick 都會被覆寫，先讀出原始位元組，解碼留給背景執行緒
+            with open(screen, "rb") as f:
+                payload: Any = f.read()
+        elif isinstance(screen, np.ndarray) and screen.flags.writeable:
+            payload = screen.copy()
+        else:
+            payload = screen  # 唯讀陣列與 RawFrame 不會再被修改
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        self._put(("frame", seq, clock.monotonic(), time.time(), payload))
+        return seq
+
+    def note(self, kind: str, **fields: Any) -> None:
+        self._put(("event", self._seq, clock.monotonic(), time.time(), {"kind": kind, **fields}))
+
+    def close(self, timeout: float = 60.0) -> None:
+        """等待佇列寫完並關閉目前分段。"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.logger.warning(f"[REC] 關閉逾時，尚有約 {self._queue.qsize()} 筆未寫入")
+
+    # ------------------------------------------------------------------
+    # 背景執行緒
+    # ------------------------------------------------------------------
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                kind, seq, t, ts, payload = item
+                if kind == "frame":
+                    self._write_frame(seq, t, ts, payload)
+                else:
+                    self._current().write_event({"seq": seq, "t": round(t, 3), "ts": round(ts, 3), **payload})
+            except Exception as e:
+                self.logger.warning(f"[REC] 寫入失敗: {e}")
+        if self._chunk is not None:
+            self._chunk.close()
+            self._chunk = None
+        self._enforce_budget()
+
+    def _current(self) -> _Chunk:
+        if self._chunk is None:
+            self._chunk = _Chunk(self.directory, self._next_chunk)
+            self._next_chunk += 1
+        return self._chunk
+
+    def _rotate_if_needed(self) -> None:
+        c = self._chunk
+        if c is not None and (c.bytes >= self.chunk_bytes or c.frames >= self.chunk_frames):
+            c.close()
+            self._chunk = None
+            self._enforce_budget()
+
+    def _enforce_budget(self) -> None:
+        chunks = list_chunks(self.directory)
+        sizes = {p: os.path.getsize(p) + os.path.getsize(p[:-4] + ".jsonl") for p in chunks if os.path.exists(p[:-4] + ".jsonl")}
+        total = sum(sizes.values())
+        # 最新的分段（含正在寫入的）一律保留
+        for path in chunks[:-1]:
+            if total <= self.max_bytes:
+                break
+            if path not in sizes:
+                continue
+            os.remove(path)
+            os.remove(path[:-4] + ".jsonl")
+            total -= sizes[path]
+            self.logger.info(f"[REC] 超過磁碟預算，刪除 {os.path.basename(path)}")
+
+    def _write_frame(self, seq: int, t: float, ts: float, payload: Any) -> None:
+        frame = _decode(payload)
+        chunk = self._current()
+        digest = hashlib.sha1(memoryview(frame).cast("B")).hexdigest()
+        h, small = signature(frame)
+        event = {"seq": seq, "t": round(t, 3), "ts": round(ts, 3), "kind": "frame", "phash": f"{h:064x}", "sha1": digest}
+
+        entry = chunk.entries.get(digest)
+        if entry is not None:
+            event.update(entry=entry, exact=True)
+            self.stats["duplicates"] += 1
+        elif (
+            chunk.last_entry is not None
+            and self.dedup_bits >= 0
+            and hamming(h, chunk.last_hash) <= self.dedup_bits
+            and float(np.mean(np.abs(small - chunk.last_small))) <= self.dedup_tolerance
+        ):
+            event.update(entry=chunk.last_entry, exact=False)
+            self.stats["duplicates"] += 1
+        else:
+            entry = self._store(chunk, frame, digest, h)
+            chunk.entries[digest] = entry
+            chunk.last_entry, chunk.last_hash, chunk.last_small = entry, h, small
+            event.update(entry=entry, exact=True)
+        chunk.frames += 1
+        self.stats["frames"] += 1
+        chunk.write_event(event)
+        self._rotate_if_needed()
+
+    def _store(self, chunk: _Chunk, frame: np.ndarray, digest: str, h: int) -> str:
+        key = chunk.key_frame
+        if key is not None and key.shape == frame.shape and hamming(h, chunk.key_hash) <= self.delta_bits:
+            delta = zlib.compress(np.bitwise_xor(frame, key).tobytes(), 6)
+            # 差分比關鍵影格還大就不划算，改存新關鍵影格
+            if len(delta) < chunk.key_bytes:
+                name = f"d/{digest}@{chunk.key_entry[2:-4]}.xor"
+                chunk.write_entry(name, delta)
+                self.stats["deltas"] += 1
+                return name
+        ok, buf = cv2.imencode(".png", frame, [cv2.IMWRITE_PNG_COMPRESSION, 3])
+        if not ok:
+            raise RuntimeError("PNG 編碼失敗")
+        name = f"k/{digest}.png"
+        chunk.write_entry(name, buf.tobytes())
+        chunk.key_entry, chunk.key_frame, chunk.key_hash, chunk.key_bytes = name, frame, h, len(buf)
+        self.stats["keyframes"] += 1
+        return name
+
+
+def _decode(payload: Any) -> np.ndarray:
+    if isinstance(payload, (bytes, bytearray)):
+        frame = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("無法解碼截圖")
+        return frame
+    if isinstance(payload, RawFrame):
+        return payload.to_bgr()
+    return np.ascontiguousarray(payload)
+
+
+# ----------------------------------------------------------------------
+# 讀取
+# ----------------------------------------------------------------------
+def list_chunks(directory: str) -> list[str]:
+    names = sorted(n for n in os.listdir(directory) if n.startswith("chunk-") and n.endswith(".zip"))
+    return [os.path.join(directory, n) for n in names]
+
+
+@dataclass
+class RecordedFrame:
+    seq: int
+    t: float
+    frame: np.ndarray
+    exact: bool
+    events: list[dict]  # 同序號的 OCR / 比對 / 點擊事件
+
+
+class SessionReader:
+    """讀回錄製的工作階段：依序號還原畫面（解開差分）並附上對應的事件。"""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def events(self) -> Iterator[dict]:
+        for path in list_chunks(self.directory):
+            with open(path[:-4] + ".jsonl", "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def frames(self) -> Iterator[RecordedFrame]:
+        for path in list_chunks(self.directory):
+            with zipfile.ZipFile(path) as zf, open(path[:-4] + ".jsonl", "r", encoding="utf-8") as f:
+                cache: dict[str, np.ndarray] = {}
+                pending: Optional[RecordedFrame] = None
+                for line in f:
+                    if not line.strip():
+                        continue
+                    ev = json.loads(line)
+                    if ev["kind"] == "frame":
+                        if pending is not None:
+                            yield pending
+                        pending = RecordedFrame(ev["seq"], ev["t"], _load_entry(zf, ev["entry"], cache), ev["exact"], [])
+                    elif pending is not None and ev["seq"] == pending.seq:
+                        pending.events.append(ev)
+                if pending is not None:
+                    yield pending
+
+
+def _load_entry(zf: zipfile.ZipFile, name: str, cache: dict[str, np.ndarray]) -> np.ndarray:
+    frame = cache.get(name)
+    if frame is not None:
+        return frame
+    data = zf.read(name)
+    if name.startswith("k/"):
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        cache.clear()  # 之後的差分只會參照這張新的關鍵影格
+    else:
+        key = _load_entry(zf, "k/" + name.split("@", 1)[1][:-4] + ".png", cache)
+        frame = np.bitwise_xor(key, np.frombuffer(zlib.decompress(data), np.uint8).reshape(key.shape))
+    cache[name] = frame
+    return frame
+
+
+# ----------------------------------------------------------------------
+# 全域錄製器（未設定時各 hook 皆為 no-op）
+# ----------------------------------------------------------------------
+_recorder: Optional[SessionRecorder] = None
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+def set_recorder(recorder: Optional[SessionRecorder]) -> Optional[SessionRecorder]:
+    global _recorder
+    previous, _recorder = _recorder, recorder
+    return previous
+
+
+def record_frame(screen: Screen) -> None:
+    rec = _recorder
+    if rec is not None:
+        try:
+            rec.record_frame(screen)
+        except Exception as e:
+            rec.logger.warning(f"[REC] 無法錄製畫面: {e}")
+
+
+def note(kind: str, **fields: Any) -> None:
+    rec = _recorder
+    if rec is not None:
+        rec.note(kind, **fields)
+
+
+def configure_from_env() -> Optional[SessionRecorder]:
+    """RECORD_DIR 設定時啟用錄製（RECORD_MAX_MB 總預算、RECORD_CHUNK_MB 分段大小、
+    RECORD_DEDUP_BITS / RECORD_DELTA_BITS 去重與差分門檻）。"""
+    directory = os.getenv("RECORD_DIR", "").strip()
+    if not directory:
+        return None
+    rec = SessionRecorder(
+        directory,
+        max_bytes=int(float(os.getenv("RECORD_MAX_MB", "2048")) * 1024 * 1024),
+        chunk_bytes=int(float(os.getenv("RECORD_CHUNK_MB", "64")) * 1024 * 1024),
+        dedup_bits=int(os.getenv("RECORD_DEDUP_BITS", "0")),
+        delta_bits=int(os.getenv("RECORD_DELTA_BITS", "48")),
+    )
+    set_recorder(rec)
+    import atexit
+
+    atexit.register(rec.close)
+    get_logger("recorder").info(f"[REC] 錄製工作階段到 {directory}")
+    return rec
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, Tuple
+from typing import Callable, Optional, Sequence, Tuple
 import os
 import cv2
 import numpy as np
@@ -13,7 +13,9 @@ except Exception:
     easyocr = None  # type: ignore
     _HAS_EASYOCR = False
 
+from . import metrics, recorder, tracing
 from .image_recognizer import find_image_in_region as _find_image_in_region
+from .image_utils import Screen, crop_screen
 from .logger import get_logger
 
 Region = tuple[int, int, int, int]
@@ -22,6 +24,27 @@ _logger = get_logger("region_tools")
 
 _easyocr_readers: dict[str, object] = {}
 
+# OCR 引擎在啟動時讀取一次（可由設定檔熱重載覆寫），避免每次呼叫都查環境變數
+_ocr_engine = os.getenv("OCR_ENGINE", "auto").strip().lower()
+
+
+# 額外註冊的 OCR 引擎（例如假裝置依腳本回傳文字）：name -> fn(screen, region, lang=...)
+_custom_engines: dict[str, Callable[..., str]] = {}
+
+
+def register_ocr_engine(name: str, fn: Optional[Callable[..., str]]) -> None:
+    """註冊（fn=None 時移除）自訂 OCR 引擎，之後可用 `find_text(..., engine=name)` 或 set_ocr_engine 選用。"""
+    key = name.strip().lower()
+    if fn is None:
+        _custom_engines.pop(key, None)
+    else:
+        _custom_engines[key] = fn
+
+
+def set_ocr_engine(engine: str) -> None:
+    global _ocr_engine
+    _ocr_engine = (engine or "auto").strip().lower()
+
 
 def _map_lang_for_easyocr(lang: str) -> list[str]:
     """Map tesseract style lang code to EasyOCR list.
@@ -53,19 +76,17 @@ def _get_easyocr_reader(lang: str):
 
 
 def _extract_text_from_region(
-    screen_path: str,
+    screen_path: Screen,
     region: Region,
     *,
     lang: str = "chi_tra",
 ) -> str:
     """使用強化預處理的 OCR 文字辨識"""
-    img = cv2.imread(screen_path)
-    if img is None:
-        return ""
-
     # 擷取指定區域
-    x, y, w, h = region
-    crop = img[y:y + h, x:x + w]
+    try:
+        crop = crop_screen(screen_path, region)
+    except FileNotFoundError:
+        return ""
 
     # === Step 1: 灰階 + 去雜訊 ===
     gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
@@ -101,18 +122,14 @@ def _extract_text_from_region(
 
 
 def _extract_text_with_easyocr(
-    screen_path: str,
+    screen_path: Screen,
     region: Region,
     *,
     lang: str = "chi_tra",
 ) -> str:
     """Use EasyOCR to extract text from a region. Falls back to empty string on errors."""
     try:
-        img = cv2.imread(screen_path)
-        if img is None:
-            return ""
-        x, y, w, h = region
-        crop = img[y:y + h, x:x + w]
+        crop = crop_screen(screen_path, region)
         reader = _get_easyocr_reader(lang)
         # detail=0 returns list[str]; paragraph=False to keep line granularity
         result = reader.readtext(crop, detail=0, paragraph=False)
@@ -127,8 +144,9 @@ def _extract_text_with_easyocr(
         return ""
 
 
+@tracing.traced("find_image", cat="match")
 def find_image(
-    screen_path: str,
+    screen_path: Screen,
     template_path: str,
     region: Region,
     *,
@@ -139,8 +157,29 @@ def find_image(
     value_check: bool = True,
     value_mean_min: float = 40.0,
     value_mean_max: float = 240.0,
+    parallel: Optional[bool] = None,
+    method: str = "template",
+    scales: Optional[Sequence[float]] = None,
 ) -> Tuple[Optional[tuple[int, int]], float]:
-    """Find an image within a region on the given screenshot."""
+    """Find an image within a region on the given screenshot (path, array or RawFrame).
+
+    method: 'template' (multi-scale template matching) or a feature method
+    ('orb' / 'akaze' / 'sift'; threshold is then the RANSAC inlier ratio).
+    scales: template scale factors (None sweeps DEFAULT_SCALES; (1.0,) once calibrated).
+    """
+    if method != "template":
+        from .feature_matcher import find_image_by_features
+
+        return find_image_by_features(
+            screen_path,
+            template_path,
+            region,
+            method=method,
+            threshold=threshold,
+            debug=debug,
+            debug_tag=debug_tag,
+            debug_dir=debug_dir,
+        )
     return _find_image_in_region(
         screen_path,
         template_path,
@@ -152,43 +191,60 @@ def find_image(
         value_check=value_check,
         value_mean_min=value_mean_min,
         value_mean_max=value_mean_max,
+        parallel=parallel,
+        scales=scales,
     )
 
 
+def _timed_ocr(engine: str, extract, screen_path: Screen, region: Region, lang: str) -> str:
+    """執行 OCR 並以引擎與區域為標籤記錄耗時。"""
+    with metrics.timer("ocr_seconds", engine=engine, region=",".join(str(v) for v in region)):
+        text = extract(screen_path, region, lang=lang)
+    recorder.note("ocr", engine=engine, region=list(region), text=text)
+    return text
+
+
+@tracing.traced("find_text", cat="ocr")
 def find_text(
-    screen_path: str,
+    screen_path: Screen,
     region: Region,
     *,
     lang: str = "chi_tra",
+    engine: Optional[str] = None,
 ) -> str:
     """Extract text within a region.
 
-    Engine selection via env `OCR_ENGINE`:
+    Engine selection via `engine` (default: env `OCR_ENGINE` read at startup,
+    or the `ocr.engine` config value):
     - 'easyocr' to force EasyOCR
     - 'tesseract' to force Tesseract
     - 'auto' (default): try EasyOCR if available, else Tesseract
     """
 
-    engine = os.getenv("OCR_ENGINE", "auto").strip().lower()
+    engine = engine or _ocr_engine
+
+    custom = _custom_engines.get(engine)
+    if custom is not None:
+        return _timed_ocr(engine, custom, screen_path, region, lang)
 
     if engine in ("easy", "easyocr"):
         if _HAS_EASYOCR:
-            text = _extract_text_with_easyocr(screen_path, region, lang=lang)
+            text = _timed_ocr("easyocr", _extract_text_with_easyocr, screen_path, region, lang)
             if text:
                 return text
             # If EasyOCR returns empty, fall through to tesseract as safety net
         # EasyOCR not available, fallback
-        return _extract_text_from_region(screen_path, region, lang=lang)
+        return _timed_ocr("tesseract", _extract_text_from_region, screen_path, region, lang)
 
     if engine in ("tesseract", "tess"):
-        return _extract_text_from_region(screen_path, region, lang=lang)
+        return _timed_ocr("tesseract", _extract_text_from_region, screen_path, region, lang)
 
     # auto
     if _HAS_EASYOCR:
-        text = _extract_text_with_easyocr(screen_path, region, lang=lang)
+        text = _timed_ocr("easyocr", _extract_text_with_easyocr, screen_path, region, lang)
         if text:
             return text
-    return _extract_text_from_region(screen_path, region, lang=lang)
+    return _timed_ocr("tesseract", _extract_text_from_region, screen_path, region, lang)
     # display = text or "∅"
     # try:
     #     _logger.info(f"[OCR] file='{screen_path}', region={region}, text='{display}'")
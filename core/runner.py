@@ -1,12 +1,19 @@
 from __future__ import annotations
 
 import os
-import time
-from typing import Iterable, Optional, List
+import threading
+from typing import Iterable, Optional, List, Union
 
-from core.adb_controller import capture_screen
+from core.adb_controller import DeviceUnavailable, FrameSource, capture_screen, grab_frame, register_frame_source, register_touch_backend
+from core import clock, metrics, tracing
+from core.config import AppConfig, ConfigStore, ConfigView, apply_global_config, get_config_store
+from core.calibration import calibrate_from_env
 from core.logger import get_logger
+from core.polling import AdaptivePoller, build_poller_from_env
+from core.scene import SceneClassifier, build_classifier_from_env
+from core.scheduler import CooperativeScheduler
 from core.task import Task, TaskContext, TaskResult
+from core.touch_backend import build_touch_from_env
 
 
 class TaskRunner:
@@ -18,64 +25,233 @@ class TaskRunner:
         match_threshold: float = 0.8,
         check_interval: float = 1.0,
         click_cooldown: float = 2.0,
+        tick_budget: float = 0.0,
         device_id: Optional[str] = None,
+        frame_source: Optional[FrameSource] = None,
+        scene_classifier: Optional[SceneClassifier] = None,
+        config_store: Union[ConfigStore, ConfigView, None] = None,
+        poller: Optional[AdaptivePoller] = None,
     ) -> None:
         self.tasks: List[Task] = list(tasks)
         self.screenshot_path = screenshot_path
         self.match_threshold = float(match_threshold)
         self.check_interval = float(check_interval)
         self.click_cooldown = float(click_cooldown)
+        # 每個 tick 的時間預算；超過時其餘任務延到下一個 tick（0 表示不限制）
+        self.tick_budget = float(tick_budget)
+        self.scheduler = CooperativeScheduler(step_budget=tick_budget)
+        self._start = 0
+        self.completed = 0  # 已完成（回傳 TaskResult）的任務執行次數
         self.device_id = device_id
+        self.frame_source = frame_source
+        self.scene_classifier = scene_classifier
+        self.config_store = config_store
+        self.poller = poller
         self.logger = get_logger("runner")
+        self._stop: Optional[threading.Event] = None  # loop() 的停止事件；設定後睡眠會提早結束
+        if config_store is not None:
+            config_store.subscribe(self._apply_config)
 
-    def loop(self) -> None:
+    def _apply_config(self, cfg: AppConfig) -> None:
+        """熱重載：在 tick 之間整份替換設定。"""
+        self.match_threshold = cfg.runner.match_threshold
+        self.check_interval = cfg.runner.check_interval
+        self.click_cooldown = cfg.runner.click_cooldown
+        self.tick_budget = cfg.runner.tick_budget
+        self.scheduler.step_budget = cfg.runner.tick_budget
+        apply_global_config(cfg)
+        for task in self.tasks:
+            apply = getattr(task, "apply_config", None)
+            if apply is not None and task.name in cfg.tasks:
+                apply(cfg.tasks[task.name])
+
+    def close(self) -> None:
+        """停止接收設定通知（裝置管理器停止工作執行緒時呼叫）。"""
+        if self.config_store is not None:
+            self.config_store.unsubscribe(self._apply_config)
+
+    def loop(self, stop: Optional[threading.Event] = None) -> None:
+        """持續執行 tick；`stop` 被設定時在下一個 tick 之前結束（裝置管理器停止工作執行緒用）。"""
         self.logger.info(
             f"Runner start: tasks={[t.name for t in self.tasks]}, interval={self.check_interval}, "
             f"cooldown={self.click_cooldown}, threshold={self.match_threshold}"
         )
+        if self.frame_source is not None:
+            register_frame_source(self.device_id, self.frame_source)
+            self.logger.info(f"Capture backend: {type(self.frame_source).__name__}")
 
-        while True:
+        self._stop = stop
+        while stop is None or not stop.is_set():
             try:
-                # 1) Capture once for all tasks
+                self.step()
+            except DeviceUnavailable as e:
+                # 斷路器開啟：停放裝置直到冷卻結束，不以 check_interval 空轉（停止時立即結束）
+                self.logger.warning(f"Runner parked: {e}")
+                self._sleep(max(self.check_interval, e.retry_in), name="parked")
+            except Exception as e:
+                self.logger.error(f"Runner error: {e}")
+                self._sleep(self.check_interval)
+
+    def _sleep(self, seconds: float, *, name: str = "sleep") -> None:
+        """同 tracing.sleep；loop() 收到停止事件時提早返回。"""
+        if self._stop is None:
+            tracing.sleep(seconds, name=name)
+            return
+        with tracing.span(name, cat="sleep", seconds=round(seconds, 3)):
+            clock.wait(self._stop, seconds)
+
+    def step(self) -> bool:
+        """執行一個 tick 並依輪詢策略睡眠（時間來自 core.clock，可替換為虛擬時鐘）。"""
+        idle = self.idle_delay()
+        if idle is not None:
+            # 所有任務都在等待（例如 Wait(60)）：不截圖，直接睡到最早的恢復時間
+            metrics.inc("ticks_skipped_total")
+            self._sleep(idle, name="idle")
+            return False
+        steps = self.scheduler.steps
+        with metrics.device_scope(self.device_id):
+            acted_any = self.tick()
+        # 協程在 tick 中前進（例如巨集中途的點擊）也算動作，輪詢間隔回到最短
+        self._sleep(self.next_delay(acted_any or self.scheduler.steps != steps))
+        return acted_any
+
+    def idle_delay(self) -> Optional[float]:
+        """沒有任務可執行且最早的恢復時間未到時，回傳可直接睡眠的秒數（有輪詢策略時以其最長間隔為上限）。"""
+        if not self.tasks or not all(self.scheduler.is_suspended(t) for t in self.tasks):
+            return None
+        wake = self.scheduler.next_wake()
+        remaining = wake - self.scheduler.clock() if wake is not None else 0.0
+        if remaining <= 0:
+            return None
+        if self.poller is not None:
+            remaining = min(remaining, self.poller.max_interval)
+        return remaining
+
+    def next_delay(self, acted_any: bool) -> float:
+        # 3) Sleep policy（有暫停中的任務時，最晚在其恢復時間醒來）
+        if self.poller is not None:
+            delay = self.poller.next_interval(acted_any)
+        else:
+            delay = self.click_cooldown if acted_any else self.check_interval
+        wake = self.scheduler.next_wake()
+        if wake is not None:
+            delay = min(delay, max(0.0, wake - self.scheduler.clock()))
+        return delay
+
+    def tick(self) -> bool:
+        """擷取一次畫面並執行/恢復各任務一步；回傳是否有任務完成動作。"""
+        with metrics.timer("tick_seconds"), tracing.span("tick", cat="runner"):
+            # 0) 設定檔有變更時於 tick 之間套用
+            if self.config_store is not None:
+                self.config_store.maybe_reload()
+
+            # 1) Capture once for all tasks
+            #    有影格來源時保留在記憶體中，只解碼任務實際讀取的區域
+            frame = None
+            if self.frame_source is not None:
+                frame = grab_frame(self.device_id)
+            else:
                 capture_screen(self.screenshot_path, device_id=self.device_id)
 
-                # 2) Build context and execute tasks in order
-                ctx = TaskContext(
-                    screenshot_path=self.screenshot_path,
-                    match_threshold=self.match_threshold,
-                    device_id=self.device_id,
+            # 2) Build context and execute tasks in order
+            ctx = TaskContext(
+                screenshot_path=self.screenshot_path,
+                match_threshold=self.match_threshold,
+                device_id=self.device_id,
+                frame=frame,
+            )
+            # 沒有任務宣告 scenes 時不做場景判斷，省下每個 tick 的分類成本
+            if self.scene_classifier is not None and any(getattr(t, "scenes", None) for t in self.tasks):
+                match = self.scene_classifier.classify(ctx.screen)
+                ctx.scene, ctx.scene_confidence = match.scene, match.confidence
+
+            if self.poller is not None:
+                self.poller.observe(ctx.screen)
+
+            acted_any = self.run_tasks(ctx)
+        metrics.inc("ticks_total")
+        return acted_any
+
+    def run_tasks(self, ctx: TaskContext) -> bool:
+        """以協作方式執行/恢復各任務一步；回傳是否有任務完成動作。"""
+        acted_any = False
+        started = self.scheduler.clock()
+        n = len(self.tasks)
+        order = [self.tasks[(self._start + i) % n] for i in range(n)]
+        self._start = 0
+        for i, task in enumerate(order):
+            if i > 0 and self.tick_budget > 0 and self.scheduler.clock() - started > self.tick_budget:
+                # 超過預算：剩餘任務延到下一個 tick 優先執行，避免固定排在後面的任務被餓死
+                self._start = self.tasks.index(task)
+                self.logger.warning(
+                    f"tick 超過預算 {self.tick_budget:.2f}s，延後: {[t.name for t in order[i:]]}"
                 )
+                break
+            if not self.scheduler.is_suspended(task) and not self._handles_scene(task, ctx):
+                continue
+            with metrics.timer("task_step_seconds", task=task.name):
+                result: Optional[TaskResult] = self.scheduler.run(task, ctx)
+            if result is None:
+                continue
+            self.completed += 1
+            metrics.inc("task_results_total", task=task.name, acted=str(result.acted).lower())
+            if result.message:
+                # 多行訊息合併成一筆記錄（JSON 輸出時可依 task 欄位過濾）
+                lines = [line.strip() for line in str(result.message).splitlines() if line.strip()]
+                if lines:
+                    self.logger.info(f"[{task.name}] " + "\n".join(lines), extra={"task": task.name})
+            acted_any = acted_any or result.acted
+        return acted_any
 
-                acted_any = False
-                for task in self.tasks:
-                    result: TaskResult = task.tick(ctx)
-                    if result.message:
-                        # 將多行訊息逐行輸出，讓每一步都有獨立時間戳
-                        for line in str(result.message).splitlines():
-                            line = line.strip()
-                            if line:
-                                self.logger.info(f"[{task.name}] {line}")
-                    acted_any = acted_any or result.acted
+    @staticmethod
+    def _handles_scene(task: Task, ctx: TaskContext) -> bool:
+        """任務宣告了 `scenes` 且目前畫面已辨識為其他場景時略過，避免不必要的 OCR。"""
+        scenes = getattr(task, "scenes", None)
+        if not scenes or ctx.scene is None or ctx.scene == "unknown":
+            return True
+        return ctx.scene in scenes
 
-                # 3) Sleep policy
-                time.sleep(self.click_cooldown if acted_any else self.check_interval)
 
-            except Exception as e:
-                self.logger.error(f"Runner error: {e}")
-                time.sleep(self.check_interval)
+def build_runner_from_env(
+    tasks: Iterable[Task],
+    *,
+    device_id: Optional[str] = None,
+    screenshot_path: Optional[str] = None,
+    config_store: Union[ConfigStore, ConfigView, None] = None,
+    touch_port: Optional[int] = None,
+) -> TaskRunner:
+    """`config_store` 預設為共用的 ConfigStore；多裝置時傳入各自的 ConfigView，`touch_port` 為該裝置的 minitouch 轉送埠。"""
+    store = config_store if config_store is not None else get_config_store()
+    cfg = store.current
+    apply_global_config(cfg)
+    if device_id is None:
+        device_id = os.getenv("ADB_DEVICE")
+    frame_source = None
+    backend = os.getenv("CAPTURE_BACKEND", "screencap").strip().lower()
+    if backend == "stream":
+        from core.screen_stream import build_stream_from_env
 
+        frame_source = build_stream_from_env(device_id).start()
+    elif backend in ("adaptive", "raw", "png"):
+        from core.capture_codec import build_capture_from_env
 
-def build_runner_from_env(tasks: Iterable[Task]) -> TaskRunner:
-    screenshot_path = os.getenv("SCREENSHOT_PATH", "screen.png")
-    match_threshold = float(os.getenv("MATCH_THRESHOLD", "0.8"))
-    check_interval = float(os.getenv("CHECK_INTERVAL", "1.0"))
-    click_cooldown = float(os.getenv("CLICK_COOLDOWN", "2.0"))
-    device_id = os.getenv("ADB_DEVICE")
-    return TaskRunner(
+        frame_source = build_capture_from_env(device_id, backend)
+    runner = TaskRunner(
         tasks,
-        screenshot_path=screenshot_path,
-        match_threshold=match_threshold,
-        check_interval=check_interval,
-        click_cooldown=click_cooldown,
+        screenshot_path=screenshot_path or cfg.runner.screenshot_path,
+        match_threshold=cfg.runner.match_threshold,
+        check_interval=cfg.runner.check_interval,
+        click_cooldown=cfg.runner.click_cooldown,
+        tick_budget=cfg.runner.tick_budget,
         device_id=device_id,
+        frame_source=frame_source,
+        scene_classifier=build_classifier_from_env(),
+        config_store=store,
+        poller=build_poller_from_env(),
     )
+    # 影格來源就緒後量測解析度；換算後的設定經由 ConfigStore 通知 Runner 與各任務
+    cal = calibrate_from_env(store, device_id)
+    touch = build_touch_from_env(device_id, cal.device_size, port=touch_port)
+    if touch is not None:
+        register_touch_backend(device_id, touch)
+    return runner
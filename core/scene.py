@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import yaml
+
+from core.image_utils import Screen, load_screen, thumbnail
+from core.logger import get_logger
+from core.probes import PixelProbe, ProbeSet
+
+# 已知畫面：關卡選擇、戰鬥中、暫停選單、退出確認、失敗/成功結算
+KNOWN_SCENES = (
+    "level_select",
+    "in_battle",
+    "pause_menu",
+    "exit_dialog",
+    "fail_confirm",
+    "success_confirm",
+)
+UNKNOWN_SCENE = "unknown"
+
+THUMBNAIL_SIZE = (16, 9)
+
+
+class SceneSpec:
+    """一個畫面的指紋：幾個像素探針加上一張極小的灰階縮圖。"""
+
+    def __init__(
+        self,
+        name: str,
+        probes: Optional[list[PixelProbe]] = None,
+        thumbnail: Optional[np.ndarray] = None,  # uint8, shape=(9, 16)
+    ) -> None:
+        self.name = name
+        self.probes = ProbeSet(name, probes or [])
+        self.thumbnail = thumbnail
+
+    def score(self, screen: Screen, thumb: Optional[np.ndarray]) -> float:
+        parts: list[tuple[float, float]] = []
+        if len(self.probes):
+            try:
+                ratio = self.probes.evaluate(screen).ratio
+            except ValueError:
+                ratio = 0.0
+            parts.append((0.6, ratio))
+        if self.thumbnail is not None and thumb is not None:
+            # 平均灰階差 0 → 1.0；差 64 以上 → 0.0
+            mad = float(np.mean(np.abs(thumb.astype(np.int16) - self.thumbnail.astype(np.int16))))
+            parts.append((0.4, max(0.0, 1.0 - mad / 64.0)))
+        if not parts:
+            return 0.0
+        total = sum(w for w, _ in parts)
+        return sum(w * s for w, s in parts) / total
+
+
+@dataclass
+class SceneMatch:
+    scene: str
+    confidence: float
+
+    @property
+    def known(self) -> bool:
+        return self.scene != UNKNOWN_SCENE
+
+
+class SceneClassifier:
+    """以像素探針（向量化 ProbeSet）與縮圖，一次判斷目前位於哪個畫面。
+
+    場景檔（YAML）格式：
+        scenes:
+          level_select:
+            thumbnail: [144 個 0~255 灰階值]
+            probes:
+              - {x: 1570, y: 850, bgr: [30, 40, 200], tol: 20}
+
+    探針可用 `tools/pixel_picker.py --scene <名稱>` 從截圖直接建立。
+    """
+
+    def __init__(self, scenes: list[SceneSpec], *, min_confidence: float = 0.7) -> None:
+        self.scenes = scenes
+        self.min_confidence = float(min_confidence)
+
+    @classmethod
+    def load(cls, path: str, *, min_confidence: float = 0.7) -> "SceneClassifier":
+        return cls(load_scene_specs(path), min_confidence=min_confidence)
+
+    def classify(self, screen: Screen) -> SceneMatch:
+        if not self.scenes:
+            return SceneMatch(UNKNOWN_SCENE, 0.0)
+        if isinstance(screen, str):
+            # 路徑只讀取一次，避免每個探針各自讀檔
+            screen = load_screen(screen)
+        needs_thumb = any(s.thumbnail is not None for s in self.scenes)
+        thumb = thumbnail(screen, THUMBNAIL_SIZE) if needs_thumb else None
+        best_name, best_score = UNKNOWN_SCENE, 0.0
+        for spec in self.scenes:
+            sc = spec.score(screen, thumb)
+            if sc > best_score:
+                best_name, best_score = spec.name, sc
+        if best_score < self.min_confidence:
+            return SceneMatch(UNKNOWN_SCENE, best_score)
+        return SceneMatch(best_name, best_score)
+
+
+# ----------------------------------------------------------------------
+# 場景檔讀寫
+# ----------------------------------------------------------------------
+def _spec_from_dict(name: str, data: dict) -> SceneSpec:
+    probes = [PixelProbe.from_dict(p) for p in data.get("probes") or []]
+    thumb = data.get("thumbnail")
+    arr = None
+    if thumb:
+        tw, th = THUMBNAIL_SIZE
+        arr = np.asarray(thumb, dtype=np.uint8)
+        if arr.size != tw * th:
+            raise ValueError(f"場景 {name} 的縮圖大小錯誤：{arr.size} != {tw * th}")
+        arr = arr.reshape(th, tw)
+    return SceneSpec(name, probes, arr)
+
+
+def load_scene_specs(path: str) -> list[SceneSpec]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    scenes = data.get("scenes") or {}
+    return [_spec_from_dict(name, spec or {}) for name, spec in scenes.items()]
+
+
+def save_scene(
+    path: str,
+    name: str,
+    *,
+    thumb: Optional[np.ndarray] = None,
+    probes: Optional[list[PixelProbe]] = None,
+) -> None:
+    """新增或更新場景：提供縮圖則覆寫縮圖；探針為附加。"""
+    data: dict = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+    scenes = data.setdefault("scenes", {})
+    entry = scenes.setdefault(name, {}) or {}
+    scenes[name] = entry
+    if thumb is not None:
+        entry["thumbnail"] = [int(v) for v in thumb.reshape(-1)]
+    if probes:
+        entry.setdefault("probes", [])
+        entry["probes"].extend(p.to_dict() for p in probes)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False, default_flow_style=None)
+
+
+def build_classifier_from_env() -> Optional[SceneClassifier]:
+    """SCENES_FILE 存在時建立場景分類器；否則回傳 None（不做場景判斷）。"""
+    path = os.getenv("SCENES_FILE", "config/scenes.yaml").strip()
+    if not path or not os.path.exists(path):
+        return None
+    classifier = SceneClassifier.load(
+        path, min_confidence=float(os.getenv("SCENE_MIN_CONFIDENCE", "0.7"))
+    )
+    get_logger("scene").info(f"載入場景指紋 {len(classifier.scenes)} 個：{path}")
+    return classifier
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable, Generator, Optional, Union
+
+from core import clock as _clock, tracing
+from core.logger import get_logger
+from core.task import Task, TaskContext, TaskResult
+
+
+@dataclass(frozen=True)
+class Wait:
+    """暫停任務 `seconds` 秒；期間 Runner 可以執行其他任務。"""
+
+    seconds: float
+
+
+@dataclass(frozen=True)
+class WaitUntil:
+    """暫停任務直到 `predicate(ctx)` 成立或逾時。
+
+    Runner 每個 tick 以最新畫面呼叫 predicate（最短間隔 `poll` 秒，第一次檢查也在 `poll` 秒之後）；
+    恢復時 `yield` 的值為 True（條件成立）或 False（逾時）。
+    """
+
+    predicate: Callable[[TaskContext], bool]
+    timeout: float = 30.0
+    poll: float = 0.5
+
+
+Step = Union[Wait, WaitUntil]
+# 協程式任務：tick() 回傳 generator，yield Wait/WaitUntil，最後 return TaskResult
+TaskCoroutine = Generator[Step, Any, Optional[TaskResult]]
+
+
+@dataclass
+class _Suspended:
+    gen: TaskCoroutine
+    ctx: TaskContext  # 任務開始時取得的 context；恢復前以最新畫面更新
+    step: Step
+    resume_at: float  # Wait：恢復時間；WaitUntil：下次檢查時間
+    deadline: float  # WaitUntil 逾時時間（Wait 與 resume_at 相同）
+    since_us: float = 0.0  # 開始等待的追蹤時間戳
+
+
+class CooperativeScheduler:
+    """在單一執行緒上交錯執行多個任務。
+
+    `tick()` 可以直接回傳 TaskResult（一般任務），也可以是 generator：
+    遇到 `yield Wait(...)` / `yield WaitUntil(...)` 時交回控制權，
+    之後由 Runner 在條件滿足的 tick 繼續執行，不再以 time.sleep 佔住整個程序。
+    """
+
+    def __init__(self, *, clock: Callable[[], float] = _clock.monotonic, step_budget: float = 0.0) -> None:
+        self.clock = clock
+        # 單一步驟（兩次 yield 之間）允許的執行時間；0 表示不檢查
+        self.step_budget = float(step_budget)
+        self.logger = get_logger("scheduler")
+        self._suspended: dict[str, _Suspended] = {}
+        # 協程前進的步數（兩次 yield 之間可能點擊了畫面）；Runner 以此重設輪詢退避
+        self.steps = 0
+
+    def is_suspended(self, task: Task) -> bool:
+        return task.name in self._suspended
+
+    def next_wake(self) -> Optional[float]:
+        """最近一個需要處理的暫停任務的時間（clock 時間），沒有則為 None。"""
+        if not self._suspended:
+            return None
+        return min(s.resume_at for s in self._suspended.values())
+
+    def run(self, task: Task, ctx: TaskContext) -> Optional[TaskResult]:
+        """執行或恢復任務一步；任務仍在等待時回傳 None。"""
+        suspended = self._suspended.get(task.name)
+        if suspended is None:
+            out = task.tick(ctx)
+            if not inspect.isgenerator(out):
+                return out
+            return self._advance(task, out, ctx, None)
+
+        now = self.clock()
+        step = suspended.step
+        if now < suspended.resume_at:
+            return None
+        suspended.ctx.update_from(ctx)
+        value: Any = None
+        if isinstance(step, WaitUntil):
+            try:
+                value = bool(step.predicate(suspended.ctx))
+            except Exception as e:
+                self.logger.error(f"[{task.name}] WaitUntil 條件錯誤: {e}")
+                value = False
+            if not value and now < suspended.deadline:
+                suspended.resume_at = min(now + step.poll, suspended.deadline)
+                return None
+        del self._suspended[task.name]
+        # 等待期間在追蹤時間軸上以任務名稱為軌道顯示
+        if isinstance(step, Wait):
+            tracing.record("Wait", suspended.since_us, cat="sleep", track=task.name, seconds=step.seconds)
+        else:
+            tracing.record("WaitUntil", suspended.since_us, cat="sleep", track=task.name, result=value)
+        return self._advance(task, suspended.gen, suspended.ctx, value)
+
+    def cancel(self, task: Task) -> None:
+        suspended = self._suspended.pop(task.name, None)
+        if suspended is not None:
+            suspended.gen.close()
+
+    def _advance(self, task: Task, gen: TaskCoroutine, ctx: TaskContext, value: Any) -> Optional[TaskResult]:
+        started = self.clock()
+        self.steps += 1
+        try:
+            step = gen.send(value)
+        except StopIteration as stop:
+            return stop.value if stop.value is not None else TaskResult()
+        finally:
+            elapsed = self.clock() - started
+            if self.step_budget > 0 and elapsed > self.step_budget:
+                self.logger.warning(
+                    f"[{task.name}] 單一步驟耗時 {elapsed:.2f}s，超過預算 {self.step_budget:.2f}s"
+                )
+        now = self.clock()
+        if isinstance(step, Wait):
+            at = now + max(0.0, float(step.seconds))
+            self._suspended[task.name] = _Suspended(gen, ctx, step, at, at, tracing.now_us())
+        elif isinstance(step, WaitUntil):
+            deadline = now + max(0.0, float(step.timeout))
+            # 至少等 poll 秒才檢查：否則 next_wake 等於現在，Runner 會以零延遲連續截圖
+            at = min(now + max(0.0, float(step.poll)), deadline)
+            self._suspended[task.name] = _Suspended(gen, ctx, step, at, deadline, tracing.now_us())
+        else:
+            gen.close()
+            raise TypeError(f"任務 {task.name} yield 了不支援的步驟: {step!r}")
+        return None
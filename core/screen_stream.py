@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import collections
+import os
+import shlex
+import subprocess
+import threading
+import time
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+
+from core.logger import get_logger
+
+# Android screenrecord 單次錄影上限為 180 秒，需在此之前重新啟動
+SCREENRECORD_TIME_LIMIT = 180.0
+
+
+class ScreenRecordStream:
+    """以 `adb exec-out screenrecord` 長時間串流畫面，持續解碼成最新一張 BGR 影像。
+
+    - 裝置模式：adb 輸出 H.264 → ffmpeg 解碼為 bgr24 原始影格
+    - 測試模式：`source` 指定本機影片檔（以 OpenCV 解碼，依影片 fps 播放並循環）
+      或 `command` 指定任何輸出 H.264 的指令（例如 `cat clip.h264`）取代 adb
+
+    每次重新啟動前等待 `restart_backoff` 秒；沒有產生任何影格就結束時（裝置離線、adb 或 ffmpeg 立即退出）
+    等待時間加倍（上限 `max_backoff`），連續 `max_failures` 次後停止串流，之後 `grab()` 直接拋出錯誤。
+    """
+
+    def __init__(
+        self,
+        device_id: Optional[str] = None,
+        *,
+        size: tuple[int, int] = (1920, 1080),
+        bit_rate: int = 8_000_000,
+        restart_seconds: float = 170.0,
+        source: Optional[str] = None,
+        command: Optional[Sequence[str]] = None,
+        fps_window: float = 2.0,
+        restart_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_failures: int = 5,
+    ) -> None:
+        self.device_id = device_id
+        self.size = (int(size[0]), int(size[1]))
+        self.bit_rate = int(bit_rate)
+        # 保留餘裕，避免裝置端先因時間上限中斷
+        self.restart_seconds = min(float(restart_seconds), SCREENRECORD_TIME_LIMIT - 5.0)
+        self.source = source
+        self.command = list(command) if command else None
+        self.fps_window = float(fps_window)
+        self.restart_backoff = max(0.0, float(restart_backoff))
+        self.max_backoff = max(self.restart_backoff, float(max_backoff))
+        self.max_failures = max(1, int(max_failures))
+        self.logger = get_logger("screen_stream")
+
+        self._cond = threading.Condition()
+        self._frame: Optional[np.ndarray] = None
+        self._seq = 0
+        self._stamps: collections.deque[float] = collections.deque()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 讀取執行緒、重啟計時器與 stop() 都會終止子行程，清單以鎖保護
+        self._procs_lock = threading.Lock()
+        self._procs: list[subprocess.Popen] = []
+        self.restarts = 0
+        self.failures = 0  # 連續沒有產生影格的次數
+        self.failed = False  # 超過 max_failures，串流已放棄
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+    def start(self) -> "ScreenRecordStream":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self.failures, self.failed = 0, False
+        self._thread = threading.Thread(target=self._run, name="screen-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._kill_procs()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def __enter__(self) -> "ScreenRecordStream":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------------
+    @property
+    def fps(self) -> float:
+        """最近 `fps_window` 秒內實際解碼的影格率。"""
+        with self._cond:
+            self._trim_stamps(time.monotonic())
+            return len(self._stamps) / self.fps_window
+
+    @property
+    def frame_count(self) -> int:
+        with self._cond:
+            return self._seq
+
+    def latest(self) -> Optional[np.ndarray]:
+        with self._cond:
+            return self._frame
+
+    def wait_frame(self, timeout: float = 5.0, after_seq: int = 0) -> tuple[np.ndarray, int]:
+        """等待序號大於 `after_seq` 的影格，回傳 (frame, seq)。"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._frame is None or self._seq <= after_seq:
+                if self.failed:
+                    raise RuntimeError(f"串流連續 {self.failures} 次未產生影格，已停止")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("串流在時限內沒有新的影格")
+                self._cond.wait(remaining)
+            return self._frame, self._seq
+
+    def grab(self, timeout: float = 5.0) -> np.ndarray:
+        """回傳目前最新的影格（尚無影格時等待第一張）。"""
+        frame, _ = self.wait_frame(timeout=timeout)
+        return frame
+
+    # ------------------------------------------------------------------
+    # 內部實作
+    # ------------------------------------------------------------------
+    def _trim_stamps(self, now: float) -> None:
+        while self._stamps and now - self._stamps[0] > self.fps_window:
+            self._stamps.popleft()
+
+    def _publish(self, frame: np.ndarray) -> None:
+        now = time.monotonic()
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._stamps.append(now)
+            self._trim_stamps(now)
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        backoff = self.restart_backoff
+        while not self._stop.is_set():
+            started = time.monotonic()
+            seq = self.frame_count
+            try:
+                if self.source:
+                    self._run_file(started)
+                else:
+                    self._run_pipe(started)
+            except Exception as e:
+                self.logger.error(f"[STREAM] 串流中斷: {e}")
+            finally:
+                self._kill_procs()
+            if self._stop.is_set():
+                return
+            if self.frame_count > seq:
+                # 有產生影格（例如時限到的正常重啟）：退避回到起始值
+                self.failures, backoff, delay = 0, self.restart_backoff, self.restart_backoff
+            else:
+                self.failures += 1
+                if self.failures >= self.max_failures:
+                    self.logger.error(f"[STREAM] 連續 {self.failures} 次未產生影格，停止串流")
+                    with self._cond:
+                        self.failed = True
+                        self._cond.notify_all()
+                    return
+                delay, backoff = backoff, min(self.max_backoff, max(backoff, 0.01) * 2)
+            self.restarts += 1
+            self.logger.info(f"[STREAM] {delay:.1f}s 後重新啟動串流（第 {self.restarts} 次），fps={self.fps:.1f}")
+            self._stop.wait(delay)
+
+    def _screenrecord_command(self) -> list[str]:
+        if self.command:
+            return list(self.command)
+        prefix = ["-s", self.device_id] if self.device_id else []
+        w, h = self.size
+        return [
+            "adb", *prefix, "exec-out", "screenrecord",
+            "--output-format=h264",
+            f"--size={w}x{h}",
+            f"--bit-rate={self.bit_rate}",
+            f"--time-limit={int(SCREENRECORD_TIME_LIMIT)}",
+            "-",
+        ]
+
+    def _run_pipe(self, started: float) -> None:
+        w, h = self.size
+        decoder = [
+            "ffmpeg", "-loglevel", "error",
+            "-fflags", "nobuffer", "-flags", "low_delay",
+            "-probesize", "32", "-analyzeduration", "0",
+            "-f", "h264", "-i", "pipe:0",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1",
+        ]
+        # 每個子行程建立後立即登記，ffmpeg 啟動失敗時 producer 也會被終止
+        producer = self._track(subprocess.Popen(self._screenrecord_command(), stdout=subprocess.PIPE))
+        consumer = self._track(subprocess.Popen(decoder, stdin=producer.stdout, stdout=subprocess.PIPE))
+        # 讓 ffmpeg 成為 producer stdout 的唯一讀者，producer 結束時 ffmpeg 才會收到 EOF
+        producer.stdout.close()  # type: ignore[union-attr]
+
+        # 畫面靜止時 screenrecord 不會輸出影格，read 會一直阻塞；改以計時器在時限前主動結束
+        timer = threading.Timer(max(0.0, self.restart_seconds - (time.monotonic() - started)), self._kill_procs)
+        timer.daemon = True
+        timer.start()
+        try:
+            frame_bytes = w * h * 3
+            stdout = consumer.stdout
+            assert stdout is not None
+            while not self._stop.is_set():
+                buf = stdout.read(frame_bytes)
+                if len(buf) < frame_bytes:
+                    # 串流結束（時限到、裝置斷線或被計時器終止）
+                    return
+                self._publish(np.frombuffer(buf, dtype=np.uint8).reshape(h, w, 3))
+        finally:
+            timer.cancel()
+
+    def _run_file(self, started: float) -> None:
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"無法開啟串流來源: {self.source}")
+        try:
+            src_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            interval = 1.0 / src_fps if src_fps > 0 else 0.0
+            next_at = time.monotonic()
+            while not self._stop.is_set():
+                if time.monotonic() - started >= self.restart_seconds:
+                    return
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                self._publish(frame)
+                next_at += interval
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+        finally:
+            cap.release()
+
+    def _track(self, proc: subprocess.Popen) -> subprocess.Popen:
+        """登記子行程；若 stop() 已先執行，立即終止，避免遺留 ffmpeg / screenrecord。"""
+        with self._procs_lock:
+            self._procs.append(proc)
+            stopping = self._stop.is_set()
+        if stopping:
+            self._kill_procs()
+        return proc
+
+    def _kill_procs(self) -> None:
+        # 先在鎖內整份取出清單，每個子行程只會由一個呼叫端終止
+        with self._procs_lock:
+            procs, self._procs = self._procs, []
+        for proc in procs:
+            try:
+                if proc.poll() is None:
+                    proc.kill()
+                proc.wait(timeout=2.0)
+            except Exception:
+                pass
+
+
+def _parse_size(s: str) -> tuple[int, int]:
+    w, h = s.lower().split("x")
+    return int(w), int(h)
+
+
+def build_stream_from_env(device_id: Optional[str]) -> ScreenRecordStream:
+    """依環境變數建立串流（STREAM_SIZE / STREAM_BIT_RATE / STREAM_RESTART_SECONDS / STREAM_SOURCE / STREAM_COMMAND /
+    STREAM_RESTART_BACKOFF / STREAM_MAX_FAILURES）。"""
+    command = os.getenv("STREAM_COMMAND", "").strip()
+    return ScreenRecordStream(
+        device_id,
+        size=_parse_size(os.getenv("STREAM_SIZE", "1920x1080")),
+        bit_rate=int(os.getenv("STREAM_BIT_RATE", "8000000")),
+        restart_seconds=float(os.getenv("STREAM_RESTART_SECONDS", "170")),
+        source=os.getenv("STREAM_SOURCE", "").strip() or None,
+        command=shlex.split(command) if command else None,
+        restart_backoff=float(os.getenv("STREAM_RESTART_BACKOFF", "0.5")),
+        max_failures=int(os.getenv("STREAM_MAX_FAILURES", "5")),
+    )
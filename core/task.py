@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Protocol, Optional
+from dataclasses import dataclass, field
+from typing import Any, Protocol, Optional
 
 
 @dataclass
@@ -11,6 +11,43 @@ class TaskContext:
     screenshot_path: str
     match_threshold: float
     device_id: Optional[str]
+    # In-memory frame (ndarray or RawFrame); None means use screenshot_path
+    frame: Optional[Any] = None
+    # Scene id from the scene classifier (None when no classifier is configured)
+    scene: Optional[str] = None
+    scene_confidence: float = 0.0
+    # screenshot_path decoded once per capture (file mode); shared by every recognizer in the tick
+    _decoded: Optional[Any] = field(default=None, repr=False, compare=False)
+
+    @property
+    def screen(self):
+        """Screen to pass to recognizers: the in-memory frame if any, else the
+        screenshot file, decoded on first use and reused until the next capture."""
+        if self.frame is not None:
+            return self.frame
+        if self._decoded is None:
+            from core.image_utils import load_screen
+
+            self._decoded = load_screen(self.screenshot_path)
+        return self._decoded
+
+    def refresh(self) -> None:
+        """Re-capture the screen in whichever mode (memory/file) this context uses."""
+        from core.adb_controller import capture_screen, grab_frame
+
+        if self.frame is not None:
+            self.frame = grab_frame(self.device_id)
+        else:
+            capture_screen(self.screenshot_path, device_id=self.device_id)
+            self._decoded = None
+
+    def update_from(self, other: "TaskContext") -> None:
+        """Adopt a newer tick's capture (used when resuming a suspended task)."""
+        self.match_threshold = other.match_threshold
+        self.frame = other.frame
+        self._decoded = other._decoded
+        self.scene = other.scene
+        self.scene_confidence = other.scene_confidence
 
 
 @dataclass
@@ -23,12 +60,18 @@ class TaskResult:
 
 class Task(Protocol):
     name: str
+    # Optional: scene ids this task handles. When set and the runner's scene
+    # classifier recognizes a different screen, the tick is skipped.
+    # scenes: Optional[set[str]]
 
     def tick(self, ctx: TaskContext) -> TaskResult:
         """Run one iteration of the task with current screenshot available.
 
         Implementations should be resilient to errors and return TaskResult,
-        raising only on unrecoverable issues.
+        raising only on unrecoverable issues. Long flows may instead be written
+        as generators that ``yield`` ``Wait``/``WaitUntil`` steps (see
+        ``core.scheduler``) and ``return`` the TaskResult; the runner resumes
+        them on later ticks instead of blocking in ``time.sleep``.
         """
         ...
 
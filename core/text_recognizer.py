@@ -1,14 +1,65 @@
 import cv2
 import os
 import time
+from dataclasses import dataclass
+from typing import Optional
+
 import pytesseract
 from pytesseract import Output
 
+from core.image_utils import Screen, crop_screen, load_screen
+
+
+@dataclass(frozen=True)
+class OcrProfile:
+    """extract_text_from_region 的前處理參數（啟動時編譯一次，呼叫時不再讀環境變數）。"""
+
+    scale: Optional[float] = None  # None：依區域高度自動決定
+    psm: str = "7"  # 預設單行
+    method: str = "auto"  # auto / otsu / adaptive
+    debug: bool = False
+    dilate: int = 1  # 預設做輕微連接
+    adaptive_block: int = 31
+    adaptive_c: int = 5
+
+    @classmethod
+    def from_env(cls) -> "OcrProfile":
+        """讀取 OCR_SCALE, OCR_PSM, OCR_METHOD, OCR_DEBUG, OCR_DILATE, OCR_ADAPTIVE_*。"""
+
+        def _float_env(name: str, default: float) -> float:
+            try:
+                return float(os.getenv(name, str(default)))
+            except Exception:
+                return default
+
+        scale_env = os.getenv("OCR_SCALE", os.getenv("TEXT_OCR_SCALE", "")).strip()
+        scale = _float_env("OCR_SCALE", _float_env("TEXT_OCR_SCALE", 1.0)) if scale_env else None
+        return cls(
+            scale=scale,
+            psm=os.getenv("OCR_PSM", "7").strip(),
+            method=os.getenv("OCR_METHOD", os.getenv("TEXT_OCR_METHOD", "auto")).lower(),
+            debug=os.getenv("OCR_DEBUG", "0").strip() not in ("0", "false", "False", "no", "NO"),
+            dilate=int(os.getenv("OCR_DILATE", "1")),
+            adaptive_block=int(os.getenv("OCR_ADAPTIVE_BLOCK", "31")),
+            adaptive_c=int(os.getenv("OCR_ADAPTIVE_C", "5")),
+        )
+
+
+_default_profile = OcrProfile.from_env()
+
+
+def set_default_profile(profile: OcrProfile) -> None:
+    """由設定檔（含熱重載）替換預設 OCR 參數。"""
+    global _default_profile
+    _default_profile = profile
+
 
 def extract_text_from_region(
-    image_path: str,
+    image_path: Screen,
     region: tuple[int, int, int, int],
     lang: str = "chi_tra",
+    *,
+    profile: Optional[OcrProfile] = None,
 ) -> str:
     """
     擷取圖片中指定區域的文字（強化版）
@@ -16,36 +67,23 @@ def extract_text_from_region(
     - 自動於黑/白字之間選擇最佳二值化
     - OTSU / 自適應門檻自動嘗試
     - 以 Tesseract 置信度挑選最佳結果
-    可用環境變數覆寫：OCR_SCALE, OCR_PSM, OCR_METHOD, OCR_DEBUG, OCR_DILATE
+    參數來自 `profile`（未指定時為預設 OcrProfile，啟動時由 OCR_* 環境變數或設定檔建立）
     """
-
-    def _bool_env(name: str, default: str = "0") -> bool:
-        return os.getenv(name, default).strip() not in ("0", "false", "False", "no", "NO")
-
-    def _float_env(name: str, default: float) -> float:
-        try:
-            return float(os.getenv(name, str(default)))
-        except Exception:
-            return default
-
-    img = cv2.imread(image_path)
-    if img is None:
-        raise FileNotFoundError(f"無法讀取圖片: {image_path}")
+    p = profile or _default_profile
 
     x, y, w, h = region
-    crop = img[y:y + h, x:x + w]
+    crop = crop_screen(image_path, region)
 
     # 動態縮放（未指定時依區域大小自動放大）
-    scale_env = os.getenv("OCR_SCALE", os.getenv("TEXT_OCR_SCALE", "")).strip()
-    if scale_env:
-        scale = _float_env("OCR_SCALE", _float_env("TEXT_OCR_SCALE", 1.0))
+    if p.scale is not None:
+        scale = p.scale
     else:
         scale = 2.0 if h < 40 else (1.5 if h < 80 else 1.2)
 
-    psm = os.getenv("OCR_PSM", "7").strip()  # 預設單行
-    method = os.getenv("OCR_METHOD", os.getenv("TEXT_OCR_METHOD", "auto")).lower()
-    debug_flag = _bool_env("OCR_DEBUG", "0")
-    dilate_iter = int(os.getenv("OCR_DILATE", "1"))  # 預設做輕微連接
+    psm = p.psm
+    method = p.method
+    debug_flag = p.debug
+    dilate_iter = p.dilate
 
     # Step 1: 灰階 + 降噪 + 對比增強
     gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
@@ -64,9 +102,9 @@ def extract_text_from_region(
         candidates.append(("otsu_bin", b1))
         candidates.append(("otsu_inv", b2))
         # Adaptive（較適合低對比）
-        block = int(os.getenv("OCR_ADAPTIVE_BLOCK", "31"))
+        block = p.adaptive_block
         block = block if block % 2 == 1 else block + 1
-        c_val = int(os.getenv("OCR_ADAPTIVE_C", "5"))
+        c_val = p.adaptive_c
         a1 = cv2.adaptiveThreshold(img_gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block, c_val)
         a2 = cv2.adaptiveThreshold(img_gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, block, c_val)
         candidates.append(("ada_bin", a1))
@@ -139,7 +177,7 @@ def extract_text_from_region(
 
 
 def find_text_in_region(
-    image_path: str,
+    image_path: Screen,
     region: tuple[int, int, int, int],
     target_text: str,
     *,
@@ -151,8 +189,8 @@ def find_text_in_region(
     return target_text in text, text
 
 
-def show_region(image_path: str, region: tuple[int, int, int, int], file_name):
-    img = cv2.imread(image_path)
+def show_region(image_path: Screen, region: tuple[int, int, int, int], file_name):
+    img = load_screen(image_path).copy()
     x, y, w, h = region
     cv2.rectangle(img, (x, y), (x + w, y + h), (0, 255, 0), 2)
     # 若未指定資料夾，預設輸出到 debug/
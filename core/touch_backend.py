@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import os
+import shlex
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional, Protocol
+
+from core.logger import get_logger
+
+_logger = get_logger("touch")
+
+
+class TouchBackend(Protocol):
+    """與 adb_controller.tap / swipe 相同語意的觸控後端介面。"""
+
+    def tap(self, x: int, y: int) -> None:
+        ...
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class MinitouchClient:
+    """以持久 socket 連線到裝置端的 minitouch（或相容代理），每次點擊只是一次 socket 寫入。
+
+    協定（每行一個指令）：
+        d <contact> <x> <y> <pressure>   按下
+        m <contact> <x> <y> <pressure>   移動
+        u <contact>                      放開
+        c                                送出（commit）目前累積的事件
+        w <ms>                           裝置端等待
+    連線時代理先送出標頭：`v <版本>`、`^ <max_contacts> <max_x> <max_y> <max_pressure>`、`$ <pid>`。
+    畫面座標依 `screen_size` 換算到觸控座標；觸控面板為直向（max_x < max_y）而畫面為橫向時，
+    依 `rotation`（90 或 270）轉換座標軸。
+    `agent` 為本程式啟動的裝置端程式，`close()` 時一併終止並移除 `adb forward`。
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 1111,
+        *,
+        screen_size: Optional[tuple[int, int]] = None,
+        pressure: int = 50,
+        hold_ms: int = 0,
+        timeout: float = 2.0,
+        rotation: int = 90,
+        agent: Optional[subprocess.Popen] = None,
+        device_id: Optional[str] = None,
+    ) -> None:
+        self.host, self.port = host, int(port)
+        self.screen_size = screen_size
+        self.rotation = rotation
+        self.agent = agent
+        self.device_id = device_id
+        self.pressure = pressure
+        self.hold_ms = max(0, int(hold_ms))
+        self.timeout = timeout
+        self.max_x = self.max_y = 0
+        self.max_pressure = 0
+        self.version = 0
+        self.pid: Optional[int] = None
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self) -> None:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        reader = sock.makefile("r", encoding="ascii", newline="\n")
+        try:
+            while self.pid is None or not self.max_x:
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError("觸控代理在送出標頭前關閉連線")
+                parts = line.split()
+                if parts[0] == "v":
+                    self.version = int(parts[1])
+                elif parts[0] == "^":
+                    self.max_x, self.max_y, self.max_pressure = int(parts[2]), int(parts[3]), int(parts[4])
+                elif parts[0] == "$":
+                    self.pid = int(parts[1])
+        except Exception:
+            sock.close()
+            raise
+        finally:
+            reader.close()
+        self._sock = sock
+
+    def _scale(self, x: int, y: int) -> tuple[int, int]:
+        if not self.screen_size:
+            return int(x), int(y)
+        w, h = self.screen_size
+        if (self.max_x < self.max_y) != (w < h):
+            # 觸控座標維持面板原生方向：橫向畫面的 x 對應面板的 y
+            if self.rotation == 270:
+                return int(round(y * self.max_x / h)), int(round((w - x) * self.max_y / w))
+            return int(round((h - y) * self.max_x / h)), int(round(x * self.max_y / w))
+        return int(round(x * self.max_x / w)), int(round(y * self.max_y / h))
+
+    def _pressure(self) -> int:
+        return min(self.pressure, self.max_pressure) if self.max_pressure else self.pressure
+
+    def send(self, commands: Iterable[str]) -> None:
+        """一次寫出多行指令；連線中斷時重連一次再送。"""
+        payload = "".join(f"{c}\n" for c in commands).encode("ascii")
+        with self._lock:
+            try:
+                self._sock.sendall(payload)
+            except (OSError, AttributeError):
+                self._disconnect()
+                self.pid = None
+                self._connect()
+                self._sock.sendall(payload)
+
+    def tap_commands(self, x: int, y: int) -> list[str]:
+        tx, ty = self._scale(x, y)
+        cmds = [f"d 0 {tx} {ty} {self._pressure()}", "c"]
+        if self.hold_ms:
+            cmds.append(f"w {self.hold_ms}")
+        return cmds + ["u 0", "c"]
+
+    def swipe_commands(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> list[str]:
+        steps = max(2, int(duration_ms) // 16)
+        step_ms = max(1, int(duration_ms) // steps)
+        p = self._pressure()
+        tx, ty = self._scale(x1, y1)
+        cmds = [f"d 0 {tx} {ty} {p}", "c"]
+        for i in range(1, steps + 1):
+            tx, ty = self._scale(x1 + (x2 - x1) * i / steps, y1 + (y2 - y1) * i / steps)
+            cmds += [f"w {step_ms}", f"m 0 {tx} {ty} {p}", "c"]
+        return cmds + ["u 0", "c"]
+
+    def tap(self, x: int, y: int) -> None:
+        self.send(self.tap_commands(x, y))
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> None:
+        self.send(self.swipe_commands(x1, y1, x2, y2, duration_ms))
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def close(self) -> None:
+        """關閉連線；若裝置端程式由本程式啟動，一併終止並移除埠轉送。"""
+        self._disconnect()
+        if self.agent is not None:
+            stop_minitouch(self.agent, self.device_id, self.port)
+            self.agent = None
+
+
+# ----------------------------------------------------------------------
+# 本機代理（測試與離線驗證用）
+# ----------------------------------------------------------------------
+@dataclass
+class TouchEvent:
+    at: float  # time.perf_counter()
+    kind: str  # d / m / u
+    contact: int
+    x: int = 0
+    y: int = 0
+
+
+class LocalTouchAgent:
+    """在本機以 minitouch 協定接受連線的替身代理；記錄每次 commit 的事件並執行 `w` 等待。"""
+
+    def __init__(self, size: tuple[int, int] = (1920, 1080), *, max_contacts: int = 10, max_pressure: int = 255) -> None:
+        self.size = size
+        self.max_contacts = max_contacts
+        self.max_pressure = max_pressure
+        self.events: list[TouchEvent] = []
+        self.commits = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                w, h = agent.size
+                header = f"v 1\n^ {agent.max_contacts} {w - 1} {h - 1} {agent.max_pressure}\n$ {os.getpid()}\n"
+                self.wfile.write(header.encode("ascii"))
+                pending: list[TouchEvent] = []
+                for raw in self.rfile:
+                    parts = raw.decode("ascii", "replace").split()
+                    if not parts:
+                        continue
+                    cmd, args = parts[0], [int(v) for v in parts[1:]]
+                    if cmd in ("d", "m"):
+                        pending.append(TouchEvent(time.perf_counter(), cmd, args[0], args[1], args[2]))
+                    elif cmd == "u":
+                        pending.append(TouchEvent(time.perf_counter(), cmd, args[0]))
+                    elif cmd == "w":
+                        time.sleep(args[0] / 1000.0)
+                    elif cmd == "c":
+                        with agent._changed:
+                            agent.events.extend(pending)
+                            agent.commits += 1
+                            agent._changed.notify_all()
+                        pending = []
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="touch-agent", daemon=True)
+
+    def start(self) -> "LocalTouchAgent":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "LocalTouchAgent":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @property
+    def taps(self) -> list[tuple[int, int]]:
+        """依序回傳每次按下的座標。"""
+        with self._lock:
+            return [(e.x, e.y) for e in self.events if e.kind == "d"]
+
+    def wait_for(self, commits: int, timeout: float = 2.0) -> bool:
+        """等待累計 commit 數達到 `commits`。"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.commits >= commits, timeout)
+
+
+# ----------------------------------------------------------------------
+# 由環境變數建立
+# ----------------------------------------------------------------------
+def start_minitouch(device_id: Optional[str], port: int, binary: str) -> subprocess.Popen:
+    """在裝置上啟動 minitouch 並把本機埠轉送到其 abstract socket。"""
+    from core import adb_controller
+
+    prefix = adb_controller._prefix(device_id)
+    adb_controller._run(f"adb {prefix}forward tcp:{port} localabstract:minitouch")
+    # 輸出不讀取：導向 DEVNULL，避免管線寫滿後卡住裝置端程式
+    return subprocess.Popen(
+        shlex.split(f"adb {prefix}shell {binary}"), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def stop_minitouch(agent: subprocess.Popen, device_id: Optional[str], port: int) -> None:
+    """終止 start_minitouch 啟動的程式並移除埠轉送（失敗只記錄）。"""
+    from core import adb_controller
+
+    if agent.poll() is None:
+        agent.terminate()
+        try:
+            agent.wait(timeout=2.0)
+        except subprocess.TimeoutExpired:
+            agent.kill()
+    try:
+        adb_controller._run(f"adb {adb_controller._prefix(device_id)}forward --remove tcp:{port}", retries=0)
+    except Exception as e:
+        _logger.warning(f"[TOUCH] 無法移除埠轉送 tcp:{port}: {e}")
+
+
+def build_touch_from_env(
+    device_id: Optional[str], screen_size: Optional[tuple[int, int]] = None, *, port: Optional[int] = None
+) -> Optional[MinitouchClient]:
+    """TOUCH_BACKEND=minitouch 時啟動裝置端代理並連線；失敗時回傳 None（沿用 `input tap`）。
+
+    MINITOUCH_PATH 為裝置上的執行檔（預設 /data/local/tmp/minitouch，需先 push），
+    MINITOUCH_PORT 為本機轉送埠（`port` 未指定時使用；多裝置時由 core.fleet 逐台分配）；
+    MINITOUCH_HOST 設定時直接連線到既有代理，不啟動裝置端程式。
+    """
+    if os.getenv("TOUCH_BACKEND", "input").strip().lower() != "minitouch":
+        return None
+    if port is None:
+        port = int(os.getenv("MINITOUCH_PORT", "1111"))
+    host = os.getenv("MINITOUCH_HOST", "").strip()
+    agent: Optional[subprocess.Popen] = None
+    try:
+        if not host:
+            agent = start_minitouch(device_id, port, os.getenv("MINITOUCH_PATH", "/data/local/tmp/minitouch"))
+            host = "127.0.0.1"
+        deadline = time.monotonic() + 5.0
+        while True:
+            try:
+                client = MinitouchClient(
+                    host,
+                    port,
+                    screen_size=screen_size,
+                    hold_ms=int(os.getenv("MINITOUCH_HOLD_MS", "0")),
+                    rotation=int(os.getenv("MINITOUCH_ROTATION", "90")),
+                    agent=agent,
+                    device_id=device_id,
+                )
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+    except Exception as e:
+        _logger.warning(f"[TOUCH] minitouch 無法使用，改用 input tap: {e}")
+        if agent is not None:
+            stop_minitouch(agent, device_id, port)
+        return None
+    _logger.info(f"[TOUCH] 已連線 minitouch v{client.version}（觸控範圍 {client.max_x}x{client.max_y}）")
+    return client
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from core import clock
+from core.logger import get_logger
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def now_us() -> float:
+    """追蹤用時間戳（微秒，單調時鐘）。"""
+    return time.perf_counter() * 1_000_000.0
+
+
+class TraceWriter:
+    """以 Chrome trace-event（JSON Array）格式寫出 span，可直接拖進 chrome://tracing 或 Perfetto。
+
+    檔案超過 `max_bytes` 時輪替：trace.json → trace.json.1 → …，最多保留 `backups` 份。
+    每個檔案都是完整可讀的 JSON 陣列。
+    """
+
+    def __init__(self, path: str, *, max_bytes: int = 20 * 1024 * 1024, backups: int = 3) -> None:
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.backups = max(0, int(backups))
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._tids: dict[Any, int] = {}
+        self._file = None
+        self._size = 0
+        self._open()
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._size = 2
+        # 先寫入已知執行緒/軌道名稱，輪替後的新檔案也能正確顯示
+        for key, tid in self._tids.items():
+            self._write_event(self._thread_name_event(key, tid))
+
+    def _thread_name_event(self, key: Any, tid: int) -> dict:
+        return {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": str(key)}}
+
+    def _tid(self, track: Optional[str]) -> int:
+        key = track if track is not None else threading.current_thread().name
+        tid = self._tids.get(key)
+        if tid is None:
+            tid = self._tids[key] = len(self._tids) + 1
+            self._write_event(self._thread_name_event(key, tid))
+        return tid
+
+    def _write_event(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False) + ",\n"
+        self._file.write(line)
+        self._size += len(line.encode("utf-8"))
+
+    def _close_file(self) -> None:
+        # 以空物件結尾，讓最後的逗號仍為合法 JSON
+        self._file.write("{}\n]\n")
+        self._file.close()
+
+    def _rotate(self) -> None:
+        self._close_file()
+        if self.backups:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self._open()
+
+    def complete(
+        self,
+        name: str,
+        start_us: float,
+        dur_us: float,
+        *,
+        cat: str = "",
+        track: Optional[str] = None,
+        args: Optional[dict] = None,
+    ) -> None:
+        """寫入一個已完成的 span（ph=X）。`track` 指定顯示軌道，預設為目前執行緒。"""
+        event = {"name": name, "cat": cat or "app", "ph": "X", "ts": round(start_us, 1), "dur": round(dur_us, 1), "pid": self.pid}
+        if args:
+            event["args"] = {k: v if isinstance(v, (int, float, bool)) else str(v) for k, v in args.items()}
+        with self._lock:
+            if self._file is None:
+                return
+            event["tid"] = self._tid(track)
+            self._write_event(event)
+            if self._size >= self.max_bytes:
+                self._rotate()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._close_file()
+                self._file = None
+
+
+_writer: Optional[TraceWriter] = None
+
+
+def enabled() -> bool:
+    return _writer is not None
+
+
+def set_writer(writer: Optional[TraceWriter]) -> None:
+    global _writer
+    if _writer is not None and _writer is not writer:
+        _writer.close()
+    _writer = writer
+
+
+@contextmanager
+def _span(writer: TraceWriter, name: str, cat: str, track: Optional[str], args: dict) -> Iterator[None]:
+    start = now_us()
+    try:
+        yield
+    finally:
+        writer.complete(name, start, now_us() - start, cat=cat, track=track, args=args)
+
+
+def span(name: str, *, cat: str = "", track: Optional[str] = None, **args):
+    """量測區塊並寫成一個 span；未啟用追蹤時為零成本的 nullcontext。"""
+    writer = _writer
+    if writer is None:
+        return nullcontext()
+    return _span(writer, name, cat, track, args)
+
+
+def record(name: str, start_us: float, *, cat: str = "", track: Optional[str] = None, **args) -> None:
+    """以既有的開始時間（`now_us()`）補寫一個到現在為止的 span。"""
+    writer = _writer
+    if writer is not None:
+        writer.complete(name, start_us, now_us() - start_us, cat=cat, track=track, args=args)
+
+
+def traced(name: str, *, cat: str = "") -> Callable[[F], F]:
+    """函式裝飾器：每次呼叫寫一個 span。"""
+
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            writer = _writer
+            if writer is None:
+                return fn(*a, **kw)
+            with _span(writer, name, cat, None, {}):
+                return fn(*a, **kw)
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
+
+
+def sleep(seconds: float, *, name: str = "sleep") -> None:
+    """`clock.sleep`（預設即 time.sleep）並記錄為 span，讓時間軸上看得到等待。"""
+    with span(name, cat="sleep", seconds=round(seconds, 3)):
+        clock.sleep(seconds)
+
+
+def configure_from_env() -> Optional[TraceWriter]:
+    """TRACE_FILE 設定時啟用追蹤（TRACE_MAX_MB 每檔上限，TRACE_BACKUPS 保留份數）。"""
+    path = os.getenv("TRACE_FILE", "").strip()
+    if not path:
+        return None
+    writer = TraceWriter(
+        path,
+        max_bytes=int(float(os.getenv("TRACE_MAX_MB", "20")) * 1024 * 1024),
+        backups=int(os.getenv("TRACE_BACKUPS", "3")),
+    )
+    set_writer(writer)
+    import atexit
+
+    atexit.register(set_writer, None)
+    get_logger("tracing").info(f"[TRACE] 寫入 {path}（可用 chrome://tracing 或 ui.perfetto.dev 開啟）")
+    return writer
@@ -1,10 +1,15 @@
-from core.logger import get_logger
+from core.fleet import build_fleet_from_env, fleet_enabled
+from core.logger import capture_prints, get_logger
+from core.metrics import start_from_env as start_metrics_from_env
+from core.recorder import configure_from_env as configure_recorder_from_env
 from core.runner import build_runner_from_env
+from core.tracing import configure_from_env as configure_tracing_from_env
 from tasks import build_tasks_from_env
 
 
 def main() -> None:
     logger = get_logger("main")
+    capture_prints()
     tasks = build_tasks_from_env()
 
     missing = []
@@ -13,6 +18,15 @@ def main() -> None:
     for msg in missing:
         logger.warning(msg)
 
+    start_metrics_from_env()
+    configure_tracing_from_env()
+    configure_recorder_from_env()
+    if fleet_enabled():
+        # 多裝置：每台裝置各自建立任務實例與 Runner，隨裝置出現/消失啟停
+        fleet = build_fleet_from_env(build_tasks_from_env)
+        logger.info("啟動 ld_magic_dark_path 多裝置常駐程序")
+        fleet.run()
+        return
     runner = build_runner_from_env(tasks)
     logger.info("啟動 ld_magic_dark_path 多任務常駐程序")
     runner.loop()
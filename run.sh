@@ -30,5 +30,16 @@ export CHECK_INTERVAL="1.0"
 export CLICK_COOLDOWN="2.0"
 export TAP_DELAY_SECONDS="0.7"
 
-nohup python3 main.py > run.log 2>&1 &
+# 日誌：由程式以背景執行緒寫入並依大小輪替（run.log → run.log.1 …）
+export LOG_FILE="run.log"
+export LOG_MAX_MB="10"
+export LOG_BACKUPS="5"
+export LOG_CONSOLE="0"
+# export LOG_FORMAT="json"                     # JSON Lines 輸出
+# export LOG_RATE_LIMIT_TAGS="NO MATCH,MATCH,SKIP"
+# export LOG_RATE_LIMIT="5"                    # 每個標籤每 LOG_RATE_WINDOW 秒最多幾筆
+# export LOG_RATE_WINDOW="60"
+
+# stdout/stderr 只剩啟動失敗與未捕捉的例外
+nohup python3 main.py > run.stderr.log 2>&1 &
 echo "ld_magic_dark_path started. See run.log"
@@ -1,15 +1,38 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
-import time
+from concurrent.futures import Future
+from typing import Any, Generator, Optional
 
-from core.adb_controller import tap, capture_screen
-from core.image_recognizer import find_image_on_screen, find_image_in_region
+from core.adb_controller import DeviceUnavailable, tap
+from core.feature_matcher import find_image_by_features
+from core.input_macro import InputMacro
+from core.image_recognizer import DEFAULT_SCALES, find_image_on_screen, find_image_in_region
 from core.text_recognizer import show_region
 from core.region_tools import find_text, find_image
 from core.task import Task, TaskContext, TaskResult
+from core.scheduler import TaskCoroutine, Wait
+from core.config import ConfigError, TaskConfig, get_config_store
+from core import calibration, input_dispatcher, metrics, tracing
 from core.logger import get_logger
+from core.probes import load_probe_sets_from_env
+
+
+def _check_fallback_template(cfg: TaskConfig) -> None:
+    """image_fallback 以多尺度模板比對左右兩格：模板在最小倍率下仍大於區域時永遠不會命中，視為設定錯誤。"""
+    spec = cfg.templates.get("cow_target")
+    if spec is None or not spec.available or spec.method != "template":
+        return
+    th, tw = spec.image.shape[:2]
+    scale = min(spec.scales or DEFAULT_SCALES)
+    need_w, need_h = int(round(tw * scale)), int(round(th * scale))
+    for key in ("left", "right"):
+        _, _, w, h = cfg.regions[key]
+        if need_w > w or need_h > h:
+            raise ConfigError(
+                f"cow_target 模板 {tw}x{th}（最小倍率 {scale:g} 時 {need_w}x{need_h}）大於區域 '{key}' {w}x{h}，"
+                f"image_fallback 的模板比對不會命中；請改用符合區域大小的模板，或設定 method: orb"
+            )
 
 
 def _normalize_text(text: str) -> str:
@@ -48,23 +71,8 @@ STAR_BY_LABEL = {
 class CowLevelTask(Task):
     name = "cow_level"
 
-    def __init__(self) -> None:
+    def __init__(self, config: Optional[TaskConfig] = None) -> None:
         self.logger = get_logger("cow_level")
-        self.left_region = self._parse_region(
-            os.getenv("COW_REGION_LEFT", "560,260,370,60")
-        )
-        self.right_region = self._parse_region(
-            os.getenv("COW_REGION_RIGHT", "985,260,375,60")
-        )
-        self.target_text = os.getenv("COW_TARGET_TEXT", "奶牛關")
-        self.target_image = os.getenv(
-            "COW_TARGET_IMAGE", os.getenv("TARGET_IMAGE", "templates/cow_level.png")
-        )
-        # 每一個辨識可自訂門檻，未提供時回退全域或預設
-        _global_threshold = float(os.getenv("MATCH_THRESHOLD", "0.8"))
-        self.target_threshold = float(
-            os.getenv("COW_TARGET_THRESHOLD", str(_global_threshold))
-        )
         self.total_stars = 0
         # 統計用計數器
         self.cow_hits = 0  # 累計本程式存活期間遇到奶牛關的次數
@@ -72,150 +80,92 @@ class CowLevelTask(Task):
         self.stat_cow_twice = 0  # 星數達標時，遇到奶牛關次數 > 1 的次數
         self.stat_exit_with_final = 0  # 已執行退出流程（有先進入最終關卡）的次數
         self.stat_exit_without_final = 0  # 已執行退出流程（未進入最終關卡）的次數
-        self.cow_hits = 0  # 紀錄遇到奶牛關次數
-        # 點擊之間的顯示用延遲（實際延遲由 adb_controller.tap 依環境變數 TAP_DELAY_SECONDS 執行）
-        try:
-            self.tap_delay_seconds = float(os.getenv("TAP_DELAY_SECONDS", "1.0"))
-        except Exception:
-            self.tap_delay_seconds = 1.0
-
-        # 若未偵測到奶牛關，可先嘗試點任一關卡再離開（可由環境變數啟用/停用）
-        self.enter_before_exit = os.getenv("ENTER_BEFORE_EXIT", "1").strip() not in (
-            "0",
-            "false",
-            "False",
-            "no",
-            "NO",
-        )
-        self.any_level_image = os.getenv("ANY_LEVEL_IMAGE", "").strip()
-        self.any_level_region = self._parse_region_or_none(
-            os.getenv("ANY_LEVEL_REGION", "")
-        )
-        self.any_level_threshold = float(
-            os.getenv("ANY_LEVEL_THRESHOLD", str(_global_threshold))
-        )
-        self.enter_wait_seconds = float(os.getenv("ENTER_WAIT_SECONDS", "1.0"))
+        self._pending_inputs: list[Future] = []  # INPUT_ASYNC 時尚未確認結果的點擊
+
+        # 區域、模板、門檻與時序皆來自啟動時編譯好的設定（環境變數或 YAML）
+        self.apply_config(config or get_config_store().current.task(self.name))
+
+    def apply_config(self, cfg: TaskConfig) -> None:
+        """套用編譯後的設定；啟動時呼叫，設定檔熱重載時由 Runner 在 tick 之間呼叫。"""
+        regions, points, templates = cfg.regions, cfg.points, cfg.templates
+        for required in ("left", "right", "random_text"):
+            if regions.get(required) is None:
+                raise ConfigError(f"cow_level 必須設定區域 '{required}'")
+        if cfg.flags.get("image_fallback", False):
+            _check_fallback_template(cfg)
+        self.cfg = cfg
+        self.templates = templates
+        # 固定位置 UI 的像素探針組（以 tag 命名，例如 pause / exit / confirm），座標依該裝置的解析度校正換算
+        self._raw_probe_sets = load_probe_sets_from_env()
+        self._probe_calibration: Optional[calibration.Calibration] = None
+        self.probe_sets: dict = {}
+
+        self.left_region = regions["left"]
+        self.right_region = regions["right"]
+        self.target_text = cfg.values.get("target_text", "奶牛關")
+        self.target_image = templates["cow_target"].path
+        self.target_threshold = templates["cow_target"].threshold
+        # 點擊之間的顯示用延遲（實際延遲由 adb_controller.tap 依設定執行）
+        self.tap_delay_seconds = cfg.timings.get("tap_delay", 1.0)
+
+        # 若未偵測到奶牛關，可先嘗試點任一關卡再離開
+        self.enter_before_exit = cfg.flags.get("enter_before_exit", True)
+        self.any_level_image = templates["any_level"].path
+        self.any_level_region = regions.get("any_level")
+        self.any_level_threshold = templates["any_level"].threshold
+        self.enter_wait_seconds = cfg.timings.get("enter_wait", 1.0)
 
         # 進行中（In-Progress）偵測（預設沿用 pause 的模板與區域）
-        self.inprog_region = self._parse_region_or_none(
-            os.getenv("IN_PROGRESS_REGION", os.getenv("PAUSE_REGION", "0,0,65,75"))
-        )
-        self.inprog_image = os.getenv(
-            "IN_PROGRESS_IMAGE", os.getenv("PAUSE_IMAGE", "templates/pause.png")
-        )
-        self.inprog_threshold = float(
-            os.getenv("IN_PROGRESS_THRESHOLD", str(_global_threshold))
-        )
-
-        self.pause_region = self._parse_region_or_none(
-            os.getenv("PAUSE_REGION", "0,0,65,75")
-        )
-        self.pause_image = os.getenv("PAUSE_IMAGE", "templates/pause.png")
-        self.pause_threshold = float(
-            os.getenv("PAUSE_THRESHOLD", str(_global_threshold))
-        )
-
-        # 亮度過濾可調整/關閉（全域與各步驟）
-        def _bool_env(name: str, default: str) -> bool:
-            return os.getenv(name, default).strip() not in (
-                "0",
-                "false",
-                "False",
-                "no",
-                "NO",
-            )
-
-        self.value_check_global = _bool_env("BRIGHTNESS_CHECK", "1")
-        self.pause_value_check = _bool_env(
-            "PAUSE_BRIGHTNESS_CHECK", "1" if self.value_check_global else "0"
-        )
-        self.inprog_value_check = _bool_env(
-            "IN_PROGRESS_BRIGHTNESS_CHECK", "1" if self.value_check_global else "0"
-        )
-        self.auto_exit_if_in_progress = _bool_env("AUTO_EXIT_IF_IN_PROGRESS", "0")
-
-        self.exit_region = self._parse_region_or_none(
-            os.getenv("EXIT_REGION", "875,610,170,45")
-        )
-        self.exit_image = os.getenv("EXIT_IMAGE", "templates/exit.png")
-        self.exit_threshold = float(os.getenv("EXIT_THRESHOLD", str(_global_threshold)))
-        self.exit_value_check = _bool_env(
-            "EXIT_BRIGHTNESS_CHECK", "1" if self.value_check_global else "0"
-        )
+        self.inprog_region = regions.get("in_progress")
+        self.inprog_image = templates["in_progress"].path
+        self.inprog_threshold = templates["in_progress"].threshold
+        self.inprog_value_check = templates["in_progress"].value_check
+        self.inprog_value_mean_min = templates["in_progress"].value_mean_min
+        self.inprog_value_mean_max = templates["in_progress"].value_mean_max
+        self.auto_exit_if_in_progress = cfg.flags.get("auto_exit_if_in_progress", False)
+
+        self.pause_region = regions.get("pause")
+        self.pause_image = templates["pause"].path
+        self.pause_threshold = templates["pause"].threshold
+
+        self.exit_region = regions.get("exit")
+        self.exit_image = templates["exit"].path
+        self.exit_threshold = templates["exit"].threshold
         # 是否嚴格匹配完整『退出戰鬥』字串；預設放寬為包含『退出』即可
-        self.exit_match_strict = os.getenv("EXIT_MATCH_STRICT", "0").strip() not in (
-            "0",
-            "false",
-            "False",
-            "no",
-            "NO",
-        )
+        self.exit_match_strict = cfg.flags.get("exit_match_strict", False)
 
-        self.confirm_region = self._parse_region_or_none(
-            os.getenv("CONFIRM_REGION", "790,700,85,40")
-        )
-        self.confirm_image = os.getenv("CONFIRM_IMAGE", "templates/confirm.png")
-        self.confirm_threshold = float(
-            os.getenv("CONFIRM_THRESHOLD", str(_global_threshold))
-        )
-        self.confirm_value_check = _bool_env(
-            "CONFIRM_BRIGHTNESS_CHECK", "1" if self.value_check_global else "0"
-        )
+        self.confirm_region = regions.get("confirm")
+        self.confirm_image = templates["confirm"].path
+        self.confirm_threshold = templates["confirm"].threshold
 
-        # 戰鬥失敗後的『確定』再點一次（可由環境變數覆寫位置/圖片/門檻）
-        self.fail_confirm_region = self._parse_region_or_none(
-            os.getenv("FAIL_CONFIRM_REGION", "1690,1000,110,50")
-        )
-        self.fail_confirm_image = os.getenv("FAIL_CONFIRM_IMAGE", self.confirm_image)
-        self.fail_confirm_threshold = float(
-            os.getenv("FAIL_CONFIRM_THRESHOLD", str(_global_threshold))
-        )
+        # 戰鬥失敗後的『確定』再點一次
+        self.fail_confirm_region = regions.get("fail_confirm")
+        self.fail_confirm_image = templates["fail_confirm"].path
+        self.fail_confirm_threshold = templates["fail_confirm"].threshold
 
-        def _float_env(name: str, default: float) -> float:
-            try:
-                return float(os.getenv(name, str(default)))
-            except Exception:
-                return default
+        # 最後關卡（點擊用）；也支援以座標方式指定（優先於區域）
+        self.final_stage_region = regions.get("final_stage")
+        self.final_stage_point = points.get("final_stage")
+        self.list_open_point = points["list_open"]
+        self.list_confirm_point = points["list_confirm"]
+        self.blessing_point = points["blessing"]
 
-        self.value_mean_min = _float_env("VALUE_MEAN_MIN", 40.0)
-        self.value_mean_max = _float_env("VALUE_MEAN_MAX", 240.0)
-        self.pause_value_mean_min = _float_env(
-            "PAUSE_VALUE_MEAN_MIN", self.value_mean_min
-        )
-        self.pause_value_mean_max = _float_env(
-            "PAUSE_VALUE_MEAN_MAX", self.value_mean_max
-        )
-        self.inprog_value_mean_min = _float_env(
-            "IN_PROGRESS_VALUE_MEAN_MIN", self.value_mean_min
-        )
-        self.inprog_value_mean_max = _float_env(
-            "IN_PROGRESS_VALUE_MEAN_MAX", self.value_mean_max
-        )
-        self.exit_value_mean_min = _float_env(
-            "EXIT_VALUE_MEAN_MIN", self.value_mean_min
-        )
-        self.exit_value_mean_max = _float_env(
-            "EXIT_VALUE_MEAN_MAX", self.value_mean_max
-        )
-        self.confirm_value_mean_min = _float_env(
-            "CONFIRM_VALUE_MEAN_MIN", self.value_mean_min
-        )
-        self.confirm_value_mean_max = _float_env(
-            "CONFIRM_VALUE_MEAN_MAX", self.value_mean_max
-        )
+        self.random_text_region = regions["random_text"]
 
-        # 最後關卡（點擊用）可由環境變數覆寫
-        self.final_stage_region = self._parse_region_or_none(
-            os.getenv("FINAL_STAGE_REGION", "780,400,370,270")
-        )
-        # 也支援以座標方式指定（優先於區域），預設為 950,500
-        self.final_stage_point = self._parse_point_or_none(
-            os.getenv("FINAL_STAGE_POINT", "950,500")
-        )
+        # 當輪策略（可用 tools/cow_sim.py 模擬比較）：星數達標點最終關，奶牛關次數不足則退出
+        self.star_cutoff = int(cfg.values.get("star_cutoff", "10"))
+        self.min_cow_hits = int(cfg.values.get("min_cow_hits", "2"))
+        self.prefer_random = cfg.flags.get("prefer_random", True)
+        # OCR 未辨識到奶牛關時，再以 cow_target 模板（或特徵點）比對左右兩格
+        self.image_fallback = cfg.flags.get("image_fallback", False)
+        # 比對時輸出標註截圖與熱度圖到 debug/（每次比對都寫檔，只在調校模板時開啟）
+        self.match_debug = cfg.flags.get("match_debug", False)
 
-        self.random_text_region = self._parse_region(
-            os.getenv("RANDOM_TEXT_REGION", "1750,90,160,50")
-        )
+        # 只在這些場景開始新的一輪（進行中的協程不受限制）；None 表示任何畫面都執行
+        self.scenes = {n.strip() for n in cfg.values.get("scenes", "").split(",") if n.strip()} or None
+
+        # 記憶體畫面模式下輸出區域預覽需完整解碼整張畫面，預設略過
+        self.preview_in_memory = cfg.flags.get("region_preview_in_memory", False)
 
     def _stat_line(self) -> str:
         # 增加 cow_count 顯示，讓日誌可直接看見累計遇到奶牛關次數
@@ -227,30 +177,6 @@ class CowLevelTask(Task):
             f"exit_without_final={self.stat_exit_without_final}"
         )
 
-    def _parse_region(self, s: str) -> tuple[int, int, int, int]:
-        parts = [int(p) for p in s.split(",")]
-        if len(parts) != 4:
-            raise ValueError("Region must be 'x,y,w,h'")
-        return parts[0], parts[1], parts[2], parts[3]
-
-    def _parse_region_or_none(self, s: str) -> Optional[tuple[int, int, int, int]]:
-        try:
-            x, y, w, h = self._parse_region(s)
-            if w <= 0 or h <= 0:
-                return None
-            return x, y, w, h
-        except Exception:
-            return None
-
-    def _parse_point_or_none(self, s: str) -> Optional[tuple[int, int]]:
-        try:
-            parts = [int(p) for p in s.split(",")]
-            if len(parts) != 2:
-                return None
-            return parts[0], parts[1]
-        except Exception:
-            return None
-
     def _label_from_text(self, text: str) -> Optional[str]:
         for label in STAR_BY_LABEL.keys():
             if label in text:
@@ -260,6 +186,13 @@ class CowLevelTask(Task):
     def _add_stars(self, label: str) -> None:
         self.total_stars += STAR_BY_LABEL.get(label, 0)
 
+    def _show_region(
+        self, ctx: TaskContext, region: tuple[int, int, int, int], file_name: str
+    ) -> None:
+        if ctx.frame is not None and not self.preview_in_memory:
+            return
+        show_region(ctx.screen, region, file_name)
+
     def _copy_debug_images(self, tag: str) -> None:
         # 已改為在 debug/ 下以 tag 命名，不再需要額外複製
         return
@@ -271,9 +204,52 @@ class CowLevelTask(Task):
             return False, f"{tag}: 未設定區域"
         x, y, w, h = region
         cx, cy = x + w // 2, y + h // 2
-        tap(cx, cy, device_id=ctx.device_id)
+        # 不在 tap 內阻塞；INPUT_ASYNC=1 時連 adb 往返也交給輸入執行緒，結果在 _after_tap 等待結束後確認
+        self._submit_tap(ctx, cx, cy)
         return True, f"點擊{tag}中心({cx},{cy})"
 
+    def _submit_tap(self, ctx: TaskContext, x: int, y: int) -> None:
+        """同步模式下失敗直接拋出；非同步模式下保留 Future 待確認。"""
+        future = input_dispatcher.tap(x, y, device_id=ctx.device_id)
+        if not future.done():
+            self._pending_inputs.append(future)
+
+    def _inputs_ok(self) -> bool:
+        """確認已完成的非同步點擊；有失敗時回傳 False，裝置斷路器開啟時往上拋。"""
+        ok, pending = True, []
+        for future in self._pending_inputs:
+            if not future.done():
+                pending.append(future)
+                continue
+            error = future.exception()
+            if isinstance(error, DeviceUnavailable):
+                self._pending_inputs = []
+                raise error
+            if error is not None:
+                self.logger.warning(f"[ACTION] 點擊失敗: {error}")
+                metrics.inc("cow_level_events_total", event="tap_failed")
+                ok = False
+        self._pending_inputs = pending
+        return ok
+
+    def _refresh(self, ctx: TaskContext) -> bool:
+        """重新擷取畫面；失敗時記錄並沿用舊畫面。裝置斷路器開啟時往上拋，由 Runner 停放裝置。"""
+        try:
+            ctx.refresh()
+            return True
+        except DeviceUnavailable:
+            raise
+        except Exception as e:
+            self.logger.warning(f"重新擷取畫面失敗，沿用上一張: {e}")
+            metrics.inc("capture_failures_total", task=self.name)
+            return False
+
+    def _after_tap(self, extra: float = 0.0) -> Generator[Wait, Any, bool]:
+        """點擊後的等待：原本 tap 內建的延遲加上 extra 秒，期間 Runner 可執行其他任務；
+        結束後回傳先前送出的點擊是否都成功。"""
+        yield Wait(self.tap_delay_seconds + extra)
+        return self._inputs_ok()
+
     def _judge_and_tap(
         self,
         ctx: TaskContext,
@@ -294,13 +270,13 @@ class CowLevelTask(Task):
 
         # 顯示區域快照以便除錯
         try:
-            show_region(ctx.screenshot_path, region, f"region_{tag}.png")
+            self._show_region(ctx, region, f"region_{tag}.png")
         except Exception:
             pass
 
         # 先做 OCR 判斷
         try:
-            txt = find_text(ctx.screenshot_path, region)
+            txt = find_text(ctx.screen, region)
         except Exception:
             txt = ""
         # 特殊處理：確認區域常見 OCR 誤辨『雁現』→ 視為『確認』
@@ -332,7 +308,7 @@ class CowLevelTask(Task):
         if image_path and os.path.exists(image_path):
             try:
                 pt, sc = find_image(
-                    ctx.screenshot_path, image_path, region, threshold=0.0
+                    ctx.screen, image_path, region, threshold=0.0
                 )
                 score = sc
                 ok_img = sc >= image_threshold and bool(pt)
@@ -352,161 +328,185 @@ class CowLevelTask(Task):
         msgs.append(f"[{tag.upper()}] 動作: {tap_msg}")
         return msgs
 
-    def _simple_exit_sequence(self, ctx: TaskContext) -> list[str]:
-        msgs: list[str] = []
-        ok_p, m_p = self._tap_region_center(ctx, self.pause_region, "pause")
-        msgs.append(f"[EXIT] 動作: {m_p}")
-        time.sleep(self.tap_delay_seconds)
-
-        ok_e, m_e = self._tap_region_center(ctx, self.exit_region, "exit")
-        msgs.append(f"[EXIT] 動作: {m_e}")
-        time.sleep(self.tap_delay_seconds)
-
-        ok_c, m_c = self._tap_region_center(ctx, self.confirm_region, "confirm")
-        msgs.append(f"[EXIT] 動作: {m_c}")
-        time.sleep(self.tap_delay_seconds)
+    def _simple_exit_sequence(self, ctx: TaskContext) -> TaskCoroutine:
+        with tracing.span("cow_level.exit_sequence", track=self.name):
+            # 暫停 → 離開 → 確認 → 失敗確認，四次點擊編成一個巨集，只需一次 adb 往返
+            macro = InputMacro()
+            msgs: list[str] = []
+            steps = (
+                (self.pause_region, "pause", self.tap_delay_seconds),
+                (self.exit_region, "exit", self.tap_delay_seconds),
+                (self.confirm_region, "confirm", self.tap_delay_seconds),
+                (self.fail_confirm_region, "fail_confirm", 0.0),
+            )
+            prev_extra = 0.0
+            for region, tag, extra in steps:
+                if region is None:
+                    msgs.append(f"[EXIT] 動作: {tag}: 未設定區域")
+                    continue
+                x, y, w, h = region
+                cx, cy = x + w // 2, y + h // 2
+                if tag == "pause" and self._can_locate(ctx, tag):
+                    # 只有暫停鍵在巨集開始前就在畫面上：以探針組/模板確認並取得實際位置，找不到時仍點區域中心
+                    pt, found = self._locate(ctx, tag, region)
+                    metrics.inc("cow_level_events_total", event="pause_located" if pt else "pause_not_located")
+                    if pt is not None:
+                        cx, cy = pt
+                    self.logger.info(f"[EXIT] 判斷: {found}")
+                    msgs.append(f"[EXIT] 判斷: {found}")
+                # 每次點擊後的等待（tap_delay + 該步的額外等待）放在下一次點擊之前
+                if len(macro):
+                    macro.sleep(self.tap_delay_seconds + prev_extra)
+                macro.tap(cx, cy)
+                prev_extra = extra
+                msgs.append(f"[EXIT] 動作: 點擊{tag}中心({cx},{cy})")
+            yield from self._run_macro(ctx, macro, self.tap_delay_seconds + prev_extra)
+            return msgs
 
-        ok_fc, m_fc = self._tap_region_center(
-            ctx, self.fail_confirm_region, "fail_confirm"
-        )
-        msgs.append(f"[EXIT] 動作: {m_fc}")
-        return msgs
+    def _run_macro(self, ctx: TaskContext, macro: InputMacro, tail: float) -> TaskCoroutine:
+        """送出巨集後交回 Runner 等待裝置端完成，再多等 tail 秒。"""
+        if not len(macro):
+            return
+        handle = macro.start(ctx.device_id)
+        yield Wait(handle.remaining() + tail)
+        try:
+            handle.wait(timeout=10.0)
+        except DeviceUnavailable:
+            raise
+        except Exception as e:
+            self.logger.warning(f"[ACTION] 巨集執行失敗: {e}")
+            metrics.inc("cow_level_events_total", event="macro_failed")
 
-    def _find_and_tap(
+    def _locate(
         self,
         ctx: TaskContext,
-        image: str,
-        region: Optional[tuple[int, int, int, int]],
         tag: str,
-        threshold: float,
-    ) -> tuple[bool, str]:
-        if not image or not os.path.exists(image):
-            return False, f"未提供或找不到圖片：{tag}（{image}）"
+        region: Optional[tuple[int, int, int, int]],
+    ) -> tuple[Optional[tuple[int, int]], str]:
+        """以 tag 對應的探針組或模板設定（門檻、光度過濾、預載影像）找出點擊位置；找不到時回傳 (None, 原因)。"""
+        probe_set = self._probes(ctx).get(tag)
+        if probe_set is not None:
+            # 先以像素探針判斷固定位置的 UI；未通過就不必做多尺度模板比對
+            if not probe_set.check(ctx.screen):
+                return None, f"未匹配到{tag}（探針組未通過）"
+            if region is not None:
+                x, y, w, h = region
+                return (x + w // 2, y + h // 2), f"{tag}探針組命中"
+
+        spec = self.templates[tag]
+        if not spec.available:
+            return None, f"未提供或找不到圖片：{tag}（{spec.path}）"
 
         if region is not None:
             try:
-                show_region(ctx.screenshot_path, region, f"region_{tag}.png")
+                self._show_region(ctx, region, f"region_{tag}.png")
             except Exception:
                 pass
 
-        if region is None:
-            pt, score = find_image_on_screen(
-                ctx.screenshot_path,
-                image,
-                threshold=threshold,
-                debug=True,
-                debug_tag=tag,
-                value_check=(
-                    self.pause_value_check
-                    if tag == "pause"
-                    else (
-                        self.exit_value_check
-                        if tag == "exit"
-                        else self.confirm_value_check
-                    )
-                ),
-                value_mean_min=(
-                    self.pause_value_mean_min
-                    if tag == "pause"
-                    else (
-                        self.exit_value_mean_min
-                        if tag == "exit"
-                        else self.confirm_value_mean_min
-                    )
-                ),
-                value_mean_max=(
-                    self.pause_value_mean_max
-                    if tag == "pause"
-                    else (
-                        self.exit_value_mean_max
-                        if tag == "exit"
-                        else self.confirm_value_mean_max
-                    )
-                ),
+        match_kwargs = dict(
+            threshold=spec.threshold,
+            debug=self.match_debug,
+            debug_tag=tag,
+            value_check=spec.value_check,
+            value_mean_min=spec.value_mean_min,
+            value_mean_max=spec.value_mean_max,
+            scales=spec.scales,
+        )
+        if spec.method != "template":
+            # 特徵點比對：一次估計位置與縮放，適合較大且紋理豐富的模板
+            pt, score = find_image_by_features(
+                ctx.screen, spec.source, region, method=spec.method, threshold=spec.threshold, debug=self.match_debug, debug_tag=tag
             )
+        elif region is None:
+            # 全螢幕搜尋最耗時，各尺度交給執行緒池平行比對（單核心時自動逐一計算）
+            pt, score = find_image_on_screen(ctx.screen, spec.source, parallel=True, anchor=tag, **match_kwargs)
+        elif tag == "cow_target":
+            # 奶牛關圖示出現在左右任一格，位置不固定：不做定點驗證
+            pt, score = find_image_in_region(ctx.screen, spec.source, region, **match_kwargs)
         else:
-            pt, score = find_image_in_region(
-                ctx.screenshot_path,
-                image,
-                region,
-                threshold=threshold,
-                debug=True,
-                debug_tag=tag,
-                value_check=(
-                    self.pause_value_check
-                    if tag == "pause"
-                    else (
-                        self.exit_value_check
-                        if tag == "exit"
-                        else self.confirm_value_check
-                    )
-                ),
-                value_mean_min=(
-                    self.pause_value_mean_min
-                    if tag == "pause"
-                    else (
-                        self.exit_value_mean_min
-                        if tag == "exit"
-                        else self.confirm_value_mean_min
-                    )
-                ),
-                value_mean_max=(
-                    self.pause_value_mean_max
-                    if tag == "pause"
-                    else (
-                        self.exit_value_mean_max
-                        if tag == "exit"
-                        else self.confirm_value_mean_max
-                    )
-                ),
-            )
+            # 暫停、離開、確認鍵位置固定：先定點驗證上次命中處，未命中才做多尺度比對
+            pt, score = find_image_in_region(ctx.screen, spec.source, region, anchor=tag, **match_kwargs)
 
         self._copy_debug_images(tag)
 
         if pt:
-            tap(pt[0], pt[1], device_id=ctx.device_id)
-            return True, f"點擊{tag}({pt[0]},{pt[1]}) score={score:.2f}"
-        return False, (
-            f"未匹配到{tag}，信心度={score:.2f} (門檻={threshold:.2f})，"
+            return pt, f"{tag} score={score:.2f}"
+        return None, (
+            f"未匹配到{tag}，信心度={score:.2f} (門檻={spec.threshold:.2f})，"
             f"請調整 {tag.upper()}_IMAGE 與 {tag.upper()}_REGION（如有）"
         )
 
+    def _detect_cow(
+        self, ctx: TaskContext, text_left: str, text_right: str
+    ) -> tuple[Optional[tuple[int, int, int, int]], str]:
+        """判斷左右哪一格是奶牛關（左優先）；OCR 未辨識到且啟用 image_fallback 時改以 cow_target 模板比對。"""
+        if self.target_text in text_left:
+            return self.left_region, "cow_left"
+        if self.target_text in text_right:
+            return self.right_region, "cow_right"
+        if self.image_fallback and self._can_locate(ctx, "cow_target"):
+            for region, tag in ((self.left_region, "cow_left"), (self.right_region, "cow_right")):
+                pt, msg = self._locate(ctx, "cow_target", region)
+                self.logger.info(f"[MATCH] {tag}: {msg}")
+                if pt is not None:
+                    metrics.inc("cow_level_events_total", event="cow_image_fallback")
+                    return region, tag
+        return None, ""
+
+    def _probes(self, ctx: TaskContext) -> dict:
+        """換算到 ctx 裝置座標的探針組；校正變更（或首次使用）時才重新換算。"""
+        cal = calibration.active(ctx.device_id)
+        if cal is not self._probe_calibration:
+            self._probe_calibration = cal
+            self.probe_sets = cal.probe_sets(self._raw_probe_sets)
+        return self.probe_sets
+
+    def _can_locate(self, ctx: TaskContext, tag: str) -> bool:
+        """tag 是否設定了探針組或可用的模板（否則只能點擊區域中心）。"""
+        spec = self.templates.get(tag)
+        return tag in self._probes(ctx) or (spec is not None and spec.available)
+
+    def _find_and_tap(
+        self,
+        ctx: TaskContext,
+        tag: str,
+        region: Optional[tuple[int, int, int, int]],
+    ) -> tuple[bool, str]:
+        """以 `_locate` 找到 tag 後點擊。"""
+        pt, msg = self._locate(ctx, tag, region)
+        if pt is None:
+            return False, msg
+        tap(pt[0], pt[1], device_id=ctx.device_id)
+        return True, f"點擊{tag}({pt[0]},{pt[1]}) {msg}"
+
     def _perform_exit_sequence(self, ctx: TaskContext) -> str:
         msgs: list[str] = []
 
-        ok, m = self._find_and_tap(
-            ctx, self.pause_image, self.pause_region, "pause", self.pause_threshold
-        )
+        ok, m = self._find_and_tap(ctx, "pause", self.pause_region)
         msgs.append(m)
         if ok:
             msgs.append(f"等待{self.tap_delay_seconds:.1f}s")
             # 暫停後重新擷取畫面，後續 OCR/比對才會是最新狀態
-            try:
-                capture_screen(ctx.screenshot_path, device_id=ctx.device_id)
-            except Exception:
-                pass
+            self._refresh(ctx)
 
         # 透過文字判斷並點擊「退出戰鬥」
         if self.exit_region is not None:
             # 在成功點到暫停並重新擷取畫面後，才輸出區域預覽與 OCR
             if ok:
                 try:
-                    show_region(
-                        ctx.screenshot_path, self.exit_region, "region_exit_text.png"
+                    self._show_region(
+                        ctx, self.exit_region, "region_exit_text.png"
                     )
                 except Exception:
                     pass
-            text_exit = find_text(ctx.screenshot_path, self.exit_region)
+            text_exit = find_text(ctx.screen, self.exit_region)
             if self._is_exit_text(text_exit):
                 x, y, w, h = self.exit_region
                 cx, cy = x + w // 2, y + h // 2
                 tap(cx, cy, device_id=ctx.device_id)
                 ok2, m2 = True, f"點擊exit_text({cx},{cy}) 辨識='{text_exit or '∅'}'"
                 # 點擊退出後再擷取一次畫面，供 confirm 使用
-                try:
-                    capture_screen(ctx.screenshot_path, device_id=ctx.device_id)
-                except Exception:
-                    pass
+                self._refresh(ctx)
             else:
                 ok2, m2 = (
                     False,
@@ -514,14 +514,9 @@ class CowLevelTask(Task):
                 )
         else:
             # 無區域時回退圖片比對以維持相容性
-            ok2, m2 = self._find_and_tap(
-                ctx, self.exit_image, None, "exit", self.exit_threshold
-            )
+            ok2, m2 = self._find_and_tap(ctx, "exit", None)
             if ok2:
-                try:
-                    capture_screen(ctx.screenshot_path, device_id=ctx.device_id)
-                except Exception:
-                    pass
+                self._refresh(ctx)
         msgs.append(m2)
         if ok2:
             msgs.append(f"等待{self.tap_delay_seconds:.1f}s")
@@ -529,13 +524,7 @@ class CowLevelTask(Task):
         # 僅在成功點到退出後才嘗試 confirm（避免誤點）
         if ok2:
             # TODO: 可改成 OCR 判斷「確定」字樣
-            ok3, m3 = self._find_and_tap(
-                ctx,
-                self.confirm_image,
-                self.confirm_region,
-                "confirm",
-                self.confirm_threshold,
-            )
+            ok3, m3 = self._find_and_tap(ctx, "confirm", self.confirm_region)
             msgs.append(m3)
         else:
             msgs.append("略過 confirm：尚未成功點擊退出")
@@ -553,114 +542,113 @@ class CowLevelTask(Task):
         # 簡化流程：不再依此決策是否執行，保留以備未來需要
         return False, "跳過進行中檢查（已簡化流程）", 0.0
 
-    def tick(self, ctx: TaskContext) -> TaskResult:
-        try:
-            # 外層『當輪』迴圈：每一輪重置星數與當輪奶牛關數量
-            while True:
-                round_stars = 0
-                round_cow_hits = 0
-                random_text = ""
-
-                # 回到清單（與現有起始流程相同）
-                time.sleep(2.0)
-                for i in range(3):
-                    tap(1570, 850, device_id=ctx.device_id)
-                    time.sleep(0.1)
-                tap(1670, 1015, device_id=ctx.device_id)
-                time.sleep(2.0)
-                # 重新擷取畫面供 OCR
-                try:
-                    capture_screen(ctx.screenshot_path, device_id=ctx.device_id)
-                except Exception:
-                    pass
-
-                # 顯示左右區域框與 OCR
-                try:
-                    show_region(
-                        ctx.screenshot_path, self.left_region, "region_level_left.png"
-                    )
-                    show_region(
-                        ctx.screenshot_path, self.right_region, "region_level_right.png"
-                    )
-                except Exception:
-                    pass
+    def tick(self, ctx: TaskContext) -> TaskCoroutine:
+        """一輪流程（協程）：每次 yield Wait 都會交回 Runner，恢復時 ctx 已是最新畫面。"""
+        with tracing.span("cow_level.round", track=self.name):
+            return (yield from self._round(ctx))
 
-                left_raw = find_text(ctx.screenshot_path, self.left_region)
-                right_raw = find_text(ctx.screenshot_path, self.right_region)
-                text_left = _normalize_text(left_raw)
-                text_right = _normalize_text(right_raw)
-                self.logger.info(f"左區域文字='{text_left}'")
-                self.logger.info(f"右區域文字='{text_right}'")
-
-                chosen_tag = ""
-                # 若一開始不是奶牛關，維持既有行為：選關→退出→回傳
-                if (self.target_text not in text_left) and (
-                    self.target_text not in text_right
-                ):
-                    chosen = None
-                    if "隨機副本" in text_left:
-                        chosen = self.left_region
-                        chosen_tag = "random_left"
-                    elif "隨機副本" in text_right:
-                        chosen = self.right_region
-                        chosen_tag = "random_right"
-                    else:
-                        chosen = self.right_region
-                        chosen_tag = "right"
-
-                    ok_enter, _ = self._tap_region_center(ctx, chosen, chosen_tag)
-
-                    time.sleep(self.tap_delay_seconds)
-
-                    if chosen_tag == "random_left":
-                        # 如果是隨機副本的話，檢查右上角是什麼，並且將 text_left 更新
-                        random_text = self._get_random_level_text(ctx)
-                    elif chosen_tag == "random_right":
-                        # 如果是隨機副本的話，檢查右上角是什麼，並且將 text_right 更新
-                        random_text = self._get_random_level_text(ctx)
-
-                    if ok_enter and random_text != "奶牛關":
-                        self.stat_exit_without_final += 1
-                        _ = self._simple_exit_sequence(ctx)
-                    return TaskResult(acted=ok_enter, message=self._stat_line())
+    def _round(self, ctx: TaskContext) -> TaskCoroutine:
+        try:
+            # 每一輪重置星數與當輪奶牛關數量
+            round_stars = 0
+            round_cow_hits = 0
+            random_text = ""
+
+            # 回到清單（與現有起始流程相同）
+            yield Wait(2.0)
+            macro = InputMacro()
+            for i in range(3):
+                macro.tap(*self.list_open_point).sleep(self.tap_delay_seconds + 0.1)
+            macro.tap(*self.list_confirm_point)
+            yield from self._run_macro(ctx, macro, self.tap_delay_seconds + 2.0)
+
+            # 顯示左右區域框與 OCR
+            try:
+                self._show_region(
+                    ctx, self.left_region, "region_level_left.png"
+                )
+                self._show_region(
+                    ctx, self.right_region, "region_level_right.png"
+                )
+            except Exception:
+                pass
 
-                # 判定為奶牛關後，啟動『當輪迴圈』
+            left_raw = find_text(ctx.screen, self.left_region)
+            right_raw = find_text(ctx.screen, self.right_region)
+            text_left = _normalize_text(left_raw)
+            text_right = _normalize_text(right_raw)
+            self.logger.info(f"左區域文字='{text_left}'")
+            self.logger.info(f"右區域文字='{text_right}'")
+
+            chosen_tag = ""
+            # 若一開始不是奶牛關，維持既有行為：選關→退出→回傳
+            if self._detect_cow(ctx, text_left, text_right)[0] is None:
+                chosen = None
+                if self.prefer_random and "隨機副本" in text_left:
+                    chosen = self.left_region
+                    chosen_tag = "random_left"
+                elif self.prefer_random and "隨機副本" in text_right:
+                    chosen = self.right_region
+                    chosen_tag = "random_right"
+                else:
+                    chosen = self.right_region
+                    chosen_tag = "right"
+
+                ok_enter, _ = self._tap_region_center(ctx, chosen, chosen_tag)
+
+                ok_enter = (yield from self._after_tap(self.tap_delay_seconds)) and ok_enter
+
+                if chosen_tag == "random_left":
+                    # 如果是隨機副本的話，檢查右上角是什麼，並且將 text_left 更新
+                    random_text = self._get_random_level_text(ctx)
+                elif chosen_tag == "random_right":
+                    # 如果是隨機副本的話，檢查右上角是什麼，並且將 text_right 更新
+                    random_text = self._get_random_level_text(ctx)
+
+                if ok_enter and random_text != "奶牛關":
+                    self.stat_exit_without_final += 1
+                    metrics.inc("cow_level_events_total", event="exit_without_final")
+                    _ = yield from self._simple_exit_sequence(ctx)
+                return TaskResult(acted=ok_enter, message=self._stat_line())
+
+            # 判定為奶牛關後，啟動『當輪迴圈』
+            with tracing.span("cow_level.cow_loop", track=self.name):
                 while True:
                     self.logger.info(f"進入『奶牛關迴圈』")
-                    time.sleep(40)
+                    yield Wait(40)
 
                     # 星數達標則點最終關卡，據『當輪奶牛關數量』決策
                     self.logger.info(f"星數={round_stars}")
-                    if round_stars >= 10:
+                    if round_stars >= self.star_cutoff:
+                        final_started = tracing.now_us()
                         # 點最終關
                         final_region = self.final_stage_region or self.right_region
                         _msgf = self._tap_region_center(
                             ctx, final_region, "final_stage"
                         )
                         self.logger.info(f"[ACTION] 動作: {_msgf}")
+                        yield from self._after_tap()
 
-                        if round_cow_hits <= 1:
-                            self.logger.info(f"[EXIT] 動作: 只遇到一次奶牛關，重新開始")
-                            # 只遇到一次奶牛關：退出並重新來過（從 421 流程再跑一輪）
+                        if round_cow_hits < self.min_cow_hits:
+                            self.logger.info(f"[EXIT] 動作: 奶牛關次數不足（{round_cow_hits}），重新開始")
+                            # 奶牛關次數不足（預設為只遇到一次）：退出並結束本輪，下一個 tick 重新開始
                             self.stat_exit_with_final += 1
-                            _ = self._simple_exit_sequence(ctx)
-                            # 跳出當輪，回到外層重新開始一輪（重置 round_*）
-                            break
+                            metrics.inc("cow_level_events_total", event="exit_with_final")
+                            _ = yield from self._simple_exit_sequence(ctx)
                         else:
                             # 如果達兩次以上則回到等待1分鐘
-                            time.sleep(60)
+                            yield Wait(60)
 
                             # 點擊確定離開
                             m_fc = self._tap_region_center(
                                 ctx, self.fail_confirm_region, "success_confirm"
                             )
                             self.logger.info(f"[EXIT] 動作: {m_fc}")
+                            yield from self._after_tap()
                             self.stat_cow_twice += 1
-                            try:
-                                self.logger.info(self._stat_line())
-                            except Exception:
-                                pass
-                            break
+                            metrics.inc("cow_level_events_total", event="cow_twice")
+                        tracing.record("cow_level.final_stage", final_started, track=self.name, cows=round_cow_hits)
+                        return TaskResult(acted=True, message=self._stat_line())
 
                     self.logger.info(f"開始判斷賜福關")
                     # 如果上一輪點擊的是賜福關，代表有能力要點
@@ -670,24 +658,18 @@ class CowLevelTask(Task):
                         or (text_right == "賜福關" and chosen_tag == "random_right")
                     ):
                         self.logger.info(f"賜福關，點擊能力")
-                        tap(950, 500, device_id=ctx.device_id)
-                        time.sleep(1.0)
-
-                    self.logger.info(f"奶牛關迴圈 - 重新擷取畫面供 OCR")
-                    try:
-                        capture_screen(ctx.screenshot_path, device_id=ctx.device_id)
-                    except Exception:
-                        pass
+                        self._submit_tap(ctx, *self.blessing_point)
+                        yield from self._after_tap(1.0)
 
                     self.logger.info(f"奶牛關迴圈 - 顯示左右區域框與 OCR")
                     try:
-                        show_region(
-                            ctx.screenshot_path,
+                        self._show_region(
+                            ctx,
                             self.left_region,
                             "region_level_left.png",
                         )
-                        show_region(
-                            ctx.screenshot_path,
+                        self._show_region(
+                            ctx,
                             self.right_region,
                             "region_level_right.png",
                         )
@@ -695,59 +677,38 @@ class CowLevelTask(Task):
                         pass
 
                     self.logger.info(f"開始判斷奶牛關")
-                    left_raw = find_text(ctx.screenshot_path, self.left_region)
-                    right_raw = find_text(ctx.screenshot_path, self.right_region)
+                    left_raw = find_text(ctx.screen, self.left_region)
+                    right_raw = find_text(ctx.screen, self.right_region)
                     text_left = _normalize_text(left_raw)
                     text_right = _normalize_text(right_raw)
                     self.logger.info(f"奶牛關迴圈 - 左區域文字='{text_left}'")
                     self.logger.info(f"奶牛關迴圈 - 右區域文字='{text_right}'")
 
                     # 有奶牛關就點奶牛關（左優先、右其次）
-                    if self.target_text in text_left:
-                        ok, msg = self._tap_region_center(
-                            ctx, self.left_region, "cow_left"
-                        )
-                        if ok:
-                            round_stars += STAR_BY_LABEL.get("奶牛關", 4)
-                            round_cow_hits += 1
-                            self.cow_hits += 1
-                            try:
-                                self.logger.info(f"[ACTION] {msg}")
-                                self.logger.info(
-                                    f"[ROUND] stars={round_stars} cows={round_cow_hits}"
-                                )
-                            except Exception as e:
-                                self.logger.error(f"[ERROR] {e}")
-                                pass
-                        # 回到當輪迴圈頂端，持續偵測
-                        continue
-                    if self.target_text in text_right:
-                        ok, msg = self._tap_region_center(
-                            ctx, self.right_region, "cow_right"
-                        )
+                    cow_region, cow_tag = self._detect_cow(ctx, text_left, text_right)
+                    if cow_region is not None:
+                        ok, msg = self._tap_region_center(ctx, cow_region, cow_tag)
+                        ok = (yield from self._after_tap()) and ok
                         if ok:
                             round_stars += STAR_BY_LABEL.get("奶牛關", 4)
                             round_cow_hits += 1
                             self.cow_hits += 1
-                            try:
-                                self.logger.info(f"[ACTION] {msg}")
-                                self.logger.info(
-                                    f"[ROUND] stars={round_stars} cows={round_cow_hits}"
-                                )
-                            except Exception as e:
-                                self.logger.error(f"[ERROR] {e}")
-                                pass
+                            metrics.inc("cow_level_events_total", event="cow_hit")
+                            self.logger.info(f"[ACTION] {msg}")
+                            self.logger.info(
+                                f"[ROUND] stars={round_stars} cows={round_cow_hits}"
+                            )
                         # 回到當輪迴圈頂端，持續偵測
                         continue
 
                     # 沒有奶牛關
                     chosen = None
                     chosen_tag = ""
-                    if "隨機副本" in text_left:
+                    if self.prefer_random and "隨機副本" in text_left:
                         chosen = self.left_region
                         chosen_tag = "random_left"
                         round_stars += STAR_BY_LABEL.get("隨機副本", 4)
-                    elif "隨機副本" in text_right:
+                    elif self.prefer_random and "隨機副本" in text_right:
                         chosen = self.right_region
                         chosen_tag = "random_right"
                         round_stars += STAR_BY_LABEL.get("隨機副本", 4)
@@ -755,16 +716,13 @@ class CowLevelTask(Task):
                         chosen = self.right_region
                         chosen_tag = "right"
                         round_stars += STAR_BY_LABEL.get(text_right, 4)
-                    try:
-                        self.logger.info(
-                            f"[ROUND] stars={round_stars} cows={round_cow_hits}"
-                        )
-                    except Exception:
-                        pass
+                    self.logger.info(
+                        f"[ROUND] stars={round_stars} cows={round_cow_hits}"
+                    )
 
                     ok_enter, _ = self._tap_region_center(ctx, chosen, chosen_tag)
 
-                    time.sleep(self.tap_delay_seconds)
+                    yield from self._after_tap(self.tap_delay_seconds)
 
                     if chosen_tag == "random_left":
                         # 如果是隨機副本的話，檢查右上角是什麼，並且將 text_left 更新
@@ -776,21 +734,18 @@ class CowLevelTask(Task):
                     if text_left == "奶牛關" or text_right == "奶牛關":
                         round_cow_hits += 1
                         self.cow_hits += 1
+                        metrics.inc("cow_level_events_total", event="cow_hit")
 
-                # 當輪 break（只遇一次，已退出）→ 回到外層 while True 重新來過
-                continue
-
+        except DeviceUnavailable:
+            # 斷路器開啟：交給 Runner 停放裝置，不當成一般錯誤吞掉
+            raise
         except Exception as e:
             self.logger.error(f"[ERROR] {e}", exc_info=True)
             # 只輸出統計，不輸出錯誤堆疊
             return TaskResult(acted=False, message=self._stat_line())
 
     def _get_random_level_text(self, ctx: TaskContext) -> str:
-        # 進入此流程時先重新擷取畫面，確保讀到最新畫面內容
-        try:
-            capture_screen(ctx.screenshot_path, device_id=ctx.device_id)
-        except Exception:
-            pass
-        result = find_text(ctx.screenshot_path, self.random_text_region)
+        # 呼叫前已 yield Wait，恢復時 Runner 已提供最新畫面，不需再擷取
+        result = find_text(ctx.screen, self.random_text_region)
         self.logger.info(f"隨機副本的關卡為：'{result}'")
         return result
@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import pytest
+
+from core import anchors, image_recognizer, metrics
+from core.anchors import AnchorCache
+from core.fake_device import load_session
+from core.image_recognizer import find_image_in_region
+from core.task import TaskContext
+
+SESSION = "bench/sessions/cow_level_basic.yaml"
+
+
+@pytest.fixture
+def cache():
+    previous = anchors.set_cache(AnchorCache(step=4, tolerance=12))
+    yield anchors.get_cache()
+    anchors.set_cache(previous)
+
+
+def _scene():
+    rng = np.random.default_rng(3)
+    screen = rng.integers(0, 255, (270, 480, 3), dtype=np.uint8)
+    target = screen[20:60, 400:460].copy()
+    return screen, target
+
+
+def test_anchor_hit_skips_template_search(cache, monkeypatch):
+    screen, target = _scene()
+    region = (380, 0, 100, 100)
+    first = find_image_in_region(screen, target, region, value_check=False, anchor="pause")
+    assert first[0] == (430, 40) and len(cache) == 1
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("定點驗證命中時不應做模板比對")
+
+    monkeypatch.setattr(image_recognizer, "_find_best_match", no_search)
+    noisy = np.clip(screen.astype(np.int16) + 5, 0, 255).astype(np.uint8)
+    assert find_image_in_region(noisy, target, region, value_check=False, anchor="pause") == first
+
+    # 按鈕消失：定點驗證未命中，回到完整比對
+    gone = screen.copy()
+    gone[20:60, 400:460] = 0
+    with pytest.raises(AssertionError):
+        find_image_in_region(gone, target, region, value_check=False, anchor="pause")
+
+
+def test_anchor_invalidated_by_new_template(cache):
+    screen, target = _scene()
+    cache.learn(("exit", None), screen, (400, 20, 60, 40), 0.99, target)
+    assert cache.verify(("exit", None), screen, target).center == (430, 40)
+    assert cache.verify(("exit", None), screen, target.copy()) is None
+    assert cache.verify(("exit", None), np.zeros((10, 10, 3), np.uint8), target) is None
+
+
+def test_anchors_are_per_device(cache, monkeypatch):
+    screen, target = _scene()
+    region = (380, 0, 100, 100)
+    with metrics.device_scope("emu-1"):
+        find_image_in_region(screen, target, region, value_check=False, anchor="pause")
+    searches = []
+    real = image_recognizer._find_best_match
+
+    def counting(*args, **kwargs):
+        searches.append(1)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(image_recognizer, "_find_best_match", counting)
+    with metrics.device_scope("emu-2"):
+        find_image_in_region(screen, target, region, value_check=False, anchor="pause")
+    with metrics.device_scope("emu-1"):
+        find_image_in_region(screen, target, region, value_check=False, anchor="pause")
+    # emu-2 沒有自己的錨點，做完整比對；emu-1 以自己的錨點命中
+    assert searches == [1] and len(cache) == 2
+
+
+def test_file_mode_context_decodes_once_per_capture(tmp_path):
+    screen, _ = _scene()
+    path = str(tmp_path / "screen.png")
+    cv2.imwrite(path, screen)
+    ctx = TaskContext(path, 0.8, None)
+    first = ctx.screen
+    assert isinstance(first, np.ndarray) and ctx.screen is first  # 同一次擷取內所有辨識共用
+
+    device = load_session(SESSION)
+    with device.installed():
+        ctx.refresh()
+    assert ctx.screen is not first
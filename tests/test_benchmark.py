@@ -0,0 +1,19 @@
+from tools.benchmark import BenchResult, compare, measure
+
+
+def _result(name: str, p50: float) -> BenchResult:
+    return BenchResult(name, 10, 1000.0 / p50, p50, p50, p50, 100.0)
+
+
+def test_measure_reports_percentiles():
+    r = measure("noop", lambda: None, iterations=50, warmup=0)
+    assert r.iterations == 50
+    assert 0 <= r.p50_ms <= r.p95_ms <= r.p99_ms
+    assert r.ops_per_sec > 0 and r.peak_rss_mb > 0
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"results": [{"name": "a", "p50_ms": 10.0}, {"name": "b", "p50_ms": 10.0}]}
+    results = [_result("a", 11.0), _result("b", 13.0), _result("new", 99.0)]
+    failures = compare(results, baseline, max_regression=0.2)
+    assert len(failures) == 1 and failures[0].startswith("b:")
@@ -0,0 +1,136 @@
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from core import adb_controller
+from core.calibration import (
+    Calibration,
+    active,
+    calibrate,
+    calibrate_from_env,
+    find_ui_scale,
+    load_cached,
+    save_cached,
+    set_active,
+)
+from core.config import ConfigStore, load_config
+
+
+def _anchor() -> np.ndarray:
+    """類似暫停鍵的圖示：深色底、彩色圓環與兩條直槓。"""
+    img = np.full((96, 96, 3), (40, 30, 20), dtype=np.uint8)
+    cv2.circle(img, (48, 48), 40, (30, 160, 230), 6)
+    cv2.rectangle(img, (32, 28), (42, 68), (250, 250, 250), -1)
+    cv2.rectangle(img, (54, 28), (64, 68), (250, 250, 250), -1)
+    cv2.circle(img, (70, 20), 8, (60, 200, 60), -1)
+    return img
+
+
+def test_apply_scales_geometry_and_templates(tmp_path):
+    anchor_path = tmp_path / "pause.png"
+    cv2.imwrite(str(anchor_path), _anchor())
+    path = tmp_path / "tasks.yaml"
+    path.write_text(
+        "tasks:\n  cow_level:\n"
+        "    regions: {left: [300, 150, 600, 90]}\n"
+        f"    templates: {{pause: {{path: {anchor_path}}}, cow_target: {{path: {anchor_path}, method: orb}}}}\n",
+        encoding="utf-8",
+    )
+    store = ConfigStore(str(path))
+    seen = []
+    store.subscribe(seen.append)
+    cal = Calibration(device_size=(1280, 720), ui_scale=0.66, anchored=True)
+    store.set_transform(cal.apply)
+
+    task = store.current.task("cow_level")
+    assert task.regions["left"] == (200, 100, 400, 60)
+    assert task.points["list_open"] == (1047, 567)
+    assert task.templates["pause"].image.shape[:2] == (63, 63)
+    assert task.templates["pause"].scales == (1.0,)
+    # 特徵比對自行估計縮放，不預先縮放
+    assert task.templates["cow_target"].image.shape[:2] == (96, 96)
+    assert seen == [store.current]
+
+    # 熱重載後仍套用同一換算
+    path.write_text(path.read_text(encoding="utf-8").replace("300, 150", "600, 300"), encoding="utf-8")
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert store.maybe_reload() is True
+    assert store.current.task("cow_level").regions["left"] == (400, 200, 400, 60)
+
+
+def test_anchor_measures_ui_scale_and_caches(tmp_path, monkeypatch):
+    anchor = _anchor()
+    screen = np.full((720, 1280, 3), (90, 80, 70), dtype=np.uint8)
+    icon = cv2.resize(anchor, None, fx=0.7, fy=0.7, interpolation=cv2.INTER_AREA)
+    screen[20:20 + icon.shape[0], 40:40 + icon.shape[1]] = icon
+
+    scale, score = find_ui_scale(screen, anchor, expected=720 / 1080)
+    assert scale == pytest.approx(0.7, abs=0.02) and score > 0.9
+
+    path = tmp_path / "pause.png"
+    cv2.imwrite(str(path), anchor)
+    monkeypatch.setenv("PAUSE_IMAGE", str(path))
+    cal = calibrate(load_config(None), (1280, 720), screen=screen, density=240)
+    assert cal.anchored and cal.ui_scale == pytest.approx(0.7, abs=0.02)
+
+    cache = str(tmp_path / "calibration.json")
+    save_cached(cache, "emu|1280x720|240", cal)
+    assert load_cached(cache, "emu|1280x720|240") == cal
+    assert load_cached(cache, "other|1920x1080|0") is None
+
+
+def test_active_calibration_is_per_device():
+    small = Calibration(device_size=(1280, 720), base_size=(1920, 1080))
+    try:
+        set_active(small, "emu-1")
+        assert active("emu-1") is small
+        assert active("emu-2").is_identity and active().is_identity
+    finally:
+        set_active(None, "emu-1")
+    assert active("emu-1").is_identity
+
+
+def test_calibrate_from_env_is_off_by_default_and_uses_cache_before_adb(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(adb_controller, "grab_frame", lambda device_id=None: calls.append("grab"))
+    monkeypatch.setattr(adb_controller, "_run", lambda cmd, **kw: calls.append(cmd) or "")
+    cache = str(tmp_path / "calibration.json")
+    monkeypatch.setenv("CALIBRATION_FILE", cache)
+    store = ConfigStore(None)
+    monkeypatch.delenv("CALIBRATE", raising=False)
+    assert calibrate_from_env(store, "emu-1").is_identity and calls == []
+
+    cached = Calibration(device_size=(1280, 720), density=240, ui_scale=0.7, anchored=True)
+    save_cached(cache, "emu-1", cached)
+    monkeypatch.setenv("CALIBRATE", "1")
+    try:
+        assert calibrate_from_env(store, "emu-1") == cached
+        assert calls == []
+        assert store.current.task("cow_level").points["list_open"] == (1047, 567)
+    finally:
+        set_active(None, "emu-1")
+
+
+def test_calibrate_from_env_skips_anchor_at_base_size(tmp_path, monkeypatch):
+    calls = []
+
+    def grab(device_id=None):
+        calls.append("grab")
+        return np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    monkeypatch.setattr(adb_controller, "grab_frame", grab)
+    monkeypatch.setattr(adb_controller, "_run", lambda cmd, **kw: calls.append(cmd) or "")
+    cache = str(tmp_path / "calibration.json")
+    monkeypatch.setenv("CALIBRATION_FILE", cache)
+    monkeypatch.setenv("CALIBRATE", "1")
+    try:
+        assert calibrate_from_env(ConfigStore(None), "emu-2").is_identity
+        assert calls == ["grab"]  # 不查 wm size / wm density
+        assert load_cached(cache, "emu-2").is_identity
+        assert calibrate_from_env(ConfigStore(None), "emu-2").is_identity
+        assert calls == ["grab"]
+    finally:
+        set_active(None, "emu-2")
@@ -0,0 +1,89 @@
+import struct
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from core import capture_codec
+from core.capture_codec import AdaptiveCapture
+from core.raw_frame import RawFrame
+
+SCREEN = np.random.default_rng(3).integers(0, 256, (90, 160, 3), dtype=np.uint8)
+
+
+def _screencap_bytes(bgr: np.ndarray) -> bytes:
+    h, w = bgr.shape[:2]
+    return struct.pack("<III", w, h, 1) + b"\0" * 4 + cv2.cvtColor(bgr, cv2.COLOR_BGR2RGBA).tobytes()
+
+
+@pytest.fixture
+def fake_adb(monkeypatch):
+    """以可調延遲的替身取代 adb：raw 與 png 各自模擬傳輸/編碼時間。"""
+    delays = {"raw": 0.0, "png": 0.0}
+    calls: list[str] = []
+
+    def run_bytes(cmd: str, **kwargs) -> bytes:
+        mode = "png" if cmd.endswith("-p") else "raw"
+        calls.append(mode)
+        time.sleep(delays[mode])
+        if mode == "png":
+            return cv2.imencode(".png", SCREEN)[1].tobytes()
+        return _screencap_bytes(SCREEN)
+
+    monkeypatch.setattr(capture_codec, "_run_bytes", run_bytes)
+    monkeypatch.setattr(capture_codec, "_run", lambda cmd, **kwargs: "")
+    return delays, calls
+
+
+class FakeStream:
+    """scaled 模式的串流替身：每次 wait_frame 才產生新影格。"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.frame_count = 0
+        self.small = cv2.resize(SCREEN, (80, 45))
+
+    def wait_frame(self, timeout: float = 5.0, after_seq: int = 0):
+        time.sleep(self.delay)
+        self.frame_count += 1
+        return self.small, self.frame_count
+
+    def grab(self, timeout: float = 5.0):
+        return self.small
+
+    def stop(self) -> None:
+        pass
+
+
+def test_selects_cheapest_mode(fake_adb):
+    delays, _ = fake_adb
+    delays["png"] = 0.03
+    cap = AdaptiveCapture(modes=("png", "raw"), probe_samples=1)
+    frame = cap.grab()
+    assert cap.stats.mode == "raw" and isinstance(frame, RawFrame)
+    assert set(cap.stats.probes) == {"raw", "png"}
+
+    delays.update(raw=0.03, png=0.0)
+    cap.stats.probed_at = 0.0  # 強制重新量測
+    cap.reprobe_seconds = 0.0
+    frame = cap.grab()
+    assert cap.stats.mode == "png"
+    np.testing.assert_array_equal(frame, SCREEN)
+
+
+def test_scaled_is_probed_after_raw_and_upscaled(fake_adb):
+    delays, calls = fake_adb
+    delays["raw"] = 0.03
+    cap = AdaptiveCapture(modes=("scaled", "raw"), probe_samples=1)
+    cap._stream = FakeStream(delay=0.0)
+    frame = cap.grab()
+    assert calls[0] == "raw"  # raw 先量測，取得原始尺寸
+    assert cap.stats.mode == "scaled"
+    assert frame.shape == SCREEN.shape  # 放大回裝置座標
+
+    # 量測時等待新影格：串流出新影格很慢時不會因快取影格而被選上
+    slow = AdaptiveCapture(modes=("scaled", "raw"), probe_samples=1)
+    slow._stream = FakeStream(delay=0.1)
+    slow.grab()
+    assert slow.stats.mode == "raw"
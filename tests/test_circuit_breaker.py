@@ -0,0 +1,108 @@
+import sys
+
+import numpy as np
+import pytest
+
+from core import adb_controller, circuit_breaker, clock, metrics
+from core.adb_controller import AdbTimeout, RetryPolicy
+from core.circuit_breaker import CircuitBreaker, DeviceUnavailable
+from core.config import load_config
+from core.scheduler import Wait
+from core.task import TaskContext
+from tasks import cow_level
+from tasks.cow_level import CowLevelTask
+
+
+@pytest.fixture
+def fast_retries():
+    previous = adb_controller.set_retry_policy(RetryPolicy(timeout=5.0, retries=2, backoff=0.0))
+    circuit_breaker.reset_breakers()
+    yield
+    adb_controller.set_retry_policy(previous)
+    circuit_breaker.reset_breakers()
+
+
+def _counter(name: str, **labels) -> float:
+    data = metrics.REGISTRY.to_dict().get(name, {"series": []})
+    return sum(s["value"] for s in data["series"] if all(s["labels"].get(k) == v for k, v in labels.items()))
+
+
+def test_breaker_parks_device_and_probes_after_cooldown():
+    previous = clock.set_clock(clock.VirtualClock())
+    try:
+        breaker = CircuitBreaker("10.0.0.5:5555", threshold=3, cooldown=30.0)
+        for _ in range(3):
+            breaker.allow()
+            breaker.failure("error: device offline")
+        assert breaker.state == "open"
+        with pytest.raises(DeviceUnavailable) as exc:
+            breaker.allow()
+        assert exc.value.retry_in == 30.0
+
+        clock.sleep(30.0)
+        breaker.allow()  # half_open：只放行一次試探
+        with pytest.raises(DeviceUnavailable):
+            breaker.allow()
+        breaker.failure("still offline")
+        assert breaker.state == "open" and breaker.retry_in() == 60.0  # 冷卻加倍
+
+        clock.sleep(60.0)
+        breaker.allow()
+        breaker.success()
+        assert breaker.state == "closed" and breaker.trips == 2
+    finally:
+        clock.set_clock(previous)
+
+
+def test_run_retries_connection_errors_and_enforces_deadline(fast_retries):
+    offline = f"{sys.executable} -c \"import sys; sys.stderr.write('error: device offline'); sys.exit(1)\""
+    before = _counter("adb_retries_total", command="-c")
+    with pytest.raises(RuntimeError, match="device offline"):
+        adb_controller._run(offline)
+    assert _counter("adb_retries_total", command="-c") - before == 2
+
+    # 指令本身的錯誤不重試
+    before = _counter("adb_retries_total", command="-c")
+    with pytest.raises(RuntimeError):
+        adb_controller._run(f'{sys.executable} -c "import sys; sys.exit(3)"')
+    assert _counter("adb_retries_total", command="-c") == before
+
+    # 點擊等非冪等指令逾時不重送
+    before = _counter("adb_timeouts_total", command="-c")
+    with pytest.raises(AdbTimeout):
+        adb_controller._run(f'{sys.executable} -c "import time; time.sleep(5)"', timeout=0.2, idempotent=False)
+    assert _counter("adb_timeouts_total", command="-c") - before == 1
+
+
+def test_unstartable_adb_fails_the_half_open_trial(fast_retries):
+    previous = clock.set_clock(clock.VirtualClock())
+    try:
+        breaker = circuit_breaker.get_breaker("emu-9")
+        for _ in range(breaker.threshold):
+            breaker.allow()
+            breaker.failure("error: device offline")
+        clock.sleep(breaker.retry_in())
+        # 試探時 adb 無法啟動：仍記為失敗並重新開啟，而不是卡在試探中
+        with pytest.raises(RuntimeError, match="could not start"):
+            adb_controller._run("/nonexistent/adb -s emu-9 shell true")
+        assert breaker.state == "open"
+        clock.sleep(breaker.retry_in())
+        breaker.allow()
+    finally:
+        clock.set_clock(previous)
+
+
+def test_round_lets_device_unavailable_through(monkeypatch):
+    monkeypatch.setenv("PROBES_FILE", "")
+    task = CowLevelTask(load_config(None).task("cow_level"))
+
+    def parked(*args, **kwargs):
+        raise DeviceUnavailable("emu-9", 30.0)
+
+    monkeypatch.setattr(cow_level, "find_text", parked)
+    monkeypatch.setattr(task, "_run_macro", lambda ctx, macro, tail: iter(()))
+    coroutine = task.tick(TaskContext("screen.png", 0.8, "emu-9", frame=np.zeros((1080, 1920, 3), np.uint8)))
+    assert isinstance(next(coroutine), Wait)
+    with pytest.raises(DeviceUnavailable):
+        while True:
+            next(coroutine)
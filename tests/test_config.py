@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+from core.config import ConfigError, ConfigStore, load_config
+
+
+def test_env_defaults_compile(monkeypatch):
+    monkeypatch.setenv("COW_REGION_LEFT", "1,2,3,4")
+    monkeypatch.setenv("PAUSE_THRESHOLD", "0.9")
+    cfg = load_config(None).task("cow_level")
+    assert cfg.regions["left"] == (1, 2, 3, 4)
+    assert cfg.templates["pause"].threshold == 0.9
+    with pytest.raises(TypeError):
+        cfg.regions["left"] = (0, 0, 1, 1)
+
+
+def test_yaml_overrides_env(tmp_path):
+    path = tmp_path / "tasks.yaml"
+    path.write_text(
+        "runner: {check_interval: 0.25}\n"
+        "tasks:\n  cow_level:\n    regions: {left: [10, 20, 30, 40]}\n",
+        encoding="utf-8",
+    )
+    cfg = load_config(str(path))
+    assert cfg.runner.check_interval == 0.25
+    task = cfg.task("cow_level")
+    assert task.regions["left"] == (10, 20, 30, 40)
+    assert task.regions["right"] == (985, 260, 375, 60)
+
+
+def test_invalid_reload_keeps_previous(tmp_path):
+    path = tmp_path / "tasks.yaml"
+    path.write_text("runner: {match_threshold: 0.7}\n", encoding="utf-8")
+    store = ConfigStore(str(path))
+    seen = []
+    store.subscribe(seen.append)
+
+    path.write_text("runner: {match_threshold: 3}\n", encoding="utf-8")
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert store.maybe_reload() is False
+    assert store.current.runner.match_threshold == 0.7
+
+    path.write_text("runner: {match_threshold: 0.9}\n", encoding="utf-8")
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert store.maybe_reload() is True
+    assert store.current.runner.match_threshold == 0.9
+    assert seen == [store.current]
+
+
+def test_invalid_region_rejected(tmp_path):
+    path = tmp_path / "tasks.yaml"
+    path.write_text("tasks:\n  cow_level:\n    regions: {left: [1, 2]}\n", encoding="utf-8")
+    with pytest.raises(ConfigError):
+        load_config(str(path))
+
+
+def test_feature_method_uses_its_own_default_threshold(tmp_path, monkeypatch):
+    monkeypatch.setenv("COW_TARGET_MATCH_METHOD", "orb")
+    assert load_config(None).task("cow_level").templates["cow_target"].threshold == 0.5
+
+    path = tmp_path / "tasks.yaml"
+    path.write_text("tasks:\n  cow_level:\n    templates: {exit: {path: x.png, method: surf}}\n", encoding="utf-8")
+    with pytest.raises(ConfigError):
+        load_config(str(path))
+
+
+def test_tap_delay_has_single_source(tmp_path):
+    path = tmp_path / "tasks.yaml"
+    path.write_text("input: {tap_delay: 0.4}\n", encoding="utf-8")
+    cfg = load_config(str(path))
+    assert cfg.tap_delay == cfg.task("cow_level").timings["tap_delay"] == 0.4
+
+    path.write_text("tasks:\n  cow_level:\n    timings: {tap_delay: 0.4}\n", encoding="utf-8")
+    with pytest.raises(ConfigError):
+        load_config(str(path))
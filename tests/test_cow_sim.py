@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from tools.cow_sim import COW, LABELS, OfferModel, Policy, StepTimings, simulate
+
+
+def _always(label: int) -> np.ndarray:
+    p = np.zeros(len(LABELS))
+    p[label] = 1.0
+    return p
+
+
+def test_always_cow_round_is_deterministic():
+    offers = OfferModel(_always(COW), _always(LABELS.index("普通副本")), _always(COW))
+    timings = StepTimings()
+    r = simulate(Policy(star_cutoff=10, min_cows=2), offers, timings, rounds=1000, rng=np.random.default_rng(1))
+    # 4 星 × 3 次奶牛關達標，第 4 次迭代點最終關並等待成功
+    expected = (
+        timings.nav + timings.between_rounds + 4 * timings.loop_step
+        + 3 * timings.after_tap + timings.after_tap + timings.success_wait + timings.after_tap
+    )
+    assert r.cow_hits == 3000 and r.successes == 1000 and r.truncated == 0
+    assert r.mean_round_seconds == pytest.approx(expected)
+    assert r.cows_per_hour == pytest.approx(3 * 3600 / expected)
+
+
+def test_offer_model_fit_from_log_lines():
+    lines = [
+        "INFO 左區域文字='奶牛關' 右區域文字='普通副本'",
+        "INFO 奶牛關迴圈 - 左區域文字='隨機副本' 右區域文字='精英 副本'",
+        "INFO 隨機副本的關卡為：'奶牛關'",
+    ]
+    m = OfferModel.fit(lines, smoothing=0.0)
+    assert m.observations == {"left": 2, "right": 2, "reveal": 1}
+    assert m.left[COW] == pytest.approx(0.5)
+    assert m.right[LABELS.index("精英副本")] == pytest.approx(0.5)
+    assert m.reveal[COW] == pytest.approx(1.0)
@@ -0,0 +1,35 @@
+from core import adb_controller, clock
+from core.fake_device import load_session, simulate
+from core.region_tools import find_text
+from core.runner import TaskRunner
+from tasks.cow_level import CowLevelTask
+
+SESSION = "bench/sessions/cow_level_basic.yaml"
+
+
+def test_taps_drive_scripted_states_and_are_recorded():
+    device = load_session(SESSION)
+    with device.installed():
+        start = clock.monotonic()
+        frame = adb_controller.grab_frame()
+        assert device.state == "level_select" and frame.shape == (1080, 1920, 3)
+        assert find_text(frame, (985, 260, 375, 60)) == "精英副本"
+
+        adb_controller.tap(10, 10, delay=0)  # 不在任何區域內：狀態不變
+        adb_controller.tap(1172, 290, delay=5.0)  # delay 以虛擬時間計算
+        assert device.state == "in_battle"
+        assert clock.monotonic() - start == 5.0
+    assert [e.to for e in device.inputs] == [None, "in_battle"]
+    assert adb_controller._controller is None
+
+
+def test_cow_level_rounds_run_in_virtual_time():
+    device = load_session(SESSION)
+    runner = TaskRunner([CowLevelTask()], frame_source=device, check_interval=1.0, click_cooldown=2.0)
+    report = simulate(runner, device, completed=200)
+
+    assert report.completed == 200
+    assert report.virtual_seconds > 200 * 10  # 每輪至少十幾秒的等待都以虛擬時間跳過
+    assert report.wall_seconds < report.virtual_seconds / 100
+    assert device.visits["fail_confirm"] >= 200
+    assert runner.tasks[0].stat_exit_without_final == 200
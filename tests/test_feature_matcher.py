@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+import pytest
+
+from core.config import ConfigError, load_config
+from core.feature_matcher import find_image_by_features
+from core.task import TaskContext
+from tasks.cow_level import CowLevelTask
+
+
+def _textured(seed: int, size=(160, 140)) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    img = np.full((size[1], size[0], 3), 40, np.uint8)
+    for _ in range(40):
+        c = tuple(int(v) for v in rng.integers(0, 255, 3))
+        p = tuple(int(v) for v in rng.integers(0, size[0], 2))
+        cv2.circle(img, p, int(rng.integers(4, 20)), c, -1)
+        cv2.rectangle(img, p, (p[0] + 12, p[1] + 8), c[::-1], 2)
+    return img
+
+
+def _screen_with(template: np.ndarray, scale: float, at=(300, 120)) -> tuple[np.ndarray, tuple[int, int]]:
+    screen = np.full((540, 960, 3), 90, np.uint8)
+    t = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    x, y = at
+    screen[y:y + t.shape[0], x:x + t.shape[1]] = t
+    return screen, (x + t.shape[1] // 2, y + t.shape[0] // 2)
+
+
+@pytest.mark.parametrize("scale", [1.0, 1.4])
+def test_features_find_template_beyond_sweep_range(scale):
+    template = _textured(1)
+    screen, expected = _screen_with(template, scale)
+    center, score = find_image_by_features(screen, template, method="orb")
+    assert center is not None and score >= 0.5
+    assert abs(center[0] - expected[0]) <= 3 and abs(center[1] - expected[1]) <= 3
+
+
+def test_features_reject_unrelated_screen_and_use_region_offset():
+    template = _textured(1)
+    center, _ = find_image_by_features(_screen_with(_textured(2), 1.0)[0], template, method="orb")
+    assert center is None
+
+    screen, expected = _screen_with(template, 1.0)
+    center, _ = find_image_by_features(screen, template, (250, 60, 400, 300), method="orb")
+    assert center is not None and abs(center[0] - expected[0]) <= 3 and abs(center[1] - expected[1]) <= 3
+
+
+def test_cow_level_falls_back_to_features_when_ocr_misses(tmp_path, monkeypatch):
+    template = _textured(1)
+    cv2.imwrite(str(tmp_path / "cow.png"), template)
+    screen = np.full((1080, 1920, 3), 90, np.uint8)
+    screen[250:390, 1000:1160] = template
+    monkeypatch.setenv("COW_TARGET_IMAGE", str(tmp_path / "cow.png"))
+    monkeypatch.setenv("COW_TARGET_MATCH_METHOD", "orb")
+    monkeypatch.setenv("COW_REGION_LEFT", "100,200,400,300")
+    monkeypatch.setenv("COW_REGION_RIGHT", "900,200,400,300")
+    monkeypatch.chdir(tmp_path)
+    ctx = TaskContext("unused.png", 0.8, None, frame=screen)
+
+    task = CowLevelTask(load_config(None).task("cow_level"))
+    assert task._detect_cow(ctx, "", "") == (None, "")
+
+    monkeypatch.setenv("COW_IMAGE_FALLBACK", "1")
+    task = CowLevelTask(load_config(None).task("cow_level"))
+    assert task._detect_cow(ctx, "", "") == ((900, 200, 400, 300), "cow_right")
+    # OCR 命中時不做影像比對
+    assert task._detect_cow(ctx, "奶牛關", "") == ((100, 200, 400, 300), "cow_left")
+    assert not (tmp_path / "debug").exists()
+
+
+def test_shipped_template_needs_features_for_image_fallback(monkeypatch):
+    # 隨附的 cow_target 模板大於左右區域：模板比對永遠不會命中，啟用 fallback 時於載入設定時報錯
+    monkeypatch.setenv("PROBES_FILE", "")
+    monkeypatch.setenv("COW_IMAGE_FALLBACK", "1")
+    cfg = load_config(None).task("cow_level")
+    assert cfg.templates["cow_target"].available and cfg.templates["cow_target"].method == "template"
+    with pytest.raises(ConfigError, match="cow_target"):
+        CowLevelTask(cfg)
+
+    monkeypatch.setenv("COW_TARGET_MATCH_METHOD", "orb")
+    assert CowLevelTask(load_config(None).task("cow_level")).image_fallback
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from core import adb_controller, circuit_breaker
+from core import fleet as fleet_module
+from core.config import ConfigStore, ConfigView
+from core.fleet import FleetManager, FleetWorker
+from core.runner import TaskRunner
+from core.task import TaskResult
+
+
+class FleetController:
+    """可動態增減裝置的控制器；`broken` 中的裝置截圖失敗。"""
+
+    def __init__(self, serials):
+        self.serials = list(serials)
+        self.broken: set[str] = set()
+        self.captures: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def devices(self):
+        return list(self.serials)
+
+    def grab_frame(self, device_id=None):
+        if device_id in self.broken:
+            raise RuntimeError("error: device offline")
+        with self._lock:
+            self.captures[device_id] = self.captures.get(device_id, 0) + 1
+        return np.zeros((10, 10, 3), dtype=np.uint8)
+
+    def grab(self, timeout=5.0):
+        return self.grab_frame()
+
+
+class Idle:
+    name = "idle"
+
+    def tick(self, ctx):
+        return TaskResult()
+
+
+@pytest.fixture
+def controller():
+    ctrl = FleetController(["emu-1", "10.0.0.7:5555"])
+    previous = adb_controller.set_controller(ctrl)
+    circuit_breaker.reset_breakers()
+    yield ctrl
+    adb_controller.set_controller(previous)
+    circuit_breaker.reset_breakers()
+
+
+def _fleet(ctrl) -> FleetManager:
+    def factory(serial):
+        return TaskRunner([Idle()], device_id=serial, frame_source=ctrl, check_interval=0.01, click_cooldown=0.01)
+
+    return FleetManager(factory, discover_interval=0.01)
+
+
+def test_workers_follow_devices_as_they_appear_and_disappear(controller):
+    fleet = _fleet(controller)
+    try:
+        states = fleet.poll()
+        assert {s: st.status for s, st in states.items()} == {"emu-1": "online", "10.0.0.7:5555": "online"}
+        assert set(fleet.workers) == {"emu-1", "10.0.0.7:5555"}
+
+        controller.serials = ["emu-1", "emu-2"]
+        fleet.poll()
+        snap = fleet.snapshot()
+        assert snap["10.0.0.7:5555"]["status"] == "offline" and not snap["10.0.0.7:5555"]["worker"]
+        assert set(fleet.workers) == {"emu-1", "emu-2"}
+        assert all(w.alive for w in fleet.workers.values())
+    finally:
+        fleet.shutdown()
+    assert not fleet.workers
+
+
+def test_unhealthy_device_is_degraded_then_parked(controller, monkeypatch):
+    monkeypatch.setenv("ADB_BREAKER_THRESHOLD", "2")
+    controller.broken.add("emu-1")
+    fleet = _fleet(controller)
+    try:
+        fleet.poll()
+        assert fleet.devices["emu-1"].status == "degraded"
+        assert "emu-1" not in fleet.workers  # 第一次檢查失敗不啟動
+        # 控制器模式不經過 adb，斷路器由呼叫端（此處模擬 adb 失敗）回報
+        for _ in range(2):
+            circuit_breaker.get_breaker("emu-1").failure("error: device offline")
+        fleet.poll()
+        assert fleet.devices["emu-1"].status == "parked"
+        assert fleet.snapshot()["10.0.0.7:5555"]["status"] == "online"
+    finally:
+        fleet.shutdown()
+
+
+def _with_threshold(value):
+    return lambda cfg: replace(cfg, runner=replace(cfg.runner, match_threshold=value))
+
+
+def test_config_views_are_per_device_and_unsubscribed_on_stop(controller, tmp_path):
+    path = tmp_path / "tasks.yaml"
+    path.write_text("runner: {check_interval: 0.5}\n", encoding="utf-8")
+    store = ConfigStore(str(path))
+    views = {"emu-1": ConfigView(store), "10.0.0.7:5555": ConfigView(store)}
+    runners = {}
+
+    def factory(serial):
+        runners[serial] = TaskRunner([Idle()], device_id=serial, frame_source=controller, config_store=views[serial])
+        return runners[serial]
+
+    views["emu-1"].set_transform(_with_threshold(0.7))
+    views["10.0.0.7:5555"].set_transform(_with_threshold(0.9))
+    fleet = FleetManager(factory, discover_interval=0.01)
+    try:
+        fleet.poll()
+        views["emu-1"].set_transform(_with_threshold(0.75))
+        # 各裝置的換算互不覆蓋
+        assert runners["emu-1"].match_threshold == 0.75
+        assert runners["10.0.0.7:5555"].match_threshold == 0.8
+
+        path.write_text("runner: {check_interval: 0.25}\n", encoding="utf-8")
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        # 只有呼叫 maybe_reload 的裝置（即其 Runner 執行緒）套用新設定
+        assert views["emu-1"].maybe_reload() is True
+        assert views["emu-1"].current.runner.check_interval == 0.25
+        assert views["emu-1"].current.runner.match_threshold == 0.75
+        assert views["10.0.0.7:5555"].current.runner.check_interval == 0.5
+        assert views["10.0.0.7:5555"].maybe_reload() is True
+        assert views["10.0.0.7:5555"].current.runner.match_threshold == 0.9
+    finally:
+        fleet.shutdown()
+    assert not views["emu-1"]._listeners and not views["10.0.0.7:5555"]._listeners
+
+
+def test_fleet_allocates_touch_port_and_view_per_serial(monkeypatch):
+    calls = []
+    monkeypatch.setenv("MINITOUCH_PORT", "2000")
+    monkeypatch.setattr(fleet_module, "build_runner_from_env", lambda tasks, **kwargs: calls.append(kwargs))
+    manager = fleet_module.build_fleet_from_env(list)
+    for serial in ("emu-1", "10.0.0.7:5555", "emu-1"):
+        manager.runner_factory(serial)
+    assert [c["touch_port"] for c in calls] == [2000, 2001, 2000]
+    assert [c["screenshot_path"] for c in calls][:2] == ["screen_emu-1.png", "screen_10.0.0.7_5555.png"]
+    assert all(isinstance(c["config_store"], ConfigView) for c in calls)
+    assert calls[0]["config_store"] is not calls[2]["config_store"]
+
+
+def test_parked_worker_stops_without_waiting_out_the_cooldown(controller):
+    class Unavailable:
+        name = "unavailable"
+
+        def tick(self, ctx):
+            raise circuit_breaker.DeviceUnavailable("emu-1", 300.0)
+
+    store = ConfigView(ConfigStore(None))
+    runner = TaskRunner([Unavailable()], device_id="emu-1", frame_source=controller, config_store=store)
+    worker = FleetWorker("emu-1", runner).start()
+    while not controller.captures.get("emu-1"):
+        time.sleep(0.01)
+    start = time.monotonic()
+    assert worker.stop(timeout=5.0)
+    # 停放中的 300 秒冷卻被停止事件中斷，資源由執行緒結束時釋放
+    assert time.monotonic() - start < 1.0
+    assert not store._listeners
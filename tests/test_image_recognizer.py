@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+
+from core import image_recognizer
+from core.image_recognizer import _find_best_match, find_image_in_region, find_image_on_screen
+
+
+def _scene():
+    rng = np.random.default_rng(7)
+    screen = rng.integers(0, 255, (270, 480, 3), dtype=np.uint8)
+    target = screen[100:140, 200:260].copy()
+    return screen, target
+
+
+def test_parallel_match_equals_serial():
+    screen, target = _scene()
+    image_recognizer.set_match_workers(3)
+    try:
+        parallel = _find_best_match(screen, target, debug=False, parallel=True)
+    finally:
+        image_recognizer.set_match_workers(0)
+    serial = _find_best_match(screen, target, debug=False, parallel=False)
+
+    assert parallel[0] == serial[0] == (200, 100)
+    assert parallel[1:3] == serial[1:3] and parallel[4:] == serial[4:]
+    assert np.array_equal(parallel[3], serial[3])
+
+
+def test_parallel_flag_per_call_on_region_search():
+    screen, target = _scene()
+    image_recognizer.set_match_workers(2)
+    try:
+        got = find_image_in_region(screen, target, (150, 50, 200, 150), value_check=False, parallel=True)
+    finally:
+        image_recognizer.set_match_workers(0)
+    assert got == find_image_in_region(screen, target, (150, 50, 200, 150), value_check=False)
+    assert got[0] == (230, 120)
+
+
+class _CountingPool:
+    def __init__(self):
+        self.jobs = 0
+
+    def submit(self, fn, *args):
+        self.jobs += 1
+        return _Done(fn(*args))
+
+
+class _Done:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+def test_full_screen_search_uses_pool_without_touching_cv_threads(monkeypatch):
+    screen, target = _scene()
+    pool = _CountingPool()
+    monkeypatch.setattr(image_recognizer, "_get_pool", lambda: pool)
+    threads = cv2.getNumThreads()
+    image_recognizer.set_match_workers(2)
+    try:
+        got = find_image_on_screen(screen, target, value_check=False, parallel=True)
+    finally:
+        image_recognizer.set_match_workers(0)
+    assert got[0] == (230, 120)
+    assert pool.jobs == 2 * len(image_recognizer.DEFAULT_SCALES)  # 每個尺度的 H、S 兩個通道
+    assert cv2.getNumThreads() == threads
+
+    # MATCH_WORKERS=1：即使呼叫端要求平行也逐一計算
+    image_recognizer.set_match_workers(1)
+    try:
+        assert find_image_on_screen(screen, target, value_check=False, parallel=True) == got
+    finally:
+        image_recognizer.set_match_workers(0)
+    assert pool.jobs == 2 * len(image_recognizer.DEFAULT_SCALES)
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from core import adb_controller, clock, input_dispatcher, metrics
+from core.circuit_breaker import DeviceUnavailable
+from core.config import load_config
+from core.input_dispatcher import InputDispatcher
+from core.input_macro import InputMacro
+from core.scheduler import Wait
+from core.task import TaskContext
+from tasks.cow_level import CowLevelTask
+
+
+class SlowController:
+    """每次輸入耗時 20ms 的控制器，記錄執行順序與執行緒。"""
+
+    def __init__(self) -> None:
+        self.inputs: list[tuple] = []
+        self.threads: set[str] = set()
+
+    def tap(self, x, y, device_id=None):
+        time.sleep(0.02)
+        self.inputs.append(("tap", x, y, device_id))
+        self.threads.add(threading.current_thread().name)
+
+    def swipe(self, x1, y1, x2, y2, duration_ms=300, device_id=None):
+        self.inputs.append(("swipe", x1, y1, x2, y2, device_id))
+
+
+@pytest.fixture
+def controller():
+    ctrl = SlowController()
+    previous = adb_controller.set_controller(ctrl)
+    yield ctrl
+    adb_controller.set_controller(previous)
+
+
+def test_submit_returns_immediately_and_preserves_order(controller):
+    dispatcher = InputDispatcher("emu-1")
+    try:
+        start = time.perf_counter()
+        futures = [dispatcher.tap(i, i) for i in range(5)] + [dispatcher.swipe(1, 2, 3, 4, 100)]
+        macro_future = dispatcher.macro(InputMacro().tap(9, 9))
+        assert time.perf_counter() - start < 0.02  # 不等待任何一次輸入
+        assert not futures[-1].done()
+
+        macro_future.result(timeout=2)
+        assert all(f.done() for f in futures)
+        done_times = [f.result() for f in futures]
+        assert done_times == sorted(done_times)
+    finally:
+        dispatcher.close()
+    assert [i[:2] for i in controller.inputs] == [("tap", i) for i in range(5)] + [("swipe", 1), ("tap", 9)]
+    assert {i[-1] for i in controller.inputs} == {"emu-1"}
+    assert controller.threads == {"input-emu-1"}
+    depth = metrics.REGISTRY.to_dict()["input_queue_depth"]["series"]
+    assert {"labels": {"device": "emu-1"}, "value": 0} in depth
+
+
+def test_dedup_and_rate_limit(controller):
+    dispatcher = InputDispatcher(None, min_interval=0.05, dedup_seconds=1.0)
+    try:
+        first = dispatcher.tap(5, 5)
+        assert dispatcher.tap(5, 5) is first  # 連點合併
+        other = dispatcher.tap(6, 6)
+        assert dispatcher.tap(5, 5) is not first  # 中間有其他輸入時不合併
+        assert dispatcher.flush(timeout=2)
+        t1, t2 = first.result(), other.result()
+    finally:
+        dispatcher.close()
+    assert [i[1] for i in controller.inputs] == [5, 6, 5]
+    # 限速：兩次輸入的間隔至少 min_interval + 一次輸入耗時
+    assert t2 - t1 >= 0.05 + 0.02 - 0.005
+
+
+class BrokenController(SlowController):
+    def tap(self, x, y, device_id=None):
+        raise DeviceUnavailable(device_id, 30.0)
+
+
+def test_failures_reach_the_caller(monkeypatch):
+    previous = adb_controller.set_controller(BrokenController())
+    try:
+        # 同步模式：直接拋出，不包進無人讀取的 Future
+        monkeypatch.delenv("INPUT_ASYNC", raising=False)
+        with pytest.raises(DeviceUnavailable):
+            input_dispatcher.tap(1, 2, device_id="emu-2")
+
+        # 非同步模式：Future 帶有例外，任務在等待結束後確認並往上拋
+        monkeypatch.setenv("INPUT_ASYNC", "1")
+        monkeypatch.setenv("PROBES_FILE", "")
+        task = CowLevelTask(load_config(None).task("cow_level"))
+        ok, _ = task._tap_region_center(TaskContext("screen.png", 0.8, "emu-2"), (0, 0, 10, 10), "pause")
+        assert ok
+        input_dispatcher.get_dispatcher("emu-2").flush(timeout=2)
+        waits = task._after_tap()
+        assert isinstance(next(waits), Wait)
+        with pytest.raises(DeviceUnavailable):
+            next(waits)
+    finally:
+        input_dispatcher.shutdown()
+        adb_controller.set_controller(previous)
+
+
+def test_rate_limit_uses_core_clock(controller):
+    virtual = clock.VirtualClock(100.0)
+    previous = clock.set_clock(virtual)
+    try:
+        dispatcher = InputDispatcher(None, min_interval=5.0)
+        first, second = dispatcher.tap(1, 1), dispatcher.tap(2, 2)
+        assert dispatcher.flush(timeout=2)
+        dispatcher.close()
+    finally:
+        clock.set_clock(previous)
+    # 限速等待由虛擬時鐘跳過，不實際睡眠
+    assert second.result() - first.result() == 5.0 and virtual.slept == 5.0
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+
+import pytest
+
+from core import circuit_breaker, clock
+from core.adb_controller import AdbTimeout
+from core.circuit_breaker import DeviceUnavailable
+from core.config import load_config
+from core.fake_device import load_session
+from core.input_macro import InputMacro, _parse_times
+from core.task import TaskContext
+from tasks.cow_level import CowLevelTask
+
+SESSION = "bench/sessions/cow_level_basic.yaml"
+
+
+def test_macro_compiles_to_one_shell_script():
+    macro = InputMacro().tap(1570, 850).sleep(1.1).tap(1570, 850).sleep(0).swipe(1, 2, 3, 4, 250)
+    assert len(macro) == 4 and macro.duration == 1.35
+    assert macro.script() == "input tap 1570 850; sleep 1.1; input tap 1570 850; input swipe 1 2 3 4 250"
+    stamped = macro.script(timestamps=True)
+    assert stamped.startswith('echo "@0 $(date +%s.%N)"; input tap 1570 850; sleep 1.1; echo "@2 ')
+
+    # 裝置的 date 不支援 %N 時只取整數秒
+    assert _parse_times("@0 100.25\nnoise\n@2 101.5\n@3 102.N\n") == [100.25, 101.5, 102.0]
+
+
+def test_macro_drives_controller_in_virtual_time():
+    device = load_session(SESSION)
+    with device.installed():
+        start = clock.monotonic()
+        handle = InputMacro().tap(10, 10).sleep(2.5).tap(1172, 290).start(timestamps=True)
+        assert handle.done() and handle.remaining() == 0.0
+        result = handle.wait()
+        assert clock.monotonic() - start == 2.5
+    assert [e.to for e in device.inputs] == [None, "in_battle"]
+    assert result.offsets == [0.0, 2.5]
+
+
+def test_exit_sequence_waits_after_each_tap(monkeypatch):
+    monkeypatch.setenv("PROBES_FILE", "")
+    monkeypatch.setenv("PAUSE_IMAGE", "")
+    task = CowLevelTask(load_config(None).task("cow_level"))
+    compiled = []
+
+    def capture(ctx, macro, tail):
+        compiled.append((macro, tail))
+        yield from ()
+
+    monkeypatch.setattr(task, "_run_macro", capture)
+    list(task._simple_exit_sequence(TaskContext("screen.png", 0.8, None)))
+    (macro, tail), = compiled
+    td = task.tap_delay_seconds
+    # 暫停、離開、確認後各多等一次 tap_delay；失敗確認之後只等 tap_delay
+    assert [s.args[0] for s in macro.steps if s.kind == "sleep"] == [2 * td, 2 * td, 2 * td]
+    assert tail == td
+
+
+def test_hung_shell_is_killed_and_trips_breaker(monkeypatch):
+    popen = subprocess.Popen
+    procs = []
+
+    def hung_adb(cmd, **kwargs):
+        procs.append(popen([sys.executable, "-c", "import time; time.sleep(30)"], **kwargs))
+        return procs[-1]
+
+    monkeypatch.setattr(subprocess, "Popen", hung_adb)
+    monkeypatch.setenv("ADB_BREAKER_THRESHOLD", "1")
+    circuit_breaker.reset_breakers()
+    try:
+        handle = InputMacro().tap(1, 2).start("emu-9")
+        with pytest.raises(AdbTimeout):
+            handle.wait(timeout=0.1)
+        assert procs[0].poll() is not None  # 逾時的 adb shell 已被終止
+        # 斷路器開啟後不再啟動新的 adb shell，與單次點擊相同地往上拋
+        with pytest.raises(DeviceUnavailable):
+            InputMacro().tap(1, 2).start("emu-9")
+        assert len(procs) == 1
+    finally:
+        circuit_breaker.reset_breakers()
@@ -0,0 +1,33 @@
+import json
+import logging
+import queue
+
+from core.logger import JsonFormatter, NonBlockingQueueHandler, TagRateLimiter
+
+
+def _record(msg: str, **extra) -> logging.LogRecord:
+    rec = logging.makeLogRecord({"name": "t", "levelname": "INFO", "levelno": logging.INFO, "msg": msg})
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_rate_limiter_suppresses_repeated_tags_and_reports_count():
+    now = [0.0]
+    limiter = TagRateLimiter(["NO MATCH"], limit=2, window=10.0, clock=lambda: now[0])
+    passed = [limiter.filter(_record("[NO MATCH] best=0.1")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert limiter.filter(_record("[ACTION] tap"))  # 未列入的標籤不受限
+    now[0] = 10.0
+    rec = _record("[NO MATCH] best=0.2")
+    assert limiter.filter(rec)
+    assert "略過 3 筆" in rec.getMessage()
+
+
+def test_json_lines_and_full_queue_never_blocks():
+    line = json.loads(JsonFormatter().format(_record("[cow_level] 完成", task="cow_level")))
+    assert line["msg"] == "[cow_level] 完成" and line["task"] == "cow_level" and line["level"] == "INFO"
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record("a"))
+    handler.handle(_record("b"))
+    assert handler.dropped == 1
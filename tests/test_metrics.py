@@ -0,0 +1,36 @@
+import json
+import urllib.request
+
+from core import metrics
+
+
+def test_prometheus_and_json_output():
+    reg = metrics.Registry()
+    with metrics.device_scope("emu-1"):
+        reg.observe("match_seconds", 0.02, tag="pause")
+        reg.observe("match_seconds", 3.0, tag="pause")
+        reg.inc("taps_total")
+
+    text = reg.render_prometheus()
+    assert 'match_seconds_bucket{device="emu-1",tag="pause",le="0.025"} 1' in text
+    assert 'match_seconds_bucket{device="emu-1",tag="pause",le="+Inf"} 2' in text
+    assert 'match_seconds_count{device="emu-1",tag="pause"} 2' in text
+    assert 'taps_total{device="emu-1"} 1' in text
+
+    data = reg.to_dict()
+    series = data["match_seconds"]["series"][0]
+    assert series["labels"] == {"device": "emu-1", "tag": "pause"}
+    assert series["count"] == 2
+
+
+def test_http_endpoint_serves_registry():
+    metrics.inc("ticks_total")
+    server = metrics.start_http_server(0)
+    try:
+        port = server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+        assert "# TYPE ticks_total counter" in body
+        data = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json", timeout=5).read())
+        assert "ticks_total" in data
+    finally:
+        server.shutdown()
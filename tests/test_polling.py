@@ -0,0 +1,65 @@
+import numpy as np
+
+from core import clock
+from core.polling import AdaptivePoller
+from core.runner import TaskRunner
+from core.scheduler import Wait
+from core.task import TaskContext, TaskResult
+
+
+def test_backs_off_while_static_and_resets_on_change():
+    poller = AdaptivePoller(min_interval=0.25, max_interval=2.0, backoff=2.0, clock=lambda: 0.0)
+    still = np.full((90, 160, 3), 80, dtype=np.uint8)
+
+    poller.observe(still)
+    assert poller.next_interval() == 0.25
+    intervals = []
+    for _ in range(5):
+        poller.observe(still)
+        intervals.append(poller.next_interval())
+    assert intervals == [0.5, 1.0, 2.0, 2.0, 2.0]
+
+    poller.observe(still)
+    assert poller.next_interval(acted=True) == 0.25
+
+    moved = still.copy()
+    moved[:, :80] = 200
+    poller.observe(moved)
+    assert poller.changed
+    assert poller.next_interval() == 0.25
+
+
+def test_coroutine_step_resets_backoff_and_waits_skip_capture():
+    class Tapper:
+        name = "tapper"
+
+        def tick(self, ctx):
+            yield Wait(3.0)  # 例如巨集中途點擊後等待
+            yield Wait(3.0)
+            return TaskResult()
+
+    still = np.full((90, 160, 3), 80, dtype=np.uint8)
+    virtual = clock.VirtualClock()
+    previous = clock.set_clock(virtual)
+    try:
+        poller = AdaptivePoller(min_interval=0.25, max_interval=2.0, backoff=2.0)
+        runner = TaskRunner([Tapper()], poller=poller)
+        captures = []
+
+        def tick():
+            captures.append(virtual.now)
+            ctx = TaskContext("screen.png", 0.8, None, frame=still)
+            poller.observe(ctx.screen)
+            return runner.run_tasks(ctx)
+
+        runner.tick = tick
+        intervals = []
+        for _ in range(8):
+            runner.step()
+            intervals.append(poller.interval)
+        # 任務等待期間不截圖：睡到恢復時間（單次最多 max_interval），協程前進時回到最短間隔
+        assert captures == [0.0, 3.0, 6.0, 6.25]
+        assert intervals == [0.25] * 8
+        assert virtual.now == 6.5
+    finally:
+        clock.set_clock(previous)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from core import image_recognizer, prefilter
+from core.image_recognizer import find_image_in_region
+from core.prefilter import HistogramGate, best_window_similarity, histogram
+
+
+@pytest.fixture
+def gate():
+    previous = prefilter.set_gate(HistogramGate(0.35))
+    yield prefilter.get_gate()
+    prefilter.set_gate(previous)
+
+
+def _icon() -> np.ndarray:
+    icon = np.zeros((40, 40, 3), dtype=np.uint8)
+    icon[:, :20] = (0, 0, 230)  # 紅
+    icon[:, 20:] = (230, 120, 0)  # 藍
+    return icon
+
+
+def test_integral_windows_match_direct_histogram():
+    rng = np.random.default_rng(5)
+    screen = rng.integers(0, 255, (200, 300, 3), dtype=np.uint8)
+    patch = screen[40:80, 120:160]
+    # 視窗恰好對齊時，積分直方圖與直接計算的直方圖相同（交集為 1）
+    assert best_window_similarity(screen, histogram(patch), (40, 40), stride_frac=0.25) == pytest.approx(1.0)
+
+
+def test_gate_rejects_absent_template_before_matching(gate, monkeypatch):
+    icon = _icon()
+    screen = np.full((200, 300, 3), (60, 200, 60), dtype=np.uint8)  # 綠色畫面
+    screen[150:190, 250:290] = icon
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("閘門擋下時不應做模板比對")
+
+    monkeypatch.setattr(image_recognizer, "_find_best_match", no_search)
+    assert find_image_in_region(screen, icon, (0, 0, 120, 100), value_check=False) == (None, 0.0)
+    monkeypatch.undo()
+
+    loc, score = find_image_in_region(screen, icon, (200, 100, 100, 100), value_check=False)
+    assert loc == (270, 170) and score > 0.9
+
+
+def test_gate_is_skipped_for_low_thresholds(gate, monkeypatch):
+    icon = _icon()
+    screen = np.full((200, 300, 3), (60, 200, 60), dtype=np.uint8)
+    calls = []
+    real = image_recognizer._find_best_match
+
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(image_recognizer, "_find_best_match", counting)
+    assert find_image_in_region(screen, icon, (0, 0, 120, 100), value_check=False) == (None, 0.0)
+    assert calls == []
+    # 門檻 0 只想取得實際分數：不經過閘門
+    loc, score = find_image_in_region(screen, icon, (0, 0, 120, 100), threshold=0.0, value_check=False)
+    assert calls == [1] and score != 0.0
+
+
+def test_gate_is_opt_in(monkeypatch):
+    monkeypatch.delenv("MATCH_PREFILTER", raising=False)
+    assert prefilter._gate_from_env() is None
+    monkeypatch.setenv("MATCH_PREFILTER", "1")
+    monkeypatch.setenv("PREFILTER_MIN_THRESHOLD", "0.7")
+    assert prefilter._gate_from_env().min_threshold == 0.7
@@ -0,0 +1,105 @@
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from core import anchors, image_recognizer
+from core.anchors import AnchorCache
+from core.config import load_config
+from core.fake_device import load_session
+from core.probes import PixelProbe, ProbeSet, append_probes, load_probe_sets, load_probe_sets_from_env
+from core.raw_frame import RawFrame
+from core.task import TaskContext
+from tasks.cow_level import CowLevelTask
+
+SESSION = "bench/sessions/cow_level_basic.yaml"
+
+
+def _screen() -> np.ndarray:
+    img = np.full((90, 160, 3), (10, 20, 30), dtype=np.uint8)
+    img[5, 7] = (200, 100, 50)
+    img[40, 80] = (255, 255, 255)
+    return img
+
+
+def test_check_applies_per_probe_tolerance_and_min_ratio():
+    screen = _screen()
+    exact = PixelProbe(7, 5, (200, 100, 50), tol=0)
+    near = PixelProbe(80, 40, (240, 240, 240), tol=20)  # 差 15
+    far = PixelProbe(0, 0, (60, 20, 30), tol=20)  # 差 50
+
+    result = ProbeSet("s", [exact, near, far]).evaluate(screen)
+    assert result.passed.tolist() == [True, True, False]
+    assert result.diffs.tolist() == [0, 15, 50]
+
+    assert not ProbeSet("s", [exact, near, far]).check(screen)
+    assert ProbeSet("s", [exact, near, far], min_ratio=0.6).check(screen)
+    assert not ProbeSet("empty", []).check(screen)
+
+    # RawFrame 只讀取探針位置，結果與陣列相同
+    h, w = screen.shape[:2]
+    data = struct.pack("<III", w, h, 1) + cv2.cvtColor(screen, cv2.COLOR_BGR2RGBA).tobytes()
+    assert ProbeSet("s", [exact, near], min_ratio=1.0).check(RawFrame.from_bytes(data))
+
+    with pytest.raises(ValueError):
+        ProbeSet("s", [PixelProbe(500, 5, (0, 0, 0))]).evaluate(screen)
+
+
+def test_yaml_round_trip_and_env_loader(tmp_path, monkeypatch):
+    path = str(tmp_path / "probes.yaml")
+    append_probes(path, "pause", [PixelProbe(7, 5, (200, 100, 50), tol=5)], min_ratio=0.5)
+    append_probes(path, "pause", [PixelProbe(80, 40, (255, 255, 255))])
+
+    sets = load_probe_sets(path)
+    assert list(sets) == ["pause"]
+    assert sets["pause"].min_ratio == 0.5
+    assert sets["pause"].probes == [PixelProbe(7, 5, (200, 100, 50), 5), PixelProbe(80, 40, (255, 255, 255), 20)]
+
+    monkeypatch.setenv("PROBES_FILE", path)
+    assert list(load_probe_sets_from_env()) == ["pause"]
+    monkeypatch.setenv("PROBES_FILE", str(tmp_path / "missing.yaml"))
+    assert load_probe_sets_from_env() == {}
+
+
+def _pause_icon() -> np.ndarray:
+    # 比對只用色相/飽和度，圖示需有顏色變化
+    icon = np.full((30, 30, 3), (200, 120, 40), dtype=np.uint8)
+    icon[5:25, 8:13] = (40, 60, 220)
+    icon[5:25, 17:22] = (40, 200, 60)
+    return icon
+
+
+def test_live_exit_sequence_locates_pause(tmp_path, monkeypatch):
+    screen = np.full((1080, 1920, 3), (90, 140, 160), dtype=np.uint8)
+    screen[30:60, 20:50] = _pause_icon()  # 中心 (35, 45)，區域中心為 (32, 37)
+    cv2.imwrite(str(tmp_path / "pause.png"), _pause_icon())
+    monkeypatch.setenv("PAUSE_IMAGE", str(tmp_path / "pause.png"))
+    monkeypatch.setenv("PROBES_FILE", "")
+    previous = anchors.set_cache(AnchorCache())
+
+    device = load_session(SESSION)
+    monkeypatch.chdir(tmp_path)
+    try:
+        with device.installed():
+            task = CowLevelTask(load_config(None).task("cow_level"))
+            ctx = TaskContext("unused.png", 0.8, None, frame=screen)
+            list(task._simple_exit_sequence(ctx))
+            assert len(anchors.get_cache()) == 1
+
+            def no_search(*args, **kwargs):
+                raise AssertionError("定點驗證命中時不應做模板比對")
+
+            # 第二次由定點驗證命中，不再做多尺度比對
+            monkeypatch.setattr(image_recognizer, "_find_best_match", no_search)
+            list(task._simple_exit_sequence(ctx))
+            taps = [e.args for e in device.inputs if e.kind == "tap"]
+            assert taps[0] == (35, 45) and taps[4] == (35, 45)
+
+            # 探針組未通過時沿用區域中心
+            task.probe_sets = {"pause": ProbeSet("pause", [PixelProbe(35, 45, (0, 0, 255))])}
+            list(task._simple_exit_sequence(ctx))
+            assert [e.args for e in device.inputs if e.kind == "tap"][8] == (32, 37)
+        assert not (tmp_path / "debug").exists()  # 比對除錯影像預設不輸出
+    finally:
+        anchors.set_cache(previous)
@@ -0,0 +1,39 @@
+import struct
+
+import cv2
+import numpy as np
+
+from core.image_recognizer import find_image_in_region
+from core.raw_frame import RawFrame
+
+
+def _screencap_bytes(bgr: np.ndarray, header: int = 16) -> bytes:
+    h, w = bgr.shape[:2]
+    rgba = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGBA)
+    head = struct.pack("<III", w, h, 1) + (b"\0" * (header - 12))
+    return head + rgba.tobytes()
+
+
+def test_crop_matches_full_decode():
+    bgr = np.random.default_rng(0).integers(0, 256, (90, 160, 3), dtype=np.uint8)
+    for header in (12, 16):
+        frame = RawFrame.from_bytes(_screencap_bytes(bgr, header))
+        assert frame.shape == bgr.shape
+        region = (17, 9, 40, 25)
+        x, y, w, h = region
+        np.testing.assert_array_equal(frame.crop(region), bgr[y:y + h, x:x + w])
+        assert frame.pixel(5, 7) == tuple(int(v) for v in bgr[7, 5])
+        np.testing.assert_array_equal(frame.to_bgr(), bgr)
+
+
+def test_region_match_on_raw_frame_equals_path(tmp_path):
+    screen = cv2.imread("screen.png")
+    region = (560, 260, 370, 60)
+    x, y, w, h = region
+    template_path = str(tmp_path / "label.png")
+    cv2.imwrite(template_path, screen[y + 10:y + 50, x + 100:x + 220])
+
+    frame = RawFrame.from_bytes(_screencap_bytes(screen))
+    expected = find_image_in_region("screen.png", template_path, region, threshold=0.5, value_check=False)
+    actual = find_image_in_region(frame, template_path, region, threshold=0.5, value_check=False)
+    assert actual == expected
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+from core import recorder
+from core.recorder import SessionReader, SessionRecorder, list_chunks
+
+
+def _frame(seed: int, *, noise: bool = False) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    f = rng.integers(0, 255, (90, 160, 3), dtype=np.uint8)
+    if noise:
+        f[40:42, 70:72] = 255  # 少量像素不同：近似重複，存成差分
+    return f
+
+
+def test_frames_dedup_delta_and_roundtrip(tmp_path):
+    rec = SessionRecorder(str(tmp_path), dedup_bits=-1)
+    recorder.set_recorder(rec)
+    try:
+        frames = [_frame(0), _frame(0), _frame(0, noise=True), _frame(3), _frame(0)]
+        for i, f in enumerate(frames):
+            recorder.record_frame(f)
+            recorder.note("ocr", region=[0, 0, 10, 10], text=f"t{i}")
+        recorder.note("tap", x=5, y=6)
+    finally:
+        recorder.set_recorder(None)
+        rec.close()
+
+    assert rec.stats == {"frames": 5, "keyframes": 2, "deltas": 1, "duplicates": 2}
+    got = list(SessionReader(str(tmp_path)).frames())
+    assert [g.seq for g in got] == [1, 2, 3, 4, 5]
+    for g, f in zip(got, frames):
+        assert np.array_equal(g.frame, f)
+    assert [e["text"] for e in got[0].events] == ["t0"]
+    assert [e["kind"] for e in got[-1].events] == ["ocr", "tap"]
+
+
+def test_rotation_respects_disk_budget(tmp_path):
+    rec = SessionRecorder(str(tmp_path), chunk_frames=1, max_bytes=1)
+    for i in range(4):
+        rec.record_frame(_frame(i))
+    rec.close()
+    chunks = list_chunks(str(tmp_path))
+    # 每張一個分段，超過預算的舊分段都被刪除，只留下最後一個
+    assert [os.path.basename(p) for p in chunks] == ["chunk-000004.zip"]
+    assert len(list(SessionReader(str(tmp_path)).frames())) == 1
@@ -0,0 +1,82 @@
+import numpy as np
+
+from core import adb_controller
+from core.config import load_config
+from core.image_utils import thumbnail
+from core.probes import PixelProbe
+from core.runner import TaskRunner
+from core.scene import THUMBNAIL_SIZE, SceneClassifier, SceneMatch, SceneSpec, load_scene_specs, save_scene
+from core.task import TaskResult
+from tasks.cow_level import CowLevelTask
+
+
+def _screen(bgr) -> np.ndarray:
+    img = np.full((90, 160, 3), bgr, dtype=np.uint8)
+    img[10:20, 10:20] = (255, 255, 255)
+    return img
+
+
+def test_classifier_picks_scene_and_rejects_low_confidence(tmp_path):
+    battle, menu = _screen((40, 40, 200)), _screen((200, 40, 40))
+    path = str(tmp_path / "scenes.yaml")
+    save_scene(path, "in_battle", thumb=thumbnail(battle, THUMBNAIL_SIZE), probes=[PixelProbe(80, 60, (40, 40, 200))])
+    save_scene(path, "pause_menu", thumb=thumbnail(menu, THUMBNAIL_SIZE))
+    save_scene(path, "pause_menu", probes=[PixelProbe(80, 60, (200, 40, 40)), PixelProbe(15, 15, (255, 255, 255))])
+
+    specs = load_scene_specs(path)
+    assert [s.name for s in specs] == ["in_battle", "pause_menu"]
+    assert len(specs[1].probes) == 2 and specs[1].thumbnail.shape == (9, 16)
+
+    classifier = SceneClassifier(specs, min_confidence=0.7)
+    assert classifier.classify(battle).scene == "in_battle"
+    match = classifier.classify(menu)
+    assert match.scene == "pause_menu" and match.confidence == 1.0
+    assert not classifier.classify(_screen((0, 200, 0))).known
+
+
+class Counting:
+    def __init__(self, name, scenes=None):
+        self.name, self.scenes, self.ticks = name, scenes, 0
+
+    def tick(self, ctx):
+        self.ticks += 1
+        return TaskResult()
+
+
+class FixedClassifier(SceneClassifier):
+    def __init__(self, scene):
+        super().__init__([SceneSpec(scene)])
+        self.scene, self.calls = scene, 0
+
+    def classify(self, screen):
+        self.calls += 1
+        return SceneMatch(self.scene, 1.0)
+
+
+def test_runner_gates_tasks_by_scene_and_skips_unused_classifier():
+    frame = _screen((0, 0, 0))
+    source = type("Source", (), {"grab": lambda self, timeout=5.0: frame})()
+    classifier = FixedClassifier("pause_menu")
+
+    free = Counting("free")
+    runner = TaskRunner([free], frame_source=source, scene_classifier=classifier)
+    adb_controller.register_frame_source(None, source)
+    try:
+        runner.tick()
+        assert free.ticks == 1 and classifier.calls == 0  # 沒有任務宣告 scenes：不分類
+
+        gated = Counting("gated", scenes={"level_select"})
+        runner.tasks.append(gated)
+        runner.tick()
+        assert classifier.calls == 1 and gated.ticks == 0 and free.ticks == 2
+        classifier.scene = "level_select"
+        runner.tick()
+        assert gated.ticks == 1
+    finally:
+        adb_controller.unregister_frame_source(None)
+
+
+def test_cow_level_scenes_come_from_config(monkeypatch):
+    assert CowLevelTask(load_config(None).task("cow_level")).scenes is None
+    monkeypatch.setenv("COW_SCENES", "level_select, in_battle")
+    assert CowLevelTask(load_config(None).task("cow_level")).scenes == {"level_select", "in_battle"}
@@ -0,0 +1,107 @@
+from core.runner import TaskRunner
+from core.scheduler import CooperativeScheduler, Wait, WaitUntil
+from core.task import TaskContext, TaskResult
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _ctx(frame=None) -> TaskContext:
+    return TaskContext(screenshot_path="screen.png", match_threshold=0.8, device_id=None, frame=frame)
+
+
+class Sleeper:
+    name = "sleeper"
+
+    def __init__(self) -> None:
+        self.seen = []
+
+    def tick(self, ctx):
+        self.seen.append(ctx.frame)
+        yield Wait(10)
+        self.seen.append(ctx.frame)
+        ok = yield WaitUntil(lambda c: c.frame == "ready", timeout=5, poll=1)
+        return TaskResult(acted=ok, message="done")
+
+
+class Plain:
+    name = "plain"
+
+    def __init__(self) -> None:
+        self.ticks = 0
+
+    def tick(self, ctx):
+        self.ticks += 1
+        return TaskResult()
+
+
+def test_suspended_task_does_not_block_others():
+    clock = FakeClock()
+    sched = CooperativeScheduler(clock=clock)
+    sleeper, plain = Sleeper(), Plain()
+
+    assert sched.run(sleeper, _ctx("a")) is None
+    assert sched.next_wake() == 10
+    for t in range(1, 10):
+        clock.now = t
+        assert sched.run(sleeper, _ctx("b")) is None
+        sched.run(plain, _ctx("b"))
+    assert plain.ticks == 9
+
+    clock.now = 10
+    assert sched.run(sleeper, _ctx("c")) is None
+    # 恢復時 context 已更新為最新畫面
+    assert sleeper.seen == ["a", "c"]
+    clock.now = 11
+    result = sched.run(sleeper, _ctx("ready"))
+    assert result.acted is True and not sched.is_suspended(sleeper)
+
+
+def test_wait_until_times_out():
+    clock = FakeClock()
+    sched = CooperativeScheduler(clock=clock)
+    sleeper = Sleeper()
+    sched.run(sleeper, _ctx())
+    clock.now = 10
+    sched.run(sleeper, _ctx())
+    results = []
+    for t in range(11, 16):
+        clock.now = t
+        results.append(sched.run(sleeper, _ctx("busy")))
+    assert results[-1].acted is False
+    assert all(r is None for r in results[:-1])
+
+
+def test_runner_interleaves_generator_and_plain_tasks():
+    sleeper, plain = Sleeper(), Plain()
+    runner = TaskRunner([sleeper, plain])
+    clock = FakeClock()
+    runner.scheduler.clock = clock
+    runner.run_tasks(_ctx("a"))
+    runner.run_tasks(_ctx("b"))
+    assert plain.ticks == 2 and runner.scheduler.is_suspended(sleeper)
+
+
+def test_wait_until_waits_poll_before_first_check():
+    class Ready:
+        name = "ready"
+
+        def tick(self, ctx):
+            ok = yield WaitUntil(lambda c: True, timeout=5, poll=0.5)
+            return TaskResult(acted=ok)
+
+    task = Ready()
+    runner = TaskRunner([task])
+    clock = FakeClock()
+    runner.scheduler.clock = clock
+    runner.run_tasks(_ctx())
+    # 條件已成立也不在同一時間恢復，Runner 不會以零延遲重新截圖
+    assert runner.next_delay(False) == 0.5
+    assert runner.scheduler.run(task, _ctx()) is None
+    clock.now = 0.5
+    assert runner.scheduler.run(task, _ctx()).acted is True
@@ -0,0 +1,110 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from core.adb_controller import capture_screen, register_frame_source, unregister_frame_source
+from core.screen_stream import ScreenRecordStream
+
+
+def _write_clip(path: str, frames: int = 10, size=(64, 48), fps: float = 50.0) -> None:
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+    if not writer.isOpened():
+        pytest.skip("此環境的 OpenCV 無法寫入測試影片")
+    for i in range(frames):
+        writer.write(np.full((h, w, 3), i * 20, np.uint8))
+    writer.release()
+
+
+def test_stream_from_local_file(tmp_path):
+    clip = str(tmp_path / "clip.avi")
+    _write_clip(clip)
+
+    with ScreenRecordStream(source=clip, restart_seconds=60) as stream:
+        frame, seq = stream.wait_frame(timeout=5.0)
+        assert frame.shape == (48, 64, 3)
+        # 影片播完會重新開啟，序號持續遞增
+        deadline = time.monotonic() + 5.0
+        while stream.frame_count <= 10 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert stream.restarts >= 1
+        assert stream.frame_count > 10
+        assert stream.fps > 0
+
+
+def test_capture_screen_uses_registered_source(tmp_path):
+    clip = str(tmp_path / "clip.avi")
+    _write_clip(clip)
+    out = str(tmp_path / "screen.png")
+
+    with ScreenRecordStream(source=clip) as stream:
+        register_frame_source("fake:5555", stream)
+        try:
+            capture_screen(out, device_id="fake:5555")
+        finally:
+            unregister_frame_source("fake:5555")
+
+    img = cv2.imread(out)
+    assert img is not None and img.shape == (48, 64, 3)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="需要 ffmpeg 解碼 H.264 管線")
+def test_stream_from_pipe_stand_in(tmp_path):
+    raw = tmp_path / "clip.h264"
+    os.system(
+        f"ffmpeg -loglevel error -f lavfi -i testsrc=size=64x48:rate=30 -t 1 "
+        f"-c:v libx264 -f h264 {raw}"
+    )
+    if not raw.exists():
+        pytest.skip("ffmpeg 無法產生 H.264 測試檔")
+
+    with ScreenRecordStream(size=(64, 48), command=["cat", str(raw)]) as stream:
+        frame = stream.grab(timeout=5.0)
+        assert frame.shape == (48, 64, 3)
+
+
+def test_kill_procs_is_race_free_with_stop():
+    stream = ScreenRecordStream()
+    sleeper = [sys.executable, "-c", "import time; time.sleep(30)"]
+    procs = [stream._track(subprocess.Popen(sleeper)) for _ in range(3)]
+    # 重啟計時器與 stop() 同時終止子行程
+    killers = [threading.Thread(target=stream._kill_procs) for _ in range(2)]
+    for t in killers:
+        t.start()
+    stream.stop()
+    for t in killers:
+        t.join()
+    assert all(p.poll() is not None for p in procs)
+
+    # stop() 之後才登記的子行程（啟動與停止競賽）會立即被終止
+    late = stream._track(subprocess.Popen(sleeper))
+    assert late.poll() is not None and stream._procs == []
+
+
+def test_restarts_back_off_and_give_up_without_frames():
+    stream = ScreenRecordStream(restart_backoff=0.02, max_backoff=0.08, max_failures=4)
+    runs = []
+
+    def exits_at_once(started):
+        # 例如裝置離線：adb / ffmpeg 立即正常結束，沒有任何影格
+        runs.append(time.monotonic())
+        if len(runs) == 2:
+            stream._publish(np.zeros((4, 4, 3), np.uint8))
+
+    stream._run_pipe = exits_at_once
+    with stream:
+        stream._thread.join(timeout=5.0)
+        assert not stream._thread.is_alive()
+        with pytest.raises(RuntimeError):
+            stream.wait_frame(timeout=5.0, after_seq=1)
+    # 第 2 次有影格，失敗次數歸零；之後等待 0.02、0.02、0.04、0.08 秒，連續 4 次失敗後放棄
+    gaps = [b - a for a, b in zip(runs, runs[1:])]
+    assert len(runs) == 6 and stream.failed and stream.failures == 4
+    assert all(g >= d - 0.005 for g, d in zip(gaps, [0.02, 0.02, 0.02, 0.04, 0.08]))
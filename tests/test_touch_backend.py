@@ -0,0 +1,69 @@
+import statistics
+import subprocess
+import sys
+import time
+
+from core import adb_controller
+from core.input_macro import InputMacro
+from core.touch_backend import LocalTouchAgent, MinitouchClient
+
+
+def test_tap_and_swipe_go_through_persistent_connection():
+    with LocalTouchAgent(size=(960, 540)) as agent:
+        client = MinitouchClient("127.0.0.1", agent.port, screen_size=(1920, 1080))
+        adb_controller.register_touch_backend(None, client)
+        try:
+            latencies = []
+            for i in range(20):
+                t0 = time.perf_counter()
+                adb_controller.tap(100 + i, 200, delay=0)
+                assert agent.wait_for(2 * (i + 1))
+                latencies.append(agent.events[-1].at - t0)
+            adb_controller.swipe(0, 0, 1900, 1000, duration_ms=64)
+            assert agent.wait_for(2 * 20 + 2 + 4)
+        finally:
+            adb_controller.unregister_touch_backend(None)
+
+    # 觸控範圍為 959x539，畫面座標依比例換算
+    assert agent.taps[0] == (50, 100) and agent.taps[-1] == (0, 0)
+    assert [e.kind for e in agent.events[-6:]] == ["d", "m", "m", "m", "m", "u"]
+    assert (agent.events[-2].x, agent.events[-2].y) == (949, 499)
+    assert statistics.median(latencies) < 0.01
+
+
+def test_macro_compiles_sleeps_into_agent_waits():
+    with LocalTouchAgent() as agent:
+        adb_controller.register_touch_backend(None, MinitouchClient("127.0.0.1", agent.port))
+        try:
+            handle = InputMacro().tap(10, 20).sleep(0.05).tap(30, 40).start()
+            assert not handle.done() and 0 < handle.remaining() <= 0.05
+            assert agent.wait_for(4)
+        finally:
+            adb_controller.unregister_touch_backend(None)
+    downs = [e for e in agent.events if e.kind == "d"]
+    assert [(e.x, e.y) for e in downs] == [(10, 20), (30, 40)]
+    assert downs[1].at - downs[0].at >= 0.045
+
+
+def test_portrait_touch_range_is_rotated():
+    with LocalTouchAgent(size=(1080, 1920)) as agent:
+        client = MinitouchClient("127.0.0.1", agent.port, screen_size=(1920, 1080))
+        assert client._scale(0, 0) == (1079, 0) and client._scale(1920, 1080) == (0, 1919)
+        client.rotation = 270
+        assert client._scale(0, 0) == (0, 1919)
+        client.close()
+
+
+def test_close_stops_started_agent_and_forward(monkeypatch):
+    commands = []
+    monkeypatch.setattr(adb_controller, "_run", lambda cmd, **kwargs: commands.append(cmd) or "")
+    with LocalTouchAgent() as agent:
+        proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        client = MinitouchClient("127.0.0.1", agent.port, agent=proc, device_id="emu:5555")
+        # 重新連線只換 socket，不終止裝置端程式
+        client._disconnect()
+        client.tap(1, 1)
+        assert proc.poll() is None
+        client.close()
+    assert proc.poll() is not None
+    assert commands == [f"adb -s emu:5555 forward --remove tcp:{agent.port}"]
@@ -0,0 +1,36 @@
+import json
+
+from core import tracing
+
+
+def test_spans_rotate_into_valid_json(tmp_path):
+    path = str(tmp_path / "trace.json")
+    writer = tracing.TraceWriter(path, max_bytes=2048, backups=2)
+    tracing.set_writer(writer)
+    try:
+        for i in range(60):
+            with tracing.span("find_text", cat="ocr", region=i):
+                pass
+        tracing.sleep(0.0)
+    finally:
+        tracing.set_writer(None)
+
+    files = [path + ".2", path + ".1", path]  # 由舊到新
+    events = []
+    for f in files:
+        with open(f, encoding="utf-8") as fh:
+            events += [e for e in json.load(fh) if e]
+    assert not (tmp_path / "trace.json.3").exists()
+    spans = [e for e in events if e["ph"] == "X"]
+    assert spans[-1]["name"] == "sleep"
+    assert all(e["dur"] >= 0 for e in spans)
+    # 每個檔案都帶有軌道名稱的 metadata
+    with open(path, encoding="utf-8") as fh:
+        assert any(e.get("ph") == "M" for e in json.load(fh) if e)
+
+
+def test_disabled_tracing_is_noop():
+    assert not tracing.enabled()
+    with tracing.span("tap"):
+        pass
+    tracing.record("x", tracing.now_us())
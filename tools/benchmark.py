@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""離線效能基準：以錄製的畫面重播辨識熱路徑，輸出 ops/sec、p50/p95/p99 與峰值 RSS。
+
+    python3 tools/benchmark.py                          # 以 screen.png 與 bench/frames/ 執行
+    python3 tools/benchmark.py --save-baseline          # 將結果存為基準
+    python3 tools/benchmark.py --max-regression 0.2     # 與基準相比變慢超過 20% 即失敗（exit 1）
+    python3 tools/benchmark.py --prefilter-report       # 直方圖閘門的擋下率與誤擋率（有誤擋時 exit 1）
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+# 允許直接以腳本執行時匯入專案內的 core 模組
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DEFAULT_FRAMES = ["screen.png", "bench/frames/*.png", "bench/frames/*.raw"]
+DEFAULT_BASELINE = "bench/baseline.json"
+
+
+@dataclass
+class BenchResult:
+    name: str
+    iterations: int
+    ops_per_sec: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_rss_mb: float
+
+
+@dataclass
+class Case:
+    name: str
+    fn: Callable[[], object]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB、macOS 以 bytes 回報
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name: str, fn: Callable[[], object], *, iterations: int, warmup: int = 1) -> BenchResult:
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(iterations, dtype=np.float64)
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - t0
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000.0
+    total = float(samples.sum())
+    return BenchResult(
+        name=name,
+        iterations=iterations,
+        ops_per_sec=iterations / total if total > 0 else float("inf"),
+        p50_ms=float(p50),
+        p95_ms=float(p95),
+        p99_ms=float(p99),
+        peak_rss_mb=_peak_rss_mb(),
+    )
+
+
+def _tesseract_available() -> bool:
+    if shutil.which("tesseract"):
+        return True
+    try:
+        import pytesseract
+
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def available_engines() -> list[str]:
+    from core import region_tools
+
+    engines = []
+    if _tesseract_available():
+        engines.append("tesseract")
+    if region_tools._HAS_EASYOCR:
+        engines.append("easyocr")
+    return engines
+
+
+def load_frames(patterns: list[str], *, in_memory: bool) -> list[tuple[str, object]]:
+    """展開畫面清單；`.raw` 為 screencap 原始輸出（RawFrame），其餘以 OpenCV 讀取。"""
+    from core.image_utils import load_screen
+    from core.raw_frame import RawFrame
+
+    frames = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if path.endswith(".raw"):
+                frames.append((path, RawFrame.from_file(path)))
+            else:
+                frames.append((path, load_screen(path) if in_memory else path))
+    return frames
+
+
+def build_cases(frames: list[tuple[str, object]], *, engines: list[str]) -> list[Case]:
+    from core.anchors import AnchorCache
+    from core.config import get_config_store
+    from core.feature_matcher import clear_frame_cache, find_image_by_features
+    from core.image_recognizer import find_image_in_region, find_image_on_screen
+    from core.image_utils import load_screen
+    from core.raw_frame import RawFrame
+    from core.region_tools import find_text
+    from core.text_recognizer import extract_text_from_region
+
+    task = get_config_store().current.task("cow_level")
+    template = task.templates["cow_target"]
+    text_regions = {k: task.regions[k] for k in ("left", "right", "random_text") if task.regions.get(k)}
+    match_region = task.regions["left"]
+
+    # 定點驗證的命中成本：以比對區域本身作為已學習的錨點
+    anchor_cache = AnchorCache()
+
+    cases: list[Case] = []
+    for path, screen in frames:
+        frame = os.path.basename(path)
+        # 執行時 TaskContext 每次擷取只解碼一次，定點驗證拿到的是已解碼的畫面（RawFrame 則只讀取取樣點）
+        decoded = screen if isinstance(screen, RawFrame) else load_screen(screen)
+        anchor_cache.learn(frame, decoded, match_region, 1.0, "bench")
+        cases.append(Case(
+            f"{frame}:anchor_verify",
+            lambda s=decoded, k=frame: anchor_cache.verify(k, s, "bench"),
+        ))
+        if template.available:
+            cases.append(Case(
+                f"{frame}:find_image_on_screen",
+                lambda s=screen: find_image_on_screen(s, template.source, template.threshold),
+            ))
+            cases.append(Case(
+                f"{frame}:find_image_on_screen[parallel]",
+                lambda s=screen: find_image_on_screen(s, template.source, template.threshold, parallel=True),
+            ))
+            cases.append(Case(
+                f"{frame}:find_image_by_features[orb]",
+                lambda s=screen: (clear_frame_cache(), find_image_by_features(s, template.source, method="orb")),
+            ))
+            cases.append(Case(
+                f"{frame}:find_image_in_region",
+                lambda s=screen: find_image_in_region(s, template.source, match_region, template.threshold),
+            ))
+        for region_name, region in text_regions.items():
+            for engine in engines:
+                cases.append(Case(
+                    f"{frame}:find_text[{engine}]:{region_name}",
+                    lambda s=screen, r=region, e=engine: find_text(s, r, engine=e),
+                ))
+            if "tesseract" in engines:
+                cases.append(Case(
+                    f"{frame}:extract_text_from_region:{region_name}",
+                    lambda s=screen, r=region: extract_text_from_region(s, r),
+                ))
+    return cases
+
+
+def prefilter_report(frames: list[tuple[str, object]]) -> dict:
+    """對每張畫面 × 每個模板（依任務設定的區域）比較直方圖閘門與完整比對的結果。
+
+    reject_rate 為被閘門擋下的比例；false_reject_rate 為完整比對會命中卻被擋下的比例（以命中數為分母）。
+    """
+    from core import prefilter
+    from core.config import get_config_store
+    from core.image_recognizer import _load_image, find_image_in_region, find_image_on_screen
+    from core.image_utils import crop_screen
+
+    gate = prefilter.get_gate() or prefilter.HistogramGate()
+    task = get_config_store().current.task("cow_level")
+    checks = []
+    for tag, spec in task.templates.items():
+        if not spec.available or spec.method != "template":
+            continue
+        regions = [task.regions.get(tag)]
+        if tag == "cow_target":
+            regions = [task.regions.get("left"), task.regions.get("right")]
+        checks.extend((tag, spec, region) for region in regions)
+
+    rows = []
+    previous = prefilter.set_gate(None)
+    try:
+        for path, screen in frames:
+            image = _load_image(screen, "螢幕截圖")
+            for tag, spec, region in checks:
+                kwargs = dict(threshold=spec.threshold, value_check=spec.value_check, scales=spec.scales)
+                t0 = time.perf_counter()
+                if region is None:
+                    loc, score = find_image_on_screen(image, spec.source, **kwargs)
+                else:
+                    loc, score = find_image_in_region(image, spec.source, region, **kwargs)
+                t1 = time.perf_counter()
+                search = image if region is None else crop_screen(image, region)
+                ok, sim = gate.passes(search, spec.image, spec.source, spec.scales)
+                t2 = time.perf_counter()
+                rows.append({
+                    "frame": os.path.basename(path), "tag": tag, "region": list(region) if region else None,
+                    "found": loc is not None, "score": round(float(score), 4),
+                    "passed": ok, "similarity": round(sim, 4),
+                    "match_ms": (t1 - t0) * 1000.0, "gate_ms": (t2 - t1) * 1000.0,
+                })
+    finally:
+        prefilter.set_gate(previous)
+
+    found = sum(r["found"] for r in rows)
+    rejected = [r for r in rows if not r["passed"]]
+    false_rejects = sum(r["found"] for r in rejected)
+    saved = sum(r["match_ms"] - r["gate_ms"] for r in rejected) - sum(r["gate_ms"] for r in rows if r["passed"])
+    return {
+        "min_similarity": gate.min_similarity,
+        "calls": len(rows),
+        "found": found,
+        "rejected": len(rejected),
+        "reject_rate": len(rejected) / len(rows) if rows else 0.0,
+        "false_rejects": false_rejects,
+        "false_reject_rate": false_rejects / found if found else 0.0,
+        "saved_ms": saved,
+        "rows": rows,
+    }
+
+
+def _print_prefilter(report: dict) -> None:
+    print(f"{'frame:tag':<34} {'found':>5} {'score':>6} {'sim':>6} {'gate':>6} {'match ms':>9} {'gate ms':>8}")
+    for r in report["rows"]:
+        gate = "pass" if r["passed"] else "REJECT"
+        print(
+            f"{r['frame'] + ':' + r['tag']:<34} {str(r['found']):>5} {r['score']:>6.3f} {r['similarity']:>6.3f} "
+            f"{gate:>6} {r['match_ms']:>9.2f} {r['gate_ms']:>8.2f}"
+        )
+    print(
+        f"[PREFILTER] 下限={report['min_similarity']:.2f} 呼叫={report['calls']} 擋下={report['rejected']} "
+        f"({report['reject_rate'] * 100:.1f}%)，誤擋={report['false_rejects']}/{report['found']} "
+        f"({report['false_reject_rate'] * 100:.1f}%)，節省約 {report['saved_ms']:.1f} ms"
+    )
+
+
+def compare(
+    results: list[BenchResult], baseline: dict, *, max_regression: float, metric: str = "p50_ms"
+) -> list[str]:
+    """回傳超過回歸門檻的項目說明；基準中沒有的項目不比較。"""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    failures = []
+    for r in results:
+        old = base.get(r.name)
+        if not old or not old.get(metric):
+            continue
+        new = getattr(r, metric)
+        if metric == "ops_per_sec":
+            change = old[metric] / new - 1.0 if new > 0 else float("inf")
+        else:
+            change = new / old[metric] - 1.0
+        if change > max_regression:
+            failures.append(f"{r.name}: {metric} {old[metric]:.2f} → {new:.2f}（變慢 {change * 100:.0f}%）")
+    return failures
+
+
+def _print_table(results: list[BenchResult]) -> None:
+    width = max([len(r.name) for r in results] + [4])
+    print(f"{'case':<{width}}  {'ops/s':>9}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'RSS MB':>7}")
+    for r in results:
+        print(
+            f"{r.name:<{width}}  {r.ops_per_sec:>9.1f}  {r.p50_ms:>8.2f}  {r.p95_ms:>8.2f}  "
+            f"{r.p99_ms:>8.2f}  {r.peak_rss_mb:>7.1f}"
+        )
+
+
+@contextlib.contextmanager
+def _quiet(verbose: bool):
+    """辨識函式每次比對都會記錄 INFO；量測期間只保留 WARNING 以上，避免記錄成本影響結果。"""
+    if verbose:
+        yield
+        return
+    previous = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(previous)
+
+
+def run(args: argparse.Namespace) -> int:
+    frames = load_frames(args.frames or DEFAULT_FRAMES, in_memory=args.in_memory)
+    if not frames:
+        print("找不到任何畫面（預設為 screen.png 與 bench/frames/）", file=sys.stderr)
+        return 2
+    engines = [e for e in available_engines() if not args.engines or e in args.engines]
+    if not engines:
+        print("[BENCH] 沒有可用的 OCR 引擎，略過 find_text / extract_text_from_region")
+
+    if args.prefilter_report:
+        with _quiet(args.verbose):
+            report = prefilter_report(frames)
+        _print_prefilter(report)
+        if args.json:
+            Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        return 1 if report["false_rejects"] else 0
+
+    results = []
+    for case in build_cases(frames, engines=engines):
+        if args.filter and args.filter not in case.name:
+            continue
+        with _quiet(args.verbose):
+            results.append(measure(case.name, case.fn, iterations=args.iterations, warmup=args.warmup))
+    _print_table(results)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "engines": engines,
+        "results": [asdict(r) for r in results],
+    }
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        Path(args.baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.baseline).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[BENCH] 已儲存基準：{args.baseline}")
+        return 0
+
+    if args.max_regression is not None and os.path.exists(args.baseline):
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        failures = compare(results, baseline, max_regression=args.max_regression, metric=args.metric)
+        if failures:
+            print(f"[BENCH] 效能回歸（門檻 {args.max_regression * 100:.0f}%）：", file=sys.stderr)
+            for line in failures:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"[BENCH] 與基準相比無超過 {args.max_regression * 100:.0f}% 的回歸")
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded frames through the recognizers and report latency.")
+    parser.add_argument("frames", nargs="*", help="Frame files or globs (.png/.jpg, or .raw screencap dumps)")
+    parser.add_argument("--iterations", type=int, default=int(os.getenv("BENCH_ITERATIONS", "20")))
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--in-memory", action="store_true", help="Decode frames once up front (excludes file I/O)")
+    parser.add_argument("--engines", nargs="*", help="OCR engines to include (default: all available)")
+    parser.add_argument("--filter", help="Only run cases whose name contains this text")
+    parser.add_argument(
+        "--prefilter-report",
+        action="store_true",
+        help="Report histogram prefilter rejection and false-reject rates instead of timing cases",
+    )
+    parser.add_argument("--json", help="Also write the report to this path")
+    parser.add_argument("--verbose", action="store_true", help="Keep the recognizers' own output")
+    parser.add_argument("--baseline", default=os.getenv("BENCH_BASELINE", DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    env_regression = os.getenv("BENCH_MAX_REGRESSION", "").strip()
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=float(env_regression) if env_regression else None,
+        help="Fail when a case is slower than baseline by more than this fraction (e.g. 0.2)",
+    )
+    parser.add_argument("--metric", default="p50_ms", choices=["p50_ms", "p95_ms", "p99_ms", "ops_per_sec"])
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
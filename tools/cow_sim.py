@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""cow_level 星數/退出策略的向量化蒙地卡羅模擬。
+
+以日誌擬合左右兩側關卡（及隨機副本揭曉結果）的出現機率，搭配實測的各步驟延遲，
+一次模擬數百萬輪，比較不同策略每小時（實際時間）可遇到的奶牛關次數。
+
+    python3 tools/cow_sim.py --log logs/run.log --metrics debug/metrics.json
+    python3 tools/cow_sim.py --cutoffs 8 10 12 --min-cows 1 2 3 --rounds 2000000
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+# 允許直接以腳本執行時匯入專案內的模組
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tasks.cow_level import STAR_BY_LABEL, _normalize_text  # noqa: E402
+
+OTHER = "其他"
+LABELS = list(STAR_BY_LABEL) + [OTHER]
+COW = LABELS.index("奶牛關")
+RANDOM = LABELS.index("隨機副本")
+BLESSING = LABELS.index("賜福關")
+
+_LEFT_RE = re.compile(r"左區域文字='([^']*)'")
+_RIGHT_RE = re.compile(r"右區域文字='([^']*)'")
+_REVEAL_RE = re.compile(r"隨機副本的關卡為：'([^']*)'")
+
+
+def label_index(text: str) -> int:
+    t = _normalize_text(text or "")
+    for i, label in enumerate(LABELS[:-1]):
+        if label in t:
+            return i
+    return len(LABELS) - 1
+
+
+# ----------------------------------------------------------------------
+# 關卡出現機率
+# ----------------------------------------------------------------------
+@dataclass
+class OfferModel:
+    """左右兩側各自的關卡類別分布，以及隨機副本揭曉後的分布（索引對應 LABELS）。"""
+
+    left: np.ndarray
+    right: np.ndarray
+    reveal: np.ndarray
+    observations: dict = field(default_factory=dict)
+
+    @classmethod
+    def uniform(cls) -> "OfferModel":
+        p = np.full(len(LABELS), 1.0 / len(LABELS))
+        return cls(p, p.copy(), p.copy())
+
+    @classmethod
+    def fit(cls, lines: Iterable[str], *, smoothing: float = 1.0) -> "OfferModel":
+        counts = {k: np.zeros(len(LABELS)) for k in ("left", "right", "reveal")}
+        for line in lines:
+            for key, rx in (("left", _LEFT_RE), ("right", _RIGHT_RE), ("reveal", _REVEAL_RE)):
+                m = rx.search(line)
+                if m:
+                    counts[key][label_index(m.group(1))] += 1
+
+        def probs(c: np.ndarray) -> np.ndarray:
+            c = c + smoothing
+            return c / c.sum()
+
+        return cls(
+            probs(counts["left"]),
+            probs(counts["right"]),
+            probs(counts["reveal"]),
+            observations={k: int(v.sum()) for k, v in counts.items()},
+        )
+
+    @classmethod
+    def fit_files(cls, paths: list[str], *, smoothing: float = 1.0) -> "OfferModel":
+        def lines():
+            for p in paths:
+                with open(p, "r", encoding="utf-8", errors="replace") as f:
+                    yield from f
+
+        return cls.fit(lines(), smoothing=smoothing)
+
+    def describe(self) -> str:
+        rows = []
+        for i, label in enumerate(LABELS):
+            rows.append(f"  {label:<6} left={self.left[i]:.3f} right={self.right[i]:.3f} reveal={self.reveal[i]:.3f}")
+        return "\n".join(rows)
+
+
+# ----------------------------------------------------------------------
+# 各步驟耗時
+# ----------------------------------------------------------------------
+@dataclass
+class StepTimings:
+    """一輪中各動作的實際耗時（秒）；等待常數與 CowLevelTask 的 Wait 一致。"""
+
+    tap_delay: float = 1.0
+    tap: float = 0.08  # adb tap 往返
+    ocr: float = 0.15  # 單次 find_text
+    capture: float = 0.25  # 每個 tick 的截圖
+    stage: float = 40.0  # 奶牛關迴圈每次等待
+    success_wait: float = 60.0  # 達標且遇到兩次以上奶牛關後的等待
+    between_rounds: float = 2.0  # 一輪結束後 Runner 的 click_cooldown
+
+    @classmethod
+    def from_metrics(cls, data: dict, **overrides) -> "StepTimings":
+        """由 METRICS_JSON（core.metrics 的 JSON 輸出）取各直方圖的平均值。"""
+
+        def mean(name: str, default: float) -> float:
+            series = (data.get(name) or {}).get("series") or []
+            total = sum(s["count"] for s in series)
+            return sum(s["sum"] for s in series) / total if total else default
+
+        base = cls()
+        return cls(
+            tap=mean("tap_seconds", base.tap),
+            ocr=mean("ocr_seconds", base.ocr),
+            capture=mean("capture_seconds", base.capture),
+            **overrides,
+        )
+
+    # 以下對應 CowLevelTask 各段流程
+    @property
+    def after_tap(self) -> float:
+        return self.tap + self.tap_delay
+
+    @property
+    def nav(self) -> float:
+        # Wait(2) → 3 次 (td + 0.1) → (td + 2) → 擷取 + 左右 OCR
+        return 2.0 + 3 * (self.after_tap + 0.1) + (self.after_tap + 2.0) + self.capture + 2 * self.ocr
+
+    @property
+    def enter(self) -> float:
+        return self.after_tap + self.tap_delay
+
+    @property
+    def exit_sequence(self) -> float:
+        return 3 * (self.after_tap + self.tap_delay) + self.after_tap
+
+    @property
+    def loop_step(self) -> float:
+        return self.stage + self.capture + 2 * self.ocr
+
+
+# ----------------------------------------------------------------------
+# 策略與模擬
+# ----------------------------------------------------------------------
+@dataclass(frozen=True)
+class Policy:
+    star_cutoff: int = 10  # round_stars >= 此值時點最終關
+    min_cows: int = 2  # 當輪奶牛關少於此數則退出重來
+    prefer_random: bool = True  # 沒有奶牛關時優先選隨機副本
+    star_weights: tuple[int, ...] = tuple(STAR_BY_LABEL.get(label, 4) for label in LABELS)
+
+    @property
+    def name(self) -> str:
+        return f"cutoff={self.star_cutoff} min_cows={self.min_cows} random={'y' if self.prefer_random else 'n'}"
+
+
+@dataclass
+class SimResult:
+    policy: Policy
+    rounds: int
+    seconds: float
+    cow_hits: int
+    successes: int
+    truncated: int
+    sim_seconds: float  # 模擬本身耗費的時間
+
+    @property
+    def cows_per_hour(self) -> float:
+        return self.cow_hits * 3600.0 / self.seconds
+
+    @property
+    def successes_per_hour(self) -> float:
+        return self.successes * 3600.0 / self.seconds
+
+    @property
+    def mean_round_seconds(self) -> float:
+        return self.seconds / self.rounds
+
+    @property
+    def rounds_per_sim_second(self) -> float:
+        return self.rounds / self.sim_seconds if self.sim_seconds else float("inf")
+
+
+def simulate(
+    policy: Policy,
+    offers: OfferModel,
+    timings: StepTimings,
+    *,
+    rounds: int = 1_000_000,
+    rng: Optional[np.random.Generator] = None,
+    max_steps: int = 64,
+) -> SimResult:
+    """以陣列同時推進所有回合；流程與 CowLevelTask.tick 相同。
+
+    只需要總耗時與總次數，因此時間以純量累加，且每一步只保留仍在奶牛關迴圈中的回合。
+    """
+    rng = rng or np.random.default_rng()
+    started = time.perf_counter()
+    n = int(rounds)
+    last = len(LABELS) - 1
+    weights = np.asarray(policy.star_weights, dtype=np.int16)
+    cdf = {key: np.cumsum(getattr(offers, key)) for key in ("left", "right", "reveal")}
+
+    def sample(key: str, m: int) -> np.ndarray:
+        # 反函數取樣：比 rng.choice(p=...) 快數倍
+        idx = np.searchsorted(cdf[key], rng.random(m), side="right")
+        return np.minimum(idx, last).astype(np.int8)
+
+    def choose(left: np.ndarray, right: np.ndarray, mask: np.ndarray):
+        """沒有奶牛關時的選擇：左/右隨機副本優先（依策略），否則選右側。"""
+        if policy.prefer_random:
+            rnd = mask & ((left == RANDOM) | (right == RANDOM))
+        else:
+            rnd = np.zeros_like(mask)
+        return rnd, mask & ~rnd
+
+    total = n * (timings.nav + timings.between_rounds)
+    cow_hits = 0
+    successes = 0
+
+    # 1) 第一個畫面：沒有奶牛關就選一關後退出
+    left, right = sample("left", n), sample("right", n)
+    has_cow = (left == COW) | (right == COW)
+    rnd, _ = choose(left, right, ~has_cow)
+    n_rnd = int(rnd.sum())
+    reveal_cow = int((sample("reveal", n_rnd) == COW).sum())
+    n_no_cow = n - int(has_cow.sum())
+    total += n_no_cow * timings.enter + n_rnd * timings.ocr
+    # 隨機副本揭曉為奶牛關時原流程不退出，直接結束本輪
+    total += (n_no_cow - reveal_cow) * timings.exit_sequence
+
+    # 2) 奶牛關迴圈（第一次迭代讀到的仍是第一個畫面）
+    left, right = left[has_cow], right[has_cow]
+    m = len(left)
+    stars = np.zeros(m, dtype=np.int16)
+    cows = np.zeros(m, dtype=np.int16)
+    prev = np.full(m, -1, dtype=np.int8)
+    for step in range(max_steps):
+        if m == 0:
+            break
+        total += m * timings.loop_step
+
+        finish = stars >= policy.star_cutoff
+        n_finish = int(finish.sum())
+        if n_finish:
+            n_lose = int((finish & (cows < policy.min_cows)).sum())
+            n_win = n_finish - n_lose
+            total += n_finish * timings.after_tap + n_lose * timings.exit_sequence
+            total += n_win * (timings.success_wait + timings.after_tap)
+            successes += n_win
+            cow_hits += int(cows[finish].sum())
+            keep = ~finish
+            stars, cows, prev = stars[keep], cows[keep], prev[keep]
+            if step == 0:
+                left, right = left[keep], right[keep]
+            m = len(stars)
+            if m == 0:
+                break
+
+        total += int((prev == BLESSING).sum()) * (timings.after_tap + 1.0)
+
+        if step > 0:
+            left, right = sample("left", m), sample("right", m)
+        cow_here = (left == COW) | (right == COW)
+        rnd, pick_right = choose(left, right, ~cow_here)
+        reveal = sample("reveal", m)
+        stars += cow_here * weights[COW] + rnd * weights[RANDOM] + pick_right * weights[right]
+        cows += cow_here | (rnd & (reveal == COW))
+        n_rnd = int(rnd.sum())
+        total += int(cow_here.sum()) * timings.after_tap
+        total += (n_rnd + int(pick_right.sum())) * timings.enter + n_rnd * timings.ocr
+        prev = np.where(pick_right, right, np.where(rnd, reveal, -1)).astype(np.int8)
+
+    return SimResult(
+        policy=policy,
+        rounds=n,
+        seconds=float(total),
+        cow_hits=cow_hits + int(cows.sum()),
+        successes=successes,
+        truncated=m,
+        sim_seconds=time.perf_counter() - started,
+    )
+
+
+def compare_policies(
+    policies: list[Policy], offers: OfferModel, timings: StepTimings, *, rounds: int, seed: int = 0
+) -> list[SimResult]:
+    """以相同亂數種子評估各策略，依每小時奶牛關次數排序。"""
+    results = [simulate(p, offers, timings, rounds=rounds, rng=np.random.default_rng(seed)) for p in policies]
+    return sorted(results, key=lambda r: r.cows_per_hour, reverse=True)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Monte Carlo evaluation of cow_level round policies.")
+    parser.add_argument("--log", nargs="*", default=[], help="Runner log files to fit offer probabilities from")
+    parser.add_argument("--smoothing", type=float, default=1.0, help="Additive smoothing for fitted probabilities")
+    parser.add_argument("--metrics", help="METRICS_JSON dump to take tap/OCR/capture latencies from")
+    parser.add_argument("--tap-delay", type=float, default=1.0)
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument("--cutoffs", type=int, nargs="*", default=[6, 8, 10, 12, 14])
+    parser.add_argument("--min-cows", type=int, nargs="*", default=[1, 2, 3])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    offers = OfferModel.fit_files(args.log, smoothing=args.smoothing) if args.log else OfferModel.uniform()
+    if args.metrics:
+        timings = StepTimings.from_metrics(json.loads(Path(args.metrics).read_text(encoding="utf-8")), tap_delay=args.tap_delay)
+    else:
+        timings = StepTimings(tap_delay=args.tap_delay)
+    print(f"[SIM] 關卡分布（觀測數 {offers.observations or '無，使用均勻分布'}）：")
+    print(offers.describe())
+    print(f"[SIM] 延遲：tap={timings.tap:.3f}s ocr={timings.ocr:.3f}s capture={timings.capture:.3f}s td={timings.tap_delay:.2f}s")
+
+    policies = [
+        Policy(star_cutoff=c, min_cows=m, prefer_random=r)
+        for c, m, r in itertools.product(args.cutoffs, args.min_cows, (True, False))
+    ]
+    results = compare_policies(policies, offers, timings, rounds=args.rounds, seed=args.seed)
+    print(f"{'policy':<34} {'cows/h':>8} {'wins/h':>8} {'round s':>8} {'Mrounds/s':>10}")
+    for r in results:
+        print(
+            f"{r.policy.name:<34} {r.cows_per_hour:>8.2f} {r.successes_per_hour:>8.2f} "
+            f"{r.mean_round_seconds:>8.1f} {r.rounds_per_sim_second / 1e6:>10.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
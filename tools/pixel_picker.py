@@ -2,8 +2,12 @@
 import argparse
 import cv2
 import os
+import sys
 from pathlib import Path
 
+# 允許直接以腳本執行時匯入專案內的 core 模組
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 
 def _annotate_and_save(img, x: int, y: int, out_path: str) -> None:
     vis = img.copy()
@@ -20,12 +24,44 @@ def _annotate_and_save(img, x: int, y: int, out_path: str) -> None:
     cv2.imwrite(os.path.join(out_dir, base), vis)
 
 
+def _probes_at(img, points: list[tuple[int, int]], tol: int):
+    from core.probes import PixelProbe
+
+    probes = []
+    for x, y in points:
+        b, g, r = [int(v) for v in img[y, x]]
+        probes.append(PixelProbe(x, y, (b, g, r), tol))
+    return probes
+
+
+def _save_picked(args, img, points: list[tuple[int, int]]) -> None:
+    """依模式將點選結果寫入場景檔（--scene）及/或探針組檔（--probe-set）。"""
+    probes = _probes_at(img, points, args.tol)
+    if args.scene:
+        from core.image_utils import thumbnail
+        from core.scene import THUMBNAIL_SIZE, save_scene
+
+        save_scene(args.scenes_file, args.scene, thumb=thumbnail(img, THUMBNAIL_SIZE), probes=probes)
+        print(f"已更新場景 '{args.scene}'（新增 {len(probes)} 個探針）: {args.scenes_file}")
+    if args.probe_set and probes:
+        from core.probes import append_probes
+
+        append_probes(args.probes_file, args.probe_set, probes)
+        print(f"已附加 {len(probes)} 個探針到探針組 '{args.probe_set}': {args.probes_file}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Pick pixel color from an image. GUI if available; headless with --x --y.")
     parser.add_argument("image", help="Path to image to open (e.g., latest screenshot)")
     parser.add_argument("--x", type=int, help="X coordinate (headless mode)")
     parser.add_argument("--y", type=int, help="Y coordinate (headless mode)")
     parser.add_argument("--out", default="debug/pick.png", help="Output annotated image path (headless mode)")
+    parser.add_argument("--scene", help="Record this image as a scene fingerprint; picked points become probes")
+    parser.add_argument("--scenes-file", default=os.getenv("SCENES_FILE", "config/scenes.yaml"), help="Scene file to update")
+    parser.add_argument("--tol", type=int, default=20, help="Per-channel tolerance for recorded probes")
+    parser.add_argument("--probe-set", help="Append picked points to this named probe set")
+    parser.add_argument("--probes-file", default=os.getenv("PROBES_FILE", "config/probes.yaml"), help="Probe-set file to update")
+    parser.add_argument("--thumbnail-only", action="store_true", help="With --scene: only record the thumbnail (headless)")
     args = parser.parse_args()
 
     img = cv2.imread(args.image)
@@ -39,6 +75,8 @@ def main():
             raise ValueError(f"座標超出範圍: ({args.x},{args.y}) for image size ({w}x{h})")
         b, g, r = [int(v) for v in img[args.y, args.x]]
         print(f"(x={args.x}, y={args.y}) BGR=({b},{g},{r})")
+        if args.scene or args.probe_set:
+            _save_picked(args, img, [(args.x, args.y)])
         try:
             _annotate_and_save(img, args.x, args.y, args.out)
             print(f"已輸出標註圖片: {args.out}")
@@ -46,7 +84,13 @@ def main():
             print(f"標註輸出失敗: {e}")
         return
 
+    # 只記錄場景縮圖（不需座標與顯示環境）
+    if args.scene and args.thumbnail_only:
+        _save_picked(args, img, [])
+        return
+
     # GUI mode (requires display)
+    picked: list[tuple[int, int]] = []
     try:
         win = "PixelPicker"
         cv2.namedWindow(win, cv2.WINDOW_NORMAL)
@@ -56,12 +100,15 @@ def main():
             if event == cv2.EVENT_LBUTTONDOWN:
                 b, g, r = img[y, x]
                 print(f"pos=({x},{y}) BGR=({int(b)},{int(g)},{int(r)})")
+                picked.append((x, y))
 
         cv2.setMouseCallback(win, on_mouse)
         cv2.imshow(win, img)
         print("左鍵點擊圖片即可輸出像素座標與顏色，按任意鍵關閉視窗…")
         cv2.waitKey(0)
         cv2.destroyAllWindows()
+        if args.scene or args.probe_set:
+            _save_picked(args, img, picked)
     except Exception as e:
         print("GUI 模式無法啟動（可能沒有顯示環境）。請改用 headless 模式：")
         print("  python3 tools/pixel_picker.py <image> --x <X> --y <Y> [--out debug/pick.png]")